@@ -7,15 +7,20 @@ import tkinter as tk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import os
+import sys
 import glob
 
+# 기본 데이터 디렉토리 (저장소의 data/bottom_reflectances)
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "data", "bottom_reflectances")
+
 class BottomReflectanceViewer:
-    def __init__(self, root):
+    def __init__(self, root, data_dir=None):
         self.root = root
         self.root.title("Bottom Reflectance Spectrum Viewer")
         self.root.geometry("1200x700")
         
-        self.data_dir = r"C:\HE60\cursor\data\bottom_reflectances"
+        self.data_dir = data_dir or DEFAULT_DATA_DIR
         self.colors = ['blue', 'red', 'green', 'orange', 'purple', 'brown', 
                        'pink', 'gray', 'olive', 'cyan', 'magenta', 'navy']
         self.color_index = 0
@@ -171,8 +176,10 @@ class BottomReflectanceViewer:
         self.info_label.config(text="Plot cleared")
 
 def main():
+    # 첫 번째 인자로 데이터 디렉토리 지정 가능
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
     root = tk.Tk()
-    app = BottomReflectanceViewer(root)
+    app = BottomReflectanceViewer(root, data_dir)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""
+P05_build_Rrs_LUT.py
+HydroLight 결과 파일들로 Rrs LUT를 만들고 최근접 이웃 역산을 시험
+"""
+
+import numpy as np
+from pathlib import Path
+
+from hydrolight.ensemble import HydroLightRun, HydroLightEnsemble
+from hydrolight.lut import RrsLUT
+
+
+def main():
+    print("="*50)
+    print("P05_build_Rrs_LUT.py STARTED")
+    print("="*50)
+
+    base_dir = Path(__file__).resolve().parent.parent
+    data_files = sorted((base_dir / "data").glob("P*.txt"))
+    output_dir = base_dir / "results" / "P05_build_Rrs_LUT"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Output directory: {output_dir}")
+
+    # 파장 그리드별로 run을 묶어 그리드마다 LUT 생성
+    groups = {}
+    for data_file in data_files:
+        run = HydroLightRun.from_file(data_file)
+        groups.setdefault(tuple(run.wavelength), []).append(run)
+
+    rng = np.random.default_rng(0)
+    for grid, runs in groups.items():
+        ensemble = HydroLightEnsemble(runs)
+        lut = RrsLUT.build(ensemble, profile_quantities=('Lu', 'Ed'))
+        output_file = lut.save(output_dir / f"rrs_lut_{len(grid)}bands.npz")
+
+        print("\n" + "="*50)
+        print(f"LUT with {len(lut)} runs x {len(grid)} bands: {', '.join(ensemble.names)}")
+        print(f"Saved: {output_file}")
+
+        # LUT 자신의 스펙트럼에 5% 잡음을 넣어 역산 확인
+        observed = lut.rrs * (1.0 + 0.05 * rng.standard_normal(lut.rrs.shape))
+        distances, indices = lut.query(observed, k=min(3, len(lut)))
+        for name, d, i in zip(lut.run_names, distances, indices):
+            matches = ", ".join(f"{lut.run_names[j]} ({dist:.2e})" for j, dist in zip(i, d))
+            print(f"  {name} -> {matches}")
+
+    print("\n" + "="*50)
+    print("LUT build completed!")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    main()
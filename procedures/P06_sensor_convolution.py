@@ -0,0 +1,67 @@
+"""
+P06_sensor_convolution.py
+HydroLight Ed, Lu, Rrs 스펙트럼을 센서 밴드 값으로 변환하여 CSV로 저장
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from hydrolight.ensemble import HydroLightEnsemble
+from hydrolight.sensor import SensorResponse, load_sensors, convolve, band_matrix
+
+
+def sensor_table(cube, sensor, ensemble, quantity):
+    """(run, band[, depth]) 배열을 run/depth 행, 밴드 열의 DataFrame으로 정리"""
+    if cube.ndim == 2:
+        df = pd.DataFrame(cube, columns=sensor.band_names)
+        df.insert(0, 'run', ensemble.names)
+        return df
+    n_run, n_band, n_depth = cube.shape
+    values = cube.transpose(0, 2, 1).reshape(n_run * n_depth, n_band)
+    df = pd.DataFrame(values, columns=sensor.band_names)
+    df.insert(0, 'depth', np.tile(ensemble.depth, n_run))
+    df.insert(0, 'run', np.repeat(ensemble.names, n_depth))
+    return df
+
+
+def main():
+    print("="*50)
+    print("P06_sensor_convolution.py STARTED")
+    print("="*50)
+
+    base_dir = Path(__file__).resolve().parent.parent
+    data_files = [base_dir / "data" / "PExe04.txt", base_dir / "data" / "PExe05.txt"]
+    rsr_dir = base_dir / "data" / "sensor_rsr"
+    output_dir = base_dir / "results" / "P06_sensor_convolution"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Output directory: {output_dir}")
+
+    # 센서 RSR 파일이 없으면 밴드 중심/FWHM 기반 Gaussian 근사 센서로 예시 실행
+    sensors = load_sensors(rsr_dir) if rsr_dir.exists() else {}
+    if not sensors:
+        print(f"No RSR files in {rsr_dir}, using a Gaussian example sensor")
+        sensors = {'gaussian_example': SensorResponse.gaussian(
+            'gaussian_example', [443, 490, 560, 665], [20, 65, 35, 30],
+            band_names=['B443', 'B490', 'B560', 'B665'])}
+
+    ensemble = HydroLightEnsemble.from_files(data_files)
+    cubes = {q: ensemble.cube(q) for q in ['Ed', 'Lu', 'Rrs']}
+
+    for name, sensor in sensors.items():
+        matrix, coverage = band_matrix(sensor, ensemble.wavelength)
+        print(f"\n{name}: {len(sensor.band_names)} bands, coverage " +
+              ", ".join(f"{b}={c:.2f}" for b, c in zip(sensor.band_names, coverage)))
+        for quantity, cube in cubes.items():
+            band_cube = convolve(cube, sensor, ensemble.wavelength, axis=1, min_coverage=0.99)
+            output_file = output_dir / f"{quantity}_{name}.csv"
+            sensor_table(band_cube, sensor, ensemble, quantity).to_csv(output_file, index=False)
+            print(f"Saved: {output_file}")
+
+    print("\n" + "="*50)
+    print("Sensor convolution completed!")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+P07_watch_ingest.py
+ingest 서비스 시험: 시험용 writer가 run 폴더에 HydroLight 출력을 조금씩 쓰는 동안 서비스가 감시/처리
+"""
+
+import json
+import time
+import shutil
+import asyncio
+from pathlib import Path
+
+from hydrolight.watch import IngestService, write_like_hydrolight
+
+
+async def run_demo(data_files, run_dir, output_dir, render=True):
+    service = IngestService([run_dir], output_dir, pattern="P*.txt", cache_dir=output_dir / "cache",
+                            render=render, poll_interval=0.5, max_workers=2, queue_size=2,
+                            stale_after=3.0)
+    service_task = asyncio.create_task(service.run())
+
+    # run 폴더마다 HydroLight가 출력 파일을 쓰는 것처럼 흉내 (마지막 파일은 중간에 멈춤)
+    writers = []
+    for i, data_file in enumerate(data_files):
+        target = run_dir / f"exe{i + 1:02d}" / data_file.name
+        writers.append(write_like_hydrolight(data_file, target, delay=0.1 + 0.05 * i))
+    writers.append(write_like_hydrolight(data_files[0], run_dir / "crashed" / "Pcrashed.txt", stop_at=0.6))
+    await asyncio.gather(*writers)
+    print(f"Writers finished: {len(writers)} file(s)")
+
+    # 모든 파일이 처리되거나 incomplete로 표시될 때까지 대기
+    expected = len(writers)
+    while True:
+        counts = service.counts()
+        if sum(counts.get(s, 0) for s in ('done', 'failed', 'incomplete')) >= expected:
+            break
+        await asyncio.sleep(0.5)
+    service.stop()
+    return await service_task
+
+
+def main():
+    print("="*50)
+    print("P07_watch_ingest.py STARTED")
+    print("="*50)
+
+    base_dir = Path(__file__).resolve().parent.parent
+    data_files = sorted((base_dir / "data").glob("PExe0[1-3].txt"))
+    output_dir = base_dir / "results" / "P07_watch_ingest"
+    run_dir = output_dir / "runs"
+    # 이전 시험 결과 삭제 (상태 파일이 남아 있으면 이미 처리한 파일로 보고 건너뜀)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    print(f"Run directory: {run_dir}")
+    print(f"Output directory: {output_dir}")
+
+    start = time.perf_counter()
+    counts = asyncio.run(run_demo(data_files, run_dir, output_dir))
+
+    print("\n" + "="*50)
+    print(f"Ingest finished in {time.perf_counter() - start:.1f} s: {counts}")
+    with open(output_dir / "ingest_status.json", 'r', encoding='utf-8') as f:
+        status = json.load(f)
+    for path, entry in status['files'].items():
+        print(f"  {entry['state']:<10} {Path(path).relative_to(run_dir)}  {entry.get('error') or ''}")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    main()
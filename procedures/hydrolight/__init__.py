@@ -0,0 +1,32 @@
+"""
+hydrolight
+HydroLight 출력 파일 파싱/분석/플롯 패키지
+
+파싱 핵심(parse, ensemble, derived)은 표준 라이브러리와 numpy만 import한다.
+pandas(export, params 테이블)와 matplotlib(plots, compare, bottom)은 실제로 쓸 때만 import되므로
+파싱만 하는 작업 프로세스는 빨리 시작된다. import 시간은 importbench 모듈로 확인한다:
+
+    python -m hydrolight.importbench
+"""
+
+__version__ = "0.1.0"
+
+# 자주 쓰는 이름은 처음 접근할 때 해당 모듈을 import한다 (PEP 562)
+_EXPORTS = {
+    "parse_file": "parse",
+    "parse_lines": "parse",
+    "HydroLightRun": "ensemble",
+    "HydroLightEnsemble": "ensemble",
+    "load_run": "ensemble",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
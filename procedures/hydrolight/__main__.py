@@ -0,0 +1,10 @@
+"""
+__main__.py
+python -m hydrolight ... 로 hydrolight 명령 실행
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+algorithms.py
+모의 Rrs cube (n_run, n_wavelength)에 대한 해색 알고리즘(OCx 밴드비, CI/OCI, 분광 지수, 분광 미분) 일괄 평가
+
+HydroLight ensemble로 밴드비 클로로필 알고리즘을 시험한다. 필요한 밴드 값은 파장 그리드별로 한 번 만든
+선형 보간 행렬 하나로 구하고, 알고리즘은 모두 run 축에 대해 vectorized이므로 run 1만 개에 새 계수 집합을
+시험해도 1초 안에 끝난다. 추정 Chl은 메타데이터의 입력 Chl (출력 깊이 평균, ensemble.params)과
+짝지어 알고리즘별 오차 통계를 낸다.
+
+    products = evaluate(ensemble.cube('Rrs'), ensemble.wavelength)       # {이름: (n_run,)}
+    table = error_statistics(products, ensemble.params['chl'])          # 알고리즘별 한 행
+    products = evaluate(rrs, wavelength, coefficients={'OC4': [0.32, -2.9, 2.7, -1.2, -0.6]})
+
+- OCx: log10(Chl) = a0 + a1 r + a2 r² + a3 r³ + a4 r⁴, r = log10(max(Rrs_blue) / Rrs_green) (O'Reilly et al.)
+- CI (Hu et al. 2012): Rrs(555) - [Rrs(443) + (555-443)/(670-443) (Rrs(670) - Rrs(443))], Chl = 10^(a0 + a1 CI)
+- OCI: Chl_CI <= 0.25이면 CI, > 0.3이면 OC4, 사이는 선형 혼합
+- 그리드 범위 밖 밴드가 필요한 알고리즘은 NaN (예: 60밴드 400-700 nm 그리드의 NDCI 708 nm)
+"""
+
+import numpy as np
+
+from .library import resample_matrix
+
+
+# OCx: (blue 밴드들, green 밴드, 계수 a0-a4)
+OCX_ALGORITHMS = {
+    "OC4": ((443.0, 490.0, 510.0), 555.0, [0.3272, -2.9940, 2.7218, -1.2259, -0.5683]),
+    "OC3M": ((443.0, 488.0), 547.0, [0.2424, -2.7423, 1.8017, 0.0015, -1.2280]),
+    "OC2": ((490.0,), 555.0, [0.2511, -2.0853, 1.5035, -3.1747, 0.3383]),
+}
+# Color Index (blue, green, red 밴드, 계수 a0, a1)
+CI_BANDS = (443.0, 555.0, 670.0)
+CI_COEFFICIENTS = [-0.4909, 191.6590]
+# OCI 혼합 구간 (Chl_CI mg/m³)
+OCI_BLEND = (0.25, 0.3)
+# Chl 추정 알고리즘 (오차 통계 대상)
+CHL_ALGORITHMS = list(OCX_ALGORITHMS) + ["CI", "OCI"]
+# 분광 지수 (Chl이 아닌 값)
+INDEX_ALGORITHMS = ["NDCI", "CI_index"]
+# 1차 분광 미분 dRrs/dλ를 보고할 파장 (nm)
+DERIVATIVE_WAVELENGTHS = (490.0, 555.0, 670.0)
+ALGORITHMS = CHL_ALGORITHMS + INDEX_ALGORITHMS
+
+# (파장 그리드 bytes, 밴드 bytes) -> (보간 행렬, 그리드 안 밴드 mask)
+_SAMPLE_CACHE = {}
+
+
+def sample_matrix(wavelength, bands):
+    """(len(wavelength), len(bands)) 선형 보간 행렬과 그리드 범위 안 밴드 mask (밖의 열은 0)"""
+    wavelength = np.asarray(wavelength, dtype=float)
+    bands = np.asarray(bands, dtype=float)
+    key = (wavelength.tobytes(), bands.tobytes())
+    if key not in _SAMPLE_CACHE:
+        inside = (bands >= wavelength.min() - 1e-9) & (bands <= wavelength.max() + 1e-9)
+        matrix = np.zeros((len(wavelength), len(bands)))
+        if inside.any():
+            matrix[:, inside] = resample_matrix(wavelength, bands[inside])
+        _SAMPLE_CACHE[key] = (matrix, inside)
+    return _SAMPLE_CACHE[key]
+
+
+def band_values(rrs, wavelength, bands):
+    """Rrs (n_run, n_wavelength) 또는 (n_wavelength,) -> 밴드 파장의 값 (n_run, n_band), 범위 밖은 NaN"""
+    rrs = np.atleast_2d(np.asarray(rrs, dtype=float))
+    matrix, inside = sample_matrix(wavelength, bands)
+    out = rrs @ matrix
+    out[:, ~inside] = np.nan
+    return out
+
+
+def spectral_derivative(rrs, wavelength):
+    """파장 축 1차 미분 dRrs/dλ (n_run, n_wavelength), 불균등 간격 중앙 차분"""
+    rrs = np.atleast_2d(np.asarray(rrs, dtype=float))
+    return np.gradient(rrs, np.asarray(wavelength, dtype=float), axis=1)
+
+
+def _log10_ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = numerator / denominator
+        return np.where(ratio > 0, np.log10(np.where(ratio > 0, ratio, 1.0)), np.nan)
+
+
+def ocx(rrs, wavelength, blue, green, coefficients):
+    """OCx 밴드비 Chl (mg/m³): 최대 blue 밴드 / green 밴드의 log10에 대한 4차 다항식"""
+    values = band_values(rrs, wavelength, list(blue) + [green])
+    with np.errstate(invalid='ignore'):
+        r = _log10_ratio(np.max(values[:, :-1], axis=1), values[:, -1])
+    # np.polyval은 최고차 계수부터
+    return 10.0 ** np.polyval(np.asarray(coefficients, dtype=float)[::-1], r)
+
+
+def color_index(rrs, wavelength, bands=CI_BANDS):
+    """Hu et al. (2012) Color Index: green 밴드와 blue-red 기준선의 차 (sr^-1)"""
+    blue, green, red = bands
+    values = band_values(rrs, wavelength, bands)
+    return values[:, 1] - (values[:, 0] + (green - blue) / (red - blue) * (values[:, 2] - values[:, 0]))
+
+
+def ci_chl(rrs, wavelength, coefficients=CI_COEFFICIENTS, bands=CI_BANDS):
+    """CI 기반 Chl (mg/m³) = 10^(a0 + a1 CI)"""
+    a0, a1 = coefficients
+    return 10.0 ** (a0 + a1 * color_index(rrs, wavelength, bands))
+
+
+def oci_chl(chl_ci, chl_oc, blend=OCI_BLEND):
+    """OCI: 낮은 Chl은 CI, 높은 Chl은 OCx, 그 사이 선형 혼합"""
+    low, high = blend
+    weight = np.clip((chl_ci - low) / (high - low), 0.0, 1.0)
+    return np.where(np.isnan(chl_ci), np.nan, (1 - weight) * chl_ci + weight * chl_oc)
+
+
+def ndci(rrs, wavelength, bands=(665.0, 708.0)):
+    """Normalized Difference Chlorophyll Index (Rrs708 - Rrs665) / (Rrs708 + Rrs665)"""
+    values = band_values(rrs, wavelength, bands)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (values[:, 1] - values[:, 0]) / (values[:, 1] + values[:, 0])
+
+
+def evaluate(rrs, wavelength, algorithms=None, coefficients=None, derivative_wavelengths=DERIVATIVE_WAVELENGTHS):
+    """Rrs cube (n_run, n_wavelength) -> {제품 이름: (n_run,) 배열}
+
+    algorithms: ALGORITHMS 중 계산할 이름 (None이면 전부, OCI는 CI와 OC4를 함께 계산)
+    coefficients: {OCx 이름 또는 'CI': 계수} 기본 계수 대신 쓸 값. OCX_ALGORITHMS에 없는 이름은
+        'OC4' 밴드로 새 OCx 제품을 만든다.
+    derivative_wavelengths: 'dRrs_<파장>' 제품으로 보고할 1차 미분 파장
+    """
+    rrs = np.atleast_2d(np.asarray(rrs, dtype=float))
+    wavelength = np.asarray(wavelength, dtype=float)
+    if rrs.shape[1] != len(wavelength):
+        raise ValueError(f"Rrs has {rrs.shape[1]} wavelengths, expected {len(wavelength)}")
+    coefficients = dict(coefficients or {})
+    names = list(ALGORITHMS if algorithms is None else algorithms)
+    unknown = [n for n in names if n not in ALGORITHMS]
+    if unknown:
+        raise KeyError(f"Unknown algorithm(s) {unknown}, available: {ALGORITHMS}")
+
+    products = {}
+    ocx_sets = {name: OCX_ALGORITHMS[name] for name in names if name in OCX_ALGORITHMS}
+    if "OCI" in names:
+        ocx_sets.setdefault("OC4", OCX_ALGORITHMS["OC4"])
+    for name, values in coefficients.items():
+        if name in OCX_ALGORITHMS or name == "CI":
+            continue
+        blue, green, _ = OCX_ALGORITHMS["OC4"]
+        ocx_sets[name] = (blue, green, values)
+    for name, (blue, green, default) in ocx_sets.items():
+        products[name] = ocx(rrs, wavelength, blue, green, coefficients.get(name, default))
+    if "CI" in names or "OCI" in names:
+        products["CI"] = ci_chl(rrs, wavelength, coefficients.get("CI", CI_COEFFICIENTS))
+    if "OCI" in names:
+        products["OCI"] = oci_chl(products["CI"], products["OC4"])
+    if "CI_index" in names:
+        products["CI_index"] = color_index(rrs, wavelength)
+    if "NDCI" in names:
+        products["NDCI"] = ndci(rrs, wavelength)
+    if len(derivative_wavelengths):
+        derivative = band_values(spectral_derivative(rrs, wavelength), wavelength, derivative_wavelengths)
+        for j, wl in enumerate(derivative_wavelengths):
+            products[f"dRrs_{wl:g}"] = derivative[:, j]
+    return products
+
+
+def parse_coefficients(specs):
+    """명령행 ["OC4=0.3,-2.9,2.7,-1.2,-0.6", "CI=-0.49,191.7"] -> {이름: [계수]}"""
+    coefficients = {}
+    for spec in specs or []:
+        name, _, values = spec.partition("=")
+        try:
+            coefficients[name.strip()] = [float(v) for v in values.split(",")]
+        except ValueError:
+            raise ValueError(f"Coefficients must look like NAME=A0,A1,..., got {spec!r}") from None
+        expected = 2 if name.strip() == "CI" else 5
+        if len(coefficients[name.strip()]) != expected:
+            raise ValueError(f"{name.strip()} needs {expected} coefficients, got {spec!r}")
+    return coefficients
+
+
+def error_statistics(products, truth, names=None):
+    """Chl 제품별 입력 Chl 대비 오차 통계 -> 행 목록 (알고리즘별 dict)
+
+    양수이고 유한한 (추정, 참값) 쌍만 사용한다. log 공간 통계:
+    bias = mean(log10(추정/참)), rmse = sqrt(mean(log10(추정/참)²)), mae_factor = 10^mean|log10(추정/참)|,
+    mdape = median(|추정 - 참| / 참) x 100 (%), slope/intercept/r2 = log10(추정) ~ log10(참) 회귀
+    """
+    truth = np.asarray(truth, dtype=float)
+    if names is None:
+        # 기본 Chl 알고리즘과 계수로 만든 새 OCx 제품
+        names = ([n for n in CHL_ALGORITHMS if n in products]
+                 + [n for n in products if n not in ALGORITHMS and not n.startswith("dRrs_")])
+    rows = []
+    for name in names:
+        estimate = np.asarray(products[name], dtype=float)
+        valid = np.isfinite(estimate) & np.isfinite(truth) & (estimate > 0) & (truth > 0)
+        row = {'algorithm': name, 'n': int(valid.sum()), 'n_total': len(estimate)}
+        if valid.any():
+            log_est, log_true = np.log10(estimate[valid]), np.log10(truth[valid])
+            diff = log_est - log_true
+            row.update(bias=diff.mean(), rmse=np.sqrt(np.mean(diff ** 2)), mae_factor=10.0 ** np.abs(diff).mean(),
+                       mdape=100.0 * np.median(np.abs(estimate[valid] - truth[valid]) / truth[valid]))
+            if valid.sum() >= 3 and np.ptp(log_true) > 0:
+                slope, intercept = np.polyfit(log_true, log_est, 1)
+                r = np.corrcoef(log_true, log_est)[0, 1]
+                row.update(slope=slope, intercept=intercept, r2=r ** 2)
+        rows.append(row)
+    return rows
+
+
+def product_table(names, products, params=None):
+    """run별 제품 테이블 (pandas DataFrame, index: run 이름), params가 있으면 입력 파라미터 열을 앞에 붙임"""
+    import pandas as pd
+    table = pd.DataFrame(products, index=list(names))
+    if params is not None:
+        table = params.join(table)
+    table.index.name = 'name'
+    return table
@@ -0,0 +1,78 @@
+"""
+bottom.py
+바닥 반사도 스펙트럼 파일 (\\begin_header ... \\end_data) 파싱과 플롯 (P01_plot_ref.py에서 사용)
+"""
+
+from pathlib import Path
+
+from .plots import pyplot
+from .trace import echo
+
+
+def parse_bottom_reflectance(data_file):
+    """바닥 반사도 파일 (\\begin_header ... \\end_data) 파싱 -> (wavelengths, reflectances)"""
+    wavelengths = []
+    reflectances = []
+
+    with open(data_file, 'r', encoding='utf-8') as f:
+        in_data = False
+        for line in f:
+            line = line.strip()
+
+            # 헤더 끝 확인
+            if '\\end_header' in line:
+                in_data = True
+                continue
+
+            # 데이터 끝 확인
+            if '\\end_data' in line:
+                break
+
+            # 데이터 읽기
+            if in_data and line:
+                try:
+                    parts = line.split()
+                    if len(parts) >= 2 and not line.startswith('\\'):
+                        wavelengths.append(float(parts[0]))
+                        reflectances.append(float(parts[1]))
+                except ValueError:
+                    pass
+
+    if not wavelengths:
+        raise ValueError(f"No reflectance data found in {data_file}")
+    return wavelengths, reflectances
+
+
+def plot_bottom_reflectance(data_file, output_dir, label=None, filename=None):
+    """바닥 반사도 스펙트럼 플롯 저장 후 출력 파일 경로 반환"""
+    data_file = Path(data_file)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    label = label or data_file.stem
+    filename = filename or f"{data_file.stem}_reflectance_spectrum.png"
+
+    wavelengths, reflectances = parse_bottom_reflectance(data_file)
+
+    # 그래프 그리기
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(wavelengths, reflectances, 'b-', linewidth=2, label=label)
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Reflectance (nondimensional)', fontsize=12)
+    ax.set_title(f'Bottom Reflectance Spectrum - {label}', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=10)
+    plt.tight_layout()
+
+    # 그래프 저장
+    output_file = output_dir / filename
+    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+    # 결과 출력
+    echo(f"그래프가 저장되었습니다: {output_file}")
+    echo(f"\n데이터 요약:")
+    echo(f"  - 총 데이터 포인트: {len(wavelengths)}")
+    echo(f"  - 파장 범위: {min(wavelengths):.1f} - {max(wavelengths):.1f} nm")
+    echo(f"  - 반사도 범위: {min(reflectances):.5f} - {max(reflectances):.5f}")
+    return output_file
@@ -0,0 +1,1229 @@
+"""
+cli.py
+P01-P04 기능을 여러 파일에 대해 병렬로 실행하는 명령행 도구
+
+사용 예:
+    hydrolight parse   "data/P*.txt" -o results --jobs 4
+    hydrolight plot    "data/P*.txt" "data/bottom_reflectances/*.txt" -o results --jobs 4
+    hydrolight compare data/PExe04.txt data/PExe05.txt -o results
+    hydrolight compare "data/PExe0*.txt" --reference data/PExe01.txt -o results
+    hydrolight catalog "data/P*.txt" -o results
+    hydrolight validate "data/P*.txt" -o results --jobs 4
+    hydrolight regress "data/P*.txt" --reference results/reference --update
+    hydrolight regress "new/P*.txt" --reference results/reference --fail-fast --tol Ed=0,5e-4
+    hydrolight store   "data/PExe0[45].txt" -o results --store results/store_60bands
+    hydrolight stats   "data/PExe0[45].txt" -o results --jobs 2
+    hydrolight sensitivity "sweep/*.txt" --baseline base -o results
+    hydrolight density "sweep/*.txt" -o results --figures Lu_vs_wavelength_by_depth Lu_difference
+    hydrolight color   "data/P*.txt" -o results --quantities Rrs Lw Ed
+    hydrolight algorithms "sweep/*.txt" -o results --coefficients OC4=0.33,-3.0,2.7,-1.2,-0.57
+    hydrolight forward "data/P*.txt" -o results --library data/bottom_reflectances --fit g0 g1
+    hydrolight invert  "data/P*.txt" -o results --spectra field_rrs.csv --basis PExe04 --jobs 4
+    hydrolight image   scene.hdr -o results --product invert --runs data/PExe04.txt --tile 128 --jobs 4
+    hydrolight emulate "sweep/*.txt" -o results --parameters chl acdom440 minerals --folds 5
+    hydrolight match   field/*.txt --library data/bottom_reflectances --metric sam --window 400 700
+    hydrolight bench   "data/P*.txt" --repeat 3
+    hydrolight plot    "data/P*.txt" -q --trace results/trace.json --profile results/plot.pstats
+    hydrolight watch   /data/HE60/run -o results --jobs 2
+    hydrolight serve   "data/P*.txt" --port 8000 --jobs 4
+    hydrolight sweep   Iroot_template.txt -o results --lhs 1000 --range chl=0.05:20:log minerals=0:5 --set bottom_depth=10
+    hydrolight schedule results/sweep/manifest.csv --command "HydroLight.exe {input}" --jobs 8 --timeout 1800
+    hydrolight emulate "results/sweep/*/P*.txt" --manifest results/sweep/manifest.csv
+
+실패한 파일이 하나라도 있으면 요약을 출력하고 종료 코드 1을 반환한다.
+--trace를 주면 단계별 시간과 counter를 Chrome trace JSON으로 저장한다 (trace 모듈 참고).
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import contextlib
+import traceback
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from . import trace
+from .validate import describe, count_flags
+
+
+# 종료 코드
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def expand_inputs(patterns):
+    """glob 패턴 목록을 파일 목록으로 확장 -> (파일 목록, 일치하는 파일이 없는 패턴 목록)
+
+    순서를 유지하며 중복은 제거한다. '**'는 하위 디렉토리까지 검색한다.
+    """
+    files = []
+    seen = set()
+    unmatched = []
+    for pattern in patterns:
+        if os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        if not matches:
+            unmatched.append(pattern)
+        for match in matches:
+            key = os.path.realpath(match)
+            if key not in seen:
+                seen.add(key)
+                files.append(Path(match))
+    return files, unmatched
+
+
+def is_bottom_reflectance(filepath):
+    """바닥 반사도 파일(\\begin_header로 시작) 여부"""
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if line.strip():
+                return line.strip().startswith('\\begin_header')
+    return False
+
+
+# ----------------------------------------------------------------------
+# 작업 함수 (ProcessPoolExecutor에서 실행되므로 모듈 최상위에 둔다)
+# 각 함수는 요약 한 줄을 반환하고, 실패하면 예외를 던진다.
+# ----------------------------------------------------------------------
+def _parse_task(filepath, output_root, cache_dir):
+    from .ensemble import load_run
+    run = load_run(filepath, cache_dir)
+    output_file = run.save(Path(output_root) / "parse" / f"{Path(filepath).stem}.npz")
+    flags = describe(run.metadata.get('quality_flags', 0))
+    note = f" (quality: {', '.join(flags)})" if flags else ""
+    return (f"{len(run.wavelength)} bands, {len(run.depth)} depths -> {output_file}{note}")
+
+
+def _plot_task(filepath, output_root, cache_dir):
+    if is_bottom_reflectance(filepath):
+        from .bottom import plot_bottom_reflectance
+        output_file = plot_bottom_reflectance(filepath, Path(output_root) / "P01_plot_ref")
+        return f"bottom reflectance -> {output_file}"
+    from .ensemble import load_run
+    from .plots import process_file
+    run = load_run(filepath, cache_dir)
+    output_dir = process_file(filepath, Path(output_root) / "P03_parse_HL_results", run=run)
+    return f"{len(run.wavelength)} bands -> {output_dir}"
+
+
+def _compare_task(file_a, file_b, output_root, cache_dir):
+    from .ensemble import load_run
+    from .compare import compare_runs
+    run_a = load_run(file_a, cache_dir)
+    run_b = load_run(file_b, cache_dir)
+    output_dir = Path(output_root) / "P04_compare" / f"{run_a.name}_vs_{run_b.name}"
+    compare_runs(run_a, run_b, output_dir)
+    return f"-> {output_dir}"
+
+
+def _catalog_task(filepath, cache_dir):
+    from .ensemble import load_run
+    run = load_run(filepath, cache_dir)
+    row = {'name': run.name, 'path': str(filepath), 'n_bands': len(run.wavelength),
+           'wavelength_min': float(run.wavelength.min()) if len(run.wavelength) else None,
+           'wavelength_max': float(run.wavelength.max()) if len(run.wavelength) else None,
+           'n_depths': len(run.depth),
+           'max_depth': float(run.depth.max()) if len(run.depth) else None}
+    row.update(_metadata_columns(run.metadata))
+    return row
+
+
+def _metadata_columns(metadata):
+    """메타데이터 -> 스칼라 열 dict (catalog.csv 한 칸에 하나의 값)
+
+    dict는 '<키>.<이름>' 열 (예: forel_ule.Rrs), cie_xyY는 공기 중 값만 'cie_xyY.<양>.x/y/Y',
+    문자열 목록 (components)은 '; '로 이음. 그 밖의 배열은 생략한다.
+    """
+    row = {}
+    for key, value in metadata.items():
+        if key == 'cie_xyY':
+            for quantity, table in value.items():
+                if table.get('air') is not None:
+                    row.update({f"{key}.{quantity}.{c}": float(v) for c, v in zip("xyY", table['air'])})
+        elif isinstance(value, dict):
+            row.update({f"{key}.{name}": v for name, v in value.items()
+                        if np.ndim(v) == 0 and not isinstance(v, dict)})
+        elif isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+            row[key] = "; ".join(value)
+        elif np.ndim(value) == 0:
+            row[key] = value
+    return row
+
+
+def _validate_task(filepath, cache_dir):
+    from .ensemble import load_run
+    run = load_run(filepath, cache_dir)
+    flags = run.metadata.get('quality_flags', 0)
+    row = {'name': run.name, 'path': str(filepath), 'n_bands': len(run.wavelength),
+           'n_bands_expected': run.metadata.get('n_bands_expected', 0), 'quality_flags': flags,
+           'problems': " ".join(describe(flags))}
+    counts = count_flags(run['quality'][np.newaxis])
+    row.update({name: int(values[0]) for name, values in counts.items()})
+    return row
+
+
+def _load_task(filepath, cache_dir, manifest=None):
+    from .ensemble import load_run
+    run = load_run(filepath, cache_dir)
+    if manifest:
+        from .sweep import apply_manifest
+        apply_manifest(run, manifest)
+    return run
+
+
+def _bench_task(filepath, repeat, cache_dir):
+    from .ensemble import HydroLightRun, load_run
+    size_mb = os.path.getsize(filepath) / 1e6
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        HydroLightRun.from_file(filepath)
+        times.append(time.perf_counter() - start)
+    row = {'name': Path(filepath).stem, 'size_mb': size_mb,
+           'parse_s': min(times), 'parse_MB_per_s': size_mb / min(times)}
+    if cache_dir is not None:
+        load_run(filepath, cache_dir)
+        start = time.perf_counter()
+        load_run(filepath, cache_dir)
+        row['cached_s'] = time.perf_counter() - start
+    return row
+
+
+def _run_quietly(quiet, func, *args):
+    """quiet이면 작업 중 print 출력을 버린다 (병렬 실행 시 출력이 섞이지 않도록)"""
+    if not quiet:
+        return func(*args)
+    trace.set_quiet(True)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return func(*args)
+
+
+def _call(quiet, func, *args):
+    """작업 실행 -> (성공 여부, 결과 또는 오류 메시지, 소요 시간)"""
+    start = time.perf_counter()
+    try:
+        with trace.stage(f"task.{func.__name__.strip('_')}", input=args[0] if args else ""):
+            result = _run_quietly(quiet, func, *args)
+        return True, result, time.perf_counter() - start
+    except Exception as e:
+        detail = traceback.format_exc() if os.environ.get("HYDROLIGHT_DEBUG") else ""
+        return False, f"{type(e).__name__}: {e}\n{detail}".rstrip(), time.perf_counter() - start
+
+
+def _traced_call(quiet, func, *args):
+    """작업 프로세스에서 trace를 켜고 실행 -> _call() 결과 + 이 작업의 trace 기록"""
+    trace.enable(quiet)
+    return _call(quiet, func, *args) + (trace.TRACER.drain(),)
+
+
+def run_tasks(tasks, jobs=1, quiet=False, verdict=None):
+    """(label, func, args) 작업 목록 실행 -> [(label, 성공 여부, 결과, 소요 시간)] (입력 순서)
+
+    jobs > 1이면 프로세스 풀에서 실행한다 (matplotlib/pyplot은 스레드 안전하지 않음).
+    verdict: 결과 tuple -> 보고용 결과 tuple. 파일별 [OK]/[FAIL] 줄을 summarize에 넘길 판정과 같게 출력할 때 준다.
+    """
+    report = (lambda result: _report(verdict(result))) if verdict else _report
+    results = [None] * len(tasks)
+    if jobs <= 1 or len(tasks) <= 1:
+        for i, (label, func, args) in enumerate(tasks):
+            results[i] = (label,) + _call(quiet, func, *args)
+            report(results[i])
+        return results
+
+    # trace가 켜져 있으면 작업 프로세스의 기록을 결과와 함께 받아 합침
+    traced = trace.TRACER.enabled
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_traced_call if traced else _call, quiet, func, *args): i
+                   for i, (label, func, args) in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                outcome = future.result()
+                if traced:
+                    trace.TRACER.merge(outcome[-1])
+                    outcome = outcome[:-1]
+                results[i] = (tasks[i][0],) + outcome
+            except Exception as e:
+                # 작업 프로세스 자체가 죽은 경우 (BrokenProcessPool 등)
+                results[i] = (tasks[i][0], False, f"{type(e).__name__}: {e}", 0.0)
+            report(results[i])
+    return results
+
+
+def _report(result):
+    label, ok, value, elapsed = result
+    status = "OK  " if ok else "FAIL"
+    text = value if isinstance(value, str) else ""
+    print(f"[{status}] {label} ({elapsed:.2f} s) {text.splitlines()[0] if text else ''}".rstrip(),
+          flush=True)
+
+
+def summarize(results, unmatched=()):
+    """결과 요약 출력 후 종료 코드 반환"""
+    failed = [r for r in results if not r[1]]
+    print("\n" + "="*50)
+    print(f"{len(results)} task(s), {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    for pattern in unmatched:
+        print(f"  no files match: {pattern}")
+    for label, _, message, _ in failed:
+        print(f"  {label}: {message}")
+    print("="*50)
+    return EXIT_FAILED if failed or unmatched else EXIT_OK
+
+
+def _write_table(rows, output_file):
+    import pandas as pd
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    table = pd.DataFrame(rows)
+    table.to_csv(output_file, index=False)
+    return table
+
+
+def _load_library(args, required=True):
+    """--library (기본: 저장소의 data/bottom_reflectances) 라이브러리
+
+    required가 아니면 --library를 주지 않았고 기본 디렉토리도 없을 때 None.
+    디렉토리가 없거나 비어 있으면 ValueError.
+    """
+    from .library import SpectralLibrary, DEFAULT_LIBRARY_DIR
+    directory = args.library or DEFAULT_LIBRARY_DIR
+    if not required and args.library is None and not os.path.isdir(directory):
+        return None
+    return SpectralLibrary.from_directory(directory)
+
+
+# ----------------------------------------------------------------------
+# 하위 명령
+# ----------------------------------------------------------------------
+def cmd_parse(args, files):
+    tasks = [(str(f), _parse_task, (f, args.output_root, args.cache_dir)) for f in files]
+    return run_tasks(tasks, args.jobs, args.quiet)
+
+
+def cmd_plot(args, files):
+    tasks = [(str(f), _plot_task, (f, args.output_root, args.cache_dir)) for f in files]
+    return run_tasks(tasks, args.jobs, args.quiet)
+
+
+def cmd_compare(args, files):
+    if args.reference:
+        reference = Path(args.reference)
+        others = [f for f in files if os.path.realpath(f) != os.path.realpath(reference)]
+    elif len(files) >= 2:
+        # 기준 파일이 없으면 첫 번째 파일을 기준으로 나머지를 비교
+        reference, others = files[0], files[1:]
+    else:
+        raise SystemExit("compare needs at least two files or --reference")
+    tasks = [(f"{reference} vs {f}", _compare_task, (reference, f, args.output_root, args.cache_dir))
+             for f in others]
+    return run_tasks(tasks, args.jobs, args.quiet)
+
+
+def cmd_catalog(args, files):
+    tasks = [(str(f), _catalog_task, (f, args.cache_dir)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    rows = [value for _, ok, value, _ in results if ok]
+    if rows:
+        output_file = Path(args.output_root) / "catalog.csv"
+        table = _write_table(rows, output_file)
+        columns = [c for c in ['name', 'n_bands', 'n_depths', 'chl', 'acdom440', 'minerals',
+                               'bottom_type', 'bottom_depth', 'normal_exit', 'quality_flags']
+                   if c in table.columns]
+        print("\n" + table[columns].to_string(index=False))
+        print(f"\nSaved: {output_file}")
+    return results
+
+
+def _quality_verdict(result):
+    """validate 작업 결과 -> 보고용 결과 (품질 flag가 있는 run은 실패)"""
+    label, ok, value, elapsed = result
+    if not ok:
+        return result
+    if value['quality_flags']:
+        return (label, False, f"quality: {value['problems']}", elapsed)
+    return (label, True, "ok", elapsed)
+
+
+def cmd_validate(args, files):
+    """복사량 일관성 검사. 문제가 있는 run은 실패로 보고하고 quality.csv에 flag별 셀 수 저장"""
+    tasks = [(str(f), _validate_task, (f, args.cache_dir)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet, verdict=_quality_verdict)
+    rows = [value for _, ok, value, _ in results if ok]
+    if rows:
+        output_file = Path(args.output_root) / "quality.csv"
+        table = _write_table(rows, output_file)
+        print("\n" + table[['name', 'n_bands', 'n_bands_expected', 'quality_flags', 'problems']]
+              .to_string(index=False))
+        print(f"\nSaved: {output_file}")
+    return [_quality_verdict(result) for result in results]
+
+
+def cmd_regress(args, files):
+    """기준 parse와 비교 (--update이면 기준 저장). 보고서는 <output-root>/regress_report.json"""
+    from .regress import save_references, check_files, save_report, parse_tolerances
+    reference_dir = Path(args.reference or Path(args.output_root) / "reference")
+    if args.update:
+        tasks = [(str(f), save_references, ([f], reference_dir, args.cache_dir)) for f in files]
+        return run_tasks(tasks, args.jobs, args.quiet)
+
+    try:
+        tolerances = parse_tolerances(args.tol)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    start = time.perf_counter()
+    report = check_files(files, reference_dir, tolerances, fail_fast=args.fail_fast, top=args.top,
+                         cache_dir=args.cache_dir, jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+    output_file = save_report(report, args.report or Path(args.output_root) / "regress_report.json")
+
+    results = []
+    for run in report['runs']:
+        breached = [f"{q}({n})" for q, n in run.get('n_breach', {}).items() if n]
+        message = " ".join(run['problems'] + breached)
+        results.append((run.get('path', run['name']), run['status'] == "ok", message or "ok", 0.0))
+        if not args.quiet or run['status'] != "ok":
+            _report(results[-1])
+    if report['stopped_early']:
+        skipped = files[report['n_checked']:]
+        results.extend((str(f), False, "not checked (--fail-fast)", 0.0) for f in skipped)
+    worst = [cell for cell in report['worst'] if cell['excess'] > 0]
+    if worst:
+        print(f"\n{'run':<16} {'quantity':<12} {'wavelength':>10} {'depth':>8} "
+              f"{'new':>12} {'reference':>12} {'excess':>10}")
+        for cell in worst[:10]:
+            depth = "" if cell['depth'] is None else f"{cell['depth']:.3f}"
+            print(f"{cell['run']:<16} {cell['quantity']:<12} {cell['wavelength']:>10.1f} {depth:>8} "
+                  f"{cell['new']:>12.5g} {cell['reference']:>12.5g} {cell['excess']:>10.3g}")
+    print(f"\n{report['n_checked']} run(s) checked in {elapsed:.2f} s: {report['counts']} -> {output_file}")
+    return results
+
+
+def cmd_sensitivity(args, files):
+    """one-at-a-time 섭동 run을 baseline과 짝지어 (parameter, quantity, wavelength, depth) Jacobian 저장"""
+    from .ensemble import HydroLightEnsemble
+    from .sensitivity import jacobian
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    try:
+        jac = jacobian(HydroLightEnsemble(runs), args.quantities, baseline=args.baseline,
+                       normalize="absolute" if args.absolute else "relative")
+    except (KeyError, ValueError) as e:
+        return results + [("sensitivity", False, f"{type(e).__name__}: {e}", 0.0)]
+
+    output_dir = Path(args.output_root) / "sensitivity"
+    output_file = jac.save(output_dir / "jacobian.npz")
+    table = _write_table(jac.summary(), output_dir / "sensitivity_summary.csv")
+    print(f"\nBaseline: {jac.baseline}")
+    for name, parameter, value, base in jac.pairs:
+        print(f"  {name}: {parameter} {base:g} -> {value:g}")
+    print("\n" + table.pivot(index='parameter', columns='quantity', values='median_abs')
+          .to_string(float_format=lambda x: f"{x:.4g}"))
+    print(f"\n{jac} -> {output_file}")
+    return results
+
+
+def cmd_density(args, files):
+    """많은 run의 P03/P04 figure를 2차원 히스토그램 + 백분위수 envelope로 그림"""
+    from .ensemble import HydroLightEnsemble
+    from .density import plot_density
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    try:
+        saved = plot_density(HydroLightEnsemble(runs), Path(args.output_root) / "density", figures=args.figures,
+                             reference=args.reference, depth=args.depth, bins=(args.bins[0], args.bins[1]),
+                             jobs=args.jobs)
+    except (KeyError, ValueError) as e:
+        return results + [("density", False, f"{type(e).__name__}: {e}", 0.0)]
+    print(f"\n{len(saved)} density figure(s) from {len(runs)} run(s) -> {Path(args.output_root) / 'density'}")
+    return results
+
+
+def cmd_color(args, files):
+    """run별 색 지표 (xyY, hue angle, 주파장, Forel-Ule)와 HydroLight 출력 값과의 비교 저장"""
+    from .color import color_metrics, verify_run
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    rows = []
+    checks = []
+    for _, ok, run, _ in results:
+        if not ok:
+            continue
+        for q in args.quantities:
+            if q not in run:
+                continue
+            values = np.asarray(run[q], dtype=float)
+            # 깊이별 양은 (n_depth, n_wavelength)로 한 번에 계산
+            depths = run.depth if values.ndim == 2 else [None]
+            metrics = color_metrics(values.T if values.ndim == 2 else values, run.wavelength)
+            for i, z in enumerate(depths):
+                row = {'name': run.name, 'quantity': q, 'depth': z}
+                row.update({k: float(np.atleast_1d(v)[i]) for k, v in metrics.items()})
+                rows.append(row)
+        checks.extend({'name': run.name, **row} for row in verify_run(run))
+    output_dir = Path(args.output_root)
+    if rows:
+        table = _write_table(rows, output_dir / "colors.csv")
+        surface = table[table['depth'].isna()] if table['depth'].isna().any() else table
+        print("\n" + surface[['name', 'quantity', 'x', 'y', 'hue', 'dominant_wavelength', 'forel_ule']]
+              .to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+        print(f"\nSaved: {output_dir / 'colors.csv'}")
+    if checks:
+        table = _write_table(checks, output_dir / "colors_check.csv")
+        dxy = np.maximum(abs(table['x'] - table['printed_x']), abs(table['y'] - table['printed_y']))
+        fu = table.dropna(subset=['printed_fu'])
+        print(f"Printed vs computed: {len(table)} xyY value(s), max |dx|,|dy| {dxy.max():.4f}, "
+              f"Forel-Ule {int((fu['fu'] == fu['printed_fu']).sum())}/{len(fu)} equal "
+              f"-> {output_dir / 'colors_check.csv'}")
+        mismatch = table[table['status'] != "ok"]
+        if len(mismatch):
+            detail = ", ".join(f"{r.name} {r.quantity} (printed {int(r.printed_fu)}, computed {r.fu})"
+                               for r in mismatch.itertuples())
+            results = results + [("colors_check", False,
+                                  f"Forel-Ule mismatch in {len(mismatch)} row(s): {detail}", 0.0)]
+    return results
+
+
+def cmd_algorithms(args, files):
+    """Rrs에 해색 알고리즘을 적용하여 run별 제품과 입력 Chl 대비 알고리즘별 오차 통계 저장"""
+    import pandas as pd
+    from .ensemble import HydroLightEnsemble
+    from .algorithms import evaluate, error_statistics, parse_coefficients, product_table
+    try:
+        coefficients = parse_coefficients(args.coefficients)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    # ensemble은 같은 파장 그리드끼리만 만들 수 있으므로 그리드별로 평가
+    groups = {}
+    for run in runs:
+        groups.setdefault(run.wavelength.tobytes(), []).append(run)
+    tables = []
+    for group in groups.values():
+        ensemble = HydroLightEnsemble(group)
+        products = evaluate(ensemble.cube('Rrs'), ensemble.wavelength, args.algorithms, coefficients)
+        tables.append(product_table(ensemble.names, products, ensemble.params))
+    names = list(products)
+    table = pd.concat(tables)
+    if args.truth not in table.columns:
+        return results + [("algorithms", False, f"KeyError: no parameter {args.truth!r}", 0.0)]
+
+    output_dir = Path(args.output_root) / "algorithms"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output_dir / "products.csv")
+    stats = _write_table(error_statistics({n: table[n].to_numpy() for n in names}, table[args.truth].to_numpy()), output_dir / "algorithm_stats.csv")
+    print(f"\n{len(table)} run(s) in {len(groups)} wavelength grid(s), truth: {args.truth}")
+    print("\n" + stats.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    print(f"\nSaved: {output_dir / 'products.csv'}, {output_dir / 'algorithm_stats.csv'}")
+    return results
+
+
+def cmd_forward(args, files):
+    """반해석적 Rrs forward 모델 계수를 run에 맞게 보정하고 보정 전/후 잔차 저장"""
+    import json
+    import warnings
+    from .forward import calibrate, run_inputs, residual_report, DEFAULT_COEFFICIENTS
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    try:
+        library = _load_library(args, required=False)
+        if args.no_fit:
+            coefficients = dict(DEFAULT_COEFFICIENTS)
+            before = residual_report(run_inputs(runs, library))
+            report = {'before': before, 'after': before}
+        else:
+            # 퇴화한 보정은 아래에서 실패로 보고하므로 경고는 숨김
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                coefficients, report = calibrate(runs, library, fit=args.fit)
+    except (KeyError, ValueError, OSError) as e:
+        return results + [("forward", False, f"{type(e).__name__}: {e}", 0.0)]
+
+    output_dir = Path(args.output_root) / "forward"
+    rows = ([dict(row, stage='default') for row in report['before']]
+            + ([] if args.no_fit else [dict(row, stage='calibrated') for row in report['after']]))
+    table = _write_table(rows, output_dir / "forward_residuals.csv")
+    print("\n" + table.pivot(index='name', columns='stage', values='rms')
+          .to_string(float_format=lambda x: f"{x:.4g}"))
+    print("\nCoefficients: " + ", ".join(f"{k}={v:.4g}" for k, v in coefficients.items()))
+    problems = report.get('problems', [])
+    if problems:
+        # 퇴화한 계수는 invert/image가 기본으로 읽으므로 저장하지 않음
+        print(f"Saved: {output_dir / 'forward_residuals.csv'} (coefficients not saved)")
+        return results + [("forward", False, "Degenerate calibration: " + "; ".join(problems), 0.0)]
+    with open(output_dir / "forward_coefficients.json", 'w') as f:
+        json.dump({k: float(v) for k, v in coefficients.items()}, f, indent=2)
+    print(f"Saved: {output_dir / 'forward_coefficients.json'}, {output_dir / 'forward_residuals.csv'}")
+    return results
+
+
+def _forward_coefficients(args):
+    """--coefficients 또는 <output-root>/forward/forward_coefficients.json의 보정 계수
+
+    기본 파일이 없으면 None, --coefficients로 준 파일이 없으면 FileNotFoundError.
+    """
+    import json
+    coefficient_file = args.coefficients or os.path.join(args.output_root, "forward", "forward_coefficients.json")
+    if args.coefficients is None and not os.path.exists(coefficient_file):
+        return None
+    with open(coefficient_file) as f:
+        return json.load(f)
+
+
+def cmd_invert(args, files):
+    """관측 Rrs (--spectra, 없으면 run 자신의 Rrs)에서 IOP, 바닥 깊이, 바닥 피복 비율을 역산"""
+    from .invert import ShallowWaterInversion, read_spectra, iop_truth
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    basis = [r for r in runs if r.name == args.basis] if args.basis else runs
+    if not basis:
+        return results + [("invert", False, f"KeyError: basis run {args.basis!r} not among the inputs", 0.0)]
+    try:
+        coefficients = _forward_coefficients(args)
+        library = _load_library(args)
+        inversion = ShallowWaterInversion.from_run(basis[0], library, bottoms=args.bottoms, window=args.window,
+                                                   coefficients=coefficients)
+        truth = []
+        if args.spectra:
+            names, wavelength, spectra = read_spectra(args.spectra)
+            spectra = inversion.resample(spectra, wavelength)
+        else:
+            # 입력 run 자신의 Rrs를 역산하고 run 메타데이터와 비교 (검증)
+            names = [run.name for run in runs]
+            spectra = np.vstack([inversion.resample(run['Rrs'], run.wavelength) for run in runs])
+            for run in runs:
+                row = {f"true_{k}": v for k, v in iop_truth(run).items()}
+                row['true_bottom'] = Path(run.metadata.get('bottom_file') or "").stem
+                truth.append(row)
+    except (KeyError, ValueError, OSError) as e:
+        return results + [("invert", False, f"{type(e).__name__}: {e}", 0.0)]
+
+    start = time.perf_counter()
+    result = inversion.invert(spectra, jobs=args.jobs, chunk_size=args.chunk_size, candidates=args.candidates)
+    elapsed = time.perf_counter() - start
+    rows = inversion.result_rows(result, names)
+    for row, extra in zip(rows, truth):
+        row.update(extra)
+    output_dir = Path(args.output_root) / "invert"
+    table = _write_table(rows, output_dir / "inversion.csv")
+    np.savez_compressed(output_dir / "fitted.npz", wavelength=inversion.wavelength, names=np.array(names),
+                        observed=spectra, fitted=result['fitted'])
+    print(f"\n{inversion} (basis {basis[0].name}, "
+          f"{'calibrated' if coefficients else 'default'} coefficients)")
+    print(f"{len(spectra)} spectra inverted in {elapsed:.2f} s ({elapsed / max(len(spectra), 1) * 1e3:.1f} ms each), "
+          f"median rel_rmse {np.nanmedian(result['rel_rmse']):.4g}")
+    shown = ['name', 'P', 'G', 'X', 'H', 'bottom_1', 'bottom_2', 'q', 'rel_rmse', 'bottom_contrast']
+    shown += [c for c in ('true_P', 'true_G', 'true_X', 'true_H', 'true_bottom') if c in table.columns]
+    print("\n" + table[shown].head(20).to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    print(f"\nSaved: {output_dir / 'inversion.csv'}, {output_dir / 'fitted.npz'}")
+    return results
+
+
+def cmd_image(args, files):
+    """image cube (.npy, ENVI)를 tile로 나누어 제품 (밴드비, LUT, 분광 분리, 천해 역산) raster를 작성"""
+    import json
+    from .image import (ImageCube, BandRatioProduct, LUTProduct, UnmixProduct, InversionProduct,
+                        apply, read_wavelength)
+    results = []
+    try:
+        wavelength = read_wavelength(args.wavelength) if args.wavelength else None
+        runs = []
+        if args.product in ("lut", "invert") and not (args.product == "lut" and args.lut):
+            if not args.runs:
+                raise ValueError(f"--product {args.product} needs HydroLight runs (--runs)")
+            run_files, unmatched = expand_inputs(args.runs)
+            if unmatched:
+                raise ValueError("No run files found for: " + ", ".join(unmatched))
+            tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in run_files]
+            results = run_tasks(tasks, args.jobs, args.quiet)
+            runs = [value for _, ok, value, _ in results if ok]
+            if not runs:
+                return results
+        if args.product == "ratio":
+            from .algorithms import parse_coefficients
+            product = BandRatioProduct(args.algorithms, parse_coefficients(args.ratio_coefficients))
+        elif args.product == "lut":
+            from .lut import RrsLUT
+            if args.lut:
+                lut = RrsLUT.load(args.lut)
+            else:
+                from .ensemble import HydroLightEnsemble
+                lut = RrsLUT.build(HydroLightEnsemble(runs))
+            product = LUTProduct(lut, k=args.neighbors)
+        elif args.product == "unmix":
+            if args.endmember_file:
+                from .invert import read_spectra
+                names, endmember_wavelength, spectra = read_spectra(args.endmember_file)
+                product = UnmixProduct(names, spectra, endmember_wavelength, sum_to_one=args.sum_to_one)
+            else:
+                product = UnmixProduct.from_library(_load_library(args), args.endmembers,
+                                                    sum_to_one=args.sum_to_one)
+        else:
+            from .invert import ShallowWaterInversion
+            basis = [r for r in runs if r.name == args.basis] if args.basis else runs
+            if not basis:
+                raise KeyError(f"basis run {args.basis!r} not among the runs")
+            inversion = ShallowWaterInversion.from_run(basis[0], _load_library(args),
+                                                       bottoms=args.endmembers, window=args.window,
+                                                       coefficients=_forward_coefficients(args))
+            product = InversionProduct(inversion, candidates=args.candidates, chunk_size=args.chunk_size)
+    except (KeyError, ValueError, OSError) as e:
+        return results + [("image", False, f"{type(e).__name__}: {e}", 0.0)]
+
+    def progress(done, total, pixels, elapsed):
+        # 약 10%마다 진행 상황 출력
+        if done == total or done % max(1, total // 10) == 0:
+            trace.echo(f"  {done}/{total} tiles, {pixels:,} px, {pixels / max(elapsed, 1e-9):,.0f} px/s")
+
+    output_dir = Path(args.output_root) / "image"
+    seen = set()
+    for f in files:
+        start = time.perf_counter()
+        try:
+            cube = ImageCube.open(f, wavelength=wavelength, interleave=args.interleave, scale=args.scale)
+            key = os.path.realpath(cube.path)
+            if key in seen:
+                continue
+            seen.add(key)
+            suffix = ".npy" if cube.kind == "npy" else ".img"
+            trace.echo(f"\n{cube} -> {args.product}")
+            with trace.stage("image.apply", product=args.product):
+                stats = apply(cube, product, output_dir / f"{cube.path.stem}_{args.product}{suffix}",
+                              tile=args.tile, jobs=args.jobs, progress=progress)
+            trace.count("image.pixels", stats['pixels'])
+            stats.update(image=str(cube.path), product=args.product, tile=args.tile, jobs=args.jobs)
+            with open(output_dir / f"{cube.path.stem}_{args.product}.json", 'w') as out:
+                json.dump(stats, out, indent=2)
+            results.append((str(f), True, f"{stats['pixels']:,} px ({stats['valid']:,} valid), "
+                                          f"{stats['pixels_per_second']:,.0f} px/s -> {stats['output']}",
+                            time.perf_counter() - start))
+        except (KeyError, ValueError, OSError) as e:
+            results.append((str(f), False, f"{type(e).__name__}: {e}", time.perf_counter() - start))
+        _report(results[-1])
+    return results
+
+
+def cmd_emulate(args, files):
+    """ensemble로 PCA+RBF emulator를 학습하고 k-fold 교차 검증 오차 저장"""
+    from .ensemble import HydroLightEnsemble
+    from .emulator import Emulator, cross_validate
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+    options = {'quantities': args.quantities, 'parameters': args.parameters, 'kernel': args.kernel,
+               'smoothing': args.smoothing}
+    try:
+        ensemble = HydroLightEnsemble(runs)
+        start = time.perf_counter()
+        emulator = Emulator.fit(ensemble, **options)
+        fit_time = time.perf_counter() - start
+        rows, _ = cross_validate(ensemble, folds=args.folds, **options)
+    except (KeyError, ValueError, np.linalg.LinAlgError) as e:
+        return results + [("emulate", False, f"{type(e).__name__}: {e}", 0.0)]
+
+    output_dir = Path(args.output_root) / "emulator"
+    output_file = emulator.save(output_dir / "emulator.npz")
+    table = _write_table(rows, output_dir / "emulator_cv.csv")
+    print(f"\n{emulator} (fit {fit_time:.2f} s)")
+    print("\n" + table.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    print(f"\nSaved: {output_file}, {output_dir / 'emulator_cv.csv'}")
+    return results
+
+
+def cmd_match(args, files):
+    """측정 바닥 스펙트럼(바닥 반사도 파일 형식)과 가장 비슷한 라이브러리 항목 top-k"""
+    from .bottom import parse_bottom_reflectance
+    try:
+        library = _load_library(args)
+    except (OSError, ValueError) as e:
+        return [("match", False, f"{type(e).__name__}: {e}", 0.0)]
+    rows = []
+    results = []
+    for f in files:
+        try:
+            wavelength, values = parse_bottom_reflectance(f)
+            matches = library.match_table(values, wavelength, k=args.top, metric=args.metric,
+                                          window=args.window, labels=[Path(f).stem])
+            rows.extend(matches)
+            best = matches[0]
+            results.append((str(f), True, f"{best['name']} ({args.metric} {best['score']:.4g})", 0.0))
+        except (OSError, ValueError) as e:
+            results.append((str(f), False, f"{type(e).__name__}: {e}", 0.0))
+        _report(results[-1])
+    if rows:
+        output_file = Path(args.output_root) / "bottom_matches.csv"
+        table = _write_table(rows, output_file)
+        print("\n" + table.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+        print(f"\n{library}, window {args.window[0]:g}-{args.window[1]:g} nm -> {output_file}")
+    return results
+
+
+def cmd_bench(args, files):
+    tasks = [(str(f), _bench_task, (f, args.repeat, args.cache_dir)) for f in files]
+    start = time.perf_counter()
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    wall = time.perf_counter() - start
+    rows = [value for _, ok, value, _ in results if ok]
+    if rows:
+        import pandas as pd
+        table = pd.DataFrame(rows)
+        print("\n" + table.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+        total_mb = table['size_mb'].sum()
+        print(f"\n{len(rows)} file(s), {total_mb:.2f} MB, wall time {wall:.2f} s "
+              f"with {args.jobs} job(s) ({total_mb / wall:.2f} MB/s)")
+    return results
+
+
+def cmd_store(args, files):
+    """파일을 병렬로 파싱한 뒤 (store 쓰기는 한 프로세스에서) ensemble store에 추가"""
+    from .store import EnsembleStore
+    tasks = [(str(f), _load_task, (f, args.cache_dir, args.manifest)) for f in files]
+    results = run_tasks(tasks, args.jobs, args.quiet)
+    runs = [value for _, ok, value, _ in results if ok]
+    if not runs:
+        return results
+
+    store_path = Path(args.store or Path(args.output_root) / "store")
+    if (store_path / "store.json").exists():
+        store = EnsembleStore(store_path)
+    else:
+        store = EnsembleStore.create(store_path, runs[0].wavelength, runs[0].depth, runs[0].k_depth,
+                                     compression=None if args.uncompressed else 'zlib')
+
+    # store 그리드와 맞지 않는 run은 실패로 기록
+    final = []
+    accepted = []
+    for result in results:
+        label, ok, run, elapsed = result
+        if not ok:
+            final.append(result)
+            continue
+        try:
+            if len(run.wavelength) != len(store.wavelength) or not np.allclose(run.wavelength, store.wavelength):
+                raise ValueError(f"wavelength grid ({len(run.wavelength)} bands) does not match store")
+            for name in ('depth', 'k_depth'):
+                extra = np.setdiff1d(getattr(run, name), getattr(store, name))
+                if len(extra):
+                    raise ValueError(f"{name} values {extra} not in store grid")
+            accepted.append(run)
+            final.append((label, True, f"{run.name} -> {store_path}", elapsed))
+        except ValueError as e:
+            final.append((label, False, f"ValueError: {e}", elapsed))
+    for start in range(0, len(accepted), args.batch):
+        store.append(accepted[start:start + args.batch])
+    print(f"\n{store}")
+    return final
+
+
+def cmd_stats(args, files):
+    """셀별 평균/표준편차/최솟값/최댓값/백분위수 (run을 하나씩 읽어 메모리 사용량 제한)"""
+    from .stats import reduce_files
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+        stats, failures = reduce_files(files, quantities=args.quantities, jobs=args.jobs,
+                                       cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
+    failed = dict(failures)
+    results = [(str(f), str(f) not in failed, failed.get(str(f), ""), 0.0) for f in files]
+
+    output_dir = Path(args.output_root) / "stats"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stats.save(output_dir / "ensemble_stats.npz")
+    stats.to_frame().to_csv(output_dir / "ensemble_stats.csv", index=False)
+    print(f"{stats.n_runs} run(s) reduced in {elapsed:.2f} s -> {output_dir}")
+    return results
+
+
+def cmd_watch(args):
+    """폴더 감시 ingest 서비스 실행 (inputs는 감시할 폴더)"""
+    import asyncio
+    from .watch import IngestService
+    directories = [Path(d) for d in args.inputs]
+    missing = [str(d) for d in directories if not d.is_dir()]
+    if missing:
+        print("Not a directory: " + ", ".join(missing), file=sys.stderr)
+        return EXIT_USAGE
+    service = IngestService(directories, args.output_root, pattern=args.pattern, cache_dir=args.cache_dir,
+                            render=not args.no_render, poll_interval=args.poll, max_workers=args.jobs,
+                            queue_size=args.queue_size, status_file=args.status_file)
+    counts = asyncio.run(service.run(once=args.once))
+    print(f"\nIngest stopped: {counts}")
+    return EXIT_FAILED if counts.get('failed') else EXIT_OK
+
+
+def cmd_sweep(args):
+    """파라미터 격자/Latin hypercube를 run tree (프로파일 파일, run 입력 파일)와 manifest로 작성"""
+    from .sweep import parameter_grid, latin_hypercube, combine, parse_assignments, write_sweep
+    if len(args.inputs) > 1:
+        raise SystemExit("sweep takes at most one run input template")
+    try:
+        grid = parse_assignments(args.grid)
+        fixed = {k: v[0] for k, v in parse_assignments(args.set).items()}
+        ranges = parse_assignments(args.range, kind="range")
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if ranges and not args.lhs:
+        raise SystemExit("--range needs --lhs N")
+    if args.lhs and not ranges:
+        raise SystemExit("--lhs needs at least one --range")
+    samples = combine([fixed] if fixed else [], parameter_grid(grid) if grid else [],
+                      latin_hypercube(ranges, args.lhs, args.seed) if args.lhs else [])
+    if not samples:
+        raise SystemExit("Nothing to sweep: give --grid, --lhs with --range, or --set")
+    root = Path(args.output_root) / "sweep"
+    start = time.perf_counter()
+    rows = write_sweep(root, samples, template=args.inputs[0] if args.inputs else None, prefix=args.prefix,
+                       path_prefix=args.path_prefix)
+    print(f"{len(rows)} run(s) written to {root} in {time.perf_counter() - start:.2f} s")
+    print(f"Saved: {root / 'manifest.csv'}")
+    return EXIT_OK
+
+
+def cmd_schedule(args):
+    """sweep manifest의 run을 비용 모델 순서 (긴 작업부터)로 여러 코어에서 실행하고 printout을 파싱"""
+    from .scheduler import (jobs_from_manifest, load_history, history_from_printouts, CostModel, plan,
+                            run_jobs, HISTORY_NAME)
+    if len(args.inputs) != 1:
+        raise SystemExit("schedule takes exactly one manifest.csv")
+    manifest = Path(args.inputs[0])
+    history = Path(args.history or manifest.parent / HISTORY_NAME)
+    try:
+        jobs = jobs_from_manifest(manifest, args.printout_dir)
+        records = load_history(history)
+        if args.seed_history:
+            files, _ = expand_inputs(args.seed_history)
+            records += history_from_printouts(files, manifest)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read schedule inputs: {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    model = CostModel.fit(records)
+    model.predict(jobs)
+    ordered, bins, loads = plan(jobs, args.jobs)
+    print(f"{len(jobs)} job(s), {model}")
+    print(f"Planned makespan {loads.max():.1f} s on {args.jobs} worker(s) "
+          f"(total {loads.sum():.1f} s, longest job {ordered[0].predicted:.1f} s)" if jobs else "No jobs")
+    if args.dry_run or not jobs:
+        for k, (group, load) in enumerate(zip(bins, loads)):
+            print(f"  worker {k + 1}: {len(group)} job(s), {load:.1f} s")
+        return EXIT_OK
+    if not args.command_line:
+        raise SystemExit("schedule needs --command (e.g. \"HydroLight.exe {input}\")")
+
+    start = time.perf_counter()
+    results = run_jobs(jobs, args.command_line, workers=args.jobs, model=model, timeout=args.timeout,
+                       retries=args.retries, cache_dir=args.cache_dir, history=history,
+                       log=None if args.quiet else print)
+    wall = time.perf_counter() - start
+    table = _write_table(results, Path(args.output_root) / "schedule_report.csv")
+    failed = table[table['status'] != "ok"]
+    print(f"\n{len(table) - len(failed)}/{len(table)} run(s) ok in {wall:.1f} s "
+          f"(planned {loads.max():.1f} s), history: {history}")
+    if len(failed):
+        print(failed[['rootname', 'status', 'attempts', 'error']].to_string(index=False))
+    print(f"Saved: {Path(args.output_root) / 'schedule_report.csv'}")
+    return EXIT_FAILED if len(failed) else EXIT_OK
+
+
+def cmd_serve(args):
+    """캐시된 run 조각과 플롯을 제공하는 로컬 HTTP 서버 실행 (--workers는 요청 처리 thread 수)"""
+    from .server import serve
+    files, unmatched = expand_inputs(args.inputs)
+    if not files:
+        print("No input files found for: " + ", ".join(args.inputs), file=sys.stderr)
+        return EXIT_USAGE
+    if unmatched:
+        print("No files matched: " + ", ".join(unmatched), file=sys.stderr)
+    serve(files, args.host, args.port, cache_dir=args.cache_dir, workers=args.workers, quiet=args.quiet,
+          output_root=args.output_root)
+    return EXIT_OK
+
+
+COMMANDS = {
+    'parse': (cmd_parse, "HydroLight 출력 파일을 파싱하여 run별 npz로 저장"),
+    'plot': (cmd_plot, "P03 플롯 생성 (바닥 반사도 파일은 P01 플롯)"),
+    'compare': (cmd_compare, "P04 비교 플롯 (기준 run 대 나머지 run)"),
+    'catalog': (cmd_catalog, "run 메타데이터 목록을 catalog.csv로 저장"),
+    'validate': (cmd_validate, "복사량 일관성 검사 (Eo, R, Lu/Ed, Q, 성분 합, 밴드 수, 깊이 순서, 정상 종료)"),
+    'regress': (cmd_regress, "새 출력을 저장된 기준 parse와 비교 (양별 허용 오차, 가장 나쁜 셀 보고서)"),
+    'sensitivity': (cmd_sensitivity, "섭동 run과 baseline의 유한 차분으로 파라미터별 민감도(Jacobian) 계산"),
+    'density': (cmd_density, "수천 개 run의 P03/P04 figure를 2차원 히스토그램 이미지와 백분위수 envelope로 그림"),
+    'color': (cmd_color, "CIE xyY, hue angle, 주파장, Forel-Ule 번호 계산 (HydroLight 출력 값과 비교)"),
+    'algorithms': (cmd_algorithms, "Rrs에 OCx/CI/OCI 등 해색 알고리즘을 적용하고 입력 Chl 대비 오차 통계 계산"),
+    'forward': (cmd_forward, "반해석적 천해 Rrs 모델 (Lee) 계수를 HydroLight run에 보정하고 잔차 보고"),
+    'invert': (cmd_invert, "관측 Rrs 수천 개에서 수층 IOP, 바닥 깊이, 바닥 피복 비율을 batch 역산 (LUT seed + 경계 있는 LM)"),
+    'image': (cmd_image, "초분광 image cube (.npy, ENVI)를 memmap tile로 나누어 밴드비/LUT/분광 분리/천해 역산 raster 작성"),
+    'emulate': (cmd_emulate, "PCA + RBF 통계 emulator 학습 (파라미터 -> Rrs/Lu/Ed 스펙트럼), k-fold 교차 검증"),
+    'match': (cmd_match, "측정 바닥 스펙트럼과 가장 비슷한 바닥 반사도 라이브러리 항목 (SAM, RMSD, 상관계수)"),
+    'bench': (cmd_bench, "파싱 속도 측정"),
+    'stats': (cmd_stats, "run별 스펙트럼의 셀별 streaming 통계 (평균, 표준편차, 백분위수)"),
+    'store': (cmd_store, "run을 chunk 압축 ensemble store에 추가"),
+    'watch': (cmd_watch, "폴더를 감시하며 끝난 HydroLight 출력을 자동으로 파싱/캐시/플롯"),
+    'sweep': (cmd_sweep, "파라미터 격자/Latin hypercube sweep의 입력 파일 (농도 프로파일, run 입력)과 manifest 생성"),
+    'schedule': (cmd_schedule, "sweep manifest의 HydroLight run을 예상 시간이 긴 것부터 여러 코어에서 실행 (timeout, 재시도, 파싱)"),
+    'serve': (cmd_serve, "캐시된 run의 스펙트럼/프로파일 조각과 플롯을 로컬 HTTP로 제공"),
+}
+
+# main이 입력 파일을 펼쳐 넘기지 않고 args만 받는 명령 (--trace/--profile은 나머지 명령에만)
+SERVICE_COMMANDS = ('watch', 'sweep', 'schedule', 'serve')
+# --manifest로 sweep 파라미터를 붙이는 명령
+MANIFEST_COMMANDS = ('sensitivity', 'density', 'color', 'algorithms', 'forward', 'invert', 'image',
+                     'emulate', 'store')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hydrolight",
+                                     description="HydroLight 출력 파일 일괄 처리 도구")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == 'sweep':
+            sub.add_argument('inputs', nargs='*', help="run 입력 template 파일 (없으면 프로파일 파일만)")
+        else:
+            sub.add_argument('inputs', nargs='+',
+                             help={'watch': "감시할 폴더", 'schedule': "sweep manifest.csv"}.get(
+                                 name, "입력 파일 또는 glob 패턴 (따옴표로 감싸기)"))
+        # 공통 옵션은 쓰는 명령에만 붙이고, 없는 옵션은 main이 읽는 기본값으로 채움
+        sub.set_defaults(jobs=1, quiet=False, cache_dir=None, no_cache=False, trace=None, profile=None,
+                         manifest=None)
+        sub.add_argument('-o', '--output-root', default="results", help="출력 루트 디렉토리 (기본: results)")
+        if name not in ('match', 'sweep', 'serve'):
+            sub.add_argument('-j', '--jobs', type=int, default=1,
+                             help={'schedule': "동시에 실행할 run 수 (기본: 1)"}.get(
+                                 name, "동시에 처리할 파일 수 (기본: 1)"))
+        if name not in ('match', 'watch', 'sweep'):
+            sub.add_argument('-q', '--quiet', action='store_true', help="파일별 상세 출력 생략")
+        if name not in ('match', 'sweep'):
+            sub.add_argument('--cache-dir', default=None,
+                             help="파싱 캐시 디렉토리 (기본: <output-root>/cache)")
+            sub.add_argument('--no-cache', action='store_true', help="파싱 캐시 사용 안 함")
+        if name not in SERVICE_COMMANDS:
+            sub.add_argument('--trace', default=None, metavar="FILE",
+                             help="단계별 시간/counter를 Chrome trace JSON으로 저장")
+            sub.add_argument('--profile', default=None, metavar="FILE",
+                             help="cProfile 결과(pstats) 저장 (작업 프로세스 안은 --jobs 1일 때만 기록)")
+        if name in MANIFEST_COMMANDS:
+            sub.add_argument('--manifest', default=None, metavar="FILE",
+                             help="sweep manifest.csv (run 이름으로 sweep 파라미터를 붙임)")
+        if name == 'compare':
+            sub.add_argument('--reference', default=None, help="기준 파일 (기본: 첫 번째 입력 파일)")
+        if name == 'regress':
+            sub.add_argument('--reference', default=None,
+                             help="기준 parse 디렉토리 (기본: <output-root>/reference)")
+            sub.add_argument('--update', action='store_true', help="입력 파일을 새 기준으로 저장")
+            sub.add_argument('--fail-fast', action='store_true', help="첫 번째 위반 run에서 중단")
+            sub.add_argument('--tol', nargs='+', default=[], metavar="Q=ATOL,RTOL",
+                             help="양별 허용 오차 (예: Ed=0,5e-4 default=0,1e-3)")
+            sub.add_argument('--top', type=int, default=20, help="보고서에 남길 가장 나쁜 셀 수")
+            sub.add_argument('--report', default=None,
+                             help="보고서 JSON 파일 (기본: <output-root>/regress_report.json)")
+        if name == 'sensitivity':
+            sub.add_argument('--baseline', default=None, help="baseline run 이름 (기본: 짝이 가장 많은 run)")
+            sub.add_argument('--quantities', nargs='+', default=["Ed", "Eu", "Lu", "R", "Kd", "Rrs"],
+                             help="민감도를 계산할 양")
+            sub.add_argument('--absolute', action='store_true',
+                             help="Δy/Δp (기본: 정규화된 탄력도 (Δy/y)/(Δp/p))")
+        if name == 'density':
+            from .density import FIGURES
+            sub.add_argument('--figures', nargs='+', choices=list(FIGURES), default=None,
+                             help="그릴 figure 종류 (기본: 전체)")
+            sub.add_argument('--reference', default=None, help="P04 차이 figure의 기준 run 이름 (기본: 첫 번째 run)")
+            sub.add_argument('--depth', type=float, default=None,
+                             help="스펙트럼 figure에서 이 깊이(가장 가까운 깊이)만 사용 (기본: 모든 깊이)")
+            sub.add_argument('--bins', type=int, nargs=2, default=[300, 200], metavar=("NX", "NVALUE"),
+                             help="x 격자 열 수와 값 bin 수 (기본: 300 200)")
+        if name == 'color':
+            sub.add_argument('--quantities', nargs='+', default=["Rrs", "Lw", "Lu_air"],
+                             help="색을 계산할 양 (깊이별 양은 깊이마다, 기본: Rrs Lw Lu_air)")
+        if name == 'algorithms':
+            from .algorithms import ALGORITHMS
+            sub.add_argument('--algorithms', nargs='+', choices=ALGORITHMS, default=None,
+                             help="계산할 알고리즘 (기본: 전체)")
+            sub.add_argument('--coefficients', nargs='+', default=[], metavar="NAME=A0,A1,...",
+                             help="기본 계수 대신 쓸 계수 (새 이름은 OC4 밴드의 OCx로 추가, 예: OC4new=0.3,-2.9,2.7,-1.2,-0.6)")
+            sub.add_argument('--truth', default="chl", help="참값 파라미터 (기본: chl)")
+        if name == 'forward':
+            from .forward import DEFAULT_COEFFICIENTS, FIT_COEFFICIENTS
+            sub.add_argument('--library', default=None,
+                             help="바닥 반사도 라이브러리 디렉토리 (기본: 저장소의 data/bottom_reflectances)")
+            sub.add_argument('--fit', nargs='+', choices=list(DEFAULT_COEFFICIENTS), default=list(FIT_COEFFICIENTS),
+                             help="보정할 계수 (기본: " + " ".join(FIT_COEFFICIENTS) + ")")
+            sub.add_argument('--no-fit', action='store_true', help="보정 없이 기본 계수의 잔차만 보고")
+        if name == 'invert':
+            sub.add_argument('--library', default=None,
+                             help="바닥 반사도 라이브러리 디렉토리 (기본: 저장소의 data/bottom_reflectances)")
+            sub.add_argument('--bottoms', nargs='+', default=None, help="쓸 라이브러리 항목 이름 (기본: 전체)")
+            sub.add_argument('--spectra', default=None,
+                             help="관측 Rrs 파일 (.csv: 머리 줄이 파장, .npz: wavelength/rrs/names). 없으면 입력 run의 Rrs")
+            sub.add_argument('--basis', default=None, help="IOP 모양을 가져올 run 이름 (기본: 첫 run)")
+            sub.add_argument('--coefficients', default=None,
+                             help="forward 계수 JSON (기본: <output-root>/forward/forward_coefficients.json, 없으면 Lee 기본값)")
+            sub.add_argument('--window', type=float, nargs=2, default=[400.0, 700.0], metavar=("MIN", "MAX"),
+                             help="역산에 쓸 파장 구간 nm (기본: 400 700)")
+            sub.add_argument('--candidates', type=int, default=8, help="스펙트럼별 LM 시작점 수 (기본: 8)")
+            sub.add_argument('--chunk-size', type=int, default=512, help="작업 프로세스 하나에 보낼 스펙트럼 수")
+        if name == 'image':
+            from .image import PRODUCTS, INTERLEAVES
+            from .algorithms import ALGORITHMS
+            sub.add_argument('--product', choices=PRODUCTS, default="ratio",
+                             help="제품 (ratio: 해색 알고리즘, lut: 최근접 run 파라미터, unmix: 끝성분 비율, "
+                                  "invert: 천해 역산, 기본: ratio)")
+            sub.add_argument('--tile', type=int, default=256, help="tile 한 변의 픽셀 수 (기본: 256)")
+            sub.add_argument('--wavelength', nargs='+', default=None, metavar="NM",
+                             help="밴드 파장 nm (숫자 목록 또는 파일, 기본: .hdr의 wavelength)")
+            sub.add_argument('--interleave', choices=INTERLEAVES, default=None,
+                             help="밴드 축 순서 (기본: .npy는 bip (행, 열, 밴드), ENVI는 .hdr 값)")
+            sub.add_argument('--scale', type=float, default=1.0,
+                             help="값에 곱할 수 (.hdr의 reflectance scale factor로 나눈 뒤, 예: R -> Rrs는 0.3183)")
+            sub.add_argument('--runs', nargs='+', default=[], help="lut/invert에 쓸 HydroLight 출력 파일 (glob)")
+            sub.add_argument('--lut', default=None, help="RrsLUT.save()로 저장한 npz (lut, 주면 --runs 불필요)")
+            sub.add_argument('--neighbors', type=int, default=1, help="lut: 거리 역수 가중 평균할 이웃 수 (기본: 1)")
+            sub.add_argument('--algorithms', nargs='+', choices=ALGORITHMS, default=None,
+                             help="ratio: 계산할 알고리즘 (기본: 전체)")
+            sub.add_argument('--ratio-coefficients', nargs='+', default=[], metavar="NAME=A0,A1,...",
+                             help="ratio: 기본 계수 대신 쓸 계수")
+            sub.add_argument('--library', default=None,
+                             help="unmix/invert: 바닥 반사도 라이브러리 디렉토리 (기본: 저장소의 data/bottom_reflectances)")
+            sub.add_argument('--endmembers', nargs='+', default=None,
+                             help="unmix 끝성분 / invert 바닥 후보로 쓸 라이브러리 항목 이름 (기본: 전체)")
+            sub.add_argument('--endmember-file', default=None,
+                             help="unmix: 끝성분 스펙트럼 파일 (.csv/.npz, invert --spectra 형식)")
+            sub.add_argument('--sum-to-one', action='store_true', help="unmix: 비율 합 1 제약")
+            sub.add_argument('--basis', default=None, help="invert: IOP 모양을 가져올 run 이름 (기본: 첫 run)")
+            sub.add_argument('--coefficients', default=None,
+                             help="invert: forward 계수 JSON (기본: <output-root>/forward/forward_coefficients.json)")
+            sub.add_argument('--window', type=float, nargs=2, default=[400.0, 700.0], metavar=("MIN", "MAX"),
+                             help="invert: 역산에 쓸 파장 구간 nm (기본: 400 700)")
+            sub.add_argument('--candidates', type=int, default=8, help="invert: 픽셀별 LM 시작점 수 (기본: 8)")
+            sub.add_argument('--chunk-size', type=int, default=512, help="invert: tile 안에서 한 번에 역산할 픽셀 수")
+        if name == 'emulate':
+            sub.add_argument('--quantities', nargs='+', default=["Rrs", "Lu", "Ed"],
+                             help="emulate할 양 (기본: Rrs Lu Ed)")
+            sub.add_argument('--parameters', nargs='+', default=None,
+                             help="입력 파라미터 (기본: run마다 값이 다른 메타데이터 파라미터 전부)")
+            sub.add_argument('--folds', type=int, default=5, help="교차 검증 fold 수 (기본: 5)")
+            sub.add_argument('--kernel', default="thin_plate_spline",
+                             choices=["thin_plate_spline", "cubic", "linear", "quintic"], help="RBF kernel")
+            sub.add_argument('--smoothing', type=float, default=0.0, help="RBF smoothing (기본: 0, 정확한 보간)")
+        if name == 'match':
+            sub.add_argument('--library', default=None,
+                             help="바닥 반사도 라이브러리 디렉토리 (기본: 저장소의 data/bottom_reflectances)")
+            sub.add_argument('--metric', choices=["sam", "rmsd", "corr"], default="sam",
+                             help="유사도 (sam: spectral angle, rmsd, corr: 상관계수)")
+            sub.add_argument('--top', type=int, default=3, help="질의별 결과 수")
+            sub.add_argument('--window', type=float, nargs=2, default=[400.0, 700.0], metavar=("MIN", "MAX"),
+                             help="비교할 파장 구간 nm (기본: 400 700)")
+        if name == 'bench':
+            sub.add_argument('--repeat', type=int, default=3, help="파일별 반복 횟수 (최솟값 사용)")
+        if name == 'stats':
+            sub.add_argument('--quantities', nargs='+', default=["Lu", "Ed", "Rrs", "Kd"],
+                             help="통계 대상 양 (기본: Lu Ed Rrs Kd)")
+        if name == 'watch':
+            sub.add_argument('--pattern', default="*.txt", help="출력 파일 이름 패턴 (기본: *.txt)")
+            sub.add_argument('--poll', type=float, default=2.0, help="폴더 검사 간격 (초)")
+            sub.add_argument('--queue-size', type=int, default=8, help="처리 대기 queue 크기")
+            sub.add_argument('--status-file', default=None,
+                             help="상태 JSON 파일 (기본: <output-root>/ingest_status.json)")
+            sub.add_argument('--no-render', action='store_true', help="파싱/캐시만 하고 플롯은 생략")
+            sub.add_argument('--once', action='store_true', help="현재 있는 파일만 처리하고 종료")
+        if name == 'schedule':
+            sub.add_argument('--command', dest='command_line', default=None,
+                             help="solver 명령 ({input}, {output}, {rootname}, {run_dir} 치환)")
+            sub.add_argument('--timeout', type=float, default=None, help="run 하나의 제한 시간 (초)")
+            sub.add_argument('--retries', type=int, default=1, help="실패/timeout 재시도 횟수 (기본: 1)")
+            sub.add_argument('--history', default=None,
+                             help="밴드별 시간 이력 JSON lines (기본: manifest 옆 scheduler_history.jsonl)")
+            sub.add_argument('--seed-history', nargs='+', default=[], metavar="PRINTOUT",
+                             help="비용 모델에 더할 기존 printout (glob)")
+            sub.add_argument('--printout-dir', default=None, help="printout 위치 (기본: run 폴더)")
+            sub.add_argument('--dry-run', action='store_true', help="실행하지 않고 순서/코어별 예상 부하만 출력")
+        if name == 'sweep':
+            sub.add_argument('--grid', nargs='+', default=[], metavar="NAME=V1,V2,...", help="격자 파라미터 값")
+            sub.add_argument('--lhs', type=int, default=0, metavar="N", help="Latin hypercube 표본 수")
+            sub.add_argument('--range', nargs='+', default=[], metavar="NAME=LOW:HIGH[:log]",
+                             help="Latin hypercube 파라미터 범위")
+            sub.add_argument('--set', nargs='+', default=[], metavar="NAME=VALUE", help="모든 run에 같은 값")
+            sub.add_argument('--seed', type=int, default=None, help="Latin hypercube 난수 seed")
+            sub.add_argument('--prefix', default="sw", help="rootname 앞부분 (기본: sw -> sw0001)")
+            sub.add_argument('--path-prefix', default=None,
+                             help="run 입력 파일에 적을 프로파일 경로 앞부분 (예: C:/HE60/run/sweep)")
+        if name == 'serve':
+            sub.add_argument('--host', default="127.0.0.1", help="bind 주소 (기본: 127.0.0.1)")
+            sub.add_argument('--port', type=int, default=8000, help="port (기본: 8000, 0이면 자동)")
+            sub.add_argument('--workers', type=int, default=4, help="요청 처리 thread 수 (기본: 4)")
+        if name == 'store':
+            sub.add_argument('--store', default=None, help="store 디렉토리 (기본: <output-root>/store)")
+            sub.add_argument('--batch', type=int, default=500, help="한 번에 추가할 run 수")
+            sub.add_argument('--uncompressed', action='store_true',
+                             help="새 store를 비압축(.npy, memmap) chunk로 생성")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if getattr(args, 'workers', 1) < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.no_cache:
+        args.cache_dir = None
+    elif args.cache_dir is None:
+        args.cache_dir = str(Path(args.output_root) / "cache")
+
+    trace.set_quiet(args.quiet)
+    with contextlib.ExitStack() as stack:
+        if args.trace or args.profile:
+            stack.enter_context(trace.tracing(args.trace, args.profile, quiet=args.quiet))
+        if args.command == 'watch':
+            status = cmd_watch(args)
+        elif args.command == 'serve':
+            status = cmd_serve(args)
+        elif args.command == 'sweep':
+            status = cmd_sweep(args)
+        elif args.command == 'schedule':
+            status = cmd_schedule(args)
+        else:
+            files, unmatched = expand_inputs(args.inputs)
+            if not files:
+                print("No input files found for: " + ", ".join(args.inputs), file=sys.stderr)
+                return EXIT_USAGE
+            func, _ = COMMANDS[args.command]
+            results = func(args, files)
+            status = None
+    if args.trace:
+        print("\n" + trace.TRACER.format_summary())
+        print(f"\nSaved trace: {args.trace}")
+    if args.profile:
+        print(f"Saved profile: {args.profile}")
+    return status if status is not None else summarize(results, unmatched)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+color.py
+임의의 스펙트럼 (n_spectra, n_wavelength)에 대한 CIE 1931 XYZ/xyY, hue angle, 주파장, Forel-Ule 번호
+
+HydroLight는 자기 출력(Ed, Eu, Lu, Lw, Rrs)에 대해서만 색 좌표와 Forel-Ule 번호를 출력한다.
+여기서는 파생/혼합/보간/센서 모의 스펙트럼 수백만 개에도 같은 값을 계산한다.
+파장 그리드마다 (n_wavelength, 3) 가중치 행렬을 한 번 만들고, XYZ는 행렬곱 하나로 구한다.
+
+    metrics = color_metrics(run['Rrs'], run.wavelength)        # 스펙트럼 하나
+    metrics = color_metrics(ensemble.cube('Rrs'), wavelength)  # (n_run, n_wavelength)
+    metrics['x'], metrics['y'], metrics['hue'], metrics['forel_ule'], metrics['dominant_wavelength']
+
+- 값은 HydroLight 밴드 값으로 보고, 밴드 j의 가중치는 CMF(λ_j) Δλ_j (5 nm CMF 표를 밴드 중심에서 선형 보간,
+  Δλ_j는 밴드 폭). HydroLight 출력 x, y를 20 nm 밴드에서 반올림 오차 안으로 재현한다
+- Y = 683 Σ S ȳ Δλ (W 단위 입력이면 lm 단위. Rrs 같은 비율 스펙트럼의 Y는 의미 없음)
+- hue angle α = atan2(y - 1/3, x - 1/3) (도, 0-360), Forel-Ule 번호는 FU 경계 hue angle 표 FU_HUE_LIMITS로 분류.
+  PExe/Ptest 출력의 FU 18개를 모두 재현한다. 다른 표는 limits 인자로 준다
+- 주파장: 백색점(1/3, 1/3)에서 (x, y) 방향의 스펙트럼 궤적 파장. purple 영역은 보색 파장을 음수로
+"""
+
+import numpy as np
+
+from .sensor import band_edges
+
+
+# CIE 1931 2° 표준 관측자 color-matching function (파장 nm, x̄, ȳ, z̄), 5 nm 간격
+CIE1931 = np.array([
+    [380, 0.001368, 0.000039, 0.006450], [385, 0.002236, 0.000064, 0.010550],
+    [390, 0.004243, 0.000120, 0.020050], [395, 0.007650, 0.000217, 0.036210],
+    [400, 0.014310, 0.000396, 0.067850], [405, 0.023190, 0.000640, 0.110200],
+    [410, 0.043510, 0.001210, 0.207400], [415, 0.077630, 0.002180, 0.371300],
+    [420, 0.134380, 0.004000, 0.645600], [425, 0.214770, 0.007300, 1.039050],
+    [430, 0.283900, 0.011600, 1.385600], [435, 0.328500, 0.016840, 1.622960],
+    [440, 0.348280, 0.023000, 1.747060], [445, 0.348060, 0.029800, 1.782600],
+    [450, 0.336200, 0.038000, 1.772110], [455, 0.318700, 0.048000, 1.744100],
+    [460, 0.290800, 0.060000, 1.669200], [465, 0.251100, 0.073900, 1.528100],
+    [470, 0.195360, 0.090980, 1.287640], [475, 0.142100, 0.112600, 1.041900],
+    [480, 0.095640, 0.139020, 0.812950], [485, 0.057950, 0.169300, 0.616200],
+    [490, 0.032010, 0.208020, 0.465180], [495, 0.014700, 0.258600, 0.353300],
+    [500, 0.004900, 0.323000, 0.272000], [505, 0.002400, 0.407300, 0.212300],
+    [510, 0.009300, 0.503000, 0.158200], [515, 0.029100, 0.608200, 0.111700],
+    [520, 0.063270, 0.710000, 0.078250], [525, 0.109600, 0.793200, 0.057250],
+    [530, 0.165500, 0.862000, 0.042160], [535, 0.225750, 0.914850, 0.029840],
+    [540, 0.290400, 0.954000, 0.020300], [545, 0.359700, 0.980300, 0.013400],
+    [550, 0.433450, 0.994950, 0.008750], [555, 0.512050, 1.000000, 0.005750],
+    [560, 0.594500, 0.995000, 0.003900], [565, 0.678400, 0.978600, 0.002750],
+    [570, 0.762100, 0.952000, 0.002100], [575, 0.842500, 0.915400, 0.001800],
+    [580, 0.916300, 0.870000, 0.001650], [585, 0.978600, 0.816300, 0.001400],
+    [590, 1.026300, 0.757000, 0.001100], [595, 1.056700, 0.694900, 0.001000],
+    [600, 1.062200, 0.631000, 0.000800], [605, 1.045600, 0.566800, 0.000600],
+    [610, 1.002600, 0.503000, 0.000340], [615, 0.938400, 0.441200, 0.000240],
+    [620, 0.854450, 0.381000, 0.000190], [625, 0.751400, 0.321000, 0.000100],
+    [630, 0.642400, 0.265000, 0.000050], [635, 0.541900, 0.217000, 0.000030],
+    [640, 0.447900, 0.175000, 0.000020], [645, 0.360800, 0.138200, 0.000010],
+    [650, 0.283500, 0.107000, 0.000000], [655, 0.218700, 0.081600, 0.000000],
+    [660, 0.164900, 0.061000, 0.000000], [665, 0.121200, 0.044580, 0.000000],
+    [670, 0.087400, 0.032000, 0.000000], [675, 0.063600, 0.023200, 0.000000],
+    [680, 0.046770, 0.017000, 0.000000], [685, 0.032900, 0.011920, 0.000000],
+    [690, 0.022700, 0.008210, 0.000000], [695, 0.015840, 0.005723, 0.000000],
+    [700, 0.011359, 0.004102, 0.000000], [705, 0.008111, 0.002929, 0.000000],
+    [710, 0.005790, 0.002091, 0.000000], [715, 0.004109, 0.001484, 0.000000],
+    [720, 0.002899, 0.001047, 0.000000], [725, 0.002049, 0.000740, 0.000000],
+    [730, 0.001440, 0.000520, 0.000000], [735, 0.001000, 0.000361, 0.000000],
+    [740, 0.000690, 0.000249, 0.000000], [745, 0.000476, 0.000172, 0.000000],
+    [750, 0.000332, 0.000120, 0.000000], [755, 0.000235, 0.000085, 0.000000],
+    [760, 0.000166, 0.000060, 0.000000], [765, 0.000117, 0.000042, 0.000000],
+    [770, 0.000083, 0.000030, 0.000000], [775, 0.000059, 0.000021, 0.000000],
+    [780, 0.000042, 0.000015, 0.000000],
+])
+
+# 최대 시감 효율 (lm/W)
+KM = 683.0
+WHITE_POINT = (1.0 / 3.0, 1.0 / 3.0)
+
+# Forel-Ule 경계 hue angle (도): FU n과 n + 1의 경계 (n = 1-20), α >= 경계 n이면 FU n 이하
+# van der Woerd & Wernand (2018)의 경계를 쓰되, FU 4/5 경계 (문헌 190.779)는 HydroLight 출력에 맞춘다.
+# 출력에서 α = 192.5 (PExe04 Lw)가 FU 5, α = 196.0 (PExe04 Rrs)이 FU 4이므로 그 사이의 194.0
+FU_HUE_LIMITS = np.array([227.168, 220.977, 209.994, 194.0, 163.084, 132.999, 109.054, 94.037, 83.346, 74.572,
+                          67.957, 62.186, 56.435, 50.665, 45.129, 39.769, 34.906, 30.439, 26.337, 21.390])
+
+# 파장 경계 bytes -> 가중치 행렬
+_WEIGHT_CACHE = {}
+
+
+def cmf_weights(wavelength, edges=None):
+    """(n_wavelength, 3) 가중치: 밴드 j의 (x̄, ȳ, z̄)(λ_j) Δλ_j (CMF 범위 밖은 0)
+
+    edges: 밴드 경계 (n_wavelength + 1), None이면 인접 중심 파장의 중간점. Δλ_j는 경계 사이 폭.
+    """
+    wavelength = np.asarray(wavelength, dtype=float)
+    edges = band_edges(wavelength) if edges is None else np.asarray(edges, dtype=float)
+    key = wavelength.tobytes() + edges.tobytes()
+    if key not in _WEIGHT_CACHE:
+        cmf = np.stack([np.interp(wavelength, CIE1931[:, 0], CIE1931[:, k], left=0.0, right=0.0)
+                        for k in (1, 2, 3)], axis=1)
+        _WEIGHT_CACHE[key] = cmf * np.diff(edges)[:, None]
+    return _WEIGHT_CACHE[key]
+
+
+def xyz(spectra, wavelength, edges=None):
+    """스펙트럼 (..., n_wavelength) -> CIE XYZ (..., 3) (Y = 683 Σ S ȳ Δλ)
+
+    NaN인 밴드는 0으로 본다 (모든 밴드가 NaN이면 NaN).
+    """
+    spectra = np.asarray(spectra, dtype=float)
+    weights = cmf_weights(wavelength, edges) * KM
+    if spectra.shape[-1] != len(weights):
+        raise ValueError(f"Spectra have {spectra.shape[-1]} values, expected {len(weights)} wavelengths")
+    missing = np.isnan(spectra)
+    if missing.any():
+        out = np.where(missing, 0.0, spectra) @ weights
+        out[missing.all(axis=-1)] = np.nan
+        return out
+    return spectra @ weights
+
+
+def chromaticity(XYZ):
+    """XYZ (..., 3) -> xyY (..., 3) (X + Y + Z = 0이면 x, y는 NaN)"""
+    XYZ = np.asarray(XYZ, dtype=float)
+    total = XYZ.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.where(total != 0, XYZ[..., 0] / total, np.nan)
+        y = np.where(total != 0, XYZ[..., 1] / total, np.nan)
+    return np.stack([x, y, XYZ[..., 1]], axis=-1)
+
+
+def hue_angle(x, y):
+    """백색점 기준 hue angle α = atan2(y - 1/3, x - 1/3) (도, 0 <= α < 360)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    return np.degrees(np.arctan2(y - WHITE_POINT[1], x - WHITE_POINT[0])) % 360.0
+
+
+def forel_ule(hue, limits=None):
+    """hue angle (도) -> Forel-Ule 번호 1-21 (NaN이면 0)
+
+    limits: FU n과 n + 1의 경계 hue angle 20개, 내림차순 (None이면 FU_HUE_LIMITS).
+    첫 경계 이상 (purple 쪽 포함)은 FU 1, 마지막 경계 미만은 FU 21.
+    """
+    hue = np.asarray(hue, dtype=float)
+    limits = FU_HUE_LIMITS if limits is None else np.asarray(limits, dtype=float)
+    number = 1 + (np.nan_to_num(hue, nan=0.0)[..., None] < limits).sum(axis=-1)
+    return np.where(np.isnan(hue), 0, number)
+
+
+# 주파장 계산용 스펙트럼 궤적 (380-700 nm, 이 구간에서 hue angle이 파장에 따라 단조 감소)
+_LOCUS = CIE1931[CIE1931[:, 0] <= 700]
+_LOCUS_HUE = np.unwrap(np.radians(hue_angle(*(chromaticity(_LOCUS[:, 1:])[:, :2].T))))
+
+
+def dominant_wavelength(x, y):
+    """주파장 (nm). 스펙트럼 궤적과 만나지 않는 purple 방향은 보색 파장을 음수로 반환"""
+    hue = np.radians(hue_angle(x, y))
+    # 궤적 hue 범위에 맞추어 2π 단위로 옮긴 뒤 (감소하는 궤적을 뒤집어) 선형 보간
+    low, high = _LOCUS_HUE.min(), _LOCUS_HUE.max()
+    locus_hue, locus_wl = _LOCUS_HUE[::-1], _LOCUS[::-1, 0]
+
+    def lookup(angle):
+        angle = np.where(angle > high, angle - 2 * np.pi, angle)
+        angle = np.where(angle < low, angle + 2 * np.pi, angle)
+        inside = (angle >= low) & (angle <= high)
+        return np.where(inside, np.interp(angle, locus_hue, locus_wl), np.nan), inside
+
+    wavelength, inside = lookup(hue)
+    complementary, _ = lookup(hue + np.pi)
+    return np.where(inside, wavelength, -complementary)
+
+
+def color_metrics(spectra, wavelength, edges=None, fu_limits=None):
+    """스펙트럼 (n_spectra, n_wavelength) 또는 (n_wavelength,) -> 색 지표 dict (모두 (n_spectra,) 또는 스칼라)
+
+    X, Y, Z, x, y, hue (도), dominant_wavelength (nm, 음수는 보색), forel_ule (1-21, 계산 불가 0)
+    fu_limits: forel_ule의 limits 인자
+    """
+    XYZ = xyz(spectra, wavelength, edges)
+    xyY = chromaticity(XYZ)
+    hue = hue_angle(xyY[..., 0], xyY[..., 1])
+    return {'X': XYZ[..., 0], 'Y': XYZ[..., 1], 'Z': XYZ[..., 2], 'x': xyY[..., 0], 'y': xyY[..., 1],
+            'hue': hue, 'dominant_wavelength': dominant_wavelength(xyY[..., 0], xyY[..., 1]),
+            'forel_ule': forel_ule(hue, fu_limits)}
+
+
+def verify_run(run):
+    """HydroLight가 출력한 색 (run.metadata의 cie_xyY, forel_ule)과 여기서 계산한 값 비교 -> 행 목록
+
+    각 행: {quantity, depth ('air' 또는 깊이), printed_x, printed_y, x, y, printed_Y, Y, printed_fu, fu, status}
+    HydroLight 출력은 x, y가 소수 3자리이므로 20 nm 밴드 run은 차이가 0.0005 (반올림) 이하다.
+    5 nm 밴드 run (PExe04, PExe05)은 0.0008 이하, Y는 모두 0.2% 이하로 맞는다.
+    status: 출력 FU가 있고 계산한 FU와 다르면 'fu_mismatch', 아니면 'ok'
+    """
+    rows = []
+    printed = run.metadata.get('cie_xyY', {})
+    fu_printed = run.metadata.get('forel_ule', {})
+    surface = {'Ed': None, 'Eu': None, 'Lu': 'Lu_air', 'Lw': 'Lw', 'Rrs': 'Rrs'}
+    for quantity, table in printed.items():
+        candidates = []
+        if table.get('air') is not None and surface.get(quantity) and surface[quantity] in run:
+            candidates.append(('air', run[surface[quantity]], table['air'], fu_printed.get(surface[quantity])))
+        if quantity in run.arrays and run.arrays[quantity].ndim == 2:
+            for z, values in zip(table['depth'], table['xyY']):
+                iz = np.flatnonzero(np.isclose(run.depth, z))
+                if len(iz):
+                    candidates.append((z, run[quantity][:, iz[0]], values, None))
+        for depth, spectrum, values, fu in candidates:
+            metrics = color_metrics(spectrum, run.wavelength)
+            computed = int(metrics['forel_ule'])
+            rows.append({'quantity': quantity, 'depth': depth,
+                         'printed_x': values[0], 'x': float(metrics['x']),
+                         'printed_y': values[1], 'y': float(metrics['y']),
+                         'printed_Y': values[2], 'Y': float(metrics['Y']),
+                         'printed_fu': fu, 'fu': computed,
+                         'status': "fu_mismatch" if fu is not None and fu != computed else "ok"})
+    return rows
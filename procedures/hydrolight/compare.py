@@ -0,0 +1,194 @@
+"""
+compare.py
+두 HydroLight run의 Lu/Ed 스펙트럼 비교 플롯 (P04_compare_exe04_and_exe05.py에서 사용)
+"""
+
+import numpy as np
+from pathlib import Path
+
+from .ensemble import HydroLightEnsemble
+from .plots import pyplot, save_figure
+from .trace import stage, echo
+
+
+def file_label(name):
+    """차이 플롯 파일 이름에 쓰는 run 표기: printout 접두사 P를 떼고 소문자 (PExe04 -> exe04)
+
+    기존 P04 결과 파일 이름 (Lu_difference_exe04_minus_exe05.png 등)과 같게 유지한다.
+    """
+    return (name[1:] if name[:1] == "P" and len(name) > 1 else name).lower()
+
+
+def plot_Lu_spectrum(run, output_dir, title, filename, color_scheme='viridis'):
+    """깊이별 Lu 스펙트럼 플롯"""
+    plt = pyplot()
+    if not np.isfinite(run['Lu']).any():
+        echo(f"No data to plot: {filename}")
+        return
+    
+    echo(f"\nPlotting {title}...")
+    depths = run.depth
+    colors = plt.get_cmap(color_scheme)(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        values = run['Lu'][:, i]
+        if np.all(np.isnan(values)):
+            continue
+        ax.plot(run.wavelength, values, '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Upwelling Radiance Lu [W/(m² sr nm)]', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2, loc='best')
+    
+    plt.tight_layout()
+    output_file = output_dir / filename
+    save_figure(plt, output_file)
+
+
+def plot_Lu_difference(pair, output_dir):
+    """깊이별 Lu 차이 스펙트럼 플롯 (run A - run B)"""
+    plt = pyplot()
+    a, b = pair.names
+    Lu = pair.cube('Lu')
+    if not np.isfinite(Lu).any():
+        echo("No data to plot difference")
+        return
+    
+    echo(f"\nPlotting Lu Difference ({a} - {b})...")
+    
+    # 같은 (wavelength, depth) 그리드로 정렬된 배열에서 차이 계산
+    Lu_diff = Lu[0] - Lu[1]
+    
+    # 플롯
+    depths = pair.depth
+    colors = plt.cm.plasma(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        if np.all(np.isnan(Lu_diff[:, i])):
+            continue
+        ax.plot(pair.wavelength, Lu_diff[:, i], '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel(f'Lu Difference ({a} - {b}) [W/(m² sr nm)]', fontsize=12)
+    ax.set_title(f'Lu Difference: {a} - {b} by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2, loc='best')
+    ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+    
+    plt.tight_layout()
+    output_file = output_dir / f'Lu_difference_{file_label(a)}_minus_{file_label(b)}.png'
+    save_figure(plt, output_file)
+
+
+def plot_Ed_difference(pair, output_dir):
+    """깊이별 Ed 차이 스펙트럼 플롯 (run A - run B)"""
+    plt = pyplot()
+    a, b = pair.names
+    Ed = pair.cube('Ed')
+    if not np.isfinite(Ed).any():
+        echo("No data to plot Ed difference")
+        return
+    
+    echo(f"\nPlotting Ed Difference ({a} - {b})...")
+    
+    # 같은 (wavelength, depth) 그리드로 정렬된 배열에서 차이 계산
+    Ed_diff = Ed[0] - Ed[1]
+    
+    # 플롯
+    depths = pair.depth
+    colors = plt.cm.plasma(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        if np.all(np.isnan(Ed_diff[:, i])):
+            continue
+        ax.plot(pair.wavelength, Ed_diff[:, i], '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel(f'Ed Difference ({a} - {b}) [W/(m² nm)]', fontsize=12)
+    ax.set_title(f'Ed Difference: {a} - {b} by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2, loc='best')
+    ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+    
+    plt.tight_layout()
+    output_file = output_dir / f'Ed_difference_{file_label(a)}_minus_{file_label(b)}.png'
+    save_figure(plt, output_file)
+
+
+def plot_Lu_diff_over_Ed(pair, output_dir):
+    """깊이별 (Lu 차이) / (Ed of run B) 스펙트럼 플롯"""
+    plt = pyplot()
+    a, b = pair.names
+    Lu = pair.cube('Lu')
+    Ed = pair.cube('Ed')
+    if not np.isfinite(Lu).any() or not np.isfinite(Ed[1]).any():
+        echo(f"No data to plot Lu_diff/Ed_{b}")
+        return
+    
+    echo(f"\nPlotting (Lu Difference) / (Ed {b})...")
+    
+    # 비율 계산
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Lu_diff_over_Ed = (Lu[0] - Lu[1]) / Ed[1]
+    
+    # 플롯
+    depths = pair.depth
+    colors = plt.cm.plasma(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        if np.all(np.isnan(Lu_diff_over_Ed[:, i])):
+            continue
+        ax.plot(pair.wavelength, Lu_diff_over_Ed[:, i], '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel(f'(Lu_diff / Ed_{b}) [sr⁻¹]', fontsize=12)
+    ax.set_title(f'(Lu Difference) / (Ed of {b}) by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2, loc='best')
+    ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+    
+    plt.tight_layout()
+    output_file = output_dir / f'Lu_diff_over_Ed_{file_label(b)}.png'
+    save_figure(plt, output_file)
+
+
+def compare_runs(run_a, run_b, output_dir):
+    """두 run의 Lu 스펙트럼과 Lu/Ed 차이 플롯을 output_dir에 저장"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 두 run을 같은 깊이 그리드로 정렬 (모든 비교 플롯이 같은 배열 사용)
+    pair = HydroLightEnsemble([run_a, run_b])
+    
+    # 플롯 생성
+    echo("\n" + "="*50)
+    echo("Creating comparison plots...")
+    echo("="*50)
+    
+    # 1-2. 각 run의 Lu 스펙트럼
+    for run in (run_a, run_b):
+        with stage("plot.plot_Lu_spectrum"):
+            plot_Lu_spectrum(run, output_dir, 
+                             f'Upwelling Radiance (Lu) - {run.name}', 
+                             f'Lu_spectrum_{run.name}.png',
+                             color_scheme='viridis')
+    
+    # 3. Lu 차이, 4. Ed 차이, 5. (Lu 차이) / (Ed of run B) 플롯
+    for plot in (plot_Lu_difference, plot_Ed_difference, plot_Lu_diff_over_Ed):
+        with stage(f"plot.{plot.__name__}"):
+            plot(pair, output_dir)
+    return output_dir
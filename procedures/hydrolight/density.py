@@ -0,0 +1,362 @@
+"""
+density.py
+수천 개 run의 스펙트럼/프로파일을 2차원 히스토그램 이미지와 백분위수 envelope로 그리는 플롯
+
+run마다 ax.plot을 부르면 곡선이 수천 개일 때 알아볼 수 없고 그리는 데 몇 분이 걸린다.
+여기서는 모든 곡선을 numpy로 (독립 변수 x 값) 격자에 binning한 뒤 imshow 한 번으로 그리고,
+그 위에 백분위수(기본 5, 25, 50, 75, 95%) 곡선을 겹친다. binning 뒤의 그리기 시간은 곡선 수와
+무관하다.
+
+    ensemble = HydroLightEnsemble(runs)                # 또는 EnsembleStore
+    plot_density(ensemble, "results/density")          # P03/P04의 모든 figure 종류
+    plot_density_figure(ensemble, "Lu_difference", "results/density", reference="base")
+    plot_density(ensemble, "results/density", jobs=4)   # figure별 작업 프로세스, cube는 공유 메모리로
+
+곡선은 노드 사이를 선형 보간하여 x 격자의 모든 열에 값을 넣으므로 (선을 그린 것과 같은 모양),
+밴드 수가 적어도 빈 열이 생기지 않는다. log 축 양은 log10 값으로 binning/보간한다.
+색은 열(x)마다 곡선 비율이며 (열 합 = 1), 곡선이 없는 칸은 투명하다.
+"""
+
+import numpy as np
+from pathlib import Path
+
+from .ensemble import KFUNCTION_QUANTITIES
+from .plots import pyplot, save_figure
+from .trace import stage, count, echo
+
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# (x 격자 열 수, 값 bin 수)
+DEFAULT_BINS = (300, 200)
+# log 자동 선택: 모든 값이 양수이고 99/1 백분위수 비가 이보다 크면 log 축
+AUTO_LOG_RATIO = 100.0
+
+# P03/P04 figure 종류 -> (제목, 곡선 종류, [(양, 값 축 이름, log)])
+#   profile       run x 파장별 깊이 프로파일 (깊이가 세로축, P03 *_vs_depth)
+#   spectrum      run x 깊이별 스펙트럼 (P03 *_vs_wavelength_by_depth, P04 Lu_spectrum)
+#   difference    기준 run과의 차이 스펙트럼 (P04 *_difference)
+#   diff_over_Ed  (Lu - 기준 Lu) / 기준 Ed (P04 Lu_diff_over_Ed)
+# log=None이면 값 분포에 따라 자동
+FIGURES = {
+    'IOPs_vs_depth': ("Inherent Optical Properties vs Depth", "profile", [
+        ('total_a', "Total Absorption a (1/m)", False),
+        ('total_b', "Total Scattering b (1/m)", False),
+        ('albedo', "Single Scattering Albedo ω₀", False),
+        ('total_bb_over_b', "Backscattering Ratio bb/b", False)]),
+    'Irradiances_vs_depth': ("Spectral Irradiances vs Depth", "profile", [
+        ('Ed', "Ed [W/(m² nm)]", True),
+        ('Eu', "Eu [W/(m² nm)]", True),
+        ('Eo', "Eo [W/(m² nm)]", True),
+        ('R', "R = Eu/Ed", False)]),
+    'Radiances_vs_depth': ("Spectral Radiances vs Depth", "profile", [
+        ('Lu', "Lu [W/(m² sr nm)]", True),
+        ('Ld', "Ld [W/(m² sr nm)]", True),
+        ('Lu_over_Ed', "Lu/Ed [1/sr]", True),
+        ('Q', "Q = Eu/Lu [sr]", False)]),
+    'Kfunctions_vs_depth': ("K-functions vs Depth", "profile", [
+        ('Kd', "Kd (1/m)", False),
+        ('Ku', "Ku (1/m)", False),
+        ('Ko', "Ko (1/m)", False),
+        ('KLu', "KLu (1/m)", False)]),
+    'R_vs_wavelength_by_depth': ("Irradiance Reflectance vs Wavelength", "spectrum", [
+        ('R', "Irradiance Reflectance R = Eu/Ed", None)]),
+    'Lu_vs_wavelength_by_depth': ("Upwelling Radiance vs Wavelength", "spectrum", [
+        ('Lu', "Upwelling Radiance Lu [W/(m² sr nm)]", None)]),
+    'Ed_vs_wavelength_by_depth': ("Downward Irradiance vs Wavelength", "spectrum", [
+        ('Ed', "Downward Irradiance Ed [W/(m² nm)]", None)]),
+    'Lu_Ed_ratio_vs_wavelength_by_depth': ("Lu/Ed Ratio vs Wavelength", "spectrum", [
+        ('Lu_Ed', "Lu/Ed Ratio [sr⁻¹]", None)]),
+    'Lu_spectrum': ("Upwelling Radiance (Lu)", "spectrum", [
+        ('Lu', "Upwelling Radiance Lu [W/(m² sr nm)]", None)]),
+    'Lu_difference': ("Lu Difference", "difference", [
+        ('Lu', "Lu Difference [W/(m² sr nm)]", False)]),
+    'Ed_difference': ("Ed Difference", "difference", [
+        ('Ed', "Ed Difference [W/(m² nm)]", False)]),
+    'Lu_diff_over_Ed': ("(Lu Difference) / (Ed of reference)", "diff_over_Ed", [
+        ('Lu', "(Lu_diff / Ed_ref) [sr⁻¹]", False)]),
+}
+
+
+class CurveDensity:
+    """곡선 묶음의 2차원 히스토그램
+
+    counts: (n_value_bin, n_x) 곡선 수, x: 격자 열 중심, edges: 값 bin 경계 (log이면 log10 값),
+    n_curves: binning한 곡선 수
+    """
+
+    def __init__(self, counts, x, edges, log, n_curves):
+        self.counts = counts
+        self.x = x
+        self.edges = edges
+        self.log = log
+        self.n_curves = n_curves
+
+    def column_fraction(self):
+        """열(x)마다 곡선 비율 (열 합 = 1, 곡선이 없는 열은 0)"""
+        total = self.counts.sum(axis=0, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, self.counts / total, 0.0)
+
+    def __repr__(self):
+        return (f"CurveDensity({self.n_curves} curves, {self.counts.shape[1]} x {self.counts.shape[0]} bins, "
+                f"log={self.log})")
+
+
+def auto_log(values):
+    """값이 모두 양수이고 범위가 AUTO_LOG_RATIO배보다 넓으면 True"""
+    finite = values[np.isfinite(values)]
+    if not len(finite) or finite.min() <= 0:
+        return False
+    low, high = np.percentile(finite, [1, 99])
+    return high / low > AUTO_LOG_RATIO
+
+
+def _transform(curves, log):
+    curves = np.asarray(curves, dtype=float)
+    if not log:
+        return curves
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(curves > 0, np.log10(curves), np.nan)
+
+
+def bin_curves(x, curves, bins=DEFAULT_BINS, log=None, value_range=None, chunk_size=4096):
+    """곡선 (n_curve, len(x))을 (x 격자, 값) 2차원 히스토그램으로 -> CurveDensity
+
+    x는 오름차순이어야 한다. 곡선은 x 격자 열마다 선형 보간되며, NaN 노드에 닿은 구간은
+    비워 둔다. value_range: 값 축 범위 (log이면 원래 단위), None이면 유한한 값의 최솟값-최댓값.
+    chunk_size개 곡선씩 처리하여 메모리 사용량을 제한한다.
+    """
+    x = np.asarray(x, dtype=float)
+    curves = np.atleast_2d(np.asarray(curves, dtype=float))
+    if log is None:
+        log = auto_log(curves)
+    values = _transform(curves, log)
+    n_x, n_value = bins
+
+    if value_range is None:
+        finite = values[np.isfinite(values)]
+        low, high = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    else:
+        low, high = _transform(np.asarray(value_range, dtype=float), log)
+    if not high > low:
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, n_value + 1)
+
+    # 격자 열마다 (왼쪽 노드, 가중치): 곡선 chunk마다 같은 index로 보간
+    grid = np.linspace(x[0], x[-1], n_x)
+    left = np.clip(np.searchsorted(x, grid, side='right') - 1, 0, len(x) - 2)
+    t = np.clip((grid - x[left]) / (x[left + 1] - x[left]), 0.0, 1.0)
+    columns = np.arange(n_x)
+
+    # 범위 밖/NaN 값은 마지막 (버리는) bin 행에 모음. high가 마지막 bin에 들어가도록 scale을 조금 줄임
+    counts = np.zeros((n_value + 1) * n_x, dtype=np.int64)
+    scale = n_value / (high - low) * (1 - 1e-12)
+    for start in range(0, len(values), chunk_size):
+        block = values[start:start + chunk_size]
+        b = block[:, left] * (1 - t) + block[:, left + 1] * t
+        b -= low
+        b *= scale
+        with np.errstate(invalid='ignore'):
+            b[~(b >= 0) | (b >= n_value)] = n_value
+        index = b.astype(np.intp)
+        index *= n_x
+        index += columns
+        counts += np.bincount(index.ravel(), minlength=len(counts))
+    count("curves_binned", len(values))
+    return CurveDensity(counts.reshape(n_value + 1, n_x)[:n_value], grid, edges, log, len(values))
+
+
+def percentile_envelopes(curves, percentiles=DEFAULT_PERCENTILES, log=False):
+    """노드별 백분위수 (n_percentile, len(x)) (log이면 log10 값, NaN은 제외)"""
+    import warnings
+    values = _transform(curves, log)
+    with warnings.catch_warnings():
+        # 모든 곡선이 NaN인 노드 ("All-NaN slice")는 NaN으로 둠
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanpercentile(values, percentiles, axis=0)
+
+
+def draw_density(ax, density, x, envelopes=None, percentiles=DEFAULT_PERCENTILES, vertical=False,
+                 cmap='viridis', colorbar=True):
+    """ax에 density 이미지(imshow)와 envelope를 그림
+
+    vertical=True이면 x(깊이)를 세로축에 아래로 증가하게 두고 값은 가로축 (P03 깊이 프로파일 형태).
+    log 값 축의 눈금은 원래 단위로 표시한다.
+    """
+    plt = pyplot()
+    from matplotlib.colors import LogNorm
+    from matplotlib.ticker import FuncFormatter
+
+    image = np.ma.masked_equal(density.column_fraction(), 0.0)
+    vmin = image.min() if image.count() else 1e-3
+    norm = LogNorm(vmin=max(vmin, 1e-4), vmax=1.0)
+    low, high = density.edges[0], density.edges[-1]
+    x0, x1 = density.x[0], density.x[-1]
+    if vertical:
+        im = ax.imshow(image.T, origin='lower', extent=(low, high, x0, x1), aspect='auto',
+                       interpolation='nearest', cmap=cmap, norm=norm)
+        ax.set_ylim(x1, x0)
+    else:
+        im = ax.imshow(image, origin='lower', extent=(x0, x1, low, high), aspect='auto',
+                       interpolation='nearest', cmap=cmap, norm=norm)
+
+    if envelopes is not None:
+        for p, values in zip(percentiles, envelopes):
+            # 중앙값은 실선, 안쪽 구간은 파선, 바깥 구간은 점선 (범례는 아래쪽 백분위수에만)
+            if p == 50:
+                linestyle, width, label = '-', 2.0, "median"
+            else:
+                linestyle, width = ('--' if abs(p - 50) <= 25 else ':'), 1.2
+                label = f"{p:g}-{100 - p:g}%" if p < 50 else None
+            if vertical:
+                ax.plot(values, x, linestyle, color='red', linewidth=width, label=label)
+            else:
+                ax.plot(x, values, linestyle, color='red', linewidth=width, label=label)
+        ax.legend(fontsize=8, loc='best')
+
+    if density.log:
+        formatter = FuncFormatter(lambda v, _: f"{10 ** v:.3g}")
+        (ax.xaxis if vertical else ax.yaxis).set_major_formatter(formatter)
+    if colorbar:
+        plt.colorbar(im, ax=ax, label='Fraction of curves')
+    ax.grid(True, alpha=0.3)
+    return im
+
+
+def _reference_index(source, reference):
+    names = list(source.names)
+    if reference is None:
+        return 0
+    if reference not in names:
+        raise KeyError(f"Reference run {reference!r} not in ensemble")
+    return names.index(reference)
+
+
+def figure_curves(source, kind, quantity, reference=None, depth=None):
+    """figure 종류별 곡선 (x, curves, x가 k_depth인지)
+
+    source는 cube(quantity)가 있는 HydroLightEnsemble 또는 EnsembleStore.
+    depth를 주면 스펙트럼 곡선은 가장 가까운 깊이 하나만 사용한다.
+    """
+    cube = np.asarray(source.cube(quantity), dtype=float)
+    on_k_grid = quantity in KFUNCTION_QUANTITIES
+    grid = source.k_depth if on_k_grid else source.depth
+    if kind == "profile":
+        if cube.ndim != 3:
+            raise ValueError(f"{quantity} has no depth axis")
+        return grid, cube.reshape(-1, cube.shape[2])
+
+    if kind in ("difference", "diff_over_Ed"):
+        ref = _reference_index(source, reference)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cube = cube - cube[ref]
+            if kind == "diff_over_Ed":
+                cube = cube / np.asarray(source.cube('Ed'), dtype=float)[ref]
+        cube = np.delete(cube, ref, axis=0)
+    if cube.ndim == 2:
+        return source.wavelength, cube
+    if depth is not None:
+        cube = cube[:, :, [int(np.argmin(np.abs(grid - depth)))]]
+    # (n_run, n_wavelength, n_depth) -> (n_run x n_depth, n_wavelength)
+    return source.wavelength, cube.transpose(0, 2, 1).reshape(-1, cube.shape[1])
+
+
+def plot_density_figure(source, figure, output_dir, reference=None, depth=None, bins=DEFAULT_BINS,
+                        percentiles=DEFAULT_PERCENTILES):
+    """figure 종류 하나의 density 플롯을 <output_dir>/<figure>_density.png로 저장 (저장한 파일 또는 None)"""
+    title, kind, panels = FIGURES[figure]
+    plt = pyplot()
+    n_runs = len(source.names)
+
+    # 없는 양(예: store에 저장하지 않은 IOP)이나 값이 없는 panel은 건너뜀
+    prepared = []
+    for quantity, label, log in panels:
+        try:
+            x, curves = figure_curves(source, kind, quantity, reference, depth)
+        except (KeyError, ValueError) as e:
+            echo(f"Skipping {figure} {quantity}: {e}")
+            continue
+        curves = curves[np.isfinite(curves).any(axis=1)]
+        if not len(curves):
+            continue
+        if log is None:
+            log = auto_log(curves)
+        with stage("density.bin", quantity=quantity):
+            density = bin_curves(x, curves, bins, log)
+            envelopes = percentile_envelopes(curves, percentiles, log)
+        prepared.append((quantity, label, x, density, envelopes))
+    if not prepared:
+        echo(f"No data to plot: {figure}")
+        return None
+
+    echo(f"\nPlotting {title} density ({n_runs} runs)...")
+    vertical = kind == "profile"
+    if len(prepared) == 1:
+        fig, axes = plt.subplots(figsize=(10, 6))
+        axes = [axes]
+    else:
+        fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+        axes = axes.ravel()
+        for ax in axes[len(prepared):]:
+            ax.set_visible(False)
+    differences = kind in ("difference", "diff_over_Ed")
+    suffix = f" (vs {source.names[_reference_index(source, reference)]})" if differences else ""
+    fig.suptitle(f"{title}{suffix}: {n_runs} runs", fontsize=14, fontweight='bold')
+
+    for ax, (quantity, label, x, density, envelopes) in zip(axes, prepared):
+        draw_density(ax, density, x, envelopes, percentiles, vertical=vertical)
+        if vertical:
+            ax.set_xlabel(label, fontsize=10)
+            ax.set_ylabel('Depth (m)', fontsize=10)
+        else:
+            ax.set_xlabel('Wavelength (nm)', fontsize=12)
+            ax.set_ylabel(label, fontsize=12)
+            if differences:
+                ax.axhline(y=0, color='black', linestyle='--', linewidth=1, alpha=0.5)
+        ax.set_title(f"{quantity} ({density.n_curves} curves)", fontweight='bold')
+
+    plt.tight_layout()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f"{figure}_density.png"
+    save_figure(plt, output_file)
+    return output_file
+
+
+def plot_density(source, output_dir, figures=None, reference=None, depth=None, bins=DEFAULT_BINS,
+                 percentiles=DEFAULT_PERCENTILES, jobs=1):
+    """여러 figure 종류의 density 플롯 (figures=None이면 FIGURES 전체) -> 저장한 파일 목록
+
+    P04 차이 figure는 run이 2개 이상일 때만 그린다. jobs > 1이면 필요한 cube를 공유 메모리에
+    한 번 올리고 (shared.SharedCubes) figure마다 작업 프로세스에서 그린다. 작업 프로세스에는
+    cube 대신 handle만 넘어간다.
+    """
+    _reference_index(source, reference)
+    figures = [f for f in (figures or FIGURES)
+               if not (FIGURES[f][1] in ("difference", "diff_over_Ed") and len(source.names) < 2)]
+    if jobs > 1 and len(figures) > 1:
+        return _plot_density_shared(source, output_dir, figures, reference, depth, bins, percentiles, jobs)
+    files = []
+    for figure in figures:
+        with stage(f"plot.density.{figure}"):
+            output_file = plot_density_figure(source, figure, output_dir, reference, depth, bins, percentiles)
+        if output_file is not None:
+            files.append(output_file)
+    return files
+
+
+def _plot_density_shared(source, output_dir, figures, reference, depth, bins, percentiles, jobs):
+    from concurrent.futures import ProcessPoolExecutor
+    from .shared import SharedCubes
+    quantities = [q for f in figures for q, _, _ in FIGURES[f][2]]
+    if any(FIGURES[f][1] == "diff_over_Ed" for f in figures):
+        quantities.append('Ed')
+    with SharedCubes() as shared:
+        with stage("density.publish"):
+            published = shared.publish_ensemble(source, quantities)
+        count("shared_bytes", shared.nbytes)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(figures))) as pool:
+            futures = [pool.submit(plot_density_figure, published, figure, output_dir, reference, depth, bins,
+                                   percentiles) for figure in figures]
+            files = [future.result() for future in futures]
+    return [f for f in files if f is not None]
@@ -0,0 +1,126 @@
+"""
+derived.py
+HydroLight run 배열로부터 계산하는 파생량(derived quantity) 정의
+
+각 파생량은 derived() decorator로 한 번만 선언하며, 의존하는 양(파싱된 배열 또는
+다른 파생량)의 이름을 함께 등록한다. HydroLightRun은 이 정보로 파생량을 필요할 때
+계산(lazy)하고 메모해 두었다가, 의존하는 배열이 바뀌면 무효화한다.
+"""
+
+import numpy as np
+
+
+# 이름 -> (의존 양 이름 tuple, 계산 함수)
+DERIVED_QUANTITIES = {}
+
+
+def derived(name, *dependencies):
+    """파생량 등록 decorator. 함수는 (run, *의존 배열)을 받아 numpy 배열을 반환"""
+    def register(func):
+        DERIVED_QUANTITIES[name] = (dependencies, func)
+        return func
+    return register
+
+
+def dependents(name):
+    """name이 바뀌었을 때 무효화해야 하는 파생량 집합 (간접 의존 포함)"""
+    result = set()
+    stack = [name]
+    while stack:
+        current = stack.pop()
+        for other, (deps, _) in DERIVED_QUANTITIES.items():
+            if current in deps and other not in result:
+                result.add(other)
+                stack.append(other)
+    return result
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def _log_slope(values, depth):
+    """-d ln(values)/dz (깊이 축 = 마지막 축)"""
+    if values.shape[-1] < 2:
+        return np.full(values.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.gradient(np.log(np.where(values > 0, values, np.nan)), depth, axis=-1)
+
+
+@derived('Lu_Ed', 'Lu', 'Ed')
+def _lu_ed(run, Lu, Ed):
+    """Lu/Ed [1/sr]"""
+    return _ratio(Lu, Ed)
+
+
+@derived('Eu_Ed', 'Eu', 'Ed')
+def _eu_ed(run, Eu, Ed):
+    """R = Eu/Ed (출력의 R 열과 비교용)"""
+    return _ratio(Eu, Ed)
+
+
+@derived('Eu_Lu', 'Eu', 'Lu')
+def _eu_lu(run, Eu, Lu):
+    """Q = Eu/Lu [sr]"""
+    return _ratio(Eu, Lu)
+
+
+@derived('rrs_0minus', 'Lu_Ed')
+def _rrs_0minus(run, Lu_Ed):
+    """수면 바로 아래 rrs = Lu(0-)/Ed(0-) [1/sr]"""
+    return Lu_Ed[:, 0].copy()
+
+
+@derived('Rrs_above', 'rrs_0minus')
+def _rrs_above(run, rrs):
+    """수면 아래 rrs를 수면 위 Rrs로 변환 (Lee et al., 2002: Rrs = 0.52 rrs / (1 - 1.7 rrs))"""
+    return 0.52 * rrs / (1.0 - 1.7 * rrs)
+
+
+@derived('Eo_sum', 'Eou', 'Eod')
+def _eo_sum(run, Eou, Eod):
+    """Eou + Eod (출력의 Eo 열과 비교용)"""
+    return Eou + Eod
+
+
+@derived('E_net', 'Ed', 'Eu')
+def _e_net(run, Ed, Eu):
+    """순 하향 복사조도 Ed - Eu"""
+    return Ed - Eu
+
+
+@derived('mubar_calc', 'E_net', 'Eo')
+def _mubar(run, E_net, Eo):
+    """평균 코사인 (Ed - Eu)/Eo"""
+    return _ratio(E_net, Eo)
+
+
+@derived('Kd_Ed', 'Ed')
+def _kd(run, Ed):
+    """Ed 프로파일로부터 다시 계산한 Kd = -d ln Ed/dz (출력 깊이 그리드)"""
+    return _log_slope(Ed, run.depth)
+
+
+@derived('Ku_Eu', 'Eu')
+def _ku(run, Eu):
+    """Eu 프로파일로부터 다시 계산한 Ku"""
+    return _log_slope(Eu, run.depth)
+
+
+@derived('KLu_Lu', 'Lu')
+def _klu(run, Lu):
+    """Lu 프로파일로부터 다시 계산한 KLu"""
+    return _log_slope(Lu, run.depth)
+
+
+@derived('K_net', 'E_net')
+def _k_net(run, E_net):
+    """순 복사조도 감쇠계수 -d ln(Ed - Eu)/dz"""
+    return _log_slope(E_net, run.depth)
+
+
+@derived('a_gershun', 'K_net', 'mubar_calc')
+def _a_gershun(run, K_net, mubar):
+    """Gershun 법칙에 의한 흡수계수 추정 a = K_net * mubar = -(1/Eo) d(Ed - Eu)/dz [1/m]"""
+    return K_net * mubar
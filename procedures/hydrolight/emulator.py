@@ -0,0 +1,240 @@
+"""
+emulator.py
+HydroLight ensemble로 학습하는 통계 emulator (PCA + RBF 보간)와 k-fold 교차 검증
+
+각 양의 (run, wavelength[, depth]) 출력을 PCA로 줄이고, 성분 점수를 입력 파라미터 공간에서
+scipy RBFInterpolator로 보간한다. 새 파라미터 조합의 전체 Rrs/Lu/Ed 스펙트럼은 RBF 평가 한 번과
+행렬곱 하나로 나오므로 batch로 예측하면 조합 하나에 수 μs 수준이다.
+
+    emulator = Emulator.fit(ensemble, quantities=["Rrs", "Lu", "Ed"], parameters=["chl", "acdom440", "minerals"])
+    spectra = emulator.predict({"chl": [0.5, 2.0], "acdom440": [0.01, 0.1], "minerals": [0.2, 1.0]})
+    spectra['Rrs']                       # (2, n_wavelength),  spectra['Lu']: (2, n_wavelength, n_depth)
+    rows = cross_validate(ensemble, folds=5, quantities=["Rrs"], parameters=["chl", "acdom440"])
+    emulator.save("results/emulator/emulator.npz");  Emulator.load(...)
+
+- 파라미터는 모두 양수이고 10배 이상 범위이면 log10, 그 뒤 [0, 1]로 scaling
+- 출력은 모두 양수이면 log10 공간에서 PCA (스펙트럼의 곱셈적 변화가 선형에 가까워짐)
+- 깊이 합집합 그리드에서 어떤 run에 빠진 (NaN) 칸은 학습에서 빼고 예측에서도 NaN
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+
+from .ensemble import KFUNCTION_QUANTITIES
+
+
+DEFAULT_QUANTITIES = ["Rrs", "Lu", "Ed"]
+# 입력 파라미터에서 제외할 메타데이터 (출력 쪽 값)
+EXCLUDED_PARAMETERS = ("wall_clock_s",)
+
+
+def varying_parameters(params):
+    """ensemble.params 중 NaN이 없고 run마다 값이 다른 열 이름"""
+    return [c for c in params.columns
+            if c not in EXCLUDED_PARAMETERS and params[c].notna().all() and params[c].nunique() > 1]
+
+
+class Emulator:
+    """파라미터 -> 스펙트럼 PCA+RBF emulator
+
+    x_log, x_min, x_scale: 파라미터 변환, quantities[q]: {mean, components, log, shape, mask, depth, columns}
+    scores: 학습 run의 (n_run, 전체 성분 수) 점수 (양별 성분을 이어 붙임)
+    """
+
+    def __init__(self, parameters, x_train, scores, quantities, x_log, x_min, x_scale,
+                 wavelength, depth, kernel="thin_plate_spline", smoothing=0.0):
+        self.parameters = list(parameters)
+        self.x_train = np.asarray(x_train, dtype=float)
+        self.scores = np.asarray(scores, dtype=float)
+        self.quantities = quantities
+        self.x_log = np.asarray(x_log, dtype=bool)
+        self.x_min = np.asarray(x_min, dtype=float)
+        self.x_scale = np.asarray(x_scale, dtype=float)
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        self.kernel = kernel
+        self.smoothing = smoothing
+        self._rbf = None
+
+    @classmethod
+    def fit(cls, ensemble, quantities=None, parameters=None, variance=0.9999, max_components=20,
+            kernel="thin_plate_spline", smoothing=0.0):
+        """ensemble로 학습. variance: 양별로 남길 PCA 누적 분산 비율, max_components: 양별 최대 성분 수"""
+        params = ensemble.params
+        parameters = varying_parameters(params) if parameters is None else list(parameters)
+        if not parameters:
+            raise ValueError("No input parameter varies across the ensemble")
+        missing = [p for p in parameters if p not in params.columns]
+        if missing:
+            raise KeyError(f"Unknown parameter(s) {missing}, available: {list(params.columns)}")
+        x = params[parameters].to_numpy(dtype=float)
+        if np.isnan(x).any():
+            raise ValueError(f"Parameters {parameters} have missing values for some runs")
+        if len(x) < len(parameters) + 2:
+            raise ValueError(f"{len(x)} run(s) are too few to emulate {len(parameters)} parameter(s)")
+
+        x_log = (x > 0).all(axis=0) & (x.max(axis=0) >= 10 * x.min(axis=0))
+        x = np.where(x_log, np.log10(np.where(x_log, x, 1.0)), x)
+        x_min = x.min(axis=0)
+        x_scale = np.where(np.ptp(x, axis=0) > 0, np.ptp(x, axis=0), 1.0)
+
+        table = {}
+        blocks = []
+        for q in quantities or DEFAULT_QUANTITIES:
+            cube = ensemble.cube(q)
+            shape = cube.shape[1:]
+            grid = ensemble.k_depth if q in KFUNCTION_QUANTITIES else ensemble.depth
+            flat = cube.reshape(len(cube), -1)
+            mask = np.isfinite(flat).all(axis=0)
+            if not mask.any():
+                raise ValueError(f"{q} has no cell that is finite in every run")
+            values = flat[:, mask]
+            log = bool((values > 0).all())
+            if log:
+                values = np.log10(values)
+            mean = values.mean(axis=0)
+            _, s, vt = np.linalg.svd(values - mean, full_matrices=False)
+            explained = np.cumsum(s ** 2) / max(np.sum(s ** 2), np.finfo(float).tiny)
+            k = int(min(np.searchsorted(explained, variance) + 1, max_components, len(s)))
+            components = vt[:k]
+            blocks.append((values - mean) @ components.T)
+            table[q] = {'mean': mean, 'components': components, 'log': log, 'shape': shape, 'mask': mask,
+                        'depth': grid if cube.ndim > 2 else np.array([]),
+                        'columns': (sum(b.shape[1] for b in blocks[:-1]), sum(b.shape[1] for b in blocks))}
+        return cls(parameters, (x - x_min) / x_scale, np.hstack(blocks), table, x_log, x_min, x_scale,
+                   ensemble.wavelength, ensemble.depth, kernel, smoothing)
+
+    def _interpolator(self):
+        if self._rbf is None:
+            from scipy.interpolate import RBFInterpolator
+            self._rbf = RBFInterpolator(self.x_train, self.scores, kernel=self.kernel, smoothing=self.smoothing)
+        return self._rbf
+
+    def transform(self, values):
+        """파라미터 {이름: 값 배열} 또는 (n, n_parameter) 배열 -> 학습 공간 좌표 (n, n_parameter)"""
+        if isinstance(values, dict):
+            missing = [p for p in self.parameters if p not in values]
+            if missing:
+                raise KeyError(f"Missing parameter(s) {missing}")
+            values = np.column_stack(np.broadcast_arrays(*(np.atleast_1d(np.asarray(values[p], dtype=float))
+                                                           for p in self.parameters)))
+        x = np.atleast_2d(np.asarray(values, dtype=float))
+        if x.shape[1] != len(self.parameters):
+            raise ValueError(f"Expected {len(self.parameters)} parameter(s) {self.parameters}, got {x.shape[1]}")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(self.x_log, np.log10(x), x)
+        return (x - self.x_min) / self.x_scale
+
+    def predict(self, values, quantities=None):
+        """파라미터 조합 n개 -> {양: (n, n_wavelength[, n_depth])}"""
+        scores = self._interpolator()(self.transform(values))
+        out = {}
+        for q in quantities or self.quantities:
+            info = self.quantities[q]
+            start, stop = info['columns']
+            values = scores[:, start:stop] @ info['components'] + info['mean']
+            if info['log']:
+                values = 10.0 ** values
+            full = np.full((len(scores), info['mask'].size), np.nan)
+            full[:, info['mask']] = values
+            out[q] = full.reshape((len(scores),) + tuple(info['shape']))
+        return out
+
+    def save(self, filepath):
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        info = {'parameters': self.parameters, 'kernel': self.kernel, 'smoothing': self.smoothing, 'quantities': {}}
+        for q, table in self.quantities.items():
+            info['quantities'][q] = {'log': table['log'], 'shape': list(table['shape']),
+                                     'columns': list(table['columns'])}
+            for key in ('mean', 'components', 'mask', 'depth'):
+                arrays[f"{q}__{key}"] = table[key]
+        np.savez(filepath, x_train=self.x_train, scores=self.scores, x_log=self.x_log, x_min=self.x_min,
+                 x_scale=self.x_scale, wavelength=self.wavelength, depth=self.depth, info=json.dumps(info), **arrays)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as f:
+            info = json.loads(str(f['info']))
+            quantities = {q: {'mean': f[f"{q}__mean"], 'components': f[f"{q}__components"],
+                              'mask': f[f"{q}__mask"], 'depth': f[f"{q}__depth"], 'log': table['log'], 'shape': tuple(table['shape']),
+                              'columns': tuple(table['columns'])}
+                          for q, table in info['quantities'].items()}
+            return cls(info['parameters'], f['x_train'], f['scores'], quantities, f['x_log'], f['x_min'],
+                       f['x_scale'], f['wavelength'], f['depth'], info['kernel'], info['smoothing'])
+
+    def __repr__(self):
+        components = ", ".join(f"{q} {t['components'].shape[0]}" for q, t in self.quantities.items())
+        return (f"Emulator({len(self.x_train)} runs, parameters {self.parameters}, "
+                f"components {components}, kernel {self.kernel})")
+
+
+class _RunSubset:
+    """ensemble (cube()와 params가 있는 HydroLightEnsemble, EnsembleStore)의 run 일부
+
+    양마다 전체 cube를 한 번 읽어 두고 (cubes) 인덱스로 잘라 쓴다. 그리드는 원래 ensemble 것을 그대로 쓴다.
+    """
+
+    def __init__(self, ensemble, params, cubes, index):
+        self.ensemble = ensemble
+        self.wavelength, self.depth, self.k_depth = ensemble.wavelength, ensemble.depth, ensemble.k_depth
+        self.params = params.iloc[index]
+        self.cubes = cubes
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def cube(self, quantity):
+        if quantity not in self.cubes:
+            self.cubes[quantity] = self.ensemble.cube(quantity)
+        return self.cubes[quantity][self.index]
+
+
+def cross_validate(ensemble, folds=5, seed=0, **fit_kwargs):
+    """k-fold 교차 검증 -> (요약 행 목록, 예측 오차 dict)
+
+    run을 섞어 folds개로 나누고, 각 fold를 나머지로 학습한 emulator로 예측한다. fold는 cube()와 params의
+    run 인덱스로 나누므로 ensemble은 HydroLightEnsemble이든 EnsembleStore든 된다.
+    요약 행 (양별): quantity, n_runs, folds, rms (상대 오차 RMS), median_abs, p95_abs, max_abs
+    예측 오차 dict: {양: (n_run, ...) 상대 오차 (예측 - HydroLight) / HydroLight}
+    """
+    n = len(ensemble)
+    folds = min(folds, n)
+    if folds < 2:
+        raise ValueError("Cross-validation needs at least 2 runs")
+    order = np.random.default_rng(seed).permutation(n)
+    quantities = fit_kwargs.pop('quantities', None) or DEFAULT_QUANTITIES
+    truth = {q: ensemble.cube(q) for q in quantities}
+    params = ensemble.params
+    errors = {q: np.full(truth[q].shape, np.nan) for q in quantities}
+    for test in np.array_split(order, folds):
+        train = np.setdiff1d(order, test)
+        emulator = Emulator.fit(_RunSubset(ensemble, params, truth, train), quantities=quantities, **fit_kwargs)
+        predicted = emulator.predict(params[emulator.parameters].to_numpy(dtype=float)[test])
+        for q in quantities:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                grid = ensemble.k_depth if q in KFUNCTION_QUANTITIES else ensemble.depth
+                errors[q][test] = _align(predicted[q], emulator.quantities[q]['depth'], grid) / truth[q][test] - 1
+    rows = []
+    for q in quantities:
+        err = np.abs(errors[q][np.isfinite(errors[q])])
+        rows.append({'quantity': q, 'n_runs': n, 'folds': folds,
+                     'rms': np.sqrt(np.mean(err ** 2)) if len(err) else np.nan,
+                     'median_abs': np.median(err) if len(err) else np.nan,
+                     'p95_abs': np.percentile(err, 95) if len(err) else np.nan,
+                     'max_abs': err.max() if len(err) else np.nan})
+    return rows, errors
+
+
+def _align(values, depth, target_depth):
+    """(n, n_wavelength, len(depth)) 배열을 target_depth 그리드로 (없는 깊이는 NaN)"""
+    if values.ndim < 3 or (len(depth) == len(target_depth) and np.allclose(depth, target_depth)):
+        return values
+    out = np.full(values.shape[:2] + (len(target_depth),) + values.shape[3:], np.nan)
+    index = np.searchsorted(target_depth, depth)
+    out[:, :, index] = values
+    return out
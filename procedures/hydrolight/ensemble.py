@@ -0,0 +1,255 @@
+"""
+ensemble.py
+HydroLight run 결과를 numpy 배열로 정리하고, 여러 run을 하나의 ensemble로 묶는 유틸리티
+
+pandas는 params 테이블을 만들 때만 import한다.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+
+from .parse import (read_lines, parse_lines, parse_run_metadata, IRRADIANCE_COLUMNS, RADIANCE_COLUMNS,
+                    IOP_COLUMNS, KFUNCTION_COLUMNS, PARSE_VERSION)
+from .derived import DERIVED_QUANTITIES, dependents
+from .validate import validate_run
+from .interpolate import GridInterpolator
+from .trace import stage, count
+
+
+# 파싱 결과에서 (wavelength, depth) 배열로 저장되는 양들
+IRRADIANCE_QUANTITIES = IRRADIANCE_COLUMNS[3:]
+RADIANCE_QUANTITIES = RADIANCE_COLUMNS[3:]
+IOP_QUANTITIES = IOP_COLUMNS[3:]
+KFUNCTION_QUANTITIES = KFUNCTION_COLUMNS[3:]
+SURFACE_QUANTITIES = ["Lw", "Rrs", "Lu_air"]
+
+# ensemble 파라미터 테이블에 들어가는 수치형 메타데이터
+PARAMETER_NAMES = ["chl", "acdom440", "minerals", "bottom_depth", "bottom_R",
+                   "sun_zenith", "wind_speed", "cloud", "wall_clock_s"]
+
+
+class HydroLightRun:
+    """HydroLight run 하나의 파싱 결과 (파장 x 깊이 numpy 배열 + 메타데이터)
+
+    run[name]은 파싱된 배열 또는 derived 모듈에 선언된 파생량을 반환한다.
+    파생량은 처음 요청될 때 계산되어 메모되며, set()으로 배열을 바꾸면 그 배열에
+    의존하는 파생량만 무효화된다.
+    """
+
+    def __init__(self, name, wavelength, depth, arrays, metadata=None, k_depth=None, path=None):
+        self.name = name
+        self.path = path
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        self.k_depth = np.asarray(k_depth if k_depth is not None else [], dtype=float)
+        self.arrays = dict(arrays)
+        self.metadata = dict(metadata or {})
+        self._derived = {}
+        self._interpolators = {}
+
+    @classmethod
+    def from_file(cls, filepath):
+        """HydroLight 출력 파일을 읽어 run 객체 생성"""
+        filepath = Path(filepath)
+        return cls.from_lines(read_lines(filepath), name=filepath.stem, path=filepath)
+
+    @classmethod
+    def from_lines(cls, raw_lines, name="run", path=None):
+        """읽어들인 라인으로부터 run 객체 생성"""
+        data = parse_lines(raw_lines)
+        if not len(data['wavelength']):
+            raise ValueError(f"No HydroLight band output found in {name}")
+        with stage("parse.metadata"):
+            metadata = parse_run_metadata(raw_lines)
+        run = cls(name, data['wavelength'], data['depth'], data['arrays'], metadata,
+                  k_depth=data['k_depth'], path=path)
+        # 일관성 검사 결과를 run에 저장 (arrays['quality'], metadata['quality_flags'])
+        with stage("validate"):
+            validate_run(run, data['tables'])
+        count("runs_parsed")
+        return run
+
+    def save(self, filepath, **extra):
+        """파싱된 배열과 메타데이터를 npz 파일로 저장 (파생량은 저장하지 않음)"""
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"q_{k}": v for k, v in self.arrays.items()}
+        metadata = json.dumps(self.metadata, default=lambda o: o.item())
+        np.savez(filepath, name=self.name, path=str(self.path or ""), wavelength=self.wavelength,
+                 depth=self.depth, k_depth=self.k_depth, metadata=metadata, **extra, **arrays)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath):
+        """save()로 저장한 run 읽기"""
+        with np.load(filepath) as f:
+            arrays = {k[2:]: f[k] for k in f.files if k.startswith("q_")}
+            path = str(f['path'])
+            return cls(str(f['name']), f['wavelength'], f['depth'], arrays,
+                       json.loads(str(f['metadata'])), k_depth=f['k_depth'],
+                       path=Path(path) if path else None)
+
+    @property
+    def quantities(self):
+        return sorted(self.arrays)
+
+    @property
+    def derived_quantities(self):
+        return sorted(DERIVED_QUANTITIES)
+
+    def __getitem__(self, quantity):
+        if quantity in self.arrays:
+            return self.arrays[quantity]
+        if quantity in self._derived:
+            return self._derived[quantity]
+        if quantity not in DERIVED_QUANTITIES:
+            raise KeyError(f"Unknown quantity {quantity!r} for run {self.name}")
+        deps, func = DERIVED_QUANTITIES[quantity]
+        inputs = [self[d] for d in deps]
+        with stage(f"derive.{quantity}"):
+            values = np.asarray(func(self, *inputs))
+        # 메모된 배열을 실수로 제자리 수정하지 않도록 읽기 전용으로 둔다
+        values.flags.writeable = False
+        self._derived[quantity] = values
+        return values
+
+    def __contains__(self, quantity):
+        return quantity in self.arrays or quantity in DERIVED_QUANTITIES
+
+    def set(self, quantity, values):
+        """배열 교체 후 이 배열에 의존하는 파생량 무효화"""
+        self.arrays[quantity] = np.asarray(values)
+        self.invalidate(quantity)
+
+    def invalidate(self, quantity=None):
+        """quantity에 의존하는 메모(파생량, 보간기) 삭제 (None이면 전체 삭제)"""
+        if quantity is None:
+            self._derived.clear()
+            self._interpolators.clear()
+            return
+        names = dependents(quantity) | {quantity}
+        for name in names:
+            self._derived.pop(name, None)
+        for key in [k for k in self._interpolators if k[0] in names]:
+            del self._interpolators[key]
+
+    def interpolator(self, quantity, method="pchip"):
+        """quantity의 (깊이, 파장) 보간기 (계수는 한 번만 계산하여 메모)
+
+        사용 예: run.interpolator('Ed')([2.37, 3.8], 550.0) -> 두 깊이의 550 nm Ed
+        그리드 밖 처리 등은 interpolate 모듈 설명 참고.
+        """
+        key = (quantity, method)
+        if key not in self._interpolators:
+            self._interpolators[key] = GridInterpolator.from_run(self, quantity, method)
+        return self._interpolators[key]
+
+    def __repr__(self):
+        return (f"HydroLightRun({self.name!r}, {len(self.wavelength)} wavelengths, "
+                f"{len(self.depth)} depths)")
+
+
+class HydroLightEnsemble:
+    """같은 파장 그리드를 공유하는 여러 HydroLight run의 묶음"""
+
+    def __init__(self, runs):
+        runs = list(runs)
+        if not runs:
+            raise ValueError("Ensemble needs at least one run")
+        wavelength = runs[0].wavelength
+        for run in runs[1:]:
+            if run.wavelength.shape != wavelength.shape or not np.allclose(run.wavelength, wavelength):
+                raise ValueError(f"Wavelength grid of {run.name} does not match {runs[0].name}")
+        self.runs = runs
+        self.wavelength = wavelength
+        # 깊이는 run마다 (바닥 행 누락 등으로) 다를 수 있으므로 합집합 그리드 사용
+        self.depth = np.unique(np.concatenate([run.depth for run in runs]))
+        self.k_depth = np.unique(np.concatenate([run.k_depth for run in runs]))
+
+    @classmethod
+    def from_files(cls, filepaths):
+        """HydroLight 출력 파일 목록으로 ensemble 생성"""
+        return cls(HydroLightRun.from_file(p) for p in filepaths)
+
+    @property
+    def names(self):
+        return [run.name for run in self.runs]
+
+    @property
+    def params(self):
+        """run별 수치형 메타데이터 테이블 (index: run 이름)
+
+        sweep manifest를 붙인 run (metadata['sweep'])은 그 파라미터가 같은 이름의 값을 대신하거나 열로 추가된다.
+        """
+        import pandas as pd
+        sweep = list(dict.fromkeys(k for run in self.runs for k in run.metadata.get('sweep', {})))
+        columns = PARAMETER_NAMES + [k for k in sweep if k not in PARAMETER_NAMES]
+        rows = [[run.metadata.get('sweep', {}).get(p, run.metadata.get(p, np.nan)) for p in columns]
+                for run in self.runs]
+        return pd.DataFrame(rows, columns=columns, index=self.names, dtype=float)
+
+    def cube(self, quantity):
+        """(n_run, n_wavelength[, n_depth]) 배열, 없는 깊이는 NaN"""
+        if self.runs[0][quantity].ndim == 1:
+            return np.stack([run[quantity] for run in self.runs])
+        on_k_grid = quantity in KFUNCTION_QUANTITIES
+        grid = self.k_depth if on_k_grid else self.depth
+        # 성분별 계수처럼 깊이 뒤에 축이 더 있는 양은 첫 run의 shape을 따름
+        tail = self.runs[0][quantity].shape[2:]
+        out = np.full((len(self.runs), len(self.wavelength), len(grid)) + tail, np.nan)
+        for i, run in enumerate(self.runs):
+            iz = np.searchsorted(grid, run.k_depth if on_k_grid else run.depth)
+            out[i][:, iz] = run[quantity]
+        return out
+
+    def interpolator(self, quantity, method="pchip", **kwargs):
+        """모든 run의 quantity 보간기: interp(z, wavelength[, runs]) -> (n_run, ...) 또는 질의점별 값"""
+        return GridInterpolator.from_ensemble(self, quantity, method, **kwargs)
+
+    def __len__(self):
+        return len(self.runs)
+
+
+def _cache_key(filepath):
+    """(경로, 크기, mtime, 파서 버전)으로 만든 캐시 key. 파일이나 파서가 바뀌면 key도 바뀐다"""
+    stat = filepath.stat()
+    text = f"{filepath}|{stat.st_size}|{stat.st_mtime_ns}|{PARSE_VERSION}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def load_run(filepath, cache_dir=None):
+    """HydroLight 출력 파일 읽기. cache_dir가 주어지면 파싱 결과를 npz로 캐시
+
+    캐시 파일 이름에 원본 파일의 크기와 mtime이 들어가므로, 원본이 바뀌면 자동으로
+    다시 파싱한다. 오래된 캐시 파일은 같은 run 이름으로 새로 저장할 때 지운다.
+    """
+    filepath = Path(filepath).resolve()
+    if cache_dir is None:
+        return HydroLightRun.from_file(filepath)
+    cache_dir = Path(cache_dir)
+    cache_file = cache_dir / f"{filepath.stem}-{_cache_key(filepath)}.npz"
+    if cache_file.exists():
+        try:
+            with stage("cache.load"):
+                run = HydroLightRun.load(cache_file)
+            count("cache_hits")
+            return run
+        except (OSError, ValueError, KeyError):
+            pass
+    count("cache_misses")
+    run = HydroLightRun.from_file(filepath)
+    for old in cache_dir.glob(f"{filepath.stem}-*.npz"):
+        with np.load(old) as f:
+            stale = str(f['path']) == str(filepath) if 'path' in f.files else False
+        if stale:
+            old.unlink()
+    # 다른 프로세스가 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓴 뒤 이름 변경
+    tmp = cache_dir / f".{cache_file.stem}.{os.getpid()}.tmp.npz"
+    with stage("cache.save"):
+        run.save(tmp)
+        count("bytes_written", tmp.stat().st_size)
+        tmp.replace(cache_file)
+    return run
@@ -0,0 +1,57 @@
+"""
+export.py
+parse_lines() 결과를 pandas DataFrame으로 변환 (pandas는 이 모듈에서만 import)
+"""
+
+import numpy as np
+import pandas as pd
+
+from .parse import COLUMNS, IN_AIR_RADIANCE_COLUMNS, parse_file
+from .ensemble import KFUNCTION_QUANTITIES
+
+
+# 테이블 이름 -> DataFrame dict의 key (이전 parse_hydrolight_lines()와 같은 이름)
+FRAME_NAMES = {"iops": "iops", "irradiances": "irradiances", "radiances": "radiances",
+               "kfunctions": "kfunctions", "in_air": "rrs"}
+
+
+def to_frames(parsed):
+    """parse_lines() 결과 -> {'iops', 'irradiances', 'radiances', 'kfunctions', 'rrs': DataFrame}
+
+    각 DataFrame은 원래 테이블의 컬럼과 'wavelength' 컬럼을 가진 long-format이다.
+    """
+    frames = {}
+    for name, key in FRAME_NAMES.items():
+        waves, table = parsed['tables'][name]
+        if not len(table):
+            frames[key] = pd.DataFrame()
+            continue
+        columns = IN_AIR_RADIANCE_COLUMNS if name == "in_air" else COLUMNS[name]
+        df = pd.DataFrame(table, columns=columns)
+        if "iz" in df.columns:
+            df["iz"] = df["iz"].astype(int)
+        df["wavelength"] = waves
+        frames[key] = df
+    return frames
+
+
+def read_frames(filepath):
+    """HydroLight 출력 파일 -> to_frames() 결과"""
+    return to_frames(parse_file(filepath))
+
+
+def run_to_frame(run, quantities=None, k_grid=False):
+    """HydroLightRun의 (파장, 깊이) 배열들을 long-format DataFrame 하나로 변환
+
+    컬럼: wavelength, depth, 각 양. k_grid=True면 K-function 깊이 그리드(run.k_depth)의
+    양을, 아니면 출력 깊이 그리드(run.depth)의 양을 내보낸다.
+    """
+    grid = run.k_depth if k_grid else run.depth
+    if quantities is None:
+        quantities = [q for q in run.quantities
+                      if (q in KFUNCTION_QUANTITIES) == k_grid and np.ndim(run[q]) == 2]
+    wl, z = np.meshgrid(run.wavelength, grid, indexing='ij')
+    data = {'wavelength': wl.ravel(), 'depth': z.ravel()}
+    for q in quantities:
+        data[q] = np.asarray(run[q]).ravel()
+    return pd.DataFrame(data)
@@ -0,0 +1,196 @@
+"""
+forward.py
+Lee et al. (1998, 1999) 반해석적 천해 Rrs forward 모델과 HydroLight ensemble에 대한 계수 보정
+
+HydroLight run 하나는 30초 정도 걸리므로 (PExe05 'Total (wall clock) run time') IOP/바닥 조합 수백만 개를
+고르는 데는 쓸 수 없다. 이 모델은 a, bb, 바닥 깊이, 바닥 반사도로부터 Rrs를 numpy broadcasting 한 번으로
+계산하여 HydroLight 앞의 빠른 screening 단계로 쓴다.
+
+    u = bb / (a + bb),  κ = a + bb,  θw = 수중 태양 천정각 (Snell, n = 1.34)
+    rrs_dp = (g0 + g1 u) u
+    DuC = c0 (1 + c1 u)^0.5,  DuB = b0 (1 + b1 u)^0.5
+    rrs = rrs_dp (1 - exp(-(1/cos θw + DuC) κ H)) + (ρ/π) exp(-(1/cos θw + DuB) κ H)
+    Rrs = t rrs / (1 - γ rrs)
+
+    inputs = run_inputs(runs, library)                     # run별 수층 평균 IOP, 바닥, 태양각, HydroLight Rrs
+    Rrs = forward(inputs['a'], inputs['bb'], inputs['bottom_depth'], inputs['bottom'], inputs['sun_zenith'])
+    coefficients, report = calibrate(runs, library)        # 계수 보정과 잔차 (report['problems']: 퇴화한 보정)
+    Rrs = forward(a, bb[:, None], depths[:, None, None], library_spectra, 30.0, coefficients)   # 조합 screening
+
+바닥이 무한 깊이(infinitely deep)인 run은 H = inf (rrs = rrs_dp), 불투명 바닥은 메타데이터의
+바닥 파일 (라이브러리 이름) 또는 상수 R을 쓴다.
+"""
+
+import warnings
+import numpy as np
+from pathlib import Path
+
+from .library import resample_matrix
+
+
+# Lee et al. (1999) 계수
+DEFAULT_COEFFICIENTS = {"g0": 0.084, "g1": 0.17, "c0": 1.03, "c1": 2.4, "b0": 1.04, "b1": 5.4,
+                        "t": 0.52, "gamma": 1.7}
+# calibrate 기본 보정 대상 (t, gamma는 수면 투과 상수라 고정). c1, b1 (u 의존성)은 run이 적으면 c0, b0와
+# 구분되지 않아 경계(0)로 가거나 발산하므로 기본은 Lee 값으로 고정
+FIT_COEFFICIENTS = ("g0", "g1", "c0", "b0")
+# 열 정규화 Jacobian의 (최소 / 최대 특이값)이 이보다 작으면 계수들이 독립적으로 정해지지 않은 것으로 봄
+MIN_SINGULAR_RATIO = 1e-3
+WATER_INDEX = 1.34
+
+
+def subsurface_zenith(sun_zenith):
+    """공기 중 태양 천정각 (도) -> 수중 굴절각 (도)"""
+    return np.degrees(np.arcsin(np.sin(np.radians(sun_zenith)) / WATER_INDEX))
+
+
+def forward(a, bb, bottom_depth, bottom, sun_zenith=30.0, coefficients=None):
+    """수면 위 Rrs (sr^-1). 모든 입력은 서로 broadcast 가능한 배열 (bottom_depth = inf이면 광학적으로 깊은 물)
+
+    a, bb: 흡수/후방산란 계수 (1/m), bottom: 바닥 반사도 ρ (irradiance 반사도), sun_zenith: 도
+    coefficients: DEFAULT_COEFFICIENTS 중 바꿀 값
+    """
+    c = dict(DEFAULT_COEFFICIENTS, **(coefficients or {}))
+    a, bb = np.asarray(a, dtype=float), np.asarray(bb, dtype=float)
+    kappa = a + bb
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = bb / kappa
+    rrs_dp = (c["g0"] + c["g1"] * u) * u
+    mu_w = np.cos(np.radians(subsurface_zenith(np.asarray(sun_zenith, dtype=float))))
+    du_c = c["c0"] * np.sqrt(1 + c["c1"] * u)
+    du_b = c["b0"] * np.sqrt(1 + c["b1"] * u)
+    kh = kappa * np.asarray(bottom_depth, dtype=float)
+    # H = inf이면 exp(-inf) = 0
+    column = 1 - np.exp(-(1 / mu_w + du_c) * kh)
+    floor = np.exp(-(1 / mu_w + du_b) * kh)
+    rrs = rrs_dp * column + np.asarray(bottom, dtype=float) / np.pi * floor
+    return c["t"] * rrs / (1 - c["gamma"] * rrs)
+
+
+def bottom_spectrum(run, library):
+    """run 메타데이터의 바닥 반사도를 run 파장으로 -> (n_wavelength,) (무한 깊이 바닥은 0)
+
+    바닥 파일은 라이브러리 항목 이름 (파일 stem)으로 찾고, 없으면 상수 R (bottom_R)을 쓴다.
+    """
+    meta = run.metadata
+    if meta.get('bottom_type') == "infinite":
+        return np.zeros(len(run.wavelength))
+    name = Path(meta.get('bottom_file') or "").stem
+    if name:
+        if library is None or name not in library.names:
+            raise KeyError(f"{run.name}: bottom reflectance {name!r} is not in the library")
+        spectrum = library.spectra[library.names.index(name)]
+        return spectrum @ resample_matrix(library.wavelength, run.wavelength)
+    value = meta.get('bottom_R', np.nan)
+    if np.isnan(value):
+        raise ValueError(f"{run.name}: no bottom reflectance file or constant R in the metadata")
+    return np.full(len(run.wavelength), float(value))
+
+
+def column_mean(run, quantity):
+    """수층(바닥 깊이까지) 평균 IOP (n_wavelength,)"""
+    values = run[quantity]
+    bottom = run.metadata.get('bottom_depth', np.nan)
+    keep = run.depth <= bottom if np.isfinite(bottom) else np.ones(len(run.depth), dtype=bool)
+    return np.nanmean(values[:, keep], axis=1)
+
+
+def run_inputs(runs, library=None):
+    """run 목록 -> forward 입력과 HydroLight Rrs를 모든 (run, 파장)에 대해 1차원으로 이은 dict
+
+    키: a, bb, bottom_depth, bottom, sun_zenith, Rrs, wavelength, run (run 이름 index), names
+    파장 그리드가 run마다 달라도 된다.
+    """
+    columns = {k: [] for k in ("a", "bb", "bottom_depth", "bottom", "sun_zenith", "Rrs", "wavelength", "run")}
+    for i, run in enumerate(runs):
+        n = len(run.wavelength)
+        infinite = run.metadata.get('bottom_type') == "infinite"
+        columns["a"].append(column_mean(run, "total_a"))
+        columns["bb"].append(column_mean(run, "total_bb"))
+        columns["bottom_depth"].append(np.full(n, np.inf if infinite else run.metadata['bottom_depth']))
+        columns["bottom"].append(bottom_spectrum(run, library))
+        columns["sun_zenith"].append(np.full(n, run.metadata.get('sun_zenith', np.nan)))
+        columns["Rrs"].append(run["Rrs"])
+        columns["wavelength"].append(run.wavelength)
+        columns["run"].append(np.full(n, i))
+    inputs = {k: np.concatenate(v) for k, v in columns.items()}
+    inputs["names"] = [run.name for run in runs]
+    return inputs
+
+
+def _model(inputs, coefficients):
+    return forward(inputs["a"], inputs["bb"], inputs["bottom_depth"], inputs["bottom"],
+                   inputs["sun_zenith"], coefficients)
+
+
+def residual_report(inputs, coefficients=None):
+    """forward 모델 대 HydroLight Rrs 잔차 -> 행 목록 (run별 + 전체)
+
+    relative = (모델 - HydroLight) / HydroLight. 각 행: name, n, bias (상대 오차 평균),
+    rms (상대 오차 RMS), max_abs (최대 |상대 오차|), rmse (절대 RMSE, sr^-1)
+    """
+    model = _model(inputs, coefficients)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = (model - inputs["Rrs"]) / inputs["Rrs"]
+    valid = np.isfinite(relative)
+    rows = []
+    groups = [(name, inputs["run"] == i) for i, name in enumerate(inputs["names"])] + [("all", np.ones_like(valid))]
+    for name, mask in groups:
+        m = mask & valid
+        rel = relative[m]
+        rows.append({'name': name, 'n': int(m.sum()),
+                     'bias': rel.mean() if len(rel) else np.nan,
+                     'rms': np.sqrt(np.mean(rel ** 2)) if len(rel) else np.nan,
+                     'max_abs': np.abs(rel).max() if len(rel) else np.nan,
+                     'rmse': np.sqrt(np.mean((model[m] - inputs["Rrs"][m]) ** 2)) if len(rel) else np.nan})
+    return rows
+
+
+def fit_problems(fit, result):
+    """least_squares 결과에서 퇴화한 보정 찾기 -> 문제 설명 목록 (경계에 걸린 계수, rank가 부족한 Jacobian)"""
+    problems = []
+    at_bound = [k for k, active in zip(fit, result.active_mask) if active]
+    if at_bound:
+        problems.append(f"coefficient(s) {', '.join(at_bound)} at the lower bound 0")
+    # 계수 크기 차이를 없애려고 열마다 정규화 (0인 열은 그대로 두어 특이값 0이 됨)
+    norms = np.linalg.norm(result.jac, axis=0)
+    singular = np.linalg.svd(result.jac / np.where(norms > 0, norms, 1.0), compute_uv=False)
+    ratio = singular.min() / singular.max() if singular.max() > 0 else 0.0
+    if ratio < MIN_SINGULAR_RATIO:
+        problems.append(f"rank-deficient Jacobian (singular value ratio {ratio:.2g}): "
+                        f"the runs do not constrain {', '.join(fit)} independently")
+    return problems
+
+
+def calibrate(runs, library=None, fit=FIT_COEFFICIENTS, initial=None):
+    """HydroLight run에 맞도록 forward 계수를 최소제곱 보정 (상대 잔차, 계수 >= 0, scipy least_squares)
+
+    반환: (계수 dict, {'before': 잔차 행 목록, 'after': 잔차 행 목록, 'inputs': run_inputs 결과,
+    'problems': fit_problems 결과})
+    유효한 Rrs가 있는 run 수가 보정할 계수 수 이하이면 ValueError. 보정이 퇴화하면 (problems가 있으면)
+    RuntimeWarning을 낸다.
+    """
+    from scipy.optimize import least_squares
+    inputs = run_inputs(runs, library)
+    start = dict(DEFAULT_COEFFICIENTS, **(initial or {}))
+    fit = list(fit)
+    unknown = [k for k in fit if k not in DEFAULT_COEFFICIENTS]
+    if unknown:
+        raise KeyError(f"Unknown coefficient(s) {unknown}, available: {list(DEFAULT_COEFFICIENTS)}")
+    valid = np.isfinite(inputs["Rrs"]) & (inputs["Rrs"] > 0) & np.isfinite(inputs["a"]) & np.isfinite(inputs["bb"])
+    n_runs = len(np.unique(inputs["run"][valid]))
+    if n_runs <= len(fit):
+        raise ValueError(f"{n_runs} run(s) with valid Rrs cannot constrain {len(fit)} coefficient(s), "
+                         f"need more runs than coefficients (use fit= to fit fewer)")
+    subset = {k: (v[valid] if isinstance(v, np.ndarray) else v) for k, v in inputs.items()}
+
+    def residuals(x):
+        return _model(subset, dict(start, **dict(zip(fit, x)))) / subset["Rrs"] - 1
+
+    result = least_squares(residuals, [start[k] for k in fit], bounds=(0.0, np.inf))
+    coefficients = dict(start, **dict(zip(fit, result.x)))
+    problems = fit_problems(fit, result)
+    for problem in problems:
+        warnings.warn(f"Degenerate forward calibration: {problem}", RuntimeWarning, stacklevel=2)
+    return coefficients, {'before': residual_report(inputs, start), 'after': residual_report(inputs, coefficients),
+                          'inputs': inputs, 'problems': problems}
@@ -0,0 +1,549 @@
+"""
+image.py
+항공/위성 초분광 image cube (.npy, ENVI raw + .hdr)에 밴드비, LUT 검색, 분광 분리, 천해 역산 제품을 tile 단위로 적용
+
+cube는 memmap으로 열고 (행 x 열) tile로 나눈다. 작업 프로세스에는 시작할 때 cube/제품/출력 raster 설명을 한 번만
+보내고 (initializer), 이후에는 tile 좌표만 보낸다. 작업 프로세스는 자기 memmap에서 tile을 읽어 (픽셀, 밴드)
+스펙트럼 행렬로 바꾸고, 유효한 픽셀에만 제품을 계산해 출력 raster memmap의 같은 자리에 바로 쓴다.
+주 프로세스는 픽셀 값을 읽지 않으므로 메모리 사용량은 대략 jobs x tile² x 밴드 수 x 8 B로 제한된다.
+
+    cube = ImageCube.open("scene.hdr")                               # 또는 "scene.npy", wavelength=...
+    product = BandRatioProduct(["OC4", "CI"])                        # LUTProduct, UnmixProduct, InversionProduct
+    stats = apply(cube, product, "results/image/scene_ratio.img", tile=256, jobs=4)
+    stats['pixels_per_second']
+
+cube 형식:
+- .npy: 3차원 배열, interleave 'bip' (행, 열, 밴드, 기본), 'bil' (행, 밴드, 열), 'bsq' (밴드, 행, 열).
+  파장은 wavelength 인자나 같은 이름의 .hdr (wavelength, reflectance scale factor만 읽음)
+- ENVI: .hdr의 samples, lines, bands, interleave, data type, byte order, header offset, wavelength
+  (+ wavelength units), reflectance scale factor, data ignore value
+출력 raster는 입력이 .npy이면 (행, 열, 제품 밴드) float32 .npy, ENVI이면 BIP float32 .img + .hdr
+(band names, map info 등 좌표 정보 복사). 값을 쓸 수 없는 픽셀 (NaN, data ignore value, 모든 밴드 0)은 NaN.
+"""
+
+import os
+import time
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .library import resample_matrix
+
+
+PRODUCTS = ("ratio", "lut", "unmix", "invert")
+INTERLEAVES = ("bip", "bil", "bsq")
+# ENVI data type 코드 -> numpy dtype (복소수 6, 9는 지원 안 함)
+ENVI_DTYPES = {1: "u1", 2: "i2", 3: "i4", 4: "f4", 5: "f8", 12: "u2", 13: "u4", 14: "i8", 15: "u8"}
+# ENVI 데이터 파일로 찾아볼 확장자 (.hdr 옆)
+ENVI_EXTENSIONS = ("", ".img", ".dat", ".raw", ".bsq", ".bil", ".bip")
+# 출력 .hdr로 복사할 좌표 정보
+MAP_KEYS = ("map info", "coordinate system string", "projection info", "pixel size")
+# 분광 분리에서 모든 부분집합을 풀어 정확한 NNLS 해를 구하는 끝성분 수 상한 (2^k - 1개 부분집합)
+EXACT_ENDMEMBERS = 10
+
+
+# ----------------------------------------------------------------------
+# ENVI header
+# ----------------------------------------------------------------------
+def read_envi_header(filepath):
+    """ENVI .hdr -> {소문자 key: 문자열 또는 문자열 list ({...} 값)}"""
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.read().splitlines()
+    if not lines or lines[0].strip() != "ENVI":
+        raise ValueError(f"{filepath} is not an ENVI header (first line must be 'ENVI')")
+    header = {}
+    i = 1
+    while i < len(lines):
+        key, sep, value = lines[i].partition("=")
+        i += 1
+        if not sep:
+            continue
+        value = value.strip()
+        if value.startswith("{"):
+            # 중괄호 값은 여러 줄에 걸칠 수 있음
+            while "}" not in value and i < len(lines):
+                value += " " + lines[i].strip()
+                i += 1
+            value = value[1:value.rindex("}")] if "}" in value else value[1:]
+            if key.strip().lower() not in ("description", "coordinate system string"):
+                value = [v.strip() for v in value.split(",")]
+        header[key.strip().lower()] = value
+    return header
+
+
+def write_envi_header(filepath, header):
+    """{key: 값} -> ENVI .hdr (list 값은 {a, b, ...})"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write("ENVI\n")
+        for key, value in header.items():
+            if isinstance(value, (list, tuple)):
+                value = "{" + ", ".join(str(v) for v in value) + "}"
+            elif key in ("description", "coordinate system string") and not str(value).startswith("{"):
+                value = "{" + str(value) + "}"
+            f.write(f"{key} = {value}\n")
+    return filepath
+
+
+def envi_paths(filepath):
+    """.hdr 또는 데이터 파일 경로 -> (데이터 파일, .hdr), 없으면 FileNotFoundError"""
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == ".hdr":
+        header = filepath
+        for ext in ENVI_EXTENSIONS:
+            data = filepath.with_suffix(ext)
+            if data.is_file():
+                return data, header
+        raise FileNotFoundError(f"No data file next to {header}")
+    for header in (Path(str(filepath) + ".hdr"), filepath.with_suffix(".hdr")):
+        if header.is_file():
+            return filepath, header
+    raise FileNotFoundError(f"No ENVI header (.hdr) for {filepath}")
+
+
+def _wavelength_from_header(header):
+    values = header.get("wavelength")
+    if not values:
+        return None
+    wavelength = np.array([float(v) for v in values])
+    units = str(header.get("wavelength units", "")).lower()
+    if units.startswith("micro") or units == "um" or (not units and wavelength.max() < 10):
+        wavelength = wavelength * 1000.0
+    return wavelength
+
+
+def read_wavelength(values):
+    """명령행 --wavelength 값 (숫자 목록 또는 숫자가 적힌 텍스트 파일 하나) -> 파장 배열 (nm)"""
+    values = [str(v) for v in values]
+    if len(values) == 1 and os.path.isfile(values[0]):
+        with open(values[0]) as f:
+            values = f.read().replace(",", " ").split()
+    return np.array([float(v) for v in values])
+
+
+# ----------------------------------------------------------------------
+# image cube
+# ----------------------------------------------------------------------
+class ImageCube:
+    """memmap으로 여는 (행, 열, 밴드) image cube
+
+    memmap은 tile을 읽을 때마다 새로 열고 닫는다. 오래 열어 둔 memmap은 읽은 page가 모두 RSS에 남아
+    결국 파일 크기만큼 차지하기 때문이다. 객체 자체에는 경로와 형식만 있으므로 작업 프로세스로 보내기도 싸다.
+    """
+
+    def __init__(self, path, lines, samples, bands, dtype, interleave="bip", wavelength=None, offset=0,
+                 scale=1.0, ignore_value=None, header=None, kind="npy"):
+        if interleave not in INTERLEAVES:
+            raise ValueError(f"interleave must be one of {INTERLEAVES}, got {interleave!r}")
+        self.path = Path(path)
+        self.lines, self.samples, self.bands = int(lines), int(samples), int(bands)
+        self.dtype = np.dtype(dtype)
+        self.interleave = interleave
+        self.wavelength = (np.asarray(wavelength, dtype=float) if wavelength is not None
+                           else np.arange(self.bands, dtype=float))
+        if len(self.wavelength) != self.bands:
+            raise ValueError(f"{self.path.name}: {len(self.wavelength)} wavelengths for {self.bands} bands")
+        self.offset = int(offset)
+        self.scale = float(scale)
+        self.ignore_value = ignore_value
+        self.header = dict(header or {})
+        self.kind = kind
+
+    @classmethod
+    def open(cls, filepath, wavelength=None, interleave=None, scale=1.0):
+        """.npy 또는 ENVI (.hdr / 데이터 파일) 열기. wavelength, scale은 header 값보다 우선 (scale은 곱함)"""
+        filepath = Path(filepath)
+        if filepath.suffix.lower() == ".npy":
+            array = np.load(filepath, mmap_mode='r')
+            if array.ndim != 3:
+                raise ValueError(f"{filepath.name}: expected a 3-D cube, got shape {array.shape}")
+            interleave = interleave or "bip"
+            header = {}
+            for candidate in (filepath.with_suffix(".hdr"), Path(str(filepath) + ".hdr")):
+                if candidate.is_file():
+                    header = read_envi_header(candidate)
+                    break
+            lines, samples, bands = cls._logical_shape(array.shape, interleave)
+            cube = cls(filepath, lines, samples, bands, array.dtype, interleave,
+                       wavelength if wavelength is not None else _wavelength_from_header(header),
+                       scale=scale / float(header.get("reflectance scale factor", 1.0)),
+                       ignore_value=cls._ignore(header), header=header, kind="npy")
+            del array
+            return cube
+
+        data, header_file = envi_paths(filepath)
+        header = read_envi_header(header_file)
+        try:
+            lines, samples, bands = (int(header[k]) for k in ("lines", "samples", "bands"))
+            code = int(header.get("data type", 4))
+        except KeyError as e:
+            raise ValueError(f"{header_file.name} has no {e.args[0]!r}") from None
+        if code not in ENVI_DTYPES:
+            raise ValueError(f"{header_file.name}: unsupported ENVI data type {code}")
+        dtype = np.dtype(ENVI_DTYPES[code]).newbyteorder(">" if header.get("byte order", "0").strip() == "1" else "<")
+        return cls(data, lines, samples, bands, dtype, interleave or header.get("interleave", "bsq").lower(),
+                   wavelength if wavelength is not None else _wavelength_from_header(header),
+                   offset=int(header.get("header offset", 0)),
+                   scale=scale / float(header.get("reflectance scale factor", 1.0)),
+                   ignore_value=cls._ignore(header), header=header, kind="envi")
+
+    @staticmethod
+    def _ignore(header):
+        value = header.get("data ignore value")
+        return float(value) if value not in (None, "") else None
+
+    @staticmethod
+    def _logical_shape(shape, interleave):
+        if interleave == "bip":
+            return shape
+        if interleave == "bil":
+            return shape[0], shape[2], shape[1]
+        return shape[1], shape[2], shape[0]
+
+    @property
+    def shape(self):
+        return self.lines, self.samples, self.bands
+
+    @property
+    def n_pixels(self):
+        return self.lines * self.samples
+
+    def _storage_shape(self):
+        if self.interleave == "bip":
+            return self.lines, self.samples, self.bands
+        if self.interleave == "bil":
+            return self.lines, self.bands, self.samples
+        return self.bands, self.lines, self.samples
+
+    def array(self):
+        """저장 순서 그대로의 새 읽기 전용 memmap"""
+        if self.kind == "npy":
+            return np.load(self.path, mmap_mode='r')
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.offset, shape=self._storage_shape())
+
+    def tiles(self, tile=256):
+        """(행 시작, 행 끝, 열 시작, 열 끝) tile 창 목록 (행 우선)"""
+        return [(r, min(r + tile, self.lines), c, min(c + tile, self.samples))
+                for r in range(0, self.lines, tile) for c in range(0, self.samples, tile)]
+
+    def read(self, window):
+        """tile 창 -> (행, 열, 밴드) float32 (scale 적용, ignore value와 모든 밴드 0인 픽셀은 NaN)"""
+        r0, r1, c0, c1 = window
+        array = self.array()
+        if self.interleave == "bip":
+            block = array[r0:r1, c0:c1, :]
+        elif self.interleave == "bil":
+            block = array[r0:r1, :, c0:c1].transpose(0, 2, 1)
+        else:
+            block = array[:, r0:r1, c0:c1].transpose(1, 2, 0)
+        values = block.astype(np.float32)
+        invalid = ~np.any(values != 0, axis=2)
+        if self.ignore_value is not None:
+            invalid |= np.any(values == self.ignore_value, axis=2)
+        if self.scale != 1.0:
+            values *= self.scale
+        values[invalid] = np.nan
+        return values
+
+    def map_header(self):
+        """출력 .hdr로 복사할 좌표 정보"""
+        return {k: self.header[k] for k in MAP_KEYS if k in self.header}
+
+    def __repr__(self):
+        return (f"ImageCube({self.path.name}, {self.lines} x {self.samples} px, {self.bands} bands "
+                f"{self.wavelength.min():g}-{self.wavelength.max():g} nm, {self.kind} {self.interleave})")
+
+
+class OutputRaster:
+    """제품 raster (행, 열, 제품 밴드) float32: .npy 또는 ENVI BIP .img + .hdr
+
+    주 프로세스가 create()로 파일을 만들고, 작업 프로세스는 tile마다 r+ memmap을 열어 그 자리에 쓰고 닫는다.
+    """
+
+    def __init__(self, path, lines, samples, band_names, map_header=None):
+        self.path = Path(path)
+        self.lines, self.samples = int(lines), int(samples)
+        self.band_names = list(band_names)
+        self.map_header = dict(map_header or {})
+        self.kind = "npy" if self.path.suffix.lower() == ".npy" else "envi"
+
+    @property
+    def shape(self):
+        return self.lines, self.samples, len(self.band_names)
+
+    def create(self):
+        """빈 raster 파일 작성 (ENVI는 .hdr도)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.kind == "npy":
+            np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float32, shape=self.shape).flush()
+        else:
+            with open(self.path, 'wb') as f:
+                f.truncate(int(np.prod(self.shape)) * 4)
+            header = {"description": "hydrolight image product", "samples": self.samples, "lines": self.lines,
+                      "bands": len(self.band_names), "header offset": 0, "file type": "ENVI Standard",
+                      "data type": 4, "interleave": "bip", "byte order": 0, "band names": self.band_names}
+            header.update(self.map_header)
+            write_envi_header(self.path.with_suffix(".hdr"), header)
+        return self
+
+    def array(self):
+        """새 쓰기 가능 memmap"""
+        if self.kind == "npy":
+            return np.lib.format.open_memmap(self.path, mode='r+')
+        return np.memmap(self.path, dtype="<f4", mode='r+', shape=self.shape)
+
+    def write(self, window, values):
+        r0, r1, c0, c1 = window
+        array = self.array()
+        array[r0:r1, c0:c1, :] = values
+        array.flush()
+
+
+# ----------------------------------------------------------------------
+# 제품: prepare(wavelength)로 image 파장에 맞춘 뒤 (n, n_band) 스펙트럼 -> (n, len(bands)) 값
+# ----------------------------------------------------------------------
+class BandRatioProduct:
+    """algorithms.py의 OCx/CI/OCI, 분광 지수, 분광 미분 (image 파장 그대로)"""
+
+    name = "ratio"
+
+    def __init__(self, algorithms=None, coefficients=None):
+        self.algorithms = algorithms
+        self.coefficients = coefficients
+        self.bands = []
+
+    def prepare(self, wavelength):
+        from .algorithms import evaluate
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        # 제품 이름은 작은 입력 하나로 evaluate를 불러 정함
+        probe = evaluate(np.full((1, len(self.wavelength)), 1e-3), self.wavelength, self.algorithms, self.coefficients)
+        self.bands = list(probe)
+        return self
+
+    def __call__(self, spectra):
+        from .algorithms import evaluate
+        products = evaluate(spectra, self.wavelength, self.algorithms, self.coefficients)
+        return np.column_stack([products[b] for b in self.bands])
+
+
+class LUTProduct:
+    """lut.RrsLUT 최근접 run의 파라미터 (k > 1이면 거리 역수 가중 평균), 거리, 최근접 run 인덱스"""
+
+    name = "lut"
+
+    def __init__(self, lut, k=1):
+        if not len(lut):
+            raise ValueError("LUT is empty")
+        self.lut = lut
+        self.k = max(1, min(int(k), len(lut)))
+        self.bands = list(lut.param_names) + ["distance", "run_index"]
+
+    def prepare(self, wavelength):
+        self.matrix = resample_matrix(wavelength, self.lut.wavelength)
+        return self
+
+    def __call__(self, spectra):
+        distances, indices = self.lut.query(spectra @ self.matrix, k=self.k, workers=1)
+        params = self.lut.lookup(indices)
+        if self.k > 1:
+            weights = 1.0 / np.maximum(distances, 1e-12)
+            with np.errstate(invalid='ignore'):
+                values = (np.nan_to_num(params) * weights[:, :, None]).sum(1) / weights.sum(1)[:, None]
+            values[np.isnan(params).all(axis=1)] = np.nan
+        else:
+            values = params[:, 0]
+        return np.column_stack([values, distances[:, 0], indices[:, 0]])
+
+
+class UnmixProduct:
+    """끝성분 스펙트럼의 음이 아닌 선형 혼합 비율 (sum_to_one이면 합 1 제약 추가)과 잔차 RMSE
+
+    픽셀마다 NNLS를 따로 풀지 않는다. Gram 행렬이 모든 픽셀에 같으므로 끝성분이 EXACT_ENDMEMBERS개 이하이면
+    모든 부분집합의 제약 없는 해를 행렬곱으로 구하고, 음수가 없는 해 중 잔차가 가장 작은 것을 고른다 (정확한
+    NNLS 해). 끝성분이 더 많으면 모든 픽셀을 한 배열로 대각 scaling한 가속 투영 경사법 (FISTA)으로 함께 푼다
+(근사, 비슷한 끝성분이 많으면 iterations를 늘림).
+    끝성분 범위 안의 image 밴드만 쓴다.
+    """
+
+    name = "unmix"
+
+    def __init__(self, names, endmembers, wavelength, sum_to_one=False, iterations=2000, tol=1e-7):
+        self.names = list(names)
+        self.endmembers = np.atleast_2d(np.asarray(endmembers, dtype=float))
+        self.endmember_wavelength = np.asarray(wavelength, dtype=float)
+        if self.endmembers.shape != (len(self.names), len(self.endmember_wavelength)):
+            raise ValueError(f"endmembers shape {self.endmembers.shape} does not match "
+                             f"{len(self.names)} names x {len(self.endmember_wavelength)} wavelengths")
+        self.sum_to_one = sum_to_one
+        self.iterations = iterations
+        self.tol = tol
+        self.bands = [f"f_{n}" for n in self.names] + ["rmse"]
+
+    @classmethod
+    def from_library(cls, library, names=None, **kwargs):
+        """바닥 반사도 라이브러리 항목 (names, None이면 전체)을 끝성분으로"""
+        names = list(names) if names else list(library.names)
+        missing = [n for n in names if n not in library.names]
+        if missing:
+            raise KeyError(f"Library has no {missing}, available: {library.names}")
+        rows = [library.names.index(n) for n in names]
+        return cls(names, library.spectra[rows], library.wavelength, **kwargs)
+
+    def prepare(self, wavelength):
+        wavelength = np.asarray(wavelength, dtype=float)
+        self.keep = ((wavelength >= self.endmember_wavelength.min() - 1e-9)
+                     & (wavelength <= self.endmember_wavelength.max() + 1e-9))
+        if self.keep.sum() < len(self.names):
+            raise ValueError(f"Only {self.keep.sum()} image bands inside the endmember range "
+                             f"{self.endmember_wavelength.min():g}-{self.endmember_wavelength.max():g} nm "
+                             f"for {len(self.names)} endmembers")
+        E = self.endmembers @ resample_matrix(self.endmember_wavelength, wavelength[self.keep])
+        if self.sum_to_one:
+            # 합 1 제약은 큰 가중치의 1 열을 덧붙여 근사 (FCLS)
+            self._delta = 10.0 * np.abs(E).max()
+            E = np.column_stack([E, np.full(len(E), self._delta)])
+        self.E = E
+        self.gram = E @ E.T
+        k = len(self.names)
+        if k <= EXACT_ENDMEMBERS:
+            subsets = [np.flatnonzero([(m >> i) & 1 for i in range(k)]) for m in range(1, 2 ** k)]
+            self.subsets = [(S, np.linalg.pinv(self.gram[np.ix_(S, S)])) for S in subsets]
+        else:
+            self.subsets = None
+            # 끝성분 크기 차이로 나빠지는 조건수를 대각 scaling으로 줄임 (x >= 0 제약은 그대로)
+            self._diag = 1.0 / np.sqrt(np.maximum(np.diag(self.gram), 1e-30))
+            self._scaled = self.gram * np.outer(self._diag, self._diag)
+            self.step = 1.0 / np.linalg.eigvalsh(self._scaled).max()
+        return self
+
+    def _exact(self, b):
+        # 잔차 제곱합 = |y|² - b_S·x_S 이므로 음수 없는 해 중 b_S·x_S가 가장 큰 부분집합 (x = 0이면 0)
+        x = np.zeros_like(b)
+        best = np.zeros(len(b))
+        for S, inverse in self.subsets:
+            xs = b[:, S] @ inverse
+            gain = (b[:, S] * xs).sum(1)
+            better = (xs >= 0).all(axis=1) & (gain > best)
+            if better.any():
+                best[better] = gain[better]
+                x[better] = 0.0
+                x[np.ix_(better, S)] = xs[better]
+        return x
+
+    def _fista(self, b):
+        gram = self._scaled
+        b = b * self._diag
+        x = np.maximum(b @ np.linalg.pinv(gram), 0.0)
+        z = x.copy()
+        t = 1.0
+        for _ in range(self.iterations):
+            x_new = np.maximum(z - (z @ gram - b) * self.step, 0.0)
+            t_new = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t * t))
+            z = x_new + ((t - 1.0) / t_new) * (x_new - x)
+            change = np.abs(x_new - x).max() if len(x) else 0.0
+            x, t = x_new, t_new
+            if change < self.tol:
+                break
+        return x * self._diag
+
+    def __call__(self, spectra):
+        y = spectra[:, self.keep]
+        if self.sum_to_one:
+            y = np.column_stack([y, np.full(len(y), self._delta)])
+        b = y @ self.E.T
+        x = self._exact(b) if self.subsets is not None else self._fista(b)
+        n = self.keep.sum()
+        residual = x @ self.E[:, :n] - y[:, :n]
+        return np.column_stack([x, np.sqrt((residual ** 2).mean(1))])
+
+
+class InversionProduct:
+    """invert.ShallowWaterInversion의 P, G, X, H, q, 바닥 피복 비율, 적합 품질 (tile 안에서 chunk 단위)"""
+
+    name = "invert"
+
+    def __init__(self, inversion, candidates=8, max_iter=50, chunk_size=512):
+        from .invert import PARAMETERS
+        self.inversion = inversion
+        self.candidates = candidates
+        self.max_iter = max_iter
+        self.chunk_size = chunk_size
+        self.bands = (list(PARAMETERS) + [f"f_{n}" for n in inversion.bottom_names]
+                      + ["rmse", "rel_rmse", "sam", "bottom_contrast"])
+
+    def prepare(self, wavelength):
+        self.matrix = resample_matrix(wavelength, self.inversion.wavelength)
+        return self
+
+    def __call__(self, spectra):
+        # 작업 프로세스 안이므로 inversion 자체의 프로세스 풀은 쓰지 않음 (jobs=1)
+        result = self.inversion.invert(spectra @ self.matrix, jobs=1, chunk_size=self.chunk_size,
+                                       candidates=self.candidates, max_iter=self.max_iter)
+        return np.column_stack([result["values"], result["fractions"], result["rmse"], result["rel_rmse"],
+                                result["sam"], result["bottom_contrast"]])
+
+
+# ----------------------------------------------------------------------
+# tile pipeline
+# ----------------------------------------------------------------------
+# 작업 프로세스마다 initializer가 한 번 넣는 (cube, product, output)
+_WORKER = {}
+
+
+def _init_worker(cube, product, output):
+    _WORKER.update(cube=cube, product=product, output=output)
+
+
+def _tile_task(window):
+    return process_tile(_WORKER['cube'], _WORKER['product'], _WORKER['output'], window)
+
+
+def process_tile(cube, product, output, window):
+    """tile 하나를 읽어 제품을 계산하고 출력 raster에 씀 -> (window, 유효 픽셀 수, 소요 시간)"""
+    start = time.perf_counter()
+    block = cube.read(window)
+    rows, cols, _ = block.shape
+    spectra = block.reshape(rows * cols, -1)
+    valid = np.isfinite(spectra).all(axis=1)
+    out = np.full((len(spectra), len(product.bands)), np.nan, dtype=np.float32)
+    if valid.any():
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            out[valid] = product(spectra[valid].astype(float))
+    output.write(window, out.reshape(rows, cols, -1))
+    return window, int(valid.sum()), time.perf_counter() - start
+
+
+def apply(cube, product, output_path, tile=256, jobs=1, progress=None):
+    """cube 전체에 product를 tile 단위로 적용하고 output_path에 raster 작성 -> 통계 dict
+
+    progress(끝난 tile 수, 전체 tile 수, 처리한 픽셀 수, 경과 초)는 tile이 끝날 때마다 불린다.
+    통계: tiles, pixels, valid, seconds, pixels_per_second, tile_seconds (작업 프로세스 시간 합), bands, output
+    """
+    product.prepare(cube.wavelength)
+    output = OutputRaster(output_path, cube.lines, cube.samples, product.bands, cube.map_header()).create()
+    windows = cube.tiles(tile)
+    start = time.perf_counter()
+    pixels = valid = 0
+    busy = 0.0
+
+    def done(k, outcome):
+        nonlocal pixels, valid, busy
+        (r0, r1, c0, c1), n_valid, seconds = outcome
+        pixels += (r1 - r0) * (c1 - c0)
+        valid += n_valid
+        busy += seconds
+        if progress is not None:
+            progress(k, len(windows), pixels, time.perf_counter() - start)
+
+    if jobs > 1 and len(windows) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(windows)), initializer=_init_worker,
+                                 initargs=(cube, product, output)) as pool:
+            futures = [pool.submit(_tile_task, w) for w in windows]
+            for k, future in enumerate(as_completed(futures), 1):
+                done(k, future.result())
+    else:
+        for k, window in enumerate(windows, 1):
+            done(k, process_tile(cube, product, output, window))
+    elapsed = time.perf_counter() - start
+    return {"tiles": len(windows), "pixels": pixels, "valid": valid, "seconds": elapsed,
+            "pixels_per_second": pixels / elapsed if elapsed > 0 else float("inf"), "tile_seconds": busy,
+            "bands": list(product.bands), "output": str(output.path)}
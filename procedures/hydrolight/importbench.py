@@ -0,0 +1,113 @@
+"""
+importbench.py
+hydrolight 모듈의 import 시간 측정과 무거운 의존성(pandas, matplotlib, scipy) import 여부 검사
+
+새 인터프리터에서 모듈 하나씩 import하여 시간을 재고, 파싱 경로에서 금지된 패키지가
+import되었거나 시간이 예산을 넘으면 종료 코드 1을 반환한다.
+
+    python -m hydrolight.importbench
+    python -m hydrolight.importbench --repeat 10 --budget-ms 150
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+
+HEAVY_MODULES = ("pandas", "matplotlib", "scipy")
+
+# (모듈, 이 모듈을 import했을 때 함께 import되면 안 되는 패키지)
+CHECKS = [
+    ("hydrolight", HEAVY_MODULES + ("numpy",)),
+    ("hydrolight.parse", HEAVY_MODULES),
+    ("hydrolight.trace", HEAVY_MODULES),
+    ("hydrolight.ensemble", HEAVY_MODULES),
+    ("hydrolight.validate", HEAVY_MODULES),
+    ("hydrolight.interpolate", HEAVY_MODULES),
+    ("hydrolight.regress", HEAVY_MODULES),
+    ("hydrolight.library", HEAVY_MODULES),
+    ("hydrolight.sensitivity", HEAVY_MODULES),
+    ("hydrolight.server", HEAVY_MODULES),
+    ("hydrolight.density", HEAVY_MODULES),
+    ("hydrolight.color", HEAVY_MODULES),
+    ("hydrolight.algorithms", HEAVY_MODULES),
+    ("hydrolight.forward", HEAVY_MODULES),
+    ("hydrolight.emulator", HEAVY_MODULES),
+    ("hydrolight.sweep", HEAVY_MODULES),
+    ("hydrolight.scheduler", HEAVY_MODULES),
+    ("hydrolight.standin", HEAVY_MODULES),
+    ("hydrolight.shared", HEAVY_MODULES),
+    ("hydrolight.invert", HEAVY_MODULES),
+    ("hydrolight.image", HEAVY_MODULES),
+    ("hydrolight.cli", HEAVY_MODULES),
+    ("hydrolight.watch", HEAVY_MODULES),
+    ("hydrolight.store", HEAVY_MODULES),
+    ("hydrolight.stats", HEAVY_MODULES),
+    ("hydrolight.plots", HEAVY_MODULES),
+    ("hydrolight.compare", HEAVY_MODULES),
+]
+
+# 새 인터프리터에서 실행하는 측정 코드 (기준선: 인터프리터 시작 후 numpy 없이)
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m for m in sys.modules if "." not in m)}}))
+"""
+
+
+def measure(module, repeat=5, python=sys.executable):
+    """새 인터프리터에서 module import 시간(최솟값, 초)과 import된 최상위 패키지 목록"""
+    path = str(Path(__file__).resolve().parent.parent)
+    times = []
+    modules = []
+    for _ in range(repeat):
+        out = subprocess.run([python, "-c", _PROBE.format(module=module)], capture_output=True,
+                             text=True, check=True, cwd=path)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        modules = result['modules']
+    return min(times), modules
+
+
+def run_checks(checks=CHECKS, repeat=5, budget_ms=None):
+    """모든 검사 실행 -> (결과 행 list, 실패 메시지 list)"""
+    rows = []
+    failures = []
+    for module, forbidden in checks:
+        seconds, modules = measure(module, repeat)
+        loaded = [m for m in forbidden if m in modules]
+        rows.append((module, seconds * 1e3, loaded))
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)}")
+        if budget_ms is not None and seconds * 1e3 > budget_ms:
+            failures.append(f"{module} import took {seconds * 1e3:.0f} ms (budget {budget_ms:.0f} ms)")
+    return rows, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure hydrolight import times in fresh interpreters")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter starts per module (minimum is reported)")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if any module takes longer than this to import")
+    args = parser.parse_args(argv)
+
+    rows, failures = run_checks(repeat=args.repeat, budget_ms=args.budget_ms)
+    print(f"{'module':<22} {'import (ms)':>12}  heavy packages loaded")
+    for module, ms, loaded in rows:
+        print(f"{module:<22} {ms:>12.1f}  {', '.join(loaded) or '-'}")
+    for pkg in HEAVY_MODULES:
+        seconds, _ = measure(pkg, args.repeat)
+        print(f"{'(' + pkg + ')':<22} {seconds * 1e3:>12.1f}")
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+interpolate.py
+출력 그리드 밖의 (깊이, 파장)에서 Ed, Lu, Kd 등을 구하는 보간기
+
+계수(노드 기울기)는 보간기를 만들 때 한 번만 계산하고, 호출할 때는 (run, z, λ) 질의점
+수백만 개를 한 번의 vectorized 계산으로 평가한다.
+
+method:
+    'pchip'      파장/깊이 방향 각각 단조 3차 Hermite (Fritsch-Carlson 기울기), 두 방향을 곱한
+                 bicubic Hermite patch. 노드 사이에서 overshoot가 없다.
+    'loglinear'  log(값)을 파장/깊이 방향으로 선형 보간 (지수 감쇠하는 Ed, Lu에 적합).
+                 네 모서리 중 0 이하인 값이 있는 칸은 값 자체를 선형 보간한다.
+
+표층/바닥 행 처리:
+    - 깊이 0 행은 수면 바로 아래(0-) 값이다. 수면 위(in air) 값과는 보간하지 않으며,
+      z < 0인 질의는 fill_value(기본 NaN)를 반환한다.
+    - 마지막 깊이 행은 바닥 바로 위 값이다. 그보다 깊은 질의도 fill_value를 반환한다.
+      clip=True로 만들면 그리드 밖 질의를 가장 가까운 표층/바닥 행 값으로 고정한다.
+    - 바닥 행의 NaN(예: Eu = 0인 바닥에서 Q, mubar_u)은 그 노드를 쓰는 칸에만 NaN을 준다.
+      NaN 이웃이 있는 노드의 기울기는 한쪽 차분으로 계산하므로 NaN이 위쪽 칸으로 번지지 않는다.
+    - K-function은 K 깊이 그리드(run.k_depth, 두 깊이의 중간)에서 보간한다.
+    - 깊이 축이 없는 양(Rrs, Lw)은 파장 방향으로만 보간하며 depth 인자는 무시한다.
+"""
+
+import numpy as np
+
+from .parse import KFUNCTION_COLUMNS
+
+
+METHODS = ("pchip", "loglinear")
+KFUNCTION_QUANTITIES = KFUNCTION_COLUMNS[3:]
+
+
+def _pchip_slopes(f, x):
+    """마지막 축을 따라 Fritsch-Carlson 단조 기울기 (NaN 이웃은 한쪽 차분)"""
+    n = f.shape[-1]
+    if n < 2:
+        return np.zeros_like(f)
+    h = np.diff(x)
+    d = np.diff(f, axis=-1) / h
+    m = np.empty_like(f)
+    m[..., 0] = d[..., 0]
+    m[..., -1] = d[..., -1]
+    if n > 2:
+        dl, dr = d[..., :-1], d[..., 1:]
+        hl, hr = h[:-1], h[1:]
+        w1, w2 = 2 * hr + hl, hr + 2 * hl
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mid = (w1 + w2) / (w1 / dl + w2 / dr)
+        # 기울기 부호가 바뀌거나 평평한 곳은 0 (단조성 유지)
+        mid[dl * dr <= 0] = 0.0
+        mid = np.where(np.isnan(dl), dr, np.where(np.isnan(dr), dl, mid))
+        m[..., 1:-1] = mid
+    # 끝점: NaN 이웃이면 안쪽 차분 사용
+    if n > 2:
+        m[..., 0] = np.where(np.isnan(d[..., 0]), d[..., 1], m[..., 0])
+        m[..., -1] = np.where(np.isnan(d[..., -1]), d[..., -2], m[..., -1])
+    return m
+
+
+def _locate(grid, x, clip):
+    """질의값 x의 칸 인덱스 i (grid[i] <= x <= grid[i+1]), 칸 안 위치 t (0-1), 그리드 밖 mask"""
+    if len(grid) == 1:
+        return np.zeros(x.shape, dtype=np.intp), np.zeros(x.shape), np.zeros(x.shape, dtype=bool)
+    outside = np.isnan(x)
+    if clip:
+        x = np.clip(x, grid[0], grid[-1])
+    else:
+        outside |= (x < grid[0]) | (x > grid[-1])
+    i = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+    t = (x - grid[i]) / (grid[i + 1] - grid[i])
+    return i, t, outside
+
+
+def _term(weight, values):
+    """weight * values (weight가 0인 항은 values가 NaN이어도 0)"""
+    return np.where(weight == 0, 0.0, weight * values)
+
+
+def _hermite(t):
+    """3차 Hermite 기저: (값 기저 [왼쪽, 오른쪽], 기울기 기저 [왼쪽, 오른쪽])"""
+    t2 = t * t
+    t3 = t2 * t
+    return ((2 * t3 - 3 * t2 + 1, -2 * t3 + 3 * t2),
+            (t3 - 2 * t2 + t, t3 - t2))
+
+
+class GridInterpolator:
+    """(run, 파장, 깊이) 그리드 배열의 보간기
+
+    values는 (n_run, n_wavelength, n_depth) 또는 깊이 축이 없는 (n_run, n_wavelength).
+
+    사용 예:
+        interp = ensemble.interpolator('Ed')                  # 계수 계산 (한 번)
+        Ed = interp([2.37, 3.8], 550.0)                       # (n_run, 2)
+        Ed = interp(np.c_[[2.37, 3.8]], np.arange(403, 698))  # (n_run, 2, 295): depth x 파장 격자
+        Ed = interp(z, wl, runs=run_index)                    # 질의점별 run (같은 shape으로 broadcast)
+        Lu = run.interpolator('Lu')(2.37, np.arange(403, 698)) # run 하나: (295,)
+    """
+
+    def __init__(self, values, wavelength, depth=None, method="pchip", fill_value=np.nan,
+                 clip=False, single=False, batch_size=1 << 20):
+        if method not in METHODS:
+            raise ValueError(f"Unknown interpolation method {method!r} (use one of {METHODS})")
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 2:
+            values = values[:, :, np.newaxis]
+            depth = [0.0]
+            self.has_depth = False
+        else:
+            self.has_depth = True
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        if values.shape[1:] != (len(self.wavelength), len(self.depth)):
+            raise ValueError(f"values shape {values.shape} does not match grid "
+                             f"({len(self.wavelength)} wavelengths, {len(self.depth)} depths)")
+        self.method = method
+        self.fill_value = fill_value
+        self.clip = clip
+        self.single = single
+        self.batch_size = batch_size
+        self.n_runs = len(values)
+        self.f = values
+        if method == "pchip":
+            # 노드별 값, 파장/깊이 방향 기울기, 교차 미분(twist)
+            self.fw = np.moveaxis(_pchip_slopes(np.moveaxis(values, 1, -1), self.wavelength), -1, 1)
+            self.fz = _pchip_slopes(values, self.depth)
+            self.fwz = np.moveaxis(_pchip_slopes(np.moveaxis(self.fz, 1, -1), self.wavelength), -1, 1)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.logf = np.where(values > 0, np.log(values), np.nan)
+
+    @classmethod
+    def from_run(cls, run, quantity, method="pchip", **kwargs):
+        """HydroLightRun 하나의 양 (K-function은 k_depth 그리드)"""
+        values = np.asarray(run[quantity])
+        depth = (run.k_depth if quantity in KFUNCTION_QUANTITIES else run.depth) if values.ndim == 2 else None
+        return cls(values[np.newaxis], run.wavelength, depth, method, single=True, **kwargs)
+
+    @classmethod
+    def from_ensemble(cls, ensemble, quantity, method="pchip", **kwargs):
+        """HydroLightEnsemble(또는 같은 cube/grid를 가진 store)의 양"""
+        cube = ensemble.cube(quantity)
+        depth = ensemble.k_depth if quantity in KFUNCTION_QUANTITIES else ensemble.depth
+        return cls(cube, ensemble.wavelength, depth if cube.ndim == 3 else None, method, **kwargs)
+
+    def __call__(self, depth, wavelength, runs=None):
+        """질의점 값
+
+        runs=None이면 모든 run에서 평가하여 (n_run,) + broadcast(depth, wavelength) shape 반환
+        (run 하나로 만든 보간기는 run 축 없이 반환). runs를 주면 depth, wavelength, runs를
+        broadcast한 질의점별로 평가한다.
+        """
+        wavelength = np.asarray(wavelength, dtype=float)
+        depth = np.zeros(1) if (depth is None or not self.has_depth) else np.asarray(depth, dtype=float)
+        if runs is None:
+            shape = np.broadcast_shapes(depth.shape, wavelength.shape) if self.has_depth else wavelength.shape
+            z = np.broadcast_to(depth, shape).ravel() if self.has_depth else np.zeros(int(np.prod(shape)))
+            w = np.broadcast_to(wavelength, shape).ravel()
+            n = len(w)
+            r = np.repeat(np.arange(self.n_runs), n)
+            out = self._evaluate(r, np.tile(z, self.n_runs), np.tile(w, self.n_runs))
+            out = out.reshape((self.n_runs,) + shape)
+            return out[0] if self.single else out
+        if not self.has_depth:
+            depth = np.zeros(1)
+        runs, depth, wavelength = np.broadcast_arrays(np.asarray(runs), depth, wavelength)
+        out = self._evaluate(runs.ravel().astype(np.intp), depth.ravel(), wavelength.ravel())
+        return out.reshape(runs.shape)
+
+    def _evaluate(self, r, z, w):
+        out = np.empty(len(w))
+        for start in range(0, len(w), self.batch_size):
+            sel = slice(start, start + self.batch_size)
+            out[sel] = self._evaluate_batch(r[sel], z[sel], w[sel])
+        return out
+
+    def _evaluate_batch(self, r, z, w):
+        if np.any((r < 0) | (r >= self.n_runs)):
+            raise IndexError(f"run index out of range for {self.n_runs} runs")
+        iw, t, out_w = _locate(self.wavelength, w, self.clip)
+        iz, u, out_z = _locate(self.depth, z, self.clip)
+        n_w, n_z = len(self.wavelength), len(self.depth)
+        base = (r * n_w + iw) * n_z + iz
+        w_step = 1 if n_w > 1 else 0
+        z_step = 1 if n_z > 1 else 0
+        corners = [(a, b, base + a * w_step * n_z + b * z_step) for a in (0, 1) for b in (0, 1)]
+
+        if self.method == "pchip":
+            (vt, dt), (vu, du) = _hermite(t), _hermite(u)
+            hw = np.diff(self.wavelength)[iw] if n_w > 1 else np.zeros(len(w))
+            hz = np.diff(self.depth)[iz] if n_z > 1 else np.zeros(len(z))
+            f, fw, fz, fwz = (a.reshape(-1) for a in (self.f, self.fw, self.fz, self.fwz))
+            result = np.zeros(len(w))
+            for a, b, idx in corners:
+                result += _term(vt[a] * vu[b], f[idx])
+                result += _term(hw * dt[a] * vu[b], fw[idx])
+                result += _term(hz * vt[a] * du[b], fz[idx])
+                result += _term(hw * hz * dt[a] * du[b], fwz[idx])
+        else:
+            weights = [(1 - t, t), (1 - u, u)]
+            f, logf = self.f.reshape(-1), self.logf.reshape(-1)
+            log_sum = np.zeros(len(w))
+            lin_sum = np.zeros(len(w))
+            for a, b, idx in corners:
+                weight = weights[0][a] * weights[1][b]
+                log_sum += _term(weight, logf[idx])
+                lin_sum += _term(weight, f[idx])
+            # 0 이하 모서리가 있는 칸(log가 NaN)은 선형 보간 값 사용 (모서리 값 자체가 NaN이면 NaN)
+            result = np.where(np.isnan(log_sum), lin_sum, np.exp(log_sum))
+
+        result[out_w | out_z] = self.fill_value
+        return result
+
+    def __repr__(self):
+        return (f"GridInterpolator({self.method}, {self.n_runs} runs, {len(self.wavelength)} wavelengths, "
+                f"{len(self.depth) if self.has_depth else 0} depths)")
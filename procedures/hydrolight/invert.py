@@ -0,0 +1,452 @@
+"""
+invert.py
+관측 Rrs 스펙트럼 수천 개에서 수층 IOP, 바닥 깊이, 바닥 피복 비율을 한꺼번에 역산 (천해 inversion)
+
+forward.py의 반해석적 모델 (Lee et al. 1999)을 HydroLight run의 성분별 IOP 모양과 바닥 반사도
+라이브러리로 매개변수화하고, 스펙트럼마다 5개 미지수를 찾는다 (SAMBUCA 방식의 바닥 두 종 혼합):
+
+    a(λ)  = a_w(λ) + P a_phy(λ) + G a_cdm(λ)      a_w: 성분 1 (pure water), a_phy: 성분 2 (440 nm = 1),
+    bb(λ) = bb_w(λ) + X bb_p(λ)                    a_cdm: CDOM + 광물 (440 nm = 1), bb_p: 입자 (550 nm = 1)
+    ρ(λ)  = q ρ_i(λ) + (1 - q) ρ_j(λ)              바닥 라이브러리 항목 쌍 (i, j), 0 <= q <= 1
+    미지수: P, G, X, H (바닥 깊이), q  + 바닥 쌍 (이산)
+
+1. LUT seed: (P, G, X, H) 격자 상태마다 수면 아래 rrs가 바닥 ρ에 선형이므로, 모든 바닥 쌍의 최적 q와
+   잔차 제곱합을 Gram 행렬 (행렬곱)로 닫힌 형태로 구한다. 스펙트럼 x 상태 x 쌍 후보를 한 번에 평가하고,
+   깊이 격자 값별 최적 상태 중 candidates개를 seed로 쓴다.
+2. 정밀화: 경계가 있는 Levenberg-Marquardt를 모든 (스펙트럼, seed)에 대해 배열 연산으로 동시에 반복한다.
+   미지수는 log P, log G, log X, log H (경계로 투영)이고, 바닥 쌍과 q는 평가마다 닫힌 형태로 다시 고른다.
+3. 스펙트럼을 chunk로 나누어 jobs > 1이면 프로세스 풀에서 처리한다.
+
+    inversion = ShallowWaterInversion.from_run(run, library, coefficients=calibrated)
+    result = inversion.invert(spectra, jobs=4)                  # spectra: (n, n_wavelength) Rrs
+    rows = inversion.result_rows(result, labels)                # P, G, X, H, 바닥 비율, rmse, sam, ...
+
+적합 품질: rmse (sr^-1), rel_rmse (rmse / 관측 평균), sam (spectral angle, rad),
+bottom_contrast (적합 스펙트럼과 같은 물을 무한 깊이로 둔 스펙트럼의 최대 상대 차이; 작으면 바닥이
+보이지 않아 H와 바닥 비율은 의미 없음), at_bound (경계에 붙은 미지수).
+"""
+
+import csv
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from .forward import forward, column_mean, DEFAULT_COEFFICIENTS
+from .library import resample_matrix, top_k
+
+
+PARAMETERS = ("P", "G", "X", "H", "q")
+# 미지수 경계 (P, G: 1/m at 440 nm, X: 1/m at 550 nm, H: m)
+DEFAULT_BOUNDS = {"P": (1e-4, 2.0), "G": (1e-4, 2.0), "X": (1e-5, 0.5), "H": (0.1, 30.0), "q": (0.0, 1.0)}
+# LUT seed 격자 점 수 (경계 사이 log 간격)
+DEFAULT_GRID = {"P": 6, "G": 5, "X": 5, "H": 12}
+REFERENCE_A = 440.0
+REFERENCE_BB = 550.0
+# 성분 모양을 쓸 수 없을 때 (값이 0인 성분) 쓰는 해석적 모양
+CDM_SLOPE = 0.015
+BBP_EXPONENT = 1.0
+# LUT seed 한 번에 만드는 (스펙트럼 x 상태 x 쌍) 원소 수 상한
+SEED_ELEMENTS = 4_000_000
+
+
+# ----------------------------------------------------------------------
+# IOP 모양
+# ----------------------------------------------------------------------
+def _normalized(values, wavelength, reference):
+    i = int(np.argmin(np.abs(wavelength - reference)))
+    return values / values[i] if values[i] > 0 and np.all(values >= 0) else None
+
+
+def water_basis(run):
+    """HydroLight run의 성분별 IOP (수층 평균)로 만든 모양 -> {a_w, bb_w, a_phy, a_cdm, bb_p} (n_wavelength,)
+
+    성분 순서는 HydroLight New Case 2 (1 pure water, 2 chlorophyll-bearing particles, 3 CDOM, 4 minerals).
+    성분 값이 0이라 모양을 만들 수 없으면 a_cdm은 exp(-S(λ-440)), bb_p는 (550/λ)^Y를 쓴다.
+    """
+    wl = run.wavelength
+    a = np.stack([column_mean_component(run, "a_comp", k) for k in range(run["a_comp"].shape[2])])
+    bb = np.stack([column_mean_component(run, "bb_comp", k) for k in range(run["bb_comp"].shape[2])])
+    a_phy = _normalized(a[1], wl, REFERENCE_A)
+    if a_phy is None:
+        raise ValueError(f"{run.name}: phytoplankton absorption (component 2) is zero, choose another basis run")
+    a_cdm = _normalized(a[2:4].sum(axis=0), wl, REFERENCE_A)
+    if a_cdm is None:
+        a_cdm = np.exp(-CDM_SLOPE * (wl - REFERENCE_A))
+    bb_p = _normalized(column_mean(run, "total_bb") - bb[0], wl, REFERENCE_BB)
+    if bb_p is None:
+        bb_p = (REFERENCE_BB / wl) ** BBP_EXPONENT
+    return {"a_w": a[0], "bb_w": bb[0], "a_phy": a_phy, "a_cdm": a_cdm, "bb_p": bb_p}
+
+
+def column_mean_component(run, table, component):
+    """성분별 계수 (n_wavelength, n_depth, n_component) 중 한 성분의 수층 평균 (n_wavelength,)"""
+    values = run[table][:, :, component]
+    bottom = run.metadata.get('bottom_depth', np.nan)
+    keep = run.depth <= bottom if np.isfinite(bottom) else np.ones(len(run.depth), dtype=bool)
+    return np.nanmean(values[:, keep], axis=1)
+
+
+def iop_truth(run):
+    """run 자신의 basis로 본 참값 {P, G, X, H} (HydroLight run을 역산해 검증할 때)"""
+    wl = run.wavelength
+    ia = int(np.argmin(np.abs(wl - REFERENCE_A)))
+    ib = int(np.argmin(np.abs(wl - REFERENCE_BB)))
+    bb_w = column_mean_component(run, "bb_comp", 0)
+    infinite = run.metadata.get('bottom_type') == "infinite"
+    return {"P": column_mean_component(run, "a_comp", 1)[ia],
+            "G": column_mean_component(run, "a_comp", 2)[ia] + column_mean_component(run, "a_comp", 3)[ia],
+            "X": column_mean(run, "total_bb")[ib] - bb_w[ib],
+            "H": np.inf if infinite else run.metadata.get('bottom_depth', np.nan)}
+
+
+def read_spectra(filepath):
+    """관측 Rrs 파일 -> (이름 목록, wavelength, (n, n_wavelength) 배열)
+
+    .npz: 'wavelength', 'rrs' (선택: 'names') 배열
+    .csv: 머리 줄의 숫자 열 이름이 파장 (nm), 숫자가 아닌 첫 열은 스펙트럼 이름
+    """
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == ".npz":
+        with np.load(filepath) as f:
+            rrs = np.atleast_2d(f['rrs'])
+            names = [str(n) for n in f['names']] if 'names' in f else [str(i) for i in range(len(rrs))]
+            return names, np.asarray(f['wavelength'], dtype=float), rrs.astype(float)
+    with open(filepath, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        numeric = [i for i, h in enumerate(header) if _is_number(h)]
+        label = next((i for i in range(len(header)) if i not in numeric), None)
+        names, rows = [], []
+        for k, row in enumerate(reader):
+            if not row:
+                continue
+            names.append(row[label] if label is not None else str(k))
+            rows.append([float(row[i]) if row[i].strip() else np.nan for i in numeric])
+    if not numeric or not rows:
+        raise ValueError(f"{filepath} has no wavelength columns or no spectra")
+    return names, np.array([float(header[i]) for i in numeric]), np.array(rows)
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+# ----------------------------------------------------------------------
+# 역산
+# ----------------------------------------------------------------------
+class ShallowWaterInversion:
+    """IOP 모양 + 바닥 라이브러리 + forward 계수로 정한 역산 문제
+
+    wavelength: 역산 밴드, basis: water_basis 결과 (wavelength에 맞춘 것), bottoms: (K, n_wavelength)
+    """
+
+    def __init__(self, wavelength, basis, bottoms, bottom_names, sun_zenith=30.0, coefficients=None,
+                 bounds=None, grid=None):
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.basis = {k: np.asarray(v, dtype=float) for k, v in basis.items()}
+        self.bottoms = np.atleast_2d(np.asarray(bottoms, dtype=float))
+        self.bottom_names = list(bottom_names)
+        if self.bottoms.shape != (len(self.bottom_names), len(self.wavelength)):
+            raise ValueError(f"bottoms shape {self.bottoms.shape} does not match "
+                             f"{len(self.bottom_names)} names x {len(self.wavelength)} wavelengths")
+        self.sun_zenith = float(sun_zenith)
+        self.coefficients = dict(DEFAULT_COEFFICIENTS, **(coefficients or {}))
+        self.bounds = dict(DEFAULT_BOUNDS, **(bounds or {}))
+        self.grid = dict(DEFAULT_GRID, **(grid or {}))
+        # 모든 바닥 쌍 (i < j), 항목이 하나면 (0, 0)
+        k = len(self.bottom_names)
+        self.pairs = np.array([(i, j) for i in range(k) for j in range(i + 1, k)] or [(0, 0)])
+        # 바닥 반사도 곱 ρ_k ρ_l (n_wavelength, K²)
+        self._products = np.ascontiguousarray((self.bottoms[:, None, :] * self.bottoms[None]).reshape(k * k, -1).T)
+        self._lut = None
+
+    @classmethod
+    def from_run(cls, run, library, bottoms=None, window=None, **kwargs):
+        """basis run과 바닥 라이브러리로 생성 (bottoms: 쓸 라이브러리 항목 이름, window: (최소, 최대) nm)"""
+        keep = np.ones(len(run.wavelength), dtype=bool)
+        if window is not None:
+            keep = (run.wavelength >= window[0]) & (run.wavelength <= window[1])
+        keep &= (run.wavelength >= library.wavelength.min()) & (run.wavelength <= library.wavelength.max())
+        if keep.sum() < len(PARAMETERS) + 1:
+            raise ValueError(f"Only {int(keep.sum())} band(s) of {run.name} are usable for the inversion")
+        names = list(bottoms or library.names)
+        missing = [n for n in names if n not in library.names]
+        if missing:
+            raise KeyError(f"Bottom(s) {missing} not in the library, available: {library.names}")
+        wl = run.wavelength[keep]
+        spectra = library.spectra[[library.names.index(n) for n in names]] @ resample_matrix(library.wavelength, wl)
+        basis = {k: v[keep] for k, v in water_basis(run).items()}
+        kwargs.setdefault("sun_zenith", run.metadata.get('sun_zenith', 30.0))
+        return cls(wl, basis, spectra, names, **kwargs)
+
+    def resample(self, spectra, wavelength):
+        """다른 파장 그리드의 스펙트럼 (n, len(wavelength)) -> 역산 밴드 (역산 밴드가 범위 밖이면 ValueError)"""
+        wavelength = np.asarray(wavelength, dtype=float)
+        if len(wavelength) == len(self.wavelength) and np.allclose(wavelength, self.wavelength):
+            return np.atleast_2d(np.asarray(spectra, dtype=float))
+        return np.atleast_2d(np.asarray(spectra, dtype=float)) @ resample_matrix(wavelength, self.wavelength)
+
+    def __getstate__(self):
+        # 작업 프로세스로 보낼 때 LUT는 빼고 보냄 (프로세스마다 처음 쓸 때 다시 만듦)
+        state = dict(self.__dict__)
+        state['_lut'] = None
+        return state
+
+    # ------------------------------------------------------------------
+    # 모델
+    # ------------------------------------------------------------------
+    def iops(self, P, G, X):
+        """(n,) 값 -> a, bb (n, n_wavelength)"""
+        b = self.basis
+        a = b["a_w"] + np.asarray(P)[:, None] * b["a_phy"] + np.asarray(G)[:, None] * b["a_cdm"]
+        bb = b["bb_w"] + np.asarray(X)[:, None] * b["bb_p"]
+        return a, bb
+
+    def model(self, values, pairs):
+        """미지수 (n, 5) [P, G, X, H, q]와 바닥 쌍 (n, 2) -> Rrs (n, n_wavelength)"""
+        values = np.asarray(values, dtype=float)
+        a, bb = self.iops(values[:, 0], values[:, 1], values[:, 2])
+        q = values[:, 4:5]
+        bottom = q * self.bottoms[pairs[:, 0]] + (1 - q) * self.bottoms[pairs[:, 1]]
+        return forward(a, bb, values[:, 3:4], bottom, self.sun_zenith, self.coefficients)
+
+    def _subsurface(self, rrs_above):
+        """수면 위 Rrs -> 수면 아래 rrs (forward의 Rrs = t rrs / (1 - γ rrs) 역변환)"""
+        c = self.coefficients
+        return rrs_above / (c["t"] + c["gamma"] * rrs_above)
+
+    def _parts(self, P, G, X, H):
+        """(n,) 값 -> 수면 아래 rrs = A + B ρ 의 A, B (n, n_wavelength) (모델이 ρ에 선형)"""
+        a, bb = self.iops(P, G, X)
+        # 수면 투과 전 rrs: t = 1, γ = 0
+        c = dict(self.coefficients, t=1.0, gamma=0.0)
+        h = np.asarray(H, dtype=float)[:, None]
+        A = forward(a, bb, h, 0.0, self.sun_zenith, c)
+        return A, forward(a, bb, h, 1.0, self.sun_zenith, c) - A
+
+    def _pair_terms(self, B):
+        """B (..., n) -> 쌍별 (<u_j, u_j>, <u_j, u_i>, |u_i - u_j|²) (..., n_pair)
+
+        u_k = B ρ_k 이므로 <u_k, u_l> = B² · (ρ_k ρ_l): 바닥 곱 행렬 (n, K²)과의 행렬곱 하나로 모든 내적.
+        """
+        k = len(self.bottom_names)
+        i, j = self.pairs[:, 0], self.pairs[:, 1]
+        uu = (B ** 2) @ self._products
+        jj, ji = np.take(uu, j * k + j, axis=-1), np.take(uu, j * k + i, axis=-1)
+        return jj, ji, np.take(uu, i * k + i, axis=-1) - 2 * ji + jj
+
+    def _pair_fit(self, ee, eu, terms):
+        """모든 바닥 쌍의 최적 q와 잔차 제곱합 (닫힌 형태)
+
+        e = y - A (관측 - 물기둥 항), u_k = B ρ_k 일 때 쌍 (i, j)의 잔차는 e - u_j - q (u_i - u_j)이므로
+        q = <e - u_j, d> / |d|² (d = u_i - u_j, [0, 1]로 자름). 입력은 내적만:
+        ee = |e|² (...), eu = <e, u_k> (..., K), terms = _pair_terms(<u_k, u_l>) -> q, 잔차 제곱합 (..., n_pair)
+        """
+        jj, ji, dd = terms
+        eu_j = np.take(eu, self.pairs[:, 1], axis=-1)
+        ed = np.take(eu, self.pairs[:, 0], axis=-1) - eu_j - ji + jj
+        with np.errstate(divide='ignore', invalid='ignore'):
+            q = np.clip(np.where(dd > 0, ed / dd, 1.0), 0.0, 1.0)
+        error = ee[..., None] - 2 * eu_j + jj - q * (2 * ed - q * dd)
+        return q, error
+
+    def _build_lut(self):
+        """LUT 상태 (S, 4) [P, G, X, H]와 관측과 무관한 내적 (한 번만 계산)"""
+        if self._lut is None:
+            axes = [np.geomspace(*self.bounds[p], self.grid[p]) for p in PARAMETERS[:4]]
+            states = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 4)
+            A, B = self._parts(*states.T)
+            U = B[:, None, :] * self.bottoms[None]                      # (S, K, n)
+            self._lut = {'states': states, 'A': A, 'U': U.reshape(-1, U.shape[2]),
+                         'AA': np.einsum('sn,sn->s', A, A), 'AU': np.einsum('sn,skn->sk', A, U),
+                         'terms': self._pair_terms(B)}
+        return self._lut
+
+    # ------------------------------------------------------------------
+    # 1. LUT seed
+    # ------------------------------------------------------------------
+    def seed(self, spectra, candidates=8):
+        """스펙트럼 (m, n) -> seed [P, G, X, H] (m, c, 4)와 수면 아래 rrs 잔차 제곱합 (m, c)
+
+        LUT 상태마다 모든 바닥 쌍 중 가장 작은 잔차를 구하고 (스펙트럼 x 상태 x 쌍을 행렬곱으로 한 번에),
+        깊이 격자 값마다 가장 좋은 상태 하나씩 중 잔차가 작은 c개를 seed로 쓴다. 깊이와 바닥 밝기가
+        서로 보상하는 국소 최솟값이 많으므로, 서로 다른 깊이에서 출발해야 전역 최솟값을 찾는 비율이 높다.
+        """
+        lut = self._build_lut()
+        y = self._subsurface(np.asarray(spectra, dtype=float))
+        n_state, n_depth = len(lut['states']), self.grid["H"]
+        c = min(candidates, n_depth)
+        seeds = np.empty((len(y), c, 4))
+        sse = np.empty((len(y), c))
+        batch = max(1, SEED_ELEMENTS // (n_state * len(self.pairs)))
+        for start in range(0, len(y), batch):
+            Y = y[start:start + batch]
+            ee = (Y ** 2).sum(1)[:, None] - 2 * Y @ lut['A'].T + lut['AA']            # |y - A|², (m, S)
+            eu = (Y @ lut['U'].T).reshape(len(Y), n_state, -1) - lut['AU']             # <y - A, u_k>, (m, S, K)
+            _, error = self._pair_fit(ee, eu, lut['terms'])                                # (m, S, pair)
+            # 상태는 H가 가장 빨리 바뀌는 순서 -> (m, P x G x X, H)
+            error = np.min(error, axis=2).reshape(len(Y), -1, n_depth)
+            best = np.argmin(error, axis=1)                                             # 깊이별 최적 상태
+            index, keys = top_k(np.take_along_axis(error, best[:, None], axis=1)[:, 0], c)
+            seeds[start:start + len(Y)] = lut['states'][np.take_along_axis(best, index, axis=1) * n_depth + index]
+            sse[start:start + len(Y)] = keys
+        return seeds, sse
+
+    # ------------------------------------------------------------------
+    # 2. 경계가 있는 batch Levenberg-Marquardt (바닥은 매 평가마다 닫힌 형태로)
+    # ------------------------------------------------------------------
+    def _project(self, z, y):
+        """log [P, G, X, H] (N, 4)와 수면 아래 관측 y -> (잔차 모델 - 관측 (N, n), 최적 쌍 인덱스, q)
+
+        variable projection: 물/깊이가 정해지면 모든 바닥 쌍과 q의 최적값이 닫힌 형태이므로
+        LM은 연속 미지수 4개만 다루고, 이산적인 바닥 쌍 선택은 평가마다 다시 한다.
+        """
+        A, B = self._parts(*np.exp(z).T)
+        e = y - A
+        q, error = self._pair_fit((e ** 2).sum(1), (e * B) @ self.bottoms.T, self._pair_terms(B))
+        rows = np.arange(len(z))
+        best = np.argmin(np.where(np.isfinite(error), error, np.inf), axis=1)
+        qb = q[rows, best][:, None]
+        bottom = qb * self.bottoms[self.pairs[best, 0]] + (1 - qb) * self.bottoms[self.pairs[best, 1]]
+        return B * bottom - e, best, qb[:, 0]
+
+    def refine(self, spectra, seeds, max_iter=50, tol=1e-10):
+        """모든 행을 동시에 LM으로 정밀화 -> (미지수 (N, 5), 쌍 인덱스 (N,), 잔차 제곱합 (N,), 반복 수, 수렴 여부)
+
+        spectra (N, n) 수면 위 Rrs, seeds (N, 4) 초기 [P, G, X, H]. 미지수 공간은 log P/G/X/H이고
+        한 걸음마다 경계로 투영한다. 행마다 감쇠 λ를 따로 조절하고, 수렴한 행은 계산에서 뺀다.
+        잔차 제곱합은 수면 아래 rrs 기준.
+        """
+        lo = np.log([self.bounds[p][0] for p in PARAMETERS[:4]])
+        hi = np.log([self.bounds[p][1] for p in PARAMETERS[:4]])
+        y = self._subsurface(np.asarray(spectra, dtype=float))
+        z = np.clip(np.log(seeds), lo, hi)
+        r, pair_index, q = self._project(z, y)
+        cost = (r ** 2).sum(1)
+        lam = np.full(len(z), 1e-3)
+        iterations = np.zeros(len(z), dtype=np.int64)
+        converged = np.zeros(len(z), dtype=bool)
+        active = np.arange(len(z))
+        step = 1e-6
+        for _ in range(max_iter):
+            if not len(active):
+                break
+            za, ra, ya = z[active], r[active], y[active]
+            # 전진 차분 Jacobian (위 경계에 붙은 미지수는 안쪽으로)
+            jac = np.empty(ra.shape + (za.shape[1],))
+            for k in range(za.shape[1]):
+                h = np.where(za[:, k] + step > hi[k], -step, step)
+                zk = za.copy()
+                zk[:, k] += h
+                jac[:, :, k] = (self._project(zk, ya)[0] - ra) / h[:, None]
+            jtj = np.einsum('mnk,mnl->mkl', jac, jac)
+            g = np.einsum('mnk,mn->mk', jac, ra)
+            diag = np.einsum('mkk->mk', jtj)
+            damped = jtj + (lam[active][:, None] * np.maximum(diag, 1e-30))[:, :, None] * np.eye(za.shape[1])
+            delta = -np.linalg.solve(damped, g[:, :, None])[:, :, 0]
+            z_new = np.clip(za + delta, lo, hi)
+            r_new, pair_new, q_new = self._project(z_new, ya)
+            cost_new = (r_new ** 2).sum(1)
+            better = np.isfinite(cost_new) & (cost_new < cost[active])
+            gain = np.where(better, (cost[active] - cost_new) / np.maximum(cost[active], 1e-300), 0.0)
+            moved = np.abs(z_new - za).max(axis=1)
+
+            idx = active[better]
+            z[idx], r[idx], cost[idx] = z_new[better], r_new[better], cost_new[better]
+            pair_index[idx], q[idx] = pair_new[better], q_new[better]
+            lam[active] = np.where(better, lam[active] / 3, lam[active] * 4)
+            iterations[active] += 1
+            # 개선이 아주 작거나, 어느 방향으로도 줄지 않으면 (λ가 커짐) 수렴
+            done = (better & ((gain < tol) | (moved < 1e-8))) | (lam[active] > 1e10)
+            converged[active[done]] = True
+            active = active[~done]
+        return np.column_stack([np.exp(z), q]), pair_index, cost, iterations, converged
+
+    # ------------------------------------------------------------------
+    # 전체
+    # ------------------------------------------------------------------
+    def _invert_chunk(self, spectra, candidates, max_iter):
+        m, n = spectra.shape
+        seeds, seed_sse = self.seed(spectra, candidates)
+        c = seeds.shape[1]
+        values, pair_index, cost, iterations, converged = self.refine(np.repeat(spectra, c, axis=0),
+                                                                      seeds.reshape(-1, 4), max_iter)
+        best = np.argmin(np.where(np.isfinite(cost), cost, np.inf).reshape(m, c), axis=1)
+        pick = np.arange(m) * c + best
+        values = values[pick]
+        pairs = self.pairs[pair_index[pick]]
+        fitted = self.model(values, pairs)
+        deep = self.model(np.column_stack([values[:, :3], np.full(m, np.inf), values[:, 4]]), pairs)
+        residual = fitted - spectra
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosine = (fitted * spectra).sum(1) / (np.linalg.norm(fitted, axis=1) * np.linalg.norm(spectra, axis=1))
+            contrast = np.nanmax(np.abs(fitted - deep) / np.abs(fitted), axis=1)
+        fractions = np.zeros((m, len(self.bottom_names)))
+        rows = np.arange(m)
+        fractions[rows, pairs[:, 1]] += 1 - values[:, 4]
+        fractions[rows, pairs[:, 0]] += values[:, 4]
+        rmse = np.sqrt((residual ** 2).mean(1))
+        lo = np.array([self.bounds[p][0] for p in PARAMETERS])
+        hi = np.array([self.bounds[p][1] for p in PARAMETERS])
+        at_bound = (np.isclose(values, lo, rtol=1e-6) | np.isclose(values, hi, rtol=1e-6))
+        at_bound[:, 4] = False       # q = 0 또는 1은 바닥 한 종이라는 뜻 (경계 문제 아님)
+        return {"values": values, "pairs": pairs, "fractions": fractions, "fitted": fitted,
+                "rmse": rmse, "rel_rmse": rmse / np.abs(spectra).mean(1), "sam": np.arccos(np.clip(cosine, -1, 1)),
+                "bottom_contrast": contrast, "iterations": iterations[pick], "converged": converged[pick],
+                "at_bound": at_bound, "seed_rmse": np.sqrt(np.maximum(seed_sse[rows, 0], 0) / n)}
+
+    def invert(self, spectra, jobs=1, chunk_size=512, candidates=8, max_iter=50):
+        """관측 Rrs (n, n_wavelength) 역산 -> 배열 dict
+
+        values (n, 5) [P, G, X, H, q], pairs (n, 2) 바닥 항목 인덱스, fractions (n, K) 바닥 피복 비율,
+        fitted (n, n_wavelength), rmse, rel_rmse, sam, bottom_contrast, iterations, converged,
+        at_bound (n, 5), seed_rmse (LUT seed의 수면 아래 rrs RMSE). 값이 NaN인 밴드가 있는 스펙트럼은 NaN.
+        """
+        spectra = np.atleast_2d(np.asarray(spectra, dtype=float))
+        if spectra.shape[1] != len(self.wavelength):
+            raise ValueError(f"Spectra must have {len(self.wavelength)} bands, got {spectra.shape[1]}")
+        valid = np.isfinite(spectra).all(axis=1) & (np.abs(spectra).sum(axis=1) > 0)
+        good = spectra[valid]
+        # 유효한 스펙트럼이 없어도 빈 chunk 하나로 결과 배열의 shape을 정함
+        chunks = [good[i:i + chunk_size] for i in range(0, len(good), chunk_size)] or [good]
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+                parts = list(pool.map(self._invert_chunk, chunks, [candidates] * len(chunks),
+                                      [max_iter] * len(chunks)))
+        else:
+            parts = [self._invert_chunk(chunk, candidates, max_iter) for chunk in chunks]
+
+        out = {}
+        for key in ("values", "pairs", "fractions", "fitted", "rmse", "rel_rmse", "sam", "bottom_contrast",
+                    "iterations", "converged", "at_bound", "seed_rmse"):
+            values = np.concatenate([p[key] for p in parts])
+            fill = {np.dtype(bool): False, np.dtype(np.int64): -1}.get(values.dtype, np.nan)
+            out[key] = np.full((len(spectra),) + values.shape[1:], fill, dtype=values.dtype)
+            out[key][valid] = values
+        return out
+
+    def result_rows(self, result, labels=None):
+        """invert 결과 -> 스펙트럼별 행 목록 (P, G, X, H, bottom_1, bottom_2, q, f_<바닥>, 품질 지표)"""
+        rows = []
+        for k in range(len(result["rmse"])):
+            row = {'name': labels[k] if labels is not None else k}
+            row.update({p: result["values"][k, i] for i, p in enumerate(PARAMETERS[:4])})
+            i, j = result["pairs"][k]
+            fitted = i >= 0 and np.isfinite(result["rmse"][k])
+            row['bottom_1'] = self.bottom_names[i] if fitted else ""
+            row['bottom_2'] = self.bottom_names[j] if fitted else ""
+            row['q'] = result["values"][k, 4]
+            row.update({f"f_{name}": result["fractions"][k, b] for b, name in enumerate(self.bottom_names)})
+            row.update({key: result[key][k] for key in ("rmse", "rel_rmse", "sam", "bottom_contrast", "seed_rmse",
+                                                        "iterations", "converged")})
+            row['at_bound'] = " ".join(p for p, flag in zip(PARAMETERS, result["at_bound"][k]) if flag)
+            rows.append(row)
+        return rows
+
+    def __repr__(self):
+        return (f"ShallowWaterInversion({len(self.wavelength)} bands {self.wavelength.min():g}-"
+                f"{self.wavelength.max():g} nm, {len(self.bottom_names)} bottoms, {len(self.pairs)} pairs)")
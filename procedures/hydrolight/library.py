@@ -0,0 +1,217 @@
+"""
+library.py
+바닥 반사도 라이브러리에서 측정 스펙트럼과 가장 비슷한 항목 top-k 검색
+
+현장에서 측정한 바닥 스펙트럼이 어떤 라이브러리 class에 가장 가까운지 찾는다.
+metric:
+    'sam'   spectral angle (라디안, 작을수록 비슷함): arccos(q·l / |q||l|), 밝기 차이에 둔감
+    'rmsd'  평균 제곱근 차이 (작을수록 비슷함): sqrt((|q|² + |l|² - 2 q·l) / n)
+    'corr'  Pearson 상관계수 (클수록 비슷함): 평균을 뺀 단위 벡터의 내적
+
+파장 구간(window)을 정하면 라이브러리를 그 구간으로 자르고 정규화한 행렬과 norm을 한 번만
+계산해 둔다. 질의 스펙트럼은 batch 단위 행렬곱 하나로 모든 라이브러리 항목과 비교하므로
+질의 10만 개 x 항목 수천 개도 몇 초 안에 끝난다.
+
+    library = SpectralLibrary.from_directory("data/bottom_reflectances")
+    index, score = library.search(spectra, wavelength, k=3, metric='sam', window=(400, 700))
+    library.names[index[0, 0]]               # 첫 번째 질의에 가장 가까운 항목
+"""
+
+import numpy as np
+from pathlib import Path
+
+from .bottom import parse_bottom_reflectance
+
+
+METRICS = ("sam", "rmsd", "corr")
+# 바닥 반사도 디렉토리에서 스펙트럼이 아닌 파일
+SKIP_FILES = ("filelist.txt",)
+# 기본 라이브러리 디렉토리 (저장소의 data/bottom_reflectances, 현재 디렉토리와 무관)
+DEFAULT_LIBRARY_DIR = Path(__file__).resolve().parents[2] / "data" / "bottom_reflectances"
+
+
+def resample_matrix(source, target):
+    """(n, len(source)) 스펙트럼을 target 파장으로 선형 보간하는 (len(source), len(target)) 행렬
+
+    target이 source 범위를 벗어나면 ValueError (외삽하지 않음).
+    """
+    source = np.asarray(source, dtype=float)
+    target = np.asarray(target, dtype=float)
+    if target.min() < source.min() - 1e-9 or target.max() > source.max() + 1e-9:
+        raise ValueError(f"Target wavelengths {target.min():g}-{target.max():g} nm outside "
+                         f"{source.min():g}-{source.max():g} nm")
+    i = np.clip(np.searchsorted(source, target, side='right') - 1, 0, len(source) - 2)
+    t = np.clip((target - source[i]) / (source[i + 1] - source[i]), 0.0, 1.0)
+    weights = np.zeros((len(source), len(target)))
+    columns = np.arange(len(target))
+    weights[i, columns] = 1 - t
+    weights[i + 1, columns] += t
+    return weights
+
+
+def _unit_rows(matrix):
+    """행별 단위 벡터와 norm (norm이 0인 행은 0 벡터)"""
+    norm = np.linalg.norm(matrix, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit = np.where(norm[:, None] > 0, matrix / norm[:, None], 0.0)
+    return unit, norm
+
+
+def top_k(keys, k):
+    """행별로 key가 가장 작은 k개 (index, key), 작은 것부터 정렬"""
+    k = min(k, keys.shape[1])
+    index = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(keys, index, axis=1), axis=1)
+    index = np.take_along_axis(index, order, axis=1)
+    return index, np.take_along_axis(keys, index, axis=1)
+
+
+class SpectralLibrary:
+    """라이브러리 스펙트럼 행렬 (n_entry, n_wavelength)과 이름"""
+
+    def __init__(self, names, wavelength, spectra):
+        self.names = list(names)
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.spectra = np.asarray(spectra, dtype=float)
+        if self.spectra.shape != (len(self.names), len(self.wavelength)):
+            raise ValueError(f"spectra shape {self.spectra.shape} does not match "
+                             f"{len(self.names)} names x {len(self.wavelength)} wavelengths")
+        self._prepared = {}
+
+    @classmethod
+    def from_directory(cls, directory, pattern="*.txt"):
+        """바닥 반사도 파일 디렉토리 -> 라이브러리 (파장 그리드가 다르면 첫 파일 그리드로 보간)"""
+        names, spectra, wavelength = [], [], None
+        for path in sorted(Path(directory).glob(pattern)):
+            if path.name.lower() in SKIP_FILES:
+                continue
+            wl, values = parse_bottom_reflectance(path)
+            wl, values = np.asarray(wl), np.asarray(values)
+            if wavelength is None:
+                wavelength = wl
+            elif len(wl) != len(wavelength) or not np.allclose(wl, wavelength):
+                values = values @ resample_matrix(wl, wavelength)
+            names.append(path.stem)
+            spectra.append(values)
+        if not names:
+            raise ValueError(f"No bottom reflectance files in {directory}")
+        return cls(names, wavelength, np.vstack(spectra))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return (f"SpectralLibrary({len(self)} entries, {self.wavelength.min():g}-"
+                f"{self.wavelength.max():g} nm, {len(self.wavelength)} wavelengths)")
+
+    def extend(self, names, spectra):
+        """같은 파장 그리드의 항목 추가 (미리 계산한 행렬은 다시 계산)"""
+        spectra = np.atleast_2d(np.asarray(spectra, dtype=float))
+        self.names.extend(names)
+        self.spectra = np.vstack([self.spectra, spectra])
+        self._prepared.clear()
+        return self
+
+    def prepare(self, window=None):
+        """파장 구간의 정규화 행렬과 norm을 한 번만 계산 (window=(최소, 최대) nm, None이면 전체)"""
+        key = tuple(window) if window is not None else None
+        if key not in self._prepared:
+            keep = np.ones(len(self.wavelength), dtype=bool)
+            if window is not None:
+                keep = (self.wavelength >= window[0]) & (self.wavelength <= window[1])
+                if keep.sum() < 2:
+                    raise ValueError(f"Window {window} nm contains fewer than 2 library wavelengths")
+            spectra = self.spectra[:, keep]
+            unit, norm = _unit_rows(spectra)
+            centered, _ = _unit_rows(spectra - spectra.mean(axis=1, keepdims=True))
+            # 행렬곱에 쓰는 행렬은 (n_wavelength, n_entry)로 전치하여 연속 메모리에 둔다
+            self._prepared[key] = {'wavelength': self.wavelength[keep], 'unit': np.ascontiguousarray(unit.T),
+                                   'centered': np.ascontiguousarray(centered.T), 'raw': np.ascontiguousarray(spectra.T),
+                                   'norm2': norm ** 2}
+        return self._prepared[key]
+
+    def search(self, spectra, wavelength=None, k=5, metric="sam", window=None, batch_size=2048):
+        """질의 스펙트럼 (n_query, n_wavelength) 또는 (n_wavelength,) -> (index, score), 각각 (n_query, k)
+
+        wavelength를 주면 질의를 라이브러리 window 파장으로 선형 보간한다 (None이면 이미
+        window 파장 위에 있는 것으로 본다). score는 metric 단위 ('sam'은 라디안), 가장 좋은 것부터.
+        NaN이 있는 질의는 점수가 NaN이 되어 가장 뒤로 간다.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r} (use one of {METRICS})")
+        prepared = self.prepare(window)
+        queries = np.atleast_2d(np.asarray(spectra, dtype=float))
+        if wavelength is not None:
+            queries = queries @ resample_matrix(wavelength, prepared['wavelength'])
+        elif queries.shape[1] != len(prepared['wavelength']):
+            raise ValueError(f"Query has {queries.shape[1]} values but the library window has "
+                             f"{len(prepared['wavelength'])} wavelengths; pass the query wavelength")
+
+        k = min(k, len(self))
+        index = np.empty((len(queries), k), dtype=np.intp)
+        score = np.empty((len(queries), k))
+        for start in range(0, len(queries), batch_size):
+            batch = slice(start, start + batch_size)
+            keys, offset = self._rank_keys(queries[batch], prepared, metric)
+            index[batch], best = top_k(keys, k)
+            score[batch] = self._to_score(best, offset, metric, queries.shape[1])
+        return index, score
+
+    def scores(self, spectra, metric="sam", window=None, wavelength=None):
+        """모든 라이브러리 항목에 대한 점수 (n_query, n_entry) - 작은 질의용"""
+        prepared = self.prepare(window)
+        queries = np.atleast_2d(np.asarray(spectra, dtype=float))
+        if wavelength is not None:
+            queries = queries @ resample_matrix(wavelength, prepared['wavelength'])
+        keys, offset = self._rank_keys(queries, prepared, metric)
+        return self._to_score(keys, offset, metric, queries.shape[1])
+
+    @staticmethod
+    def _rank_keys(queries, prepared, metric):
+        """(n_query, n_entry) 순위 key (작을수록 비슷함)와 질의별 offset
+
+        전체 행렬에는 행렬곱과 제자리 연산만 하고, arccos/sqrt는 top-k에만 적용한다.
+            sam   key = -cos                        score = arccos(-key)
+            corr  key = -r                          score = -key
+            rmsd  key = |l|² - 2 q·l, offset = |q|²  score = sqrt((key + offset) / n)
+        NaN이 있는 질의는 key를 inf로 두어 점수가 NaN이 된다.
+        """
+        offset = None
+        if metric == "sam":
+            unit, _ = _unit_rows(queries)
+            keys = unit @ prepared['unit']
+            keys *= -1
+        elif metric == "corr":
+            centered, _ = _unit_rows(queries - queries.mean(axis=1, keepdims=True))
+            keys = centered @ prepared['centered']
+            keys *= -1
+        else:
+            keys = queries @ prepared['raw']
+            keys *= -2
+            keys += prepared['norm2']
+            offset = (queries ** 2).sum(axis=1)[:, None]
+        bad = np.isnan(queries).any(axis=1)
+        if bad.any():
+            keys[bad] = np.inf
+        return keys, offset
+
+    @staticmethod
+    def _to_score(keys, offset, metric, n_wavelength):
+        with np.errstate(invalid='ignore'):
+            if metric == "sam":
+                score = np.arccos(np.clip(-keys, -1.0, 1.0))
+            elif metric == "corr":
+                score = -keys
+            else:
+                # 반올림 오차로 음수가 되지 않도록 0에서 자름
+                score = np.sqrt(np.maximum(keys + offset, 0.0) / n_wavelength)
+        score[np.isinf(keys)] = np.nan
+        return score
+
+    def match_table(self, spectra, wavelength=None, k=3, metric="sam", window=None, labels=None):
+        """검색 결과 행 목록 [{query, rank, name, score}] (CSV/표 출력용)"""
+        index, score = self.search(spectra, wavelength, k, metric, window)
+        labels = labels or [str(i) for i in range(len(index))]
+        return [{'query': labels[q], 'rank': r + 1, 'name': self.names[index[q, r]], 'metric': metric,
+                 'score': float(score[q, r])}
+                for q in range(len(index)) for r in range(index.shape[1])]
@@ -0,0 +1,178 @@
+"""
+lut.py
+HydroLight ensemble로부터 Rrs lookup table(LUT)을 만들고 최근접 이웃 검색으로 역산하는 유틸리티
+"""
+
+import numpy as np
+from pathlib import Path
+from scipy.spatial import cKDTree
+
+from .ensemble import PARAMETER_NAMES
+
+
+# 역산 파라미터에서 제외할 메타데이터 (출력 쪽 값)
+EXCLUDED_PARAMETERS = ("wall_clock_s",)
+LUT_PARAMETERS = [p for p in PARAMETER_NAMES if p not in EXCLUDED_PARAMETERS]
+
+
+class RrsLUT:
+    """Rrs(λ) 스펙트럼 + run 파라미터 LUT와 KD-tree 검색 인덱스
+
+    KD-tree는 정적 구조이므로, append로 추가된 run은 별도의 pending 영역에 두고
+    brute-force로 함께 검색한다. pending 개수가 인덱스 크기의 rebuild_fraction을
+    넘으면 트리를 다시 만든다.
+    """
+
+    def __init__(self, wavelength, rrs, params, param_names=None, run_names=None,
+                 profiles=None, depth=None, rebuild_fraction=0.1):
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.rrs = np.asarray(rrs, dtype=np.float32)
+        self.params = np.asarray(params, dtype=float)
+        self.param_names = list(param_names if param_names is not None else LUT_PARAMETERS)
+        self.run_names = np.asarray(run_names if run_names is not None
+                                    else [f"run{i}" for i in range(len(self.rrs))])
+        # 선택적으로 저장하는 깊이별 스펙트럼 (예: Lu, Ed) - (n_run, n_wavelength, n_depth)
+        self.profiles = {k: np.asarray(v, dtype=np.float32) for k, v in (profiles or {}).items()}
+        self.depth = np.asarray(depth if depth is not None else [], dtype=float)
+        self.rebuild_fraction = rebuild_fraction
+        self._tree = None
+        self._n_indexed = 0
+        self._check_shapes()
+
+    def _check_shapes(self):
+        n = len(self.rrs)
+        if self.rrs.ndim != 2 or self.rrs.shape[1] != len(self.wavelength):
+            raise ValueError(f"Rrs must be (n_run, {len(self.wavelength)}), got {self.rrs.shape}")
+        if self.params.shape != (n, len(self.param_names)):
+            raise ValueError(f"params must be ({n}, {len(self.param_names)}), got {self.params.shape}")
+        if len(self.run_names) != n:
+            raise ValueError("run_names length does not match number of runs")
+        for key, cube in self.profiles.items():
+            if cube.shape[:2] != self.rrs.shape:
+                raise ValueError(f"Profile {key} has shape {cube.shape}, expected ({n}, {len(self.wavelength)}, ...)")
+
+    @classmethod
+    def build(cls, ensemble, profile_quantities=(), **kwargs):
+        """HydroLightEnsemble로부터 LUT 생성 (profile_quantities 예: ('Lu', 'Ed'))
+
+        파라미터는 ensemble.params에서 EXCLUDED_PARAMETERS (실행 시간 등)를 뺀 열이다.
+        """
+        params = ensemble.params.drop(columns=list(EXCLUDED_PARAMETERS), errors='ignore')
+        rrs = ensemble.cube('Rrs')
+        profiles = {q: ensemble.cube(q) for q in profile_quantities}
+        lut = cls(ensemble.wavelength, rrs, params.to_numpy(), list(params.columns),
+                  ensemble.names, profiles=profiles, depth=ensemble.depth, **kwargs)
+        lut.rebuild_index()
+        return lut
+
+    def __len__(self):
+        return len(self.rrs)
+
+    # ------------------------------------------------------------------
+    # 저장 / 읽기
+    # ------------------------------------------------------------------
+    def save(self, filepath):
+        """압축 npz 파일로 저장"""
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {f"profile_{k}": v for k, v in self.profiles.items()}
+        np.savez_compressed(filepath, wavelength=self.wavelength, rrs=self.rrs,
+                            params=self.params, param_names=np.asarray(self.param_names),
+                            run_names=self.run_names, depth=self.depth, **arrays)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath, **kwargs):
+        """save()로 저장한 LUT를 읽고 인덱스 생성"""
+        with np.load(filepath) as f:
+            profiles = {k[len("profile_"):]: f[k] for k in f.files if k.startswith("profile_")}
+            lut = cls(f['wavelength'], f['rrs'], f['params'], list(f['param_names']),
+                      f['run_names'], profiles=profiles, depth=f['depth'], **kwargs)
+        lut.rebuild_index()
+        return lut
+
+    # ------------------------------------------------------------------
+    # 인덱스
+    # ------------------------------------------------------------------
+    def rebuild_index(self):
+        """모든 run을 포함하도록 KD-tree 재생성"""
+        self._tree = cKDTree(self.rrs) if len(self.rrs) else None
+        self._n_indexed = len(self.rrs)
+
+    def append(self, rrs, params, run_names=None, profiles=None):
+        """run 추가 (트리는 pending이 충분히 쌓였을 때만 재생성)"""
+        rrs = np.atleast_2d(np.asarray(rrs, dtype=np.float32))
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        if run_names is None:
+            run_names = [f"run{i}" for i in range(len(self), len(self) + len(rrs))]
+        profiles = profiles or {}
+        if set(profiles) != set(self.profiles):
+            raise ValueError(f"Appended profiles {sorted(profiles)} do not match LUT profiles {sorted(self.profiles)}")
+
+        self.rrs = np.concatenate([self.rrs, rrs])
+        self.params = np.concatenate([self.params, params])
+        self.run_names = np.concatenate([self.run_names, np.asarray(run_names)])
+        for key in self.profiles:
+            self.profiles[key] = np.concatenate([self.profiles[key], np.asarray(profiles[key], dtype=np.float32)])
+        self._check_shapes()
+
+        n_pending = len(self) - self._n_indexed
+        if self._tree is None or n_pending > self.rebuild_fraction * self._n_indexed:
+            self.rebuild_index()
+
+    def append_ensemble(self, ensemble):
+        """HydroLightEnsemble의 run을 LUT에 추가"""
+        if len(ensemble.wavelength) != len(self.wavelength) or not np.allclose(ensemble.wavelength, self.wavelength):
+            raise ValueError("Ensemble wavelength grid does not match the LUT")
+        params = ensemble.params.reindex(columns=self.param_names)
+        profiles = {}
+        for q in self.profiles:
+            cube = ensemble.cube(q)
+            if cube.shape[2] != len(self.depth) or not np.allclose(ensemble.depth, self.depth):
+                raise ValueError(f"Ensemble depth grid does not match the LUT profile {q}")
+            profiles[q] = cube
+        self.append(ensemble.cube('Rrs'), params.to_numpy(), ensemble.names, profiles)
+
+    # ------------------------------------------------------------------
+    # 검색
+    # ------------------------------------------------------------------
+    def query(self, spectra, k=5, batch_size=65536, workers=-1):
+        """관측 Rrs 스펙트럼 (n, n_wavelength)에 대해 top-k run의 (거리, 인덱스) 반환 (LUT가 비어 있으면 ValueError)"""
+        spectra = np.atleast_2d(np.asarray(spectra, dtype=np.float32))
+        if spectra.shape[1] != len(self.wavelength):
+            raise ValueError(f"Spectra must have {len(self.wavelength)} bands, got {spectra.shape[1]}")
+        if not len(self):
+            raise ValueError("LUT is empty")
+        if self._tree is None:
+            self.rebuild_index()
+        k = min(k, len(self))
+        distances = np.empty((len(spectra), k))
+        indices = np.empty((len(spectra), k), dtype=np.int64)
+        pending = self.rrs[self._n_indexed:]
+
+        for start in range(0, len(spectra), batch_size):
+            batch = spectra[start:start + batch_size]
+            k_tree = min(k, self._n_indexed)
+            d, i = self._tree.query(batch, k=k_tree, workers=workers)
+            d = d.reshape(len(batch), k_tree)
+            i = i.reshape(len(batch), k_tree)
+
+            if len(pending):
+                # pending run은 brute-force 거리 계산 후 트리 결과와 병합
+                dp = np.sqrt(np.maximum(
+                    (batch ** 2).sum(1)[:, None] - 2.0 * batch @ pending.T + (pending ** 2).sum(1)[None, :], 0.0))
+                d = np.concatenate([d, dp], axis=1)
+                i = np.concatenate([i, np.broadcast_to(np.arange(self._n_indexed, len(self)), dp.shape)], axis=1)
+                order = np.argpartition(d, k - 1, axis=1)[:, :k]
+                d = np.take_along_axis(d, order, axis=1)
+                i = np.take_along_axis(i, order, axis=1)
+
+            order = np.argsort(d, axis=1)
+            distances[start:start + len(batch)] = np.take_along_axis(d, order, axis=1)
+            indices[start:start + len(batch)] = np.take_along_axis(i, order, axis=1)
+
+        return distances, indices
+
+    def lookup(self, indices):
+        """query 결과 인덱스에 해당하는 파라미터 (…, n_param) 반환"""
+        return self.params[indices]
@@ -0,0 +1,392 @@
+"""
+parse.py
+HydroLight 출력(printout) 파일 파서 - 표준 라이브러리와 numpy만 사용
+
+파일을 한 번만 훑으면서 각 블록 제목줄("Summary of Inherent Optical Properties at X nm" 등)로
+현재 테이블과 파장을 정하고, 숫자 행을 바로 (파장 x 깊이) 배열에 채운다.
+pandas/matplotlib를 import하지 않으므로 파싱만 하는 작업 프로세스가 빨리 시작된다.
+
+HydroLight는 바닥 행에서 -NaN, Inf를 앞 숫자와 붙여 출력하기도 한다
+(예: "6.7189E-01-NaN", "9.995Inf"). 이런 행은 정규식 tokenizer로 나누어 읽고,
+NaN/Inf 값은 NaN으로 저장한다.
+"""
+
+import re
+import numpy as np
+
+from .trace import stage, count
+
+
+# 출력 형식이나 저장하는 배열이 바뀌면 올림 (load_run 캐시 key에 포함)
+PARSE_VERSION = 3
+
+# 블록 제목줄 -> 테이블 이름
+SECTION_HEADERS = [
+    ("Absorption Coefficients of Individual Components at", "a_comp"),
+    ("Scattering Coefficients of Individual Components at", "b_comp"),
+    ("Backscattering Coefficients of Individual Components at", "bb_comp"),
+    ("Summary of Inherent Optical Properties at", "iops"),
+    ("Spectral Irradiances [units of W/(m^2 nm)]", "irradiances"),
+    ("Selected Spectral Radiances [units of W/(m^2 sr nm)]", "radiances"),
+    ("K-functions (units of 1/meter)", "kfunctions"),
+]
+
+# 테이블별 컬럼 (숫자 행의 token 순서)
+IOP_COLUMNS = ["iz", "Geo_Depth", "Opt_Depth", "total_a", "total_b", "total_c",
+               "albedo", "total_bb", "total_bb_over_b"]
+IRRADIANCE_COLUMNS = ["iz", "z_m", "zeta", "Eou", "Eod", "Eo", "Eu", "Ed",
+                      "mubar_u", "mubar_d", "mubar", "R"]
+RADIANCE_COLUMNS = ["iz", "z", "zeta", "Lu", "Ld", "Lh0", "Lh90", "Lh180", "Lu_over_Ed", "Q"]
+KFUNCTION_COLUMNS = ["zupper", "zlower", "depth", "Kou", "Kod", "Ko", "Ku", "Kd", "Knet", "KLu"]
+# Selected Radiances 블록의 in air 행: Lu, Ld, Lh(0), Lh(90), Lh(180), Lu/Ed, Q, Lw, Rrs
+IN_AIR_RADIANCE_COLUMNS = ["Lu", "Ld", "Lh0", "Lh90", "Lh180", "Lu_over_Ed", "Q", "Lw", "Rrs"]
+
+# 성분별 IOP 테이블: iz, Geo Depth, Opt Depth, Comp 1..n, Total (성분 수는 IOP 모델마다 다름)
+COMPONENT_TABLES = {"a_comp": "total_a", "b_comp": "total_b", "bb_comp": "total_bb"}
+
+COLUMNS = {"iops": IOP_COLUMNS, "irradiances": IRRADIANCE_COLUMNS,
+           "radiances": RADIANCE_COLUMNS, "kfunctions": KFUNCTION_COLUMNS}
+# 각 테이블에서 깊이로 쓰는 컬럼
+DEPTH_COLUMNS = {"iops": "Geo_Depth", "irradiances": "z_m", "radiances": "z", "kfunctions": "depth"}
+
+DEPTH_DECIMALS = 3
+
+_WAVELENGTH = re.compile(r"at\s+([\d.]+)\s*nm")
+# 붙어서 출력된 숫자도 나눌 수 있는 tokenizer (Fortran의 E 없는 3자리 지수는 E를 넣어서 읽음)
+_NUMBER = re.compile(r"[-+]?(?:(?:\d+\.?\d*|\.\d+)(?:[Ee][-+]?\d+)?|nan|inf(?:inity)?)", re.IGNORECASE)
+_FORTRAN_EXPONENT = re.compile(r"(\d\.\d+)([-+]\d{3})(?=\s|$)")
+
+
+def tokenize(text):
+    """숫자 행을 float list로 변환. 공백으로 나뉘지 않은 token도 정규식으로 분리"""
+    try:
+        return [float(p) for p in text.split()]
+    except ValueError:
+        pass
+    text = _FORTRAN_EXPONENT.sub(r"\1E\2", text)
+    return [float(p) for p in _NUMBER.findall(text)]
+
+
+def read_lines(filepath):
+    """HydroLight 출력 파일을 라인 list로 읽기"""
+    with stage("parse.read"), open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.readlines()
+
+
+def scan_tables(raw_lines):
+    """파일을 한 번 훑어서 테이블별 행 목록 수집
+
+    반환: {테이블 이름: (파장 list, 행 list)} 와 in air 행 목록 {파장: 값 list}
+    """
+    tables = {name: ([], []) for name in list(COLUMNS) + list(COMPONENT_TABLES)}
+    in_air = {}
+    section = None
+    width = 0
+    wavelength = None
+    n_rows = 0
+    n_dropped = 0
+    for line in raw_lines:
+        s = line.strip()
+        if not s:
+            continue
+        c = s[0]
+        if c.isdigit() or c in "-+.":
+            if section is None:
+                continue
+            values = tokenize(s)
+            if len(values) < width:
+                # 잘린 행: 다른 테이블이 시작된 것은 아니므로 건너뛰기만 함
+                n_dropped += 1
+                continue
+            waves, rows = tables[section]
+            waves.append(wavelength)
+            rows.append(values[:width])
+            n_rows += 1
+            continue
+
+        if s.startswith("in air"):
+            if section == "radiances":
+                values = tokenize(s[6:])
+                if len(values) >= len(IN_AIR_RADIANCE_COLUMNS):
+                    in_air[wavelength] = values[:len(IN_AIR_RADIANCE_COLUMNS)]
+            continue
+
+        # 숫자 행이 나온 뒤의 글자 행은 테이블의 끝
+        if section is not None and n_rows:
+            section = None
+        if not c.isalpha():
+            continue
+        if section in COMPONENT_TABLES and s.startswith("iz"):
+            # 성분 테이블의 폭은 컬럼 제목줄의 "Comp n" 개수로 정함
+            width = 4 + s.count("Comp")
+            continue
+        for header, name in SECTION_HEADERS:
+            if s.startswith(header):
+                match = _WAVELENGTH.search(s)
+                if match:
+                    section = name
+                    # 성분 테이블은 컬럼 제목줄을 읽기 전까지 숫자 행을 받지 않음
+                    width = len(COLUMNS[name]) if name in COLUMNS else 10 ** 6
+                    wavelength = float(match.group(1))
+                    n_rows = 0
+                break
+    count("lines_scanned", len(raw_lines))
+    count("rows_decoded", sum(len(rows) for _, rows in tables.values()) + len(in_air))
+    count("rows_dropped", n_dropped)
+    return tables, in_air
+
+
+def _as_array(rows, width):
+    """행 list -> (n_row, width) float 배열. NaN/Inf는 NaN으로"""
+    if not rows:
+        return np.empty((0, width))
+    if len({len(r) for r in rows}) > 1:
+        # 성분 수가 다른 테이블이 섞인 경우 (잘린 파일 등): 가장 짧은 폭에 맞춤
+        width = min(len(r) for r in rows)
+        rows = [r[:width] for r in rows]
+    table = np.array(rows, dtype=float)
+    table[~np.isfinite(table)] = np.nan
+    return table
+
+
+def _fill(table, columns, depth_column, names, wavelength, grid, iw):
+    """(n_row, n_column) 테이블 -> {이름: (n_wavelength, n_depth)} 배열"""
+    arrays = {q: np.full((len(wavelength), len(grid)), np.nan) for q in names}
+    if not len(table):
+        return arrays
+    iz = np.searchsorted(grid, np.round(table[:, columns.index(depth_column)], DEPTH_DECIMALS))
+    for q in names:
+        arrays[q][iw, iz] = table[:, columns.index(q)]
+    return arrays
+
+
+def parse_lines(raw_lines):
+    """HydroLight 출력 라인 -> 파장 x 깊이 배열
+
+    반환 dict:
+        wavelength, depth (irradiance/radiance 출력 깊이의 합집합), k_depth,
+        tables ({테이블 이름: (파장 배열, (n_row, n_column) 배열)}, 원래 행 그대로.
+                테이블 이름은 COLUMNS와 COMPONENT_TABLES의 key, Selected Radiances in air 행의 "in_air"),
+        arrays ({양 이름: (n_wavelength, n_depth) 또는 (n_wavelength,) 배열,
+                 성분별 계수 a_comp/b_comp/bb_comp는 (n_wavelength, n_depth, n_component)})
+    """
+    with stage("parse.scan"):
+        rows, in_air = scan_tables(raw_lines)
+    with stage("parse.tables"):
+        tables = {name: (np.array(waves, dtype=float), _as_array(values, len(COLUMNS.get(name, IOP_COLUMNS))))
+                  for name, (waves, values) in rows.items()}
+
+    all_waves = [tables[name][0] for name in COLUMNS] + [np.array(list(in_air), dtype=float)]
+    wavelength = np.unique(np.concatenate(all_waves))
+    depth_parts = [np.round(tables[name][1][:, COLUMNS[name].index(DEPTH_COLUMNS[name])], DEPTH_DECIMALS)
+                   for name in ("irradiances", "radiances")]
+    depth = np.unique(np.concatenate(depth_parts))
+    k_table = tables["kfunctions"][1]
+    k_depth = np.unique(np.round(k_table[:, KFUNCTION_COLUMNS.index("depth")], DEPTH_DECIMALS))
+
+    arrays = {}
+    for name, names, grid in [("irradiances", IRRADIANCE_COLUMNS[3:], depth),
+                              ("radiances", RADIANCE_COLUMNS[3:], depth),
+                              ("iops", IOP_COLUMNS[3:], depth),
+                              ("kfunctions", KFUNCTION_COLUMNS[3:], k_depth)]:
+        waves, table = tables[name]
+        if name == "iops" and len(table):
+            # IOP 깊이 중 출력 깊이 그리드에 있는 것만 사용
+            keep = np.isin(np.round(table[:, 1], DEPTH_DECIMALS), depth)
+            waves, table = waves[keep], table[keep]
+        with stage(f"parse.fill.{name}"):
+            iw = np.searchsorted(wavelength, waves)
+            arrays.update(_fill(table, COLUMNS[name], DEPTH_COLUMNS[name], names, wavelength, grid, iw))
+    # 성분별 계수: (n_wavelength, n_depth, n_component), 마지막 Total 컬럼은 제외
+    for name in COMPONENT_TABLES:
+        waves, table = tables[name]
+        if not len(table):
+            continue
+        with stage(f"parse.fill.{name}"):
+            keep = np.isin(np.round(table[:, 1], DEPTH_DECIMALS), depth)
+            waves, table = waves[keep], table[keep]
+            values = np.full((len(wavelength), len(depth), table.shape[1] - 4), np.nan)
+            iz = np.searchsorted(depth, np.round(table[:, 1], DEPTH_DECIMALS))
+            values[np.searchsorted(wavelength, waves), iz] = table[:, 3:-1]
+            arrays[name] = values
+    # 광학 깊이(zeta)는 irradiance 테이블 것을 사용
+    arrays["zeta"] = _fill(tables["irradiances"][1], IRRADIANCE_COLUMNS, "z_m", ["zeta"],
+                           wavelength, depth, np.searchsorted(wavelength, tables["irradiances"][0]))["zeta"]
+
+    surface = _as_array(list(in_air.values()), len(IN_AIR_RADIANCE_COLUMNS))
+    tables["in_air"] = (np.array(list(in_air), dtype=float), surface)
+    iw = np.searchsorted(wavelength, tables["in_air"][0])
+    # 수면 위 양: Lw, Rrs와 수면 위(in air) Lu ('Lu_air')
+    for q, column in (("Lw", "Lw"), ("Rrs", "Rrs"), ("Lu_air", "Lu")):
+        arrays[q] = np.full(len(wavelength), np.nan)
+        arrays[q][iw] = surface[:, IN_AIR_RADIANCE_COLUMNS.index(column)]
+
+    return {'wavelength': wavelength, 'depth': depth, 'k_depth': k_depth,
+            'tables': tables, 'arrays': arrays}
+
+
+def parse_file(filepath):
+    """HydroLight 출력 파일 -> parse_lines() 결과"""
+    return parse_lines(read_lines(filepath))
+
+
+# ----------------------------------------------------------------------
+# run 메타데이터
+# ----------------------------------------------------------------------
+def _first_float(pattern, text):
+    match = re.search(pattern, text)
+    if match is None:
+        return float('nan')
+    try:
+        return float(match.group(1))
+    except ValueError:
+        return float('nan')
+
+
+def parse_concentration_table(raw_lines):
+    """출력 깊이별 성분 농도 테이블 (depth, chl[, acdom440, minerals]) -> {컬럼: 배열}"""
+    start = None
+    for i, line in enumerate(raw_lines):
+        if ("component concentrations at the requested output depths" in line
+                or "chlorophyll values at the requested output depths" in line):
+            start = i
+            break
+    if start is None:
+        return {}
+
+    header = None
+    rows = []
+    for line in raw_lines[start + 1:]:
+        s = line.strip()
+        if header is None:
+            if s.startswith("depth"):
+                header = s.split()
+            continue
+        if not s or s.startswith("("):
+            if rows:
+                break
+            continue
+        try:
+            rows.append([float(x) for x in s.split()[:len(header)]])
+        except ValueError:
+            break
+
+    if not rows:
+        return {}
+
+    names = {"depth": "depth", "Chl": "chl", "a_CDOM(440)": "acdom440", "minerals": "minerals"}
+    table = np.array(rows, dtype=float)
+    return {names.get(h, h): table[:, j] for j, h in enumerate(header[:table.shape[1]])}
+
+
+def parse_color_summary(raw_lines):
+    """HydroLight가 출력한 CIE 1931 (x, y, Y) 표와 Forel-Ule 번호
+
+    반환: ({양: {'air': [x, y, Y], 'depth': [...], 'xyY': [[x, y, Y], ...]}}, {'Rrs': FU, 'Lu_air': FU, 'Lw': FU})
+    -NaN 값은 NaN, 표가 없으면 빈 dict.
+    """
+    colors = {}
+    start = None
+    for i, line in enumerate(raw_lines):
+        if line.lstrip().startswith("CIE 1931 chromaticity coordinates"):
+            start = i
+            break
+    if start is not None:
+        names = None
+        for line in raw_lines[start + 1:]:
+            s = line.strip()
+            if names is None:
+                if s.startswith("depth"):
+                    names = s.split()[1:]
+                    colors = {name: {'air': None, 'depth': [], 'xyY': []} for name in names}
+                continue
+            if not s:
+                if any(c['depth'] for c in colors.values()):
+                    break
+                continue
+            if "(" not in s:
+                break
+            label = s[:s.index("(")].strip()
+            tuples = re.findall(r"\(([^)]*)\)", s)
+            for name, values in zip(names, tuples):
+                try:
+                    xyY = [float(v) for v in values.split(",")]
+                except ValueError:
+                    xyY = [float('nan')] * 3
+                if label == "in air":
+                    colors[name]['air'] = xyY
+                else:
+                    colors[name]['depth'].append(float(label))
+                    colors[name]['xyY'].append(xyY)
+
+    forel_ule = {}
+    for key, pattern in [('Rrs', r"Forel-Ule number of the nadir-viewing Rrs is FU =\s*(\d+)"),
+                         ('Lu_air', r"Forel-Ule number of the nadir-viewing, in-air Lu is FU =\s*(\d+)"),
+                         ('Lw', r"Forel-Ule number of the nadir-viewing Lw is FU =\s*(\d+)")]:
+        match = re.search(pattern, "".join(raw_lines[start or 0:]))
+        if match:
+            forel_ule[key] = int(match.group(1))
+    return colors, forel_ule
+
+
+def parse_band_timings(raw_lines):
+    """'Waveband N of M completed in X sec.' 줄 -> (밴드별 초 배열 (밴드 번호 순), M)"""
+    pattern = re.compile(r"Waveband\s+(\d+)\s+of\s+(\d+)\s+completed in\s+([-+\d.Ee]+)\s*sec")
+    timings = {}
+    total = 0
+    for line in raw_lines:
+        if "Waveband" in line:
+            match = pattern.search(line)
+            if match:
+                timings[int(match.group(1))] = float(match.group(3))
+                total = int(match.group(2))
+    return np.array([timings[k] for k in sorted(timings)], dtype=float), total
+
+
+def parse_run_metadata(raw_lines):
+    """HydroLight 출력 헤더/요약부에서 run 메타데이터 추출"""
+    text = "".join(raw_lines)
+    meta = {}
+
+    match = re.search(r"RUN TITLE:\s*(.*?)\s*$", text, re.MULTILINE)
+    meta['title'] = match.group(1) if match else ""
+    match = re.search(r'The "(.+?)" IOP (?:model|routine)', text)
+    meta['iop_model'] = match.group(1) if match else ""
+
+    # 입력 농도 프로파일 파일 (C:/HE60/run/... 경로)
+    for key, pattern in [('chl_file', r"Chl\(z\) is obtained from measured values read from file:\s*\n\s*(\S+)"),
+                         ('cdom_file', r"a_CDOM\(z,lambda0\) at a reference wavelength lambda0\s*\n.*?read from the file:\s*\n\s*(\S+)"),
+                         ('mineral_file', r"Min\(z\) is obtained from measured values read from file:\s*\n\s*(\S+)"),
+                         ('bottom_file', r"bottom reflectance R is obtained from measured values read from a file named:\s*\n\s*(\S+)")]:
+        match = re.search(pattern, text)
+        meta[key] = match.group(1) if match else ""
+
+    conc = parse_concentration_table(raw_lines)
+    for key in ["chl", "acdom440", "minerals"]:
+        meta[key] = float(np.mean(conc[key])) if key in conc else float('nan')
+    if np.isnan(meta['chl']):
+        meta['chl'] = _first_float(r"chlorophyll concentration is constant with depth with a value of\s+([\d.]+)", text)
+
+    if "bottom boundary is an infinitely deep" in text:
+        meta['bottom_type'] = "infinite"
+    elif "bottom boundary is an opaque reflecting surface" in text:
+        meta['bottom_type'] = "opaque"
+    else:
+        meta['bottom_type'] = ""
+    meta['bottom_depth'] = _first_float(r"bottom boundary is .*? depth\s+([\d.]+)\s*m", text)
+    meta['bottom_R'] = _first_float(r"R is constant at all wavelengths with the value:\s*\n\s*R =\s*([\d.]+)", text)
+
+    meta['sun_zenith'] = _first_float(r"Solar zenith\s+angle =\s*([\d.]+)", text)
+    meta['wind_speed'] = _first_float(r"wind speed of\s+([\d.]+)\s*m/s", text)
+    meta['cloud'] = _first_float(r"cloud fraction is cloud =\s*([\d.]+)", text)
+    meta['wall_clock_s'] = _first_float(r"Total \(wall clock\) run time =\s*([-+\d.Ee]+)\s*sec", text)
+    meta['normal_exit'] = "Normal exit from HydroLight" in text
+
+    # 성분 설명 ("Component 1 is pure water" ...)과 계산할 밴드 수 ("Waveband 1 of 60 completed")
+    meta['components'] = re.findall(r"^\s*Component \d+ is (.+?)\s*$", text, re.MULTILINE)
+    match = re.search(r"Waveband\s+\d+\s+of\s+(\d+)\s+completed", text)
+    meta['n_bands_expected'] = int(match.group(1)) if match else 0
+
+    # HydroLight가 계산한 색 (color 모듈 검증용)
+    meta['cie_xyY'], meta['forel_ule'] = parse_color_summary(raw_lines)
+    return meta
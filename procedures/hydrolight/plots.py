@@ -0,0 +1,477 @@
+"""
+plots.py
+HydroLight run의 깊이/파장별 플롯 (P03_parse_HL_results.py에서 사용)
+
+matplotlib은 플롯 함수가 처음 호출될 때 import한다 (pyplot()).
+"""
+
+import numpy as np
+from pathlib import Path
+
+from .ensemble import HydroLightRun
+from .trace import stage, count, echo
+
+
+def pyplot():
+    """Agg backend로 matplotlib.pyplot을 import하여 반환 (처음 호출할 때만 import 비용)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def save_figure(plt, output_file, dpi=300):
+    """현재 figure를 저장하고 닫음 (figure 수와 파일 크기를 trace counter에 기록)"""
+    with stage("plot.savefig"):
+        plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    count("figures_rendered")
+    count("bytes_written", Path(output_file).stat().st_size)
+    echo(f"Saved: {output_file}")
+    plt.close()
+
+
+def plot_iops(run, output_dir):
+    """IOPs 플롯 생성"""
+    plt = pyplot()
+    if not np.isfinite(run['total_a']).any():
+        echo("No IOPs data to plot")
+        return
+    
+    echo("\nPlotting IOPs...")
+    wavelengths = run.wavelength
+    colors = plt.cm.jet(np.linspace(0, 1, len(wavelengths)))
+    
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    fig.suptitle('Inherent Optical Properties vs Depth', fontsize=14, fontweight='bold')
+    
+    # Total absorption
+    ax = axes[0, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['total_a'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Total Absorption a (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(a) Total Absorption', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Total scattering
+    ax = axes[0, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['total_b'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Total Scattering b (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(b) Total Scattering', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Albedo
+    ax = axes[1, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['albedo'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Single Scattering Albedo ω₀', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(c) Single Scattering Albedo', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Backscattering ratio
+    ax = axes[1, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['total_bb_over_b'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Backscattering Ratio bb/b', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(d) Backscattering Ratio', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'IOPs_vs_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_irradiances(run, output_dir):
+    """Irradiances 플롯 생성"""
+    plt = pyplot()
+    if not np.isfinite(run['Ed']).any():
+        echo("No irradiances data to plot")
+        return
+    
+    echo("\nPlotting Irradiances...")
+    wavelengths = run.wavelength
+    colors = plt.cm.jet(np.linspace(0, 1, len(wavelengths)))
+    
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    fig.suptitle('Spectral Irradiances vs Depth', fontsize=14, fontweight='bold')
+    
+    # Downward irradiance Ed
+    ax = axes[0, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Ed'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Ed [W/(m² nm)]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(a) Downward Irradiance Ed', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Upward irradiance Eu
+    ax = axes[0, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Eu'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Eu [W/(m² nm)]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(b) Upward Irradiance Eu', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Scalar irradiance Eo
+    ax = axes[1, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Eo'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Eo [W/(m² nm)]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(c) Scalar Irradiance Eo', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Irradiance reflectance R
+    ax = axes[1, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['R'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('R = Eu/Ed', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(d) Irradiance Reflectance R', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Irradiances_vs_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_radiances(run, output_dir):
+    """Radiances 플롯 생성"""
+    plt = pyplot()
+    if not np.isfinite(run['Lu']).any():
+        echo("No radiances data to plot")
+        return
+    
+    echo("\nPlotting Radiances...")
+    wavelengths = run.wavelength
+    colors = plt.cm.jet(np.linspace(0, 1, len(wavelengths)))
+    
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    fig.suptitle('Spectral Radiances vs Depth', fontsize=14, fontweight='bold')
+    
+    # Upwelling radiance Lu
+    ax = axes[0, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Lu'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Lu [W/(m² sr nm)]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(a) Upwelling Radiance Lu', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Downwelling radiance Ld
+    ax = axes[0, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Ld'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Ld [W/(m² sr nm)]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(b) Downwelling Radiance Ld', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Lu/Ed ratio
+    ax = axes[1, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.semilogx(run['Lu_over_Ed'][i], run.depth, '-o', color=colors[i], 
+                    label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Lu/Ed [1/sr]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(c) Radiance-Irradiance Ratio Lu/Ed', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3, which='both')
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Q factor
+    ax = axes[1, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['Q'][i], run.depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Q = Eu/Lu [sr]', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(d) Q Factor (Eu/Lu)', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Radiances_vs_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_kfunctions(run, output_dir):
+    """K-functions 플롯 생성"""
+    plt = pyplot()
+    if not np.isfinite(run['Kd']).any():
+        echo("No K-functions data to plot")
+        return
+    
+    echo("\nPlotting K-functions...")
+    wavelengths = run.wavelength
+    colors = plt.cm.jet(np.linspace(0, 1, len(wavelengths)))
+    
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    fig.suptitle('K-functions vs Depth', fontsize=14, fontweight='bold')
+    
+    # Kd
+    ax = axes[0, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['Kd'][i], run.k_depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Kd (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(a) Diffuse Attenuation Kd', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Ku
+    ax = axes[0, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['Ku'][i], run.k_depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Ku (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(b) Upwelling Attenuation Ku', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # Ko
+    ax = axes[1, 0]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['Ko'][i], run.k_depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('Ko (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(c) Scalar Irradiance Attenuation Ko', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    # KLu
+    ax = axes[1, 1]
+    for i, wl in enumerate(wavelengths):
+        ax.plot(run['KLu'][i], run.k_depth, '-o', color=colors[i], 
+                label=f'{int(wl)} nm', markersize=4)
+    ax.set_xlabel('KLu (1/m)', fontsize=10)
+    ax.set_ylabel('Depth (m)', fontsize=10)
+    ax.set_title('(d) Upwelling Radiance Attenuation KLu', fontweight='bold')
+    ax.invert_yaxis()
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7, ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Kfunctions_vs_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_R_vs_wavelength(run, output_dir):
+    """Depth별 Irradiance Reflectance vs Wavelength 플롯"""
+    plt = pyplot()
+    if not np.isfinite(run['R']).any():
+        echo("No irradiances data to plot")
+        return
+    
+    echo("\nPlotting Irradiance Reflectance vs Wavelength...")
+    depths = run.depth
+    colors = plt.cm.viridis(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        values = run['R'][:, i]
+        if np.all(np.isnan(values)):
+            continue
+        ax.plot(run.wavelength, values, '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Irradiance Reflectance R = Eu/Ed', fontsize=12)
+    ax.set_title('Irradiance Reflectance vs Wavelength by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'R_vs_wavelength_by_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_Lu_vs_wavelength(run, output_dir):
+    """Depth별 Upwelling Radiance vs Wavelength 플롯"""
+    plt = pyplot()
+    if not np.isfinite(run['Lu']).any():
+        echo("No radiances data to plot")
+        return
+    
+    echo("\nPlotting Upwelling Radiance vs Wavelength...")
+    depths = run.depth
+    colors = plt.cm.viridis(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        values = run['Lu'][:, i]
+        if np.all(np.isnan(values)):
+            continue
+        ax.plot(run.wavelength, values, '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Upwelling Radiance Lu [W/(m² sr nm)]', fontsize=12)
+    ax.set_title('Upwelling Radiance vs Wavelength by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Lu_vs_wavelength_by_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_Ed_vs_wavelength(run, output_dir):
+    """Depth별 Downward Irradiance vs Wavelength 플롯"""
+    plt = pyplot()
+    if not np.isfinite(run['Ed']).any():
+        echo("No irradiances data to plot")
+        return
+    
+    echo("\nPlotting Downward Irradiance vs Wavelength...")
+    depths = run.depth
+    colors = plt.cm.viridis(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        values = run['Ed'][:, i]
+        if np.all(np.isnan(values)):
+            continue
+        ax.plot(run.wavelength, values, '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Downward Irradiance Ed [W/(m² nm)]', fontsize=12)
+    ax.set_title('Downward Irradiance vs Wavelength by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Ed_vs_wavelength_by_depth.png'
+    save_figure(plt, output_file)
+
+
+def plot_Lu_Ed_ratio_vs_wavelength(run, output_dir):
+    """Depth별 Lu/Ed 비율 vs Wavelength 플롯"""
+    plt = pyplot()
+    if not np.isfinite(run['Lu_Ed']).any():
+        echo("No data to plot Lu/Ed ratio")
+        return
+    
+    echo("\nPlotting Lu/Ed Ratio vs Wavelength...")
+    
+    # 플롯
+    depths = run.depth
+    colors = plt.cm.viridis(np.linspace(0, 1, len(depths)))
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    
+    for i, depth in enumerate(depths):
+        values = run['Lu_Ed'][:, i]
+        if np.all(np.isnan(values)):
+            continue
+        ax.plot(run.wavelength, values, '-o', color=colors[i], 
+                linewidth=2, markersize=4, label=f'{depth:.1f} m')
+    
+    ax.set_xlabel('Wavelength (nm)', fontsize=12)
+    ax.set_ylabel('Lu/Ed Ratio [sr⁻¹]', fontsize=12)
+    ax.set_title('Lu/Ed Ratio vs Wavelength by Depth', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=9, title='Depth', ncol=2)
+    
+    plt.tight_layout()
+    output_file = output_dir / 'Lu_Ed_ratio_vs_wavelength_by_depth.png'
+    save_figure(plt, output_file)
+
+
+# process_file()이 그리는 플롯 (깊이별 프로파일, 추가 플롯: wavelength별 depth 비교)
+RUN_PLOTS = [plot_iops, plot_irradiances, plot_radiances, plot_kfunctions,
+             plot_R_vs_wavelength, plot_Lu_vs_wavelength, plot_Ed_vs_wavelength,
+             plot_Lu_Ed_ratio_vs_wavelength]
+
+
+def process_file(data_file, output_root, run=None):
+    """HydroLight 출력 파일 하나의 모든 플롯을 output_root/<파일명>/ 에 저장
+
+    run이 주어지면 (예: 캐시에서 읽은 run) 파일을 다시 파싱하지 않는다.
+    """
+    data_file = Path(data_file)
+    # 파일명에서 확장자를 제거하여 출력 폴더명 생성
+    file_name = data_file.stem  # 'PExe01'
+    output_dir = Path(output_root) / file_name
+    
+    # 출력 디렉토리 생성
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 로그 파일 설정 (여러 파일을 동시에 처리할 수 있도록 출력 폴더에 저장)
+    with open(output_dir / 'P03_execution.log', 'w', encoding='utf-8') as log_file:
+        def log_print(msg):
+            echo(msg)
+            log_file.write(msg + '\n')
+            log_file.flush()
+        
+        log_print("="*50)
+        log_print("P03_parse_HL_results.py STARTED")
+        log_print("="*50)
+        log_print(f"\nData file: {data_file}")
+        log_print(f"Output directory: {output_dir}")
+        
+        # 파일 파싱
+        if run is None:
+            run = HydroLightRun.from_file(data_file)
+        log_print(f"Parsed: {run}")
+        
+        # 플롯 생성
+        echo("\n" + "="*50)
+        echo("Creating plots...")
+        echo("="*50)
+        
+        for plot in RUN_PLOTS:
+            with stage(f"plot.{plot.__name__}"):
+                plot(run, output_dir)
+        
+        log_print("\n" + "="*50)
+        log_print("All plots completed!")
+        log_print("="*50)
+        log_print(f"\nResults saved in: {output_dir}")
+    return output_dir
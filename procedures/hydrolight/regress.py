@@ -0,0 +1,239 @@
+"""
+regress.py
+새 HydroLight 출력을 저장해 둔 기준(reference) 파싱 결과와 비교하는 regression 검사
+
+HydroLight 버전을 올리거나 IOP 입력을 바꾼 뒤, 어떤 run이 허용 오차보다 크게 바뀌었는지 확인한다.
+    1) save_references(files, reference_dir): 기준 run을 <reference_dir>/<run 이름>.npz로 저장
+    2) check_files(files, reference_dir): 같은 이름의 기준과 비교 -> 보고서 dict (JSON 저장 가능)
+
+허용 오차는 양별 (atol, rtol)이며, 셀이 |new - ref| > atol + rtol * |ref| 이거나 한쪽만 NaN/Inf이면
+위반(breach)이다. 셀별 초과 비율 excess = |new - ref| / (atol + rtol * |ref|)로 가장 나쁜 셀을 고른다.
+배열 비교는 run마다 양 전체를 한 번에 계산하고, 새 출력은 파싱 캐시(load_run)로 읽는다.
+"""
+
+import json
+import heapq
+import contextlib
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from .parse import DEPTH_DECIMALS
+from .validate import describe
+from .ensemble import HydroLightRun, load_run, KFUNCTION_QUANTITIES
+
+
+# 양별 (atol, rtol). 목록에 없는 양은 DEFAULT_TOLERANCE
+DEFAULT_TOLERANCE = (0.0, 1e-3)
+TOLERANCES = {
+    "Rrs": (1e-6, 1e-3),
+    "Lw": (1e-6, 1e-3),
+    "Lu_air": (1e-6, 1e-3),
+    "a_comp": (5e-4, 1e-3),
+    "b_comp": (5e-4, 1e-3),
+    "bb_comp": (5e-5, 1e-3),
+}
+for _q in KFUNCTION_QUANTITIES:
+    TOLERANCES[_q] = (1e-4, 1e-3)
+
+# 비교하지 않는 배열 (검사 결과 mask 등)
+SKIP_QUANTITIES = ("quality",)
+
+
+def tolerance(quantity, tolerances=None):
+    """quantity의 (atol, rtol): tolerances > TOLERANCES > tolerances['default'] > DEFAULT_TOLERANCE"""
+    tolerances = tolerances or {}
+    if quantity in tolerances:
+        return tolerances[quantity]
+    if quantity in TOLERANCES:
+        return TOLERANCES[quantity]
+    return tolerances.get("default", DEFAULT_TOLERANCE)
+
+
+def reference_file(reference_dir, name):
+    return Path(reference_dir) / f"{name}.npz"
+
+
+def save_references(files, reference_dir, cache_dir=None):
+    """기준 run 저장 (같은 이름의 기존 기준은 덮어씀) -> 저장한 파일 목록"""
+    return [load_run(f, cache_dir).save(reference_file(reference_dir, Path(f).stem)) for f in files]
+
+
+def excess_ratio(new, ref, atol, rtol):
+    """셀별 |new - ref| / (atol + rtol*|ref|) (둘 다 NaN이면 0, 한쪽만 유한하면 inf)"""
+    new = np.asarray(new, dtype=float)
+    ref = np.asarray(ref, dtype=float)
+    finite_new, finite_ref = np.isfinite(new), np.isfinite(ref)
+    both = finite_new & finite_ref
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.abs(new - ref) / (atol + rtol * np.abs(ref))
+    # 0/0 (허용 오차 0, 같은 값)은 0, 값이 다른데 허용 오차가 0이면 inf
+    ratio = np.where(both, np.nan_to_num(ratio, nan=0.0, posinf=np.inf), 0.0)
+    ratio[finite_new != finite_ref] = np.inf
+    return ratio
+
+
+def _common_index(new_grid, ref_grid):
+    """두 깊이 그리드의 공통 값 인덱스 (new 인덱스, ref 인덱스)"""
+    _, i_new, i_ref = np.intersect1d(np.round(new_grid, DEPTH_DECIMALS), np.round(ref_grid, DEPTH_DECIMALS),
+                                     return_indices=True)
+    return i_new, i_ref
+
+
+def compare_runs(new, ref, tolerances=None, top=10):
+    """run 하나 비교 -> (run 결과 dict, 가장 나쁜 셀 목록)
+
+    run 결과: status ('ok', 'breach', 'grid'), problems, 양별 위반 셀 수와 최대 excess.
+    셀 목록: excess가 큰 순서로 최대 top개 (위반이 아닌 셀 포함).
+    """
+    result = {'name': new.name, 'status': "ok", 'problems': [], 'n_breach': {}, 'max_excess': {}}
+    if len(new.wavelength) != len(ref.wavelength) or not np.allclose(new.wavelength, ref.wavelength):
+        result['status'] = "grid"
+        result['problems'].append(f"wavelength grid differs ({len(new.wavelength)} vs "
+                                  f"{len(ref.wavelength)} bands)")
+        return result, []
+    grids = {False: _common_index(new.depth, ref.depth), True: _common_index(new.k_depth, ref.k_depth)}
+    if len(grids[False][0]) != len(ref.depth) or len(new.depth) != len(ref.depth):
+        result['problems'].append(f"depth grid differs ({len(new.depth)} vs {len(ref.depth)} depths), "
+                                  f"compared {len(grids[False][0])} common depths")
+    flags = (new.metadata.get('quality_flags', 0), ref.metadata.get('quality_flags', 0))
+    if flags[0] != flags[1]:
+        result['problems'].append(f"quality flags changed: [{' '.join(describe(flags[1]))}] -> "
+                                  f"[{' '.join(describe(flags[0]))}]")
+    missing = sorted(set(ref.arrays) - set(new.arrays) - set(SKIP_QUANTITIES))
+    if missing:
+        result['problems'].append("missing quantities: " + " ".join(missing))
+
+    worst = []
+    for quantity in sorted(set(ref.arrays) & set(new.arrays)):
+        if quantity in SKIP_QUANTITIES:
+            continue
+        a, b = np.asarray(new.arrays[quantity]), np.asarray(ref.arrays[quantity])
+        k_grid = quantity in KFUNCTION_QUANTITIES
+        depth = new.k_depth if k_grid else new.depth
+        if a.ndim >= 2:
+            i_new, i_ref = grids[k_grid]
+            a, b = a[:, i_new], b[:, i_ref]
+            depth = depth[i_new]
+        if a.shape != b.shape:
+            result['problems'].append(f"{quantity} shape differs {a.shape} vs {b.shape}")
+            result['n_breach'][quantity] = int(b.size)
+            result['max_excess'][quantity] = float('inf')
+            continue
+        atol, rtol = tolerance(quantity, tolerances)
+        ratio = excess_ratio(a, b, atol, rtol)
+        n_breach = int(np.count_nonzero(ratio > 1))
+        result['n_breach'][quantity] = n_breach
+        result['max_excess'][quantity] = float(ratio.max()) if ratio.size else 0.0
+        if not ratio.size:
+            continue
+        flat = ratio.ravel()
+        k = min(top, flat.size)
+        for index in np.argpartition(flat, -k)[-k:]:
+            worst.append((flat[index], quantity, index, ratio.shape, a, b, depth, atol, rtol))
+
+    if any(result['n_breach'].values()) or result['problems']:
+        result['status'] = "breach"
+    # 셀 정보(dict)는 run 전체에서 고른 top개만 만든다
+    cells = []
+    for excess, quantity, index, shape, a, b, depth, atol, rtol in heapq.nlargest(top, worst, key=lambda e: e[0]):
+        cell = np.unravel_index(index, shape)
+        entry = {'excess': float(excess), 'run': new.name, 'quantity': quantity,
+                 'wavelength': float(new.wavelength[cell[0]]),
+                 'depth': float(depth[cell[1]]) if len(cell) > 1 else None,
+                 'new': float(a[cell]), 'reference': float(b[cell]), 'atol': atol, 'rtol': rtol}
+        if len(cell) > 2:
+            entry['component'] = int(cell[2]) + 1
+        cells.append(entry)
+    return result, cells
+
+
+def _check_file(filepath, reference_dir, tolerances, top, cache_dir):
+    """파일 하나 비교 -> (run 결과, 가장 나쁜 셀 목록) (프로세스 풀에서도 실행)"""
+    name = Path(filepath).stem
+    ref_path = reference_file(reference_dir, name)
+    cells = []
+    if not ref_path.exists():
+        result = {'name': name, 'status': "no_reference", 'problems': [f"no reference {ref_path}"]}
+    else:
+        try:
+            result, cells = compare_runs(load_run(filepath, cache_dir), HydroLightRun.load(ref_path),
+                                         tolerances, top)
+        except (OSError, ValueError, KeyError) as e:
+            result = {'name': name, 'status': "error", 'problems': [f"{type(e).__name__}: {e}"]}
+    result['path'] = str(filepath)
+    return result, cells
+
+
+def check_files(files, reference_dir, tolerances=None, fail_fast=False, top=20, cache_dir=None, jobs=1):
+    """새 출력 파일들을 기준과 비교 -> 보고서 dict
+
+    fail_fast이면 (입력 순서로) 첫 번째 위반 run에서 멈춘다 (보고서의 'stopped_early' = True).
+    jobs > 1이면 프로세스 풀에서 비교하고, fail_fast로 멈추면 아직 시작하지 않은 비교는 취소한다.
+    기준이 없는 파일은 status 'no_reference', 읽지 못한 파일은 'error'.
+    보고서:
+        passed      모든 run이 ok인지
+        counts      status별 run 수
+        runs        run별 결과 (status, problems, 양별 위반 셀 수/최대 excess)
+        worst       전체에서 excess가 가장 큰 셀 top개 (run, quantity, wavelength, depth, new, reference)
+    """
+    files = [str(f) for f in files]
+    args = (reference_dir, tolerances, top, cache_dir)
+    runs = []
+    worst = []
+    stopped = False
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(files) > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=jobs))
+            futures = [pool.submit(_check_file, f, *args) for f in files]
+            outcomes = (future.result() for future in futures)
+            stack.callback(lambda: [future.cancel() for future in futures])
+        else:
+            outcomes = (_check_file(f, *args) for f in files)
+        for result, cells in outcomes:
+            runs.append(result)
+            worst = heapq.nlargest(top, worst + cells, key=lambda e: e['excess'])
+            if fail_fast and result['status'] != "ok":
+                stopped = len(runs) < len(files)
+                break
+
+    counts = {}
+    for result in runs:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return {'reference_dir': str(reference_dir), 'passed': set(counts) <= {"ok"} and not stopped,
+            'n_files': len(files), 'n_checked': len(runs), 'stopped_early': stopped, 'counts': counts,
+            'tolerances': {'default': list(tolerance("default", tolerances)),
+                           **{q: list(v) for q, v in {**TOLERANCES, **(tolerances or {})}.items()}},
+            'runs': runs, 'worst': worst}
+
+
+def save_report(report, output_file):
+    """보고서를 JSON으로 저장 (inf는 문자열 "inf")"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def clean(value):
+        if isinstance(value, float) and not np.isfinite(value):
+            return str(value)
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [clean(v) for v in value]
+        return value
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(clean(report), f, indent=1)
+    return output_file
+
+
+def parse_tolerances(specs):
+    """명령행 ["Ed=0,1e-3", "default=0,5e-4"] -> {quantity: (atol, rtol)}"""
+    tolerances = {}
+    for spec in specs or []:
+        quantity, _, values = spec.partition("=")
+        try:
+            atol, rtol = (float(v) for v in values.split(","))
+        except ValueError:
+            raise ValueError(f"Tolerance must look like QUANTITY=ATOL,RTOL, got {spec!r}") from None
+        tolerances[quantity.strip()] = (atol, rtol)
+    return tolerances
@@ -0,0 +1,281 @@
+"""
+scheduler.py
+sweep manifest의 HydroLight run을 로컬 여러 코어에서 실행하는 작업 scheduler (비용 모델 기반 순서)
+
+- 비용 모델: 과거 printout의 'Waveband N of M completed in X sec' 밴드별 시간으로
+  log(밴드당 초) = b0 + Σ b_k log10(파라미터_k + 1e-6) 를 최소제곱 적합 (이력이 적으면 밴드당 시간 중앙값).
+  예상 시간 = 밴드당 초 x 밴드 수.
+- 순서: 예상 시간이 긴 작업부터 (LPT, longest processing time first). 빈 worker가 다음 작업을
+  가져가므로 긴 작업이 마지막에 혼자 남는 일을 줄인다. plan()은 같은 규칙으로 코어별 예상 부하를 보여준다.
+- 실행: solver 명령 (예: "HydroLight.exe {input}")을 worker 수만큼 동시에 subprocess로 실행하고
+  (각 solver는 별도 프로세스, thread는 감독만), timeout을 넘기면 죽이고 실패/비정상 종료는 retries번까지 재시도.
+- 끝난 printout은 바로 load_run으로 파싱 (캐시)하고 밴드별 시간을 이력 파일 (JSON lines)에 추가하여
+  다음 sweep의 비용 모델이 된다.
+
+    jobs = jobs_from_manifest("results/sweep/manifest.csv")
+    model = CostModel.fit(load_history("results/sweep/scheduler_history.jsonl"))
+    results = run_jobs(jobs, "HydroLight.exe {input}", workers=8, model=model, timeout=1800, retries=1)
+
+명령 자리표시자: {input} (run 입력 파일, 없으면 run 폴더), {output} (기대 printout 경로),
+{rootname}, {run_dir}. HydroLight 대역으로 시험하려면 standin 모듈을 참고.
+"""
+
+import os
+import csv
+import json
+import time
+import shlex
+import threading
+import subprocess
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .parse import read_lines, parse_band_timings
+from .watch import has_normal_exit
+
+
+# 이력이 없을 때 밴드당 시간 (초)과 밴드 수
+DEFAULT_SECONDS_PER_BAND = 1.0
+DEFAULT_BANDS = 60
+HISTORY_NAME = "scheduler_history.jsonl"
+# manifest에서 비용 모델 입력이 아닌 열
+NON_PARAMETER_COLUMNS = ("rootname", "output", "title", "n_bands")
+
+
+class Job:
+    """manifest 한 행: rootname, run 폴더, 입력 파일, 기대 printout 경로, 파라미터"""
+
+    def __init__(self, rootname, run_dir, input_file, printout, params, n_bands=None):
+        self.rootname = rootname
+        self.run_dir = Path(run_dir)
+        self.input_file = Path(input_file) if input_file else None
+        self.printout = Path(printout)
+        self.params = dict(params)
+        self.n_bands = n_bands
+        self.predicted = None
+
+    def fields(self):
+        return {'input': str(self.input_file or self.run_dir), 'output': str(self.printout),
+                'rootname': self.rootname, 'run_dir': str(self.run_dir)}
+
+    def __repr__(self):
+        return f"Job({self.rootname!r}, predicted {self.predicted})"
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def jobs_from_manifest(manifest, printout_dir=None):
+    """sweep manifest.csv -> Job 목록 (printout은 printout_dir/P<rootname>.txt, 기본: run 폴더)
+
+    파일이 없으면 FileNotFoundError, rootname 열이 없으면 ValueError.
+    """
+    manifest = Path(manifest).resolve()
+    jobs = []
+    with open(manifest, newline="") as f:
+        reader = csv.DictReader(f)
+        if "rootname" not in (reader.fieldnames or []):
+            raise ValueError(f"{manifest} has no 'rootname' column (not a sweep manifest)")
+        for row in reader:
+            rootname = row["rootname"]
+            # solver는 run 폴더에서 실행되므로 경로는 manifest 위치 기준 절대 경로로
+            run_dir = manifest.parent / rootname
+            input_file = run_dir / Path(row["input_file"]).name if row.get("input_file") else None
+            output = row.get("output") or f"P{rootname}"
+            printout = Path(printout_dir or run_dir).resolve() / f"{output}.txt"
+            params = {k: _number(v) for k, v in row.items() if k not in NON_PARAMETER_COLUMNS}
+            params = {k: v for k, v in params.items() if v is not None}
+            n_bands = _number(row.get("n_bands"))
+            jobs.append(Job(rootname, run_dir, input_file, printout, params,
+                            int(n_bands) if n_bands else None))
+    return jobs
+
+
+# ----------------------------------------------------------------------
+# 이력과 비용 모델
+# ----------------------------------------------------------------------
+def timing_record(printout, params=None, rootname=None, wall_seconds=None):
+    """printout의 밴드별 시간 -> 이력 레코드 dict (밴드 시간이 없으면 None)"""
+    band_seconds, n_expected = parse_band_timings(read_lines(printout))
+    if not len(band_seconds):
+        return None
+    return {'rootname': rootname or Path(printout).stem, 'params': dict(params or {}),
+            'n_bands': int(n_expected or len(band_seconds)), 'band_seconds': band_seconds.round(4).tolist(),
+            'wall_seconds': wall_seconds}
+
+
+def load_history(filepath):
+    """이력 JSON lines -> 레코드 목록 (파일이 없으면 빈 목록)"""
+    if not os.path.exists(filepath):
+        return []
+    with open(filepath) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(filepath, record, lock=None):
+    with lock or threading.Lock():
+        with open(filepath, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def history_from_printouts(files, manifest=None):
+    """기존 printout 파일 목록 (+ manifest 파라미터) -> 이력 레코드 목록"""
+    from .sweep import load_manifest
+    table = load_manifest(manifest) if manifest else {}
+    records = []
+    for f in files:
+        record = timing_record(f, table.get(Path(f).stem, {}))
+        if record is not None:
+            records.append(record)
+    return records
+
+
+class CostModel:
+    """밴드당 실행 시간 모델: log(초/밴드) = b0 + Σ b_k log10(파라미터_k + 1e-6)"""
+
+    def __init__(self, parameters, coefficients, seconds_per_band, n_bands, n_records=0):
+        self.parameters = list(parameters)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.seconds_per_band = seconds_per_band
+        self.n_bands = n_bands
+        self.n_records = n_records
+
+    @classmethod
+    def fit(cls, records):
+        """이력 레코드로 적합. 모든 레코드에 있는 파라미터만 쓰고, 레코드가 (파라미터 수 + 2)개보다
+        적거나 값이 변하지 않는 파라미터뿐이면 밴드당 시간 중앙값만 쓴다."""
+        if not records:
+            return cls([], [], DEFAULT_SECONDS_PER_BAND, DEFAULT_BANDS)
+        per_band = np.array([np.mean(r['band_seconds']) for r in records])
+        per_band = np.maximum(per_band, 1e-4)
+        n_bands = int(np.median([r['n_bands'] for r in records]))
+        common = set.intersection(*(set(r['params']) for r in records))
+        parameters = sorted(p for p in common
+                            if len({r['params'][p] for r in records}) > 1
+                            and all(r['params'][p] >= 0 for r in records))
+        median = float(np.median(per_band))
+        if not parameters or len(records) < len(parameters) + 2:
+            return cls([], [], median, n_bands, len(records))
+        design = cls._design(parameters, [r['params'] for r in records])
+        coefficients, *_ = np.linalg.lstsq(design, np.log(per_band), rcond=None)
+        return cls(parameters, coefficients, median, n_bands, len(records))
+
+    @staticmethod
+    def _design(parameters, params_list):
+        return np.array([[1.0] + [np.log10(p[name] + 1e-6) for name in parameters] for p in params_list])
+
+    def predict(self, jobs):
+        """Job 목록 -> 예상 초 배열 (job.predicted에도 저장)"""
+        if not jobs:
+            return np.array([])
+        if self.parameters and all(all(name in job.params for name in self.parameters) for job in jobs):
+            per_band = np.exp(self._design(self.parameters, [job.params for job in jobs]) @ self.coefficients)
+        else:
+            per_band = np.full(len(jobs), self.seconds_per_band)
+        seconds = per_band * np.array([job.n_bands or self.n_bands for job in jobs])
+        for job, value in zip(jobs, seconds):
+            job.predicted = float(value)
+        return seconds
+
+    def __repr__(self):
+        if self.parameters:
+            terms = ", ".join(f"{p} {c:+.3f}" for p, c in zip(self.parameters, self.coefficients[1:]))
+            return f"CostModel({self.n_records} runs, log-linear in {terms}, {self.n_bands} bands)"
+        return f"CostModel({self.n_records} runs, {self.seconds_per_band:.3g} s/band, {self.n_bands} bands)"
+
+
+def plan(jobs, workers):
+    """LPT 순서와 코어별 예상 부하 -> (정렬된 Job 목록, 코어별 [Job], 코어별 예상 초)
+
+    긴 작업부터 가장 부하가 적은 코어에 넣는다 (빈 worker가 다음 작업을 가져가는 실행 순서와 같음).
+    """
+    ordered = sorted(jobs, key=lambda job: -(job.predicted or 0.0))
+    bins = [[] for _ in range(max(1, workers))]
+    loads = np.zeros(len(bins))
+    for job in ordered:
+        k = int(np.argmin(loads))
+        bins[k].append(job)
+        loads[k] += job.predicted or 0.0
+    return ordered, bins, loads
+
+
+# ----------------------------------------------------------------------
+# 실행
+# ----------------------------------------------------------------------
+def _execute(job, command, timeout, retries, cache_dir, history, lock, log=None):
+    """job 하나 실행 (재시도 포함) -> 결과 dict"""
+    args = [token.format(**job.fields()) for token in shlex.split(command, posix=os.name != "nt")]
+    row = {'rootname': job.rootname, 'status': "failed", 'attempts': 0, 'predicted_s': job.predicted,
+           'elapsed_s': None, 'printout': str(job.printout), 'n_bands': None, 'error': ""}
+    start = time.perf_counter()
+    for attempt in range(1, retries + 2):
+        row['attempts'] = attempt
+        attempt_start = time.perf_counter()
+        try:
+            with open(job.run_dir / f"{job.rootname}.solver.log", "ab") as out:
+                completed = subprocess.run(args, cwd=job.run_dir, stdout=out, stderr=subprocess.STDOUT,
+                                           timeout=timeout)
+        except subprocess.TimeoutExpired:
+            row['status'], row['error'] = "timeout", f"timed out after {timeout:g} s"
+            if log and attempt <= retries:
+                log(f"[RETRY] {job.rootname}: {row['error']}")
+            continue
+        except OSError as e:
+            row['status'], row['error'] = "failed", f"{type(e).__name__}: {e}"
+            break
+        if completed.returncode != 0:
+            row['status'], row['error'] = "failed", f"exit code {completed.returncode}"
+        elif not job.printout.exists() or not has_normal_exit(job.printout):
+            row['status'], row['error'] = "failed", "printout missing or without normal exit"
+        else:
+            row['status'], row['error'] = "ok", ""
+            break
+        if log and attempt <= retries:
+            log(f"[RETRY] {job.rootname}: {row['error']}")
+    row['elapsed_s'] = round(time.perf_counter() - start, 3)
+    if row['status'] != "ok":
+        return row
+
+    # 끝난 printout을 바로 파싱 (캐시)하고 밴드별 시간을 이력에 추가
+    from .ensemble import load_run
+    try:
+        run = load_run(job.printout, cache_dir)
+        row['n_bands'] = len(run.wavelength)
+    except Exception as e:
+        row['status'], row['error'] = "parse_failed", f"{type(e).__name__}: {e}"
+        return row
+    record = timing_record(job.printout, job.params, job.rootname, round(time.perf_counter() - attempt_start, 3))
+    if record is not None and history:
+        append_history(history, record, lock)
+    return row
+
+
+def run_jobs(jobs, command, workers=1, model=None, timeout=None, retries=0, cache_dir=None,
+             history=None, log=print):
+    """Job들을 LPT 순서로 workers개 동시 실행 -> 결과 행 목록 (끝난 순서)
+
+    model: CostModel (None이면 history 파일로 적합), history: 이력 JSON lines 파일 (None이면 기록 안 함)
+    """
+    if model is None:
+        model = CostModel.fit(load_history(history) if history else [])
+    model.predict(jobs)
+    ordered, _, _ = plan(jobs, workers)
+    lock = threading.Lock()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 제출 순서대로 worker가 가져가므로 긴 작업이 먼저 시작된다
+        futures = {executor.submit(_execute, job, command, timeout, retries, cache_dir, history, lock, log): job
+                   for job in ordered}
+        for future in as_completed(futures):
+            row = future.result()
+            results.append(row)
+            if log:
+                mark = "OK  " if row['status'] == "ok" else "FAIL"
+                log(f"[{mark}] {row['rootname']} ({row['elapsed_s']:.2f} s, predicted {row['predicted_s']:.2f} s, "
+                    f"{row['attempts']} attempt(s)){'' if row['status'] == 'ok' else ' ' + row['error']}")
+    return results
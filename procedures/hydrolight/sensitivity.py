@@ -0,0 +1,211 @@
+"""
+sensitivity.py
+one-at-a-time 섭동 sweep에서 파라미터별 유한 차분 민감도(Jacobian) 계산
+
+run 메타데이터(PARAMETER_NAMES)를 비교하여, 기준(baseline) run과 파라미터 하나만 다른 run을
+자동으로 짝지은 뒤 모든 양의 정규화 유한 차분 미분을 한 번의 broadcast 계산으로 구한다.
+
+    jac = jacobian(ensemble, quantities=["Ed", "Lu", "Rrs", "Kd"])
+    jac.cube                  # (n_parameter, n_quantity, n_wavelength, n_depth)
+    jac.get("Rrs")            # (n_parameter, n_wavelength)
+    jac.save("results/sensitivity/jacobian.npz")
+
+normalize:
+    'relative'  탄력도 (Δy / y0) / (Δp / p0) = d ln y / d ln p (p0 = 0이면 (Δy / y0) / Δp)
+    'absolute'  Δy / Δp
+한 파라미터에 섭동 run이 여러 개면 (예: +10%, -10%) 각 차분의 평균이며, 같은 크기의 양쪽
+섭동이면 중심 차분과 같다.
+
+짝짓기 규칙:
+    - IOP 모델, 바닥 종류가 같고, 수치 파라미터 중 정확히 하나만 다름 (NaN끼리는 같은 값)
+    - 다른 파라미터는 두 run 모두 유한한 값이어야 함 (NaN -> 값 변화는 섭동이 아님)
+    - baseline을 주지 않으면 짝이 가장 많은 run을 baseline으로 사용
+    - wall_clock_s(실행 시간)는 입력 파라미터가 아니므로 비교하지 않음
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+
+from .ensemble import PARAMETER_NAMES, KFUNCTION_QUANTITIES
+
+
+# 섭동 파라미터 후보 (입력 파라미터만)
+SENSITIVITY_PARAMETERS = [p for p in PARAMETER_NAMES if p != "wall_clock_s"]
+# 짝을 이루려면 같아야 하는 문자열 메타데이터
+CATEGORY_KEYS = ("iop_model", "bottom_type")
+DEFAULT_QUANTITIES = ("Ed", "Eu", "Lu", "R", "Kd", "Rrs")
+PARAMETER_RTOL = 1e-9
+
+
+def _categories(ensemble):
+    """run별 CATEGORY_KEYS 값 tuple (ensemble은 runs 메타데이터, store는 runs.csv 사용)"""
+    if hasattr(ensemble, 'runs'):
+        return [tuple(str(run.metadata.get(k, "")) for k in CATEGORY_KEYS) for run in ensemble.runs]
+    table = ensemble.table
+    return [tuple(str(table[k].iloc[i]) if k in table.columns else "" for k in CATEGORY_KEYS)
+            for i in range(len(table))]
+
+
+def difference_mask(params, rtol=PARAMETER_RTOL):
+    """(n_run, n_param) 파라미터 -> (n_run, n_run, n_param) 서로 다른 값 mask (NaN끼리는 같음)"""
+    a, b = params[:, None, :], params[None, :, :]
+    with np.errstate(invalid='ignore'):
+        same = np.isclose(a, b, rtol=rtol, atol=0.0) | (np.isnan(a) & np.isnan(b))
+    return ~same
+
+
+def pair_runs(params, categories=None, baseline=None, rtol=PARAMETER_RTOL):
+    """baseline과 파라미터 하나만 다른 run 짝 -> (baseline index, [(run index, parameter index)])
+
+    params: (n_run, n_param), categories: run별 비교 key (같아야 짝이 됨),
+    baseline: run index (None이면 짝이 가장 많은 run).
+    """
+    params = np.asarray(params, dtype=float)
+    diff = difference_mask(params, rtol)
+    n_diff = diff.sum(axis=2)
+    finite = np.isfinite(params)
+    # 다른 파라미터 하나가 두 run 모두 유한해야 함
+    single = (n_diff == 1) & np.all(~diff | (finite[:, None, :] & finite[None, :, :]), axis=2)
+    if categories is not None:
+        keys = np.array([hash(c) for c in categories])
+        single &= keys[:, None] == keys[None, :]
+    if baseline is None:
+        counts = single.sum(axis=1)
+        if not counts.max():
+            raise ValueError("No run pair differs in exactly one parameter")
+        baseline = int(np.argmax(counts))
+    pairs = [(int(j), int(np.argmax(diff[baseline, j]))) for j in np.flatnonzero(single[baseline])]
+    return baseline, pairs
+
+
+class Jacobian:
+    """(parameter, quantity, wavelength, depth) 민감도 cube
+
+    깊이 축은 max(len(depth), len(k_depth))이며, K-function은 k_depth 위치, 깊이 축이 없는
+    양(Rrs, Lw)은 깊이 index 0에 저장하고 나머지는 NaN이다. get()이 양별 원래 shape을 돌려준다.
+    """
+
+    def __init__(self, cube, parameters, quantities, wavelength, depth, k_depth, baseline, pairs,
+                 normalize, ndims):
+        self.cube = np.asarray(cube, dtype=float)
+        self.parameters = list(parameters)
+        self.quantities = list(quantities)
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        self.k_depth = np.asarray(k_depth, dtype=float)
+        self.baseline = baseline
+        self.pairs = list(pairs)
+        self.normalize = normalize
+        self.ndims = dict(ndims)
+
+    def get(self, quantity, parameter=None):
+        """양 하나의 민감도: (n_parameter, n_wavelength[, n_depth]) 또는 parameter를 주면 그 파라미터만"""
+        values = self.cube[:, self.quantities.index(quantity)]
+        if self.ndims[quantity] == 1:
+            values = values[:, :, 0]
+        else:
+            values = values[:, :, :len(self.k_depth if quantity in KFUNCTION_QUANTITIES else self.depth)]
+        if parameter is not None:
+            return values[self.parameters.index(parameter)]
+        return values
+
+    def summary(self):
+        """[{parameter, quantity, median_abs, max_abs}] (파라미터별 크기 비교용)"""
+        rows = []
+        for i, parameter in enumerate(self.parameters):
+            for j, quantity in enumerate(self.quantities):
+                values = np.abs(self.cube[i, j])
+                values = values[np.isfinite(values)]
+                rows.append({'parameter': parameter, 'quantity': quantity,
+                             'median_abs': float(np.median(values)) if len(values) else np.nan,
+                             'max_abs': float(values.max()) if len(values) else np.nan})
+        return rows
+
+    def save(self, filepath):
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        info = {'parameters': self.parameters, 'quantities': self.quantities, 'baseline': self.baseline,
+                'pairs': self.pairs, 'normalize': self.normalize, 'ndims': self.ndims}
+        np.savez(filepath, cube=self.cube, wavelength=self.wavelength, depth=self.depth,
+                 k_depth=self.k_depth, info=json.dumps(info))
+        return filepath
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as f:
+            info = json.loads(str(f['info']))
+            return cls(f['cube'], info['parameters'], info['quantities'], f['wavelength'], f['depth'],
+                       f['k_depth'], info['baseline'], [tuple(p) for p in info['pairs']],
+                       info['normalize'], info['ndims'])
+
+    def __repr__(self):
+        return (f"Jacobian(baseline {self.baseline!r}, parameters {self.parameters}, "
+                f"{len(self.quantities)} quantities, cube {self.cube.shape})")
+
+
+def baseline_index(names, baseline):
+    """baseline 이름 -> run 인덱스. printout 이름 (Psw0001)과 sweep rootname (sw0001) 모두 받음
+
+    없으면 run 이름 목록을 담은 KeyError.
+    """
+    names = list(names)
+    for candidate in (baseline, f"P{baseline}"):
+        if candidate in names:
+            return names.index(candidate)
+    shown = ", ".join(names[:20]) + (f", ... ({len(names)} runs)" if len(names) > 20 else "")
+    raise KeyError(f"Baseline run {baseline!r} not in ensemble, available: {shown}")
+
+
+def jacobian(ensemble, quantities=DEFAULT_QUANTITIES, baseline=None, normalize="relative",
+             parameters=SENSITIVITY_PARAMETERS):
+    """ensemble(또는 EnsembleStore)의 one-at-a-time 섭동 run으로 Jacobian 계산
+
+    baseline: baseline run 이름 또는 sweep rootname (None이면 짝이 가장 많은 run).
+    """
+    if normalize not in ("relative", "absolute"):
+        raise ValueError(f"normalize must be 'relative' or 'absolute', got {normalize!r}")
+    names = list(ensemble.names)
+    params = ensemble.params[list(parameters)].to_numpy(dtype=float)
+    base, pairs = pair_runs(params, _categories(ensemble),
+                            None if baseline is None else baseline_index(names, baseline))
+    if not pairs:
+        raise ValueError(f"No run differs from baseline {names[base]} in exactly one parameter")
+
+    # (n_run, n_quantity, n_wavelength, n_depth) 배열 하나로 모음
+    n_depth = max(len(ensemble.depth), len(ensemble.k_depth))
+    runs = np.array([base] + [j for j, _ in pairs])
+    values = np.full((len(runs), len(quantities), len(ensemble.wavelength), n_depth), np.nan)
+    ndims = {}
+    for q, quantity in enumerate(quantities):
+        cube = np.asarray(ensemble.cube(quantity))[runs]
+        ndims[quantity] = cube.ndim - 1
+        if cube.ndim == 2:
+            values[:, q, :, 0] = cube
+        else:
+            values[:, q, :, :cube.shape[2]] = cube
+
+    # 짝별 차분을 한 번에: (n_pair, n_quantity, n_wavelength, n_depth)
+    p_index = np.array([p for _, p in pairs])
+    p0 = params[base, p_index]
+    dp = params[runs[1:], p_index] - p0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if normalize == "relative":
+            scale = np.where(p0 != 0, dp / p0, dp)
+            derivative = (values[1:] - values[0]) / values[0] / scale[:, None, None, None]
+        else:
+            derivative = (values[1:] - values[0]) / dp[:, None, None, None]
+    derivative[~np.isfinite(derivative)] = np.nan
+
+    # 파라미터별 평균 (NaN 제외): (n_parameter, n_pair) 가중치 행렬곱
+    used = sorted(set(p_index))
+    weights = (np.array(used)[:, None] == p_index[None, :]).astype(float)
+    flat = derivative.reshape(len(pairs), -1)
+    finite = np.isfinite(flat)
+    with np.errstate(invalid='ignore'):
+        mean = (weights @ np.where(finite, flat, 0.0)) / (weights @ finite)
+    cube = mean.reshape((len(used),) + derivative.shape[1:])
+
+    pair_names = [(names[j], parameters[p], float(params[j, p]), float(params[base, p])) for j, p in pairs]
+    return Jacobian(cube, [parameters[p] for p in used], quantities, ensemble.wavelength, ensemble.depth,
+                    ensemble.k_depth, names[base], pair_names, normalize, ndims)
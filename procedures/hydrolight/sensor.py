@@ -0,0 +1,181 @@
+"""
+sensor.py
+센서 상대 분광 응답(RSR)으로 HydroLight 스펙트럼(Ed, Lu, Rrs 등)을 센서 밴드 값으로 변환하는 유틸리티
+"""
+
+import numpy as np
+from pathlib import Path
+
+
+# (센서 key, 밴드 경계) -> (convolution matrix, coverage)
+_MATRIX_CACHE = {}
+# (파일 경로, mtime) -> SensorResponse
+_SENSOR_CACHE = {}
+
+
+class SensorResponse:
+    """센서 밴드별 상대 분광 응답 테이블 (n_band, n_rsr_wavelength)"""
+
+    def __init__(self, name, wavelength, response, band_names=None):
+        self.name = name
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.response = np.atleast_2d(np.asarray(response, dtype=float))
+        if self.response.shape[1] != len(self.wavelength):
+            raise ValueError(f"Response must be (n_band, {len(self.wavelength)}), got {self.response.shape}")
+        if np.any(np.diff(self.wavelength) <= 0):
+            raise ValueError(f"RSR wavelengths of {name} must be strictly increasing")
+        self.band_names = list(band_names if band_names is not None
+                               else [f"B{i + 1}" for i in range(len(self.response))])
+        # matrix 캐시 key (같은 이름의 다른 테이블과 구분)
+        self.key = (name, hash(self.wavelength.tobytes()), hash(self.response.tobytes()))
+
+    @classmethod
+    def from_file(cls, filepath, name=None):
+        """RSR 텍스트 파일 읽기
+
+        첫 열은 파장(nm), 나머지 열은 밴드별 응답. 쉼표/공백 구분 모두 허용하며
+        '#' 주석과 \\begin_header ... \\end_header 블록은 건너뛴다. 숫자가 아닌 첫 행은
+        밴드 이름 행으로 사용한다.
+        """
+        filepath = Path(filepath)
+        band_names = None
+        rows = []
+        in_header = False
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                s = line.strip()
+                if s.startswith('\\begin_header'):
+                    in_header = True
+                    continue
+                if s.startswith('\\end_header'):
+                    in_header = False
+                    continue
+                if in_header or not s or s.startswith('#') or s.startswith('\\'):
+                    continue
+                parts = s.replace(',', ' ').split()
+                try:
+                    rows.append([float(x) for x in parts])
+                except ValueError:
+                    if not rows and band_names is None:
+                        band_names = parts[1:]
+                    continue
+        if not rows:
+            raise ValueError(f"No RSR data found in {filepath}")
+        table = np.array(rows)
+        return cls(name or filepath.stem, table[:, 0], table[:, 1:].T, band_names)
+
+    @classmethod
+    def gaussian(cls, name, centers, fwhm, band_names=None, step=1.0):
+        """밴드 중심/FWHM으로 Gaussian 근사 RSR 생성 (실제 RSR 파일이 없을 때)"""
+        centers = np.asarray(centers, dtype=float)
+        fwhm = np.broadcast_to(np.asarray(fwhm, dtype=float), centers.shape)
+        sigma = fwhm / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+        lo = np.floor((centers - 3 * fwhm).min())
+        hi = np.ceil((centers + 3 * fwhm).max())
+        wavelength = np.arange(lo, hi + step, step)
+        response = np.exp(-0.5 * ((wavelength[None, :] - centers[:, None]) / sigma[:, None]) ** 2)
+        return cls(name, wavelength, response, band_names)
+
+    @property
+    def centers(self):
+        """응답 가중 평균 파장"""
+        return _integrate(self.response * self.wavelength, self.wavelength) / \
+            _integrate(self.response, self.wavelength)
+
+    def __repr__(self):
+        return f"SensorResponse({self.name!r}, {len(self.band_names)} bands)"
+
+
+def _integrate(y, x):
+    """마지막 축에 대한 사다리꼴 적분"""
+    return (0.5 * (y[..., 1:] + y[..., :-1]) * np.diff(x)).sum(axis=-1)
+
+
+def load_sensor(filepath, name=None):
+    """RSR 파일 읽기 (파일이 바뀌지 않았으면 캐시 사용)"""
+    filepath = Path(filepath).resolve()
+    key = (str(filepath), filepath.stat().st_mtime_ns, name)
+    if key not in _SENSOR_CACHE:
+        _SENSOR_CACHE[key] = SensorResponse.from_file(filepath, name)
+    return _SENSOR_CACHE[key]
+
+
+def load_sensors(directory, pattern="*.txt"):
+    """디렉토리 안의 모든 RSR 파일 읽기 -> {센서 이름: SensorResponse}"""
+    return {p.stem: load_sensor(p) for p in sorted(Path(directory).glob(pattern))}
+
+
+def band_edges(wavelength):
+    """HydroLight 밴드 중심 파장으로부터 밴드 경계 추정 (인접 중심의 중간점)"""
+    wavelength = np.asarray(wavelength, dtype=float)
+    if len(wavelength) == 1:
+        raise ValueError("Cannot infer band edges from a single wavelength, pass edges explicitly")
+    mid = 0.5 * (wavelength[1:] + wavelength[:-1])
+    return np.concatenate([[wavelength[0] - (mid[0] - wavelength[0])], mid,
+                           [wavelength[-1] + (wavelength[-1] - mid[-1])]])
+
+
+def band_matrix(sensor, wavelength, edges=None):
+    """(센서, HydroLight 밴드 그리드) 쌍에 대한 convolution matrix (n_sensor_band, n_wavelength)
+
+    HydroLight 값은 각 밴드의 평균이므로, 센서 밴드 b의 값은
+    sum_j W[b, j] X_j,  W[b, j] = ∫_band_j RSR_b dλ / ∫_grid RSR_b dλ 로 계산한다.
+    coverage는 RSR 면적 중 HydroLight 파장 범위 안에 들어오는 비율이다.
+    반환 배열은 캐시와 공유하므로 읽기 전용이다 (바꾸려면 복사).
+    """
+    edges = band_edges(wavelength) if edges is None else np.asarray(edges, dtype=float)
+    if len(edges) != len(wavelength) + 1:
+        raise ValueError(f"Need {len(wavelength) + 1} band edges, got {len(edges)}")
+    key = (sensor.key, edges.tobytes())
+    if key in _MATRIX_CACHE:
+        return _MATRIX_CACHE[key]
+
+    # RSR 샘플점과 밴드 경계를 합친 격자에서 선형보간 RSR을 정확히 적분
+    grid = np.union1d(sensor.wavelength, edges)
+    rsr = np.array([np.interp(grid, sensor.wavelength, r, left=0.0, right=0.0) for r in sensor.response])
+    cumulative = np.concatenate([np.zeros((len(rsr), 1)),
+                                 np.cumsum(0.5 * (rsr[:, 1:] + rsr[:, :-1]) * np.diff(grid), axis=1)], axis=1)
+    at_edges = cumulative[:, np.searchsorted(grid, edges)]
+    weights = np.diff(at_edges, axis=1)
+
+    inside = weights.sum(axis=1)
+    total = cumulative[:, -1]
+    coverage = np.divide(inside, total, out=np.zeros_like(inside), where=total > 0)
+    matrix = np.divide(weights, inside[:, None], out=np.zeros_like(weights), where=inside[:, None] > 0)
+
+    matrix.setflags(write=False)
+    coverage.setflags(write=False)
+    _MATRIX_CACHE[key] = (matrix, coverage)
+    return matrix, coverage
+
+
+def convolve(cube, sensor, wavelength, axis=1, edges=None, min_coverage=0.0):
+    """파장 축(axis)을 센서 밴드 축으로 바꾼 배열 반환
+
+    예: (run, wavelength, depth) -> (run, sensor_band, depth). 한 번의 행렬곱으로 계산한다.
+    coverage가 min_coverage보다 작은 밴드는 NaN으로 채운다. NaN인 HydroLight 밴드는 가중치가 0인 센서
+    밴드에는 영향을 주지 않고, 가중치가 0이 아닌 센서 밴드만 NaN이 된다.
+    """
+    cube = np.asarray(cube, dtype=float)
+    if cube.ndim == 1:
+        axis = 0
+    if cube.shape[axis] != len(wavelength):
+        raise ValueError(f"Axis {axis} has length {cube.shape[axis]}, expected {len(wavelength)} wavelengths")
+    matrix, coverage = band_matrix(sensor, wavelength, edges)
+    # 파장 축을 뒤에서 두 번째로 (1차원이면 그대로) 옮겨 행렬곱 하나로 계산
+    moved = cube if cube.ndim == 1 else np.moveaxis(cube, axis, -2)
+    missing = np.isnan(moved)
+    if missing.any():
+        out = matrix @ np.where(missing, 0.0, moved)
+        out[((matrix != 0) @ missing) > 0] = np.nan
+    else:
+        out = matrix @ moved
+    if cube.ndim > 1:
+        out = np.moveaxis(out, -2, axis)
+    if min_coverage > 0:
+        bad = coverage < min_coverage
+        if bad.any():
+            index = [slice(None)] * out.ndim
+            index[axis] = bad
+            out[tuple(index)] = np.nan
+    return out
@@ -0,0 +1,339 @@
+"""
+server.py
+파싱 캐시에 있는 run의 데이터 조각과 플롯을 제공하는 로컬 HTTP 서버 (표준 라이브러리 + numpy)
+
+results/ 폴더의 PNG를 복사하는 대신 브라우저나 스크립트에서 바로 조회한다.
+
+    hydrolight serve "data/P*.txt" --port 8000 --workers 4
+
+요청 (모든 응답에 ETag, Last-Modified. If-None-Match/If-Modified-Since가 맞으면 304):
+    GET /runs                                    run 목록 (이미 읽은 run은 밴드 수, 깊이 수, 품질 flag 포함)
+    GET /runs/<run>                              메타데이터, 파장/깊이 그리드, 양 목록
+    GET /runs/<run>/<quantity>                   전체 배열
+    GET /runs/<run>/<quantity>?depth=2.37        깊이 z의 스펙트럼 (그리드 밖 깊이는 PCHIP 보간)
+    GET /runs/<run>/<quantity>?wavelength=550    파장 λ의 깊이 프로파일 (보간)
+        &format=npy                              JSON 대신 numpy .npy 바이너리
+    GET /runs/<run>/plots                        플롯 이름 목록
+    GET /runs/<run>/plots/<plot>.png             P03 플롯 (처음 요청할 때 그려서 디스크에 저장)
+
+run은 서버가 시작할 때가 아니라 처음 요청될 때 load_run(파싱 캐시)으로 한 번 읽어 메모리에 두고,
+원본 파일이 바뀐 경우에만 다시 읽는다. 요청은 고정 크기 thread pool에서 처리하며,
+matplotlib은 thread 안전하지 않으므로 플롯 그리기만 lock으로 한 번에 하나씩 실행한다.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, unquote
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+from .ensemble import load_run, _cache_key, KFUNCTION_QUANTITIES
+from .trace import echo, quieted
+
+
+def _plot_functions():
+    from .plots import RUN_PLOTS
+    return {func.__name__[len("plot_"):]: func for func in RUN_PLOTS}
+
+
+class RunRegistry:
+    """run 이름 -> 원본 파일. run은 처음 요청될 때 한 번 읽고, 원본 파일이 바뀌면 다시 읽음"""
+
+    def __init__(self, files, cache_dir=None, plot_dir=None, quiet=False):
+        self.files = {Path(f).stem: Path(f).resolve() for f in files}
+        self.cache_dir = cache_dir
+        self.plot_dir = Path(plot_dir) if plot_dir else None
+        self.quiet = quiet
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+
+    def names(self):
+        return sorted(self.files)
+
+    def version(self, name):
+        """(파일 key, mtime): ETag와 Last-Modified에 사용 (원본 파일이 바뀌면 바뀜)"""
+        path = self.files[name]
+        return _cache_key(path), path.stat().st_mtime
+
+    def get(self, name):
+        if name not in self.files:
+            raise KeyError(name)
+        key, _ = self.version(name)
+        with self._lock:
+            entry = self._runs.get(name)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+        # 파싱(또는 캐시 읽기)은 lock 밖에서 - 같은 run을 동시에 요청하면 둘 다 읽을 수 있으나 결과는 같다
+        run = load_run(self.files[name], self.cache_dir)
+        with self._lock:
+            self._runs[name] = (key, run)
+        return run
+
+    def plot(self, name, plot):
+        """플롯 PNG 경로 (없으면 그림). 파일은 <plot_dir>/<run>-<key>/<plot>/에 저장"""
+        functions = _plot_functions()
+        if plot not in functions:
+            raise KeyError(plot)
+        key, _ = self.version(name)
+        output_dir = self.plot_dir / f"{name}-{key}" / plot
+        existing = sorted(output_dir.glob("*.png"))
+        if existing:
+            return existing[0]
+        run = self.get(name)
+        with self._render_lock:
+            existing = sorted(output_dir.glob("*.png"))
+            if not existing:
+                output_dir.mkdir(parents=True, exist_ok=True)
+                # 플롯 함수의 진행 메시지는 trace.echo이므로 이 thread만 조용히 (stdout은 그대로)
+                if self.quiet:
+                    with quieted():
+                        functions[plot](run, output_dir)
+                else:
+                    functions[plot](run, output_dir)
+                existing = sorted(output_dir.glob("*.png"))
+        if not existing:
+            raise LookupError(f"No data to plot {plot} for {name}")
+        return existing[0]
+
+
+def _json_value(value):
+    """numpy 배열/스칼라를 JSON 값으로 (NaN/Inf는 null)"""
+    if isinstance(value, dict):
+        return {str(k): _json_value(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return [_json_value(v) for v in value.tolist()] if value.ndim else _json_value(value.item())
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (np.floating, np.integer, np.bool_)):
+        return _json_value(value.item())
+    return value
+
+
+def _first(query, name, cast=float):
+    values = query.get(name)
+    return cast(values[0]) if values else None
+
+
+def slice_quantity(run, quantity, depth=None, wavelength=None):
+    """run의 quantity에서 요청한 조각 -> (dict, 배열)
+
+    depth: 그 깊이의 스펙트럼, wavelength: 그 파장의 깊이 프로파일. 그리드 위의 값이면 그대로,
+    아니면 run.interpolator()로 PCHIP 보간한다. 둘 다 주면 값 하나.
+    """
+    values = np.asarray(run[quantity])
+    grid = run.k_depth if quantity in KFUNCTION_QUANTITIES else run.depth
+    info = {'run': run.name, 'quantity': quantity}
+    if values.ndim == 1:
+        if wavelength is not None:
+            values = run.interpolator(quantity)(None, wavelength)
+            info['wavelength'] = wavelength
+        else:
+            info['wavelength'] = run.wavelength
+        return info, values
+    if values.ndim != 2:
+        info.update(wavelength=run.wavelength, depth=grid)
+        return info, values
+
+    if depth is not None and wavelength is not None:
+        info.update(depth=depth, wavelength=wavelength)
+        return info, np.asarray(run.interpolator(quantity)(depth, wavelength))
+    if depth is not None:
+        on_grid = np.flatnonzero(np.isclose(grid, depth))
+        values = values[:, on_grid[0]] if len(on_grid) else run.interpolator(quantity)(depth, run.wavelength)
+        info.update(depth=depth, wavelength=run.wavelength)
+        return info, values
+    if wavelength is not None:
+        on_grid = np.flatnonzero(np.isclose(run.wavelength, wavelength))
+        values = values[on_grid[0]] if len(on_grid) else run.interpolator(quantity)(grid, wavelength)
+        info.update(wavelength=wavelength, depth=grid)
+        return info, values
+    info.update(wavelength=run.wavelength, depth=grid)
+    return info, values
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """GET 요청 처리 (registry는 server 객체에 있음)"""
+
+    server_version = "HydroLightServer/0.1"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        query = parse_qs(url.query)
+        try:
+            self._route(parts, query, url)
+        except KeyError as e:
+            self._error(404, f"Not found: {e.args[0] if e.args else url.path}")
+        except (ValueError, LookupError) as e:
+            self._error(400, str(e))
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+
+    def _route(self, parts, query, url):
+        registry = self.server.registry
+        if not parts or parts == ["runs"]:
+            rows = []
+            for name in registry.names():
+                row = {'name': name, 'path': str(registry.files[name])}
+                if name in registry._runs:
+                    run = registry._runs[name][1]
+                    row.update(n_bands=len(run.wavelength), n_depths=len(run.depth),
+                               quality_flags=run.metadata.get('quality_flags', 0))
+                rows.append(row)
+            return self._send_json({'runs': rows}, etag_source=repr(rows), mtime=None)
+        if parts[0] != "runs":
+            raise KeyError(url.path)
+
+        name = parts[1]
+        if name not in registry.files:
+            raise KeyError(name)
+        key, mtime = registry.version(name)
+        # 원본 파일 key + 요청 경로: 파일이 바뀌거나 다른 조각을 요청하면 ETag도 바뀜
+        etag_source = key + url.path + "?" + url.query
+        if self._not_modified(etag_source, mtime):
+            return
+        if len(parts) == 2:
+            run = registry.get(name)
+            body = {'name': run.name, 'metadata': run.metadata, 'wavelength': run.wavelength,
+                    'depth': run.depth, 'k_depth': run.k_depth, 'quantities': run.quantities,
+                    'derived_quantities': run.derived_quantities}
+            return self._send_json(body, etag_source, mtime)
+        if parts[2] == "plots":
+            if len(parts) == 3:
+                return self._send_json({'plots': sorted(_plot_functions())}, etag_source, mtime)
+            plot = parts[3][:-4] if parts[3].endswith(".png") else parts[3]
+            with open(registry.plot(name, plot), 'rb') as f:
+                return self._send(f.read(), "image/png", etag_source, mtime)
+
+        run = registry.get(name)
+        quantity = parts[2]
+        if quantity not in run:
+            raise KeyError(quantity)
+        info, values = slice_quantity(run, quantity, _first(query, 'depth'), _first(query, 'wavelength'))
+        if _first(query, 'format', str) == "npy":
+            buffer = BytesIO()
+            np.save(buffer, np.asarray(values, dtype=float))
+            return self._send(buffer.getvalue(), "application/octet-stream", etag_source, mtime)
+        info['values'] = values
+        return self._send_json(info, etag_source, mtime)
+
+    # ------------------------------------------------------------------
+    # 응답
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _etag(source):
+        return '"' + hashlib.sha1(source.encode('utf-8')).hexdigest()[:20] + '"'
+
+    def _not_modified(self, etag_source, mtime):
+        """조건부 요청이 현재 버전과 같으면 304를 보내고 True"""
+        etag = self._etag(etag_source)
+        match = self.headers.get("If-None-Match")
+        if match is not None:
+            if etag in [m.strip() for m in match.split(",")] or match.strip() == "*":
+                self._send_headers(304, None, etag, mtime, 0)
+                return True
+            return False
+        since = self.headers.get("If-Modified-Since")
+        if since and mtime is not None:
+            try:
+                if int(mtime) <= parsedate_to_datetime(since).timestamp():
+                    self._send_headers(304, None, etag, mtime, 0)
+                    return True
+            except (TypeError, ValueError):
+                pass
+        return False
+
+    def _send_headers(self, status, content_type, etag, mtime, length):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        if etag:
+            self.send_header("ETag", etag)
+        if mtime is not None:
+            self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send(self, body, content_type, etag_source, mtime):
+        self._send_headers(200, content_type, self._etag(etag_source), mtime, len(body))
+        self.wfile.write(body)
+
+    def _send_json(self, data, etag_source, mtime):
+        body = json.dumps(_json_value(data)).encode('utf-8')
+        self._send(body, "application/json", etag_source, mtime)
+
+    def _error(self, status, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class PooledHTTPServer(HTTPServer):
+    """요청을 고정 크기 thread pool에서 처리하는 HTTPServer"""
+
+    daemon_threads = True
+
+    def __init__(self, address, registry, workers=4, quiet=False):
+        super().__init__(address, RequestHandler)
+        self.registry = registry
+        self.quiet = quiet
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hydrolight-http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_server(files, host="127.0.0.1", port=8000, cache_dir=None, plot_dir=None, workers=4, quiet=False,
+                output_root="results"):
+    """서버 생성 (port=0이면 빈 port 자동 선택, server.server_address로 확인)
+
+    plot_dir: 플롯 저장 폴더 (기본: <output_root>/server_plots)
+    """
+    plot_dir = plot_dir or Path(output_root) / "server_plots"
+    registry = RunRegistry(files, cache_dir, plot_dir, quiet)
+    return PooledHTTPServer((host, port), registry, workers, quiet)
+
+
+def serve(files, host="127.0.0.1", port=8000, cache_dir=None, plot_dir=None, workers=4, quiet=False,
+          output_root="results"):
+    """Ctrl+C까지 서버 실행"""
+    server = make_server(files, host, port, cache_dir, plot_dir, workers, quiet, output_root)
+    host, port = server.server_address[:2]
+    echo(f"Serving {len(server.registry.files)} run(s) on http://{host}:{port}/runs "
+         f"({workers} worker threads, pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
@@ -0,0 +1,343 @@
+"""
+shared.py
+ensemble 배열을 작업 프로세스에 복사 없이 넘기는 공유 메모리 층
+
+(run, wavelength, depth) cube를 작업마다 pickle하면 큰 ensemble에서는 전송 비용이 작업보다 크다.
+SharedCubes가 cube를 한 번만 공유 메모리 (multiprocessing.shared_memory) 또는 memmap .npy 파일에
+올리고, 작업 프로세스에는 이름/shape/dtype만 담긴 handle과 run slice만 넘긴다. 작업 프로세스는
+attach(handle)로 같은 메모리를 가리키는 읽기 전용 NumPy view를 얻는다.
+
+    with SharedCubes() as shared:
+        source = shared.publish_ensemble(ensemble, ["Lu", "Ed"])     # SharedEnsemble (handle 묶음)
+        pool.map(work, [source.select(slice(i, i + 100)) for i in range(0, len(source), 100)])
+    # 작업 프로세스: source.cube("Lu") -> (선택한 run, n_wavelength, n_depth) view (복사 없음)
+
+정리 (lifecycle):
+- close() / with 블록 종료 시 공유 메모리 unlink, memmap 폴더 삭제 (여러 번 불러도 됨)
+- 정상 종료, 예외, Ctrl+C, SIGTERM: atexit와 SIGTERM 처리기가 열린 SharedCubes를 모두 닫음
+- 강제 종료 (SIGKILL 등): POSIX에서는 multiprocessing resource tracker가 남은 공유 메모리를 지우고,
+  다음 SharedCubes 생성 시 sweep_stale()이 주인 프로세스가 없는 조각 (hl_<pid>_...)을 지운다.
+  Windows에서는 마지막 handle이 닫힐 때 OS가 공유 메모리를 해제한다 (memmap 폴더는 남을 수 있음).
+- backend='auto'는 /dev/shm 여유 공간이 모자라면 (docker 기본 64 MB 등) memmap 파일로 바꾼다.
+  /dev/shm이 가득 찬 상태에서 공유 메모리에 쓰면 예외 대신 SIGBUS로 프로세스가 죽기 때문이다.
+
+작업 프로세스는 multiprocessing (ProcessPoolExecutor 등)으로 만든 프로세스여야 한다. Python 3.13 전에는
+attach한 공유 메모리도 resource tracker에 등록되므로, 관계없는 프로세스가 attach하면 그 프로세스가
+끝날 때 조각이 지워진다.
+"""
+
+import os
+import sys
+import atexit
+import shutil
+import signal
+import secrets
+import tempfile
+import numpy as np
+from pathlib import Path
+
+
+BACKENDS = ("auto", "shm", "file")
+PREFIX = "hl"
+# /dev/shm에 이만큼 여유를 남기지 못하면 auto backend는 file로
+SHM_HEADROOM = 64 << 20
+
+# 열린 publisher (atexit/SIGTERM 정리용)
+_LIVE = set()
+# 이 프로세스에서 attach한 조각: 이름 -> (SharedMemory 또는 None, view)
+_ATTACHED = {}
+_HANDLERS_INSTALLED = False
+
+
+class CubeHandle:
+    """공유 배열 하나의 위치 (pickle 크기는 수백 byte)
+
+    backend='shm'이면 location은 공유 메모리 이름, 'file'이면 .npy 경로.
+    """
+
+    __slots__ = ("name", "shape", "dtype", "backend", "location")
+
+    def __init__(self, name, shape, dtype, backend, location):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = str(dtype)
+        self.backend = backend
+        self.location = location
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype, self.backend, self.location)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype, self.backend, self.location = state
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+    def __repr__(self):
+        return f"CubeHandle({self.name!r}, shape={self.shape}, dtype={self.dtype}, backend={self.backend})"
+
+
+# ----------------------------------------------------------------------
+# 작업 프로세스 쪽
+# ----------------------------------------------------------------------
+def attach(handle):
+    """handle -> 읽기 전용 view (프로세스마다 한 번만 연결하고 이후에는 같은 view)"""
+    cached = _ATTACHED.get(handle.name)
+    if cached is not None:
+        return cached[1]
+    if handle.backend == "shm":
+        from multiprocessing import shared_memory
+        kwargs = {'track': False} if sys.version_info >= (3, 13) else {}
+        block = shared_memory.SharedMemory(name=handle.location, **kwargs)
+        view = np.ndarray(handle.shape, dtype=handle.dtype, buffer=block.buf)
+    else:
+        block = None
+        view = np.load(handle.location, mmap_mode='r')
+        if view.shape != handle.shape or view.dtype != np.dtype(handle.dtype):
+            raise ValueError(f"{handle.location} does not match {handle}")
+    view.flags.writeable = False
+    _ATTACHED[handle.name] = (block, view)
+    return view
+
+
+def detach(name=None):
+    """attach한 조각 닫기 (name=None이면 모두). 이미 넘겨준 view는 더 이상 쓰면 안 된다"""
+    names = list(_ATTACHED) if name is None else [name]
+    for key in names:
+        block, view = _ATTACHED.pop(key, (None, None))
+        del view
+        if block is not None:
+            try:
+                block.close()
+            except BufferError:
+                # 밖에 view가 남아 있으면 mmap을 닫을 수 없음 (프로세스 종료 시 해제)
+                pass
+
+
+class SharedEnsemble:
+    """공유 cube handle로 만든 ensemble 대역 (HydroLightEnsemble.cube와 같은 shape)
+
+    pickle할 때는 handle, 이름, 그리드, run 선택만 넘어간다. density 플롯과 stats reducer처럼
+    cube(q), names, wavelength, depth, k_depth만 쓰는 코드에 그대로 넘길 수 있다.
+    """
+
+    def __init__(self, handles, names, wavelength, depth, k_depth, runs=None):
+        self.handles = dict(handles)
+        self._names = list(names)
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        self.k_depth = np.asarray(k_depth, dtype=float)
+        self.runs = runs
+
+    @property
+    def quantities(self):
+        return list(self.handles)
+
+    @property
+    def names(self):
+        return self._names if self.runs is None else list(np.asarray(self._names, dtype=object)[self.runs])
+
+    def select(self, runs):
+        """전체 run 기준 slice 또는 인덱스 목록으로 고른 SharedEnsemble (데이터 복사 없음)"""
+        return SharedEnsemble(self.handles, self._names, self.wavelength, self.depth, self.k_depth, runs)
+
+    def cube(self, quantity):
+        if quantity not in self.handles:
+            raise KeyError(f"{quantity} was not published, available: {self.quantities}")
+        view = attach(self.handles[quantity])
+        return view if self.runs is None else view[self.runs]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"SharedEnsemble({len(self)} runs, quantities {self.quantities})"
+
+
+# ----------------------------------------------------------------------
+# 게시하는 쪽
+# ----------------------------------------------------------------------
+def _pid_alive(pid):
+    if os.name == "nt":
+        # Windows의 os.kill은 signal 0도 프로세스를 끝내므로 확인하지 않음 (항상 살아 있다고 봄)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _owner(name):
+    """'hl_<pid>_...' 또는 'hydrolight-shared-<pid>-...'의 pid (형식이 아니면 None)"""
+    parts = name.replace("hydrolight-shared-", f"{PREFIX}_").replace("-", "_").split("_")
+    if len(parts) < 3 or parts[0] != PREFIX or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def sweep_stale(directory=None):
+    """주인 프로세스가 끝난 공유 메모리 조각 (/dev/shm, Linux)과 memmap 폴더 삭제 -> 지운 이름 목록"""
+    removed = []
+    candidates = []
+    if os.path.isdir("/dev/shm"):
+        candidates += [Path("/dev/shm") / n for n in os.listdir("/dev/shm") if n.startswith(f"{PREFIX}_")]
+    directory = Path(directory or tempfile.gettempdir())
+    if directory.is_dir():
+        candidates += [p for p in directory.glob("hydrolight-shared-*") if p.is_dir()]
+    for path in candidates:
+        pid = _owner(path.name)
+        if pid is None or pid == os.getpid() or _pid_alive(pid):
+            continue
+        try:
+            shutil.rmtree(path) if path.is_dir() else path.unlink()
+            removed.append(path.name)
+        except OSError:
+            pass
+    return removed
+
+
+def _shm_room(nbytes):
+    """공유 메모리에 nbytes를 올려도 되는지 (/dev/shm이 없는 Windows/macOS는 항상 True)"""
+    if not os.path.isdir("/dev/shm"):
+        return True
+    return shutil.disk_usage("/dev/shm").free - nbytes >= SHM_HEADROOM
+
+
+def _close_all():
+    for shared in list(_LIVE):
+        shared.close()
+
+
+def _terminate(signum, frame):
+    # SystemExit로 바꾸면 with 블록의 __exit__와 atexit가 실행됨
+    raise SystemExit(128 + signum)
+
+
+def _install_handlers():
+    global _HANDLERS_INSTALLED
+    if _HANDLERS_INSTALLED:
+        return
+    _HANDLERS_INSTALLED = True
+    atexit.register(_close_all)
+    try:
+        if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _terminate)
+    except ValueError:
+        # main thread가 아니면 signal 처리기를 바꿀 수 없음 (atexit만 사용)
+        pass
+
+
+class SharedCubes:
+    """배열을 공유 메모리/memmap에 한 번 올리고 handle을 나눠 주는 publisher (context manager)
+
+    backend: 'shm' (multiprocessing.shared_memory), 'file' (directory 아래 .npy memmap),
+             'auto' (shm, /dev/shm 여유가 모자라면 file)
+    """
+
+    def __init__(self, backend="auto", directory=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        self.backend = backend
+        self.root = Path(directory) if directory else None
+        self.pid = os.getpid()
+        self.token = f"{PREFIX}_{self.pid}_{secrets.token_hex(4)}"
+        self.handles = {}
+        self._blocks = {}
+        self._directory = None
+        self.closed = False
+        sweep_stale(self.root)
+        _install_handlers()
+        _LIVE.add(self)
+
+    def _file_path(self, name):
+        if self._directory is None:
+            root = self.root or Path(tempfile.gettempdir())
+            root.mkdir(parents=True, exist_ok=True)
+            self._directory = Path(tempfile.mkdtemp(prefix=f"hydrolight-shared-{os.getpid()}-", dir=root))
+        return self._directory / f"{name}.npy"
+
+    def publish(self, array, key=None):
+        """배열을 공유 위치에 한 번 복사 -> CubeHandle (key: 구분용 이름, 기본은 순번)"""
+        if self.closed:
+            raise ValueError("SharedCubes is closed")
+        array = np.asarray(array)
+        key = key or f"a{len(self.handles)}"
+        if key in self.handles:
+            raise KeyError(f"{key!r} is already published")
+        name = f"{self.token}_{len(self.handles)}"
+        backend = self.backend
+        if backend == "auto":
+            backend = "shm" if _shm_room(array.nbytes) else "file"
+        if backend == "shm":
+            from multiprocessing import shared_memory
+            block = shared_memory.SharedMemory(name=name, create=True, size=max(array.nbytes, 1))
+            self._blocks[key] = block
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            location = block.name
+        else:
+            location = str(self._file_path(name))
+            target = np.lib.format.open_memmap(location, mode='w+', dtype=array.dtype, shape=array.shape)
+        np.copyto(target, array)
+        if backend == "file":
+            target.flush()
+        del target
+        self.handles[key] = CubeHandle(name, array.shape, array.dtype, backend, location)
+        return self.handles[key]
+
+    def publish_ensemble(self, source, quantities):
+        """source (HydroLightEnsemble, EnsembleStore 등)의 cube들을 올림 -> SharedEnsemble
+
+        source에 없거나 cube로 만들 수 없는 양은 건너뛴다 (SharedEnsemble.cube가 KeyError).
+        """
+        handles = {}
+        for q in dict.fromkeys(quantities):
+            try:
+                cube = np.asarray(source.cube(q), dtype=float)
+            except (KeyError, ValueError):
+                continue
+            handles[q] = self.publish(cube, key=q)
+            del cube
+        return SharedEnsemble(handles, source.names, source.wavelength, source.depth, source.k_depth)
+
+    @property
+    def nbytes(self):
+        return sum(h.nbytes for h in self.handles.values())
+
+    def close(self):
+        """모든 조각 해제 (공유 메모리 unlink, memmap 폴더 삭제). fork된 작업 프로세스에서는 아무것도 안 함"""
+        if self.closed or os.getpid() != self.pid:
+            return
+        self.closed = True
+        _LIVE.discard(self)
+        for key, handle in self.handles.items():
+            detach(handle.name)
+            block = self._blocks.pop(key, None)
+            if block is not None:
+                try:
+                    block.close()
+                except BufferError:
+                    pass
+                try:
+                    block.unlink()
+                except FileNotFoundError:
+                    pass
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __repr__(self):
+        state = "closed" if self.closed else f"{len(self.handles)} arrays, {self.nbytes / 1e6:.1f} MB"
+        return f"SharedCubes({self.backend}, {state})"
@@ -0,0 +1,85 @@
+"""
+standin.py
+scheduler를 HydroLight 없이 끝까지 시험하기 위한 대역 실행 파일: 기존 printout을 template으로 합성 printout 작성
+
+    python -m hydrolight.standin <run 입력 파일 또는 run 폴더> <출력 printout> --template data/PExe04.txt
+    hydrolight schedule results/sweep/manifest.csv --jobs 4 \\
+        --command "python -m hydrolight.standin {input} {output} --template data/PExe04.txt --seconds-per-band 0.01"
+
+- template의 각 'Waveband N of M completed in X sec' 자리에서 밴드 하나 계산 시간만큼 잠든 뒤
+  실제 걸린 시간을 적는다. 밴드당 시간 = seconds_per_band x (1 + chl / 10) (chl은 run 폴더의
+  Chlzdata 파일 첫 값, 없으면 0)이므로 scheduler의 비용 모델이 배울 수 있는 차이가 생긴다.
+- RUN TITLE 줄은 rootname, 끝의 wall clock 시간은 실제 시간으로 바꾼다.
+- --fail-once: run 폴더에 표시 파일이 없으면 만들고 종료 코드 1 (재시도 시험용)
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+
+WAVEBAND = re.compile(r"(Waveband\s+\d+\s+of\s+\d+\s+completed in)\s+[-+\d.Ee]+(\s*sec)")
+WALL_CLOCK = re.compile(r"(Total \(wall clock\) run time =)\s*[-+\d.Ee]+(\s*sec)")
+FAIL_MARKER = ".standin_failed_once"
+
+
+def read_chl(run_dir):
+    """run 폴더의 Chlzdata 파일에서 첫 Chl 값 (없으면 0)"""
+    for path in sorted(Path(run_dir).glob("Chlzdata_*.txt")):
+        in_header = False
+        for line in path.read_text().splitlines():
+            s = line.strip()
+            if s.startswith("\\begin_header"):
+                in_header = True
+            elif s.startswith("\\end_header"):
+                in_header = False
+            elif s and not in_header:
+                return float(s.split()[1])
+    return 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="hydrolight.standin", description="HydroLight 대역 실행 파일")
+    parser.add_argument('input', help="run 입력 파일 또는 run 폴더")
+    parser.add_argument('output', help="쓸 printout 파일")
+    parser.add_argument('--template', required=True, help="template printout (예: data/PExe04.txt)")
+    parser.add_argument('--seconds-per-band', type=float, default=0.01, help="chl = 0일 때 밴드당 시간 (초)")
+    parser.add_argument('--fail-once', action='store_true', help="처음 한 번은 실패 (종료 코드 1)")
+    args = parser.parse_args(argv)
+
+    source = Path(args.input)
+    run_dir = source if source.is_dir() else source.parent
+    rootname = Path(args.output).stem[1:] if Path(args.output).stem.startswith("P") else Path(args.output).stem
+    if args.fail_once and not (run_dir / FAIL_MARKER).exists():
+        (run_dir / FAIL_MARKER).touch()
+        print(f"stand-in: simulated failure for {rootname}", file=sys.stderr)
+        return 1
+
+    per_band = args.seconds_per_band * (1 + read_chl(run_dir) / 10)
+    start = time.perf_counter()
+    lines = []
+    with open(args.template, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if "RUN TITLE:" in line:
+                line = f"  RUN TITLE:  {rootname} (hydrolight stand-in)\n"
+            elif "Waveband" in line and WAVEBAND.search(line):
+                band_start = time.perf_counter()
+                time.sleep(per_band)
+                line = WAVEBAND.sub(lambda m: f"{m.group(1)} {time.perf_counter() - band_start:8.4f}{m.group(2)}",
+                                    line)
+            elif "wall clock" in line:
+                line = WALL_CLOCK.sub(lambda m: f"{m.group(1)} {time.perf_counter() - start:12.2E}{m.group(2)}", line)
+            lines.append(line)
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # 끝난 printout만 보이도록 임시 파일에 쓴 뒤 이름 바꾸기
+    partial = output.with_suffix(".partial")
+    partial.write_text("".join(lines), encoding='utf-8')
+    partial.replace(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
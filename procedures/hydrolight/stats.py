@@ -0,0 +1,405 @@
+"""
+stats.py
+여러 HydroLight run을 하나씩 읽으면서 (wavelength, depth) 셀별 통계를 누적하는 streaming reducer
+
+메모리 사용량은 그리드 크기에만 비례하고 run 개수와는 무관하다.
+- StreamingMoments: Welford 방식의 개수/평균/분산/최솟값/최댓값
+- QuantileSketch: 상대 오차가 보장되는 로그 bucket 히스토그램 (DDSketch 방식) 으로 백분위수 추정
+두 객체 모두 merge()로 합칠 수 있으므로, 여러 프로세스가 나누어 계산한 부분 결과를 합칠 수 있다.
+이미 메모리에 있는 ensemble은 reduce_ensemble이 cube를 공유 메모리로 넘긴다 (shared.py).
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+# 기본 통계 대상 양
+STATS_QUANTITIES = ("Lu", "Ed", "Rrs", "Kd")
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class StreamingMoments:
+    """셀별 개수, 평균, 분산(M2), 최솟값, 최댓값 누적 (NaN 셀은 건너뜀)"""
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape)
+        self.min = np.full(self.shape, np.inf)
+        self.max = np.full(self.shape, -np.inf)
+
+    def update(self, values):
+        """run 하나의 배열 (shape) 추가"""
+        self.update_batch(np.asarray(values, dtype=float)[None])
+
+    def update_batch(self, values):
+        """여러 run의 배열 (n, *shape) 추가 - 배치 통계를 구한 뒤 merge와 같은 식으로 합침"""
+        values = np.asarray(values, dtype=float)
+        if values.shape[1:] != self.shape:
+            raise ValueError(f"Expected (n, {self.shape}) values, got {values.shape}")
+        finite = np.isfinite(values)
+        count = finite.sum(axis=0)
+        filled = np.where(finite, values, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, filled.sum(axis=0) / count, 0.0)
+        m2 = (np.where(finite, values - mean, 0.0) ** 2).sum(axis=0)
+        self._combine(count, mean, m2,
+                      np.where(finite, values, np.inf).min(axis=0),
+                      np.where(finite, values, -np.inf).max(axis=0))
+
+    def merge(self, other):
+        """다른 StreamingMoments의 결과를 합침 (Chan et al. 병렬 분산 공식)"""
+        if other.shape != self.shape:
+            raise ValueError(f"Cannot merge moments of shape {other.shape} into {self.shape}")
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, vmin, vmax):
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            weight = np.where(total > 0, count / total, 0.0)
+            self.mean = self.mean + delta * weight
+            self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.minimum(self.min, vmin)
+        self.max = np.maximum(self.max, vmax)
+
+    def variance(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def summary(self):
+        """통계 배열 dict (값이 없는 셀은 NaN)"""
+        empty = self.count == 0
+        return {'count': self.count.copy(),
+                'mean': np.where(empty, np.nan, self.mean),
+                'std': self.std(),
+                'min': np.where(empty, np.nan, self.min),
+                'max': np.where(empty, np.nan, self.max)}
+
+
+class QuantileSketch:
+    """셀별 로그 bucket 히스토그램으로 분위수 추정 (DDSketch 방식)
+
+    bucket 경계가 gamma = (1 + a)/(1 - a)의 거듭제곱이므로, 추정한 분위수의 상대 오차는
+    relative_accuracy(a) 이하이다. |값| < min_value는 0 bucket에, max_value보다 큰 값은
+    마지막 bucket에 넣는다. 음수는 처음 나왔을 때만 별도 히스토그램을 만든다.
+    """
+
+    def __init__(self, shape, relative_accuracy=0.01, min_value=1e-10, max_value=1e6):
+        self.shape = tuple(shape)
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self._k_min = int(np.ceil(np.log(min_value) / self._log_gamma))
+        self.n_buckets = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._k_min + 1
+        n_cells = int(np.prod(self.shape))
+        self.positive = np.zeros((n_cells, self.n_buckets), dtype=np.uint32)
+        self.negative = None
+        self.zero = np.zeros(n_cells, dtype=np.uint32)
+
+    @property
+    def count(self):
+        total = self.zero.astype(np.int64) + self.positive.sum(axis=1)
+        if self.negative is not None:
+            total += self.negative.sum(axis=1)
+        return total.reshape(self.shape)
+
+    def _bucket(self, magnitude):
+        k = np.ceil(np.log(magnitude) / self._log_gamma).astype(np.int64) - self._k_min
+        return np.clip(k, 0, self.n_buckets - 1)
+
+    def update(self, values):
+        """run 하나의 배열 (shape) 추가"""
+        self.update_batch(np.asarray(values, dtype=float)[None])
+
+    def update_batch(self, values):
+        """여러 run의 배열 (n, *shape) 추가"""
+        values = np.asarray(values, dtype=float).reshape(len(values), -1)
+        if values.shape[1] != len(self.zero):
+            raise ValueError(f"Expected (n, {self.shape}) values, got {values.shape}")
+        cells = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+        finite = np.isfinite(values)
+        magnitude = np.abs(values)
+
+        small = finite & (magnitude < self.min_value)
+        np.add.at(self.zero, cells[small], 1)
+        for sign, mask in ((1, finite & ~small & (values > 0)), (-1, finite & ~small & (values < 0))):
+            if not mask.any():
+                continue
+            if sign < 0 and self.negative is None:
+                self.negative = np.zeros_like(self.positive)
+            store = self.positive if sign > 0 else self.negative
+            np.add.at(store, (cells[mask], self._bucket(magnitude[mask])), 1)
+
+    def merge(self, other):
+        """같은 설정의 다른 sketch를 합침"""
+        if (other.shape != self.shape or other.n_buckets != self.n_buckets
+                or other.gamma != self.gamma or other._k_min != self._k_min):
+            raise ValueError("Cannot merge quantile sketches with different shapes or accuracy")
+        self.positive += other.positive
+        self.zero += other.zero
+        if other.negative is not None:
+            if self.negative is None:
+                self.negative = np.zeros_like(self.positive)
+            self.negative += other.negative
+        return self
+
+    def _value(self, k):
+        """bucket k의 대표값 (bucket 안에서 상대 오차가 최소인 값)"""
+        return 2.0 * self.gamma ** (k + self._k_min) / (self.gamma + 1.0)
+
+    def quantile(self, q):
+        """셀별 q 분위수 (0 <= q <= 1), 값이 없는 셀은 NaN"""
+        q = float(q)
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"Quantile must be in [0, 1], got {q}")
+        # 작은 값부터 순서대로: 음수(큰 크기부터), 0, 양수(작은 크기부터)
+        parts = []
+        if self.negative is not None:
+            parts.append(self.negative[:, ::-1])
+        parts.append(self.zero[:, None])
+        parts.append(self.positive)
+        counts = np.concatenate(parts, axis=1).astype(np.int64)
+        cumulative = np.cumsum(counts, axis=1)
+        total = cumulative[:, -1]
+        rank = np.floor(q * np.maximum(total - 1, 0))
+        index = np.argmax(cumulative > rank[:, None], axis=1)
+
+        n_neg = self.n_buckets if self.negative is not None else 0
+        values = np.zeros(len(index))
+        neg = index < n_neg
+        pos = index > n_neg
+        values[neg] = -self._value(self.n_buckets - 1 - index[neg])
+        values[pos] = self._value(index[pos] - n_neg - 1)
+        values[total == 0] = np.nan
+        return values.reshape(self.shape)
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        """{p: 셀별 p 백분위수}"""
+        return {p: self.quantile(p / 100.0) for p in percentiles}
+
+
+class EnsembleStatistics:
+    """여러 양(quantity)의 StreamingMoments + QuantileSketch 묶음
+
+    그리드(wavelength, depth, k_depth)는 생성 시 고정된다. run의 깊이가 그리드의
+    일부이면 (바닥 행 누락 등) 없는 셀만 건너뛰고, 그리드에 없는 깊이가 있으면 오류.
+    """
+
+    def __init__(self, wavelength, depth, k_depth=(), quantities=STATS_QUANTITIES, **sketch_kwargs):
+        from .ensemble import KFUNCTION_QUANTITIES, SURFACE_QUANTITIES
+        self.wavelength = np.asarray(wavelength, dtype=float)
+        self.depth = np.asarray(depth, dtype=float)
+        self.k_depth = np.asarray(k_depth, dtype=float)
+        self.quantities = list(quantities)
+        self.sketch_kwargs = sketch_kwargs
+        self.grids = {}
+        for q in self.quantities:
+            if q in SURFACE_QUANTITIES:
+                self.grids[q] = None
+            elif q in KFUNCTION_QUANTITIES:
+                self.grids[q] = 'k_depth'
+            else:
+                self.grids[q] = 'depth'
+        self.moments = {q: StreamingMoments(self.shape(q)) for q in self.quantities}
+        self.sketches = {q: QuantileSketch(self.shape(q), **sketch_kwargs) for q in self.quantities}
+        self.n_runs = 0
+
+    @classmethod
+    def like(cls, run, quantities=STATS_QUANTITIES, **sketch_kwargs):
+        """run 하나의 그리드로 빈 통계 객체 생성"""
+        return cls(run.wavelength, run.depth, run.k_depth, quantities, **sketch_kwargs)
+
+    def shape(self, quantity):
+        grid = self.grids[quantity]
+        return (len(self.wavelength),) if grid is None else (len(self.wavelength), len(getattr(self, grid)))
+
+    def _align(self, quantity, values, run_depth):
+        """run 깊이 그리드의 배열을 통계 그리드로 옮김 (없는 깊이는 NaN)"""
+        grid = self.grids[quantity]
+        if grid is None:
+            return values
+        grid = getattr(self, grid)
+        if len(run_depth) == len(grid) and np.allclose(run_depth, grid):
+            return values
+        iz = np.searchsorted(grid, run_depth)
+        if np.any(iz >= len(grid)) or not np.allclose(grid[np.minimum(iz, len(grid) - 1)], run_depth):
+            raise ValueError(f"Depths {run_depth} are not on the statistics grid {grid}")
+        out = np.full(values.shape[:-1] + (len(grid),), np.nan)
+        out[..., iz] = values
+        return out
+
+    def add_run(self, run):
+        """HydroLightRun 하나 추가"""
+        if len(run.wavelength) != len(self.wavelength) or not np.allclose(run.wavelength, self.wavelength):
+            raise ValueError(f"Wavelength grid of {run.name} does not match the statistics grid")
+        for q in self.quantities:
+            run_depth = run.k_depth if self.grids[q] == 'k_depth' else run.depth
+            values = self._align(q, np.asarray(run[q], dtype=float), run_depth)
+            self.moments[q].update(values)
+            self.sketches[q].update(values)
+        self.n_runs += 1
+        return self
+
+    def add_runs(self, runs):
+        """run iterable(생성기 포함)을 하나씩 소비하며 추가"""
+        for run in runs:
+            self.add_run(run)
+        return self
+
+    def add_cube(self, quantity, cube):
+        """(n_run, n_wavelength[, n_depth]) 배열을 한 번에 추가 (EnsembleStore 읽기용)
+
+        n_runs는 갱신하지 않으므로, 모든 양을 추가한 뒤 직접 더한다.
+        """
+        self.moments[quantity].update_batch(cube)
+        self.sketches[quantity].update_batch(cube)
+        return self
+
+    def merge(self, other):
+        """다른 EnsembleStatistics(같은 그리드)를 합침"""
+        if (other.quantities != self.quantities or not np.array_equal(other.wavelength, self.wavelength)
+                or not np.array_equal(other.depth, self.depth) or not np.array_equal(other.k_depth, self.k_depth)):
+            raise ValueError("Cannot merge statistics with different grids or quantities")
+        for q in self.quantities:
+            self.moments[q].merge(other.moments[q])
+            self.sketches[q].merge(other.sketches[q])
+        self.n_runs += other.n_runs
+        return self
+
+    def summary(self, quantity, percentiles=DEFAULT_PERCENTILES):
+        """{'count', 'mean', 'std', 'min', 'max', 'p5', 'p50', ...} 배열 dict"""
+        result = self.moments[quantity].summary()
+        for p, values in self.sketches[quantity].percentiles(percentiles).items():
+            result[f"p{p:g}"] = values
+        return result
+
+    def to_frame(self, percentiles=DEFAULT_PERCENTILES):
+        """모든 양의 셀별 통계를 long-format DataFrame으로 변환"""
+        import pandas as pd
+        frames = []
+        for q in self.quantities:
+            stats = self.summary(q, percentiles)
+            grid = self.grids[q]
+            if grid is None:
+                index = {'wavelength': self.wavelength, 'depth': np.full(len(self.wavelength), np.nan)}
+            else:
+                wl, z = np.meshgrid(self.wavelength, getattr(self, grid), indexing='ij')
+                index = {'wavelength': wl.ravel(), 'depth': z.ravel()}
+            frame = pd.DataFrame({'quantity': q, **index, **{k: v.ravel() for k, v in stats.items()}})
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    def save(self, filepath, percentiles=DEFAULT_PERCENTILES):
+        """요약 통계를 npz로 저장 ('<quantity>_<stat>' 배열)"""
+        arrays = {}
+        for q in self.quantities:
+            for key, values in self.summary(q, percentiles).items():
+                arrays[f"{q}_{key}"] = values
+        np.savez_compressed(filepath, wavelength=self.wavelength, depth=self.depth,
+                            k_depth=self.k_depth, n_runs=self.n_runs, **arrays)
+        return filepath
+
+
+# ----------------------------------------------------------------------
+# 파일 / store 단위 reducer
+# ----------------------------------------------------------------------
+def _reduce_files(files, grid, quantities, cache_dir, sketch_kwargs):
+    """작업 프로세스에서 파일 묶음을 통계 하나로 줄임 -> (통계, [(파일, 오류 메시지)])"""
+    from .ensemble import load_run
+    stats = EnsembleStatistics(*grid, quantities=quantities, **sketch_kwargs)
+    failures = []
+    for filepath in files:
+        try:
+            stats.add_run(load_run(filepath, cache_dir))
+        except Exception as e:
+            failures.append((str(filepath), f"{type(e).__name__}: {e}"))
+    return stats, failures
+
+
+def reduce_files(files, quantities=STATS_QUANTITIES, jobs=1, cache_dir=None, grid=None, **sketch_kwargs):
+    """HydroLight 출력 파일들의 셀별 통계 -> (EnsembleStatistics, [(파일, 오류 메시지)])
+
+    jobs > 1이면 파일을 jobs개 묶음으로 나누어 각 프로세스가 부분 통계를 만들고 합친다.
+    프로세스 사이에는 run이 아니라 그리드 크기의 통계만 오간다. grid(wavelength, depth,
+    k_depth)를 주지 않으면 첫 번째 파일의 그리드를 사용한다.
+    """
+    from .ensemble import load_run
+    files = [str(f) for f in files]
+    if not files:
+        raise ValueError("No files to reduce")
+    if grid is None:
+        first = load_run(files[0], cache_dir)
+        grid = (first.wavelength, first.depth, first.k_depth)
+
+    if jobs <= 1 or len(files) == 1:
+        return _reduce_files(files, grid, quantities, cache_dir, sketch_kwargs)
+
+    chunks = [files[i::jobs] for i in range(jobs) if files[i::jobs]]
+    stats = EnsembleStatistics(*grid, quantities=quantities, **sketch_kwargs)
+    failures = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for partial, errors in pool.map(_reduce_files, chunks, [grid] * len(chunks),
+                                        [quantities] * len(chunks), [cache_dir] * len(chunks),
+                                        [sketch_kwargs] * len(chunks)):
+            stats.merge(partial)
+            failures.extend(errors)
+    return stats, failures
+
+
+def reduce_store(store, quantities=STATS_QUANTITIES, batch_runs=None, **sketch_kwargs):
+    """EnsembleStore의 셀별 통계 (run chunk 단위로 읽어 메모리 사용량 제한)"""
+    batch_runs = batch_runs or store.chunk_runs
+    stats = EnsembleStatistics(store.wavelength, store.depth, store.k_depth, quantities, **sketch_kwargs)
+    for start in range(0, len(store), batch_runs):
+        selection = slice(start, min(start + batch_runs, len(store)))
+        for q in quantities:
+            stats.add_cube(q, store.read(q, runs=selection))
+    stats.n_runs = len(store)
+    return stats
+
+
+def _reduce_cubes(source, quantities, batch_runs, sketch_kwargs):
+    """source (ensemble, store 또는 run을 고른 SharedEnsemble)의 cube를 batch_runs개씩 통계로 줄임"""
+    stats = EnsembleStatistics(source.wavelength, source.depth, source.k_depth, quantities, **sketch_kwargs)
+    n = len(source.names)
+    for q in quantities:
+        cube = source.cube(q)
+        for start in range(0, n, batch_runs or n):
+            stats.add_cube(q, cube[start:start + (batch_runs or n)])
+    stats.n_runs = n
+    return stats
+
+
+def reduce_ensemble(source, quantities=STATS_QUANTITIES, jobs=1, batch_runs=256, **sketch_kwargs):
+    """메모리에 있는 ensemble (HydroLightEnsemble 등 cube()가 있는 객체)의 셀별 통계
+
+    jobs > 1이면 cube를 공유 메모리에 한 번 올리고 (shared.SharedCubes), 작업 프로세스에는
+    handle과 run slice만 넘겨 부분 통계를 만든 뒤 합친다.
+    """
+    n = len(source.names)
+    if jobs <= 1 or n < 2:
+        return _reduce_cubes(source, quantities, batch_runs, sketch_kwargs)
+
+    from .shared import SharedCubes
+    bounds = np.linspace(0, n, min(jobs, n) + 1).astype(int)
+    stats = EnsembleStatistics(source.wavelength, source.depth, source.k_depth, quantities, **sketch_kwargs)
+    with SharedCubes() as shared:
+        published = shared.publish_ensemble(source, quantities)
+        missing = [q for q in quantities if q not in published.handles]
+        if missing:
+            raise KeyError(f"Cannot build cube(s) for {missing}")
+        parts = [published.select(slice(a, b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+            for partial in pool.map(_reduce_cubes, parts, [quantities] * len(parts),
+                                    [batch_runs] * len(parts), [sketch_kwargs] * len(parts)):
+                stats.merge(partial)
+    return stats
@@ -0,0 +1,358 @@
+"""
+store.py
+수천 개 HydroLight run의 (run, wavelength, depth) 배열을 디스크에 chunk 단위로 저장하고 부분적으로 읽는 ensemble store
+
+디렉토리 구조:
+    store/
+        store.json              파장/깊이 그리드, 양(quantity)별 shape, chunk 크기, run 개수
+        runs.csv                run 이름과 메타데이터 테이블 (sweep 파라미터는 sweep.<이름> 열)
+        <quantity>/<r>.<w>.z    run chunk r, 파장 chunk w (byte shuffle + zlib 압축)
+        <quantity>/<r>.<w>.npy  (compression=None일 때) 비압축 chunk, memmap으로 읽음
+
+배열은 run 축과 파장 축으로 chunk를 나누고 깊이 축은 나누지 않는다. 따라서
+"모든 run의 550 nm"는 파장 chunk 하나의 열(column)만, "run 하나의 모든 밴드"는
+run chunk 하나의 행(row)만 읽는다.
+"""
+
+import os
+import json
+import zlib
+import numpy as np
+from pathlib import Path
+
+from .ensemble import (HydroLightEnsemble, IRRADIANCE_QUANTITIES, RADIANCE_QUANTITIES,
+                       IOP_QUANTITIES, KFUNCTION_QUANTITIES, SURFACE_QUANTITIES,
+                       PARAMETER_NAMES)
+
+
+# runs.csv에서 metadata['sweep'] 파라미터 열 이름 앞에 붙이는 접두사
+SWEEP_PREFIX = "sweep."
+
+# 기본 저장 양: 파싱된 모든 배열
+STORE_QUANTITIES = (IRRADIANCE_QUANTITIES + RADIANCE_QUANTITIES + IOP_QUANTITIES
+                    + KFUNCTION_QUANTITIES + SURFACE_QUANTITIES)
+
+STORE_VERSION = 1
+
+
+def _write_atomic(filepath, data):
+    """임시 파일에 쓴 뒤 이름을 바꿔, 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 함"""
+    tmp = filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    tmp.replace(filepath)
+
+
+def _index(selection, n):
+    """int / slice / sequence / None 선택을 정수 인덱스 배열로 변환"""
+    if selection is None:
+        return np.arange(n)
+    if isinstance(selection, slice):
+        return np.arange(n)[selection]
+    index = np.atleast_1d(np.asarray(selection))
+    if index.dtype == bool:
+        return np.flatnonzero(index)
+    index = index.astype(np.int64)
+    index[index < 0] += n
+    if index.size and (index.min() < 0 or index.max() >= n):
+        raise IndexError(f"Index out of range for axis of length {n}")
+    return index
+
+
+class EnsembleStore:
+    """chunk 단위로 압축 저장된 HydroLight ensemble
+
+    EnsembleStore.create()로 새 store를 만들고 append()로 run을 추가한다.
+    read()는 필요한 chunk만 읽어 numpy 배열을 반환하며, 비압축 store에서 선택이
+    chunk 하나 안에 들어가면 복사 없이 memmap view를 반환한다.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "store.json", 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+        if self.info.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported store version {self.info.get('version')} in {self.path}")
+        self.wavelength = np.asarray(self.info['wavelength'], dtype=float)
+        self.depth = np.asarray(self.info['depth'], dtype=float)
+        self.k_depth = np.asarray(self.info['k_depth'], dtype=float)
+        self.chunk_runs = self.info['chunk_runs']
+        self.chunk_bands = self.info['chunk_bands']
+        self.compression = self.info['compression']
+        self.dtype = np.dtype(self.info['dtype'])
+        self._table = None
+
+    @classmethod
+    def create(cls, path, wavelength, depth, k_depth=(), quantities=STORE_QUANTITIES,
+               chunk_runs=256, chunk_bands=8, compression='zlib', level=1, dtype='float32'):
+        """빈 store 생성
+
+        chunk 하나의 크기는 chunk_runs x chunk_bands x n_depth 값이다. 기본값(256 x 8 x 11,
+        float32)은 약 90 kB로, 파장 하나 또는 run 하나를 읽을 때 읽는 양을 작게 유지한다.
+        compression=None이면 chunk를 .npy로 저장하여 memmap으로 읽는다. 압축 전에 값의
+        바이트를 자리별로 모으는 byte shuffle을 적용한다 (부호/지수 바이트가 모여 압축률이 좋아짐).
+        """
+        path = Path(path)
+        if (path / "store.json").exists():
+            raise FileExistsError(f"Store already exists: {path}")
+        if compression not in ('zlib', None):
+            raise ValueError(f"Unknown compression {compression!r}, use 'zlib' or None")
+        path.mkdir(parents=True, exist_ok=True)
+
+        layout = {}
+        for q in quantities:
+            if q in SURFACE_QUANTITIES:
+                layout[q] = None
+            elif q in KFUNCTION_QUANTITIES:
+                layout[q] = 'k_depth'
+            else:
+                layout[q] = 'depth'
+        info = {'version': STORE_VERSION,
+                'wavelength': [float(w) for w in wavelength],
+                'depth': [float(z) for z in depth],
+                'k_depth': [float(z) for z in k_depth],
+                'quantities': layout,
+                'chunk_runs': int(chunk_runs),
+                'chunk_bands': int(chunk_bands),
+                'compression': compression,
+                'level': int(level),
+                'dtype': np.dtype(dtype).name,
+                'n_runs': 0}
+        _write_atomic(path / "store.json", json.dumps(info, indent=1).encode('utf-8'))
+        return cls(path)
+
+    @classmethod
+    def from_ensemble(cls, path, ensemble, **kwargs):
+        """HydroLightEnsemble 전체를 새 store로 저장"""
+        store = cls.create(path, ensemble.wavelength, ensemble.depth, ensemble.k_depth, **kwargs)
+        store.append(ensemble.runs)
+        return store
+
+    # ------------------------------------------------------------------
+    # 기본 정보
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return self.info['n_runs']
+
+    @property
+    def quantities(self):
+        return list(self.info['quantities'])
+
+    @property
+    def table(self):
+        """run 메타데이터 테이블 (runs.csv)"""
+        if self._table is None:
+            import pandas as pd
+            table_file = self.path / "runs.csv"
+            self._table = (pd.read_csv(table_file, keep_default_na=True) if table_file.exists()
+                           else pd.DataFrame(columns=['name']))
+            # 추가 중 중단된 행은 제외
+            self._table = self._table.iloc[:len(self)]
+        return self._table
+
+    @property
+    def names(self):
+        return list(self.table['name'].astype(str))
+
+    @property
+    def params(self):
+        """run별 수치형 파라미터 테이블 (HydroLightEnsemble.params와 같은 형식)
+
+        sweep.<이름> 열의 값이 있으면 같은 이름의 메타데이터 값을 대신하거나 열로 추가된다.
+        """
+        table = self.table.set_index(self.table['name'].astype(str))
+        sweep = [c[len(SWEEP_PREFIX):] for c in table.columns if str(c).startswith(SWEEP_PREFIX)]
+        params = table.reindex(columns=PARAMETER_NAMES + [k for k in sweep if k not in PARAMETER_NAMES])
+        params = params.astype(float)
+        for k in sweep:
+            values = table[SWEEP_PREFIX + k].astype(float)
+            params[k] = values.where(values.notna(), params[k])
+        return params
+
+    def band(self, wavelength):
+        """가장 가까운 밴드 인덱스 (nm)"""
+        return int(np.argmin(np.abs(self.wavelength - wavelength)))
+
+    def run_index(self, name):
+        """run 이름 -> 인덱스"""
+        names = self.names
+        if name not in names:
+            raise KeyError(f"Run {name!r} not in store {self.path}")
+        return names.index(name)
+
+    def _grid(self, quantity):
+        if quantity not in self.info['quantities']:
+            raise KeyError(f"Quantity {quantity!r} not in store (available: {', '.join(self.quantities)})")
+        grid = self.info['quantities'][quantity]
+        return None if grid is None else getattr(self, grid)
+
+    def _tail(self, quantity):
+        """run, wavelength 뒤의 shape"""
+        grid = self._grid(quantity)
+        return () if grid is None else (len(grid),)
+
+    # ------------------------------------------------------------------
+    # chunk 읽기/쓰기
+    # ------------------------------------------------------------------
+    def _chunk_file(self, quantity, r, w):
+        suffix = "z" if self.compression else "npy"
+        return self.path / quantity / f"{r}.{w}.{suffix}"
+
+    def _band_span(self, w):
+        start = w * self.chunk_bands
+        return start, min(start + self.chunk_bands, len(self.wavelength))
+
+    def _read_chunk(self, quantity, r, w, mmap=True):
+        """chunk 하나 읽기 -> (chunk_runs, n_band_in_chunk, ...) 배열 (없으면 NaN)"""
+        start, stop = self._band_span(w)
+        shape = (self.chunk_runs, stop - start) + self._tail(quantity)
+        chunk_file = self._chunk_file(quantity, r, w)
+        if not chunk_file.exists():
+            return np.full(shape, np.nan, dtype=self.dtype)
+        if self.compression is None:
+            return np.load(chunk_file, mmap_mode='r' if mmap else None)
+        with open(chunk_file, 'rb') as f:
+            data = np.frombuffer(zlib.decompress(f.read()), dtype=np.uint8)
+        # byte shuffle 되돌리기
+        data = data.reshape(self.dtype.itemsize, -1).T.copy()
+        return data.view(self.dtype).reshape(shape)
+
+    def _write_chunk(self, quantity, r, w, chunk):
+        chunk_file = self._chunk_file(quantity, r, w)
+        chunk_file.parent.mkdir(exist_ok=True)
+        chunk = np.ascontiguousarray(chunk, dtype=self.dtype)
+        if self.compression is None:
+            tmp = chunk_file.with_name(f".{chunk_file.stem}.{os.getpid()}.tmp.npy")
+            np.save(tmp, chunk)
+            tmp.replace(chunk_file)
+        else:
+            shuffled = chunk.view(np.uint8).reshape(-1, self.dtype.itemsize).T.tobytes()
+            _write_atomic(chunk_file, zlib.compress(shuffled, self.info['level']))
+
+    # ------------------------------------------------------------------
+    # 추가
+    # ------------------------------------------------------------------
+    def append(self, runs):
+        """HydroLightRun 목록 추가
+
+        마지막 run chunk가 덜 찼으면 그 chunk를 읽어 이어서 채운다. chunk를 모두 쓴
+        뒤 runs.csv와 store.json의 run 개수를 갱신하므로, 도중에 중단되어도 읽는 쪽은
+        이전 상태를 본다.
+        """
+        runs = list(runs)
+        if not runs:
+            return self
+        ensemble = HydroLightEnsemble(runs)
+        if len(ensemble.wavelength) != len(self.wavelength) or not np.allclose(ensemble.wavelength, self.wavelength):
+            raise ValueError("Wavelength grid of appended runs does not match the store")
+        for grid_name in ('depth', 'k_depth'):
+            extra = np.setdiff1d(getattr(ensemble, grid_name), getattr(self, grid_name))
+            if len(extra):
+                raise ValueError(f"Runs have {grid_name} values not in the store grid: {extra}")
+
+        n0 = len(self)
+        n1 = n0 + len(runs)
+        n_band_chunks = -(-len(self.wavelength) // self.chunk_bands)
+        for q in self.quantities:
+            grid = self._grid(q)
+            cube = ensemble.cube(q)
+            if grid is not None:
+                # ensemble 그리드 -> store 그리드로 옮기기 (없는 깊이는 NaN)
+                own = ensemble.k_depth if q in KFUNCTION_QUANTITIES else ensemble.depth
+                full = np.full(cube.shape[:2] + (len(grid),), np.nan)
+                full[:, :, np.searchsorted(grid, own)] = cube
+                cube = full
+            for r in range(n0 // self.chunk_runs, -(-n1 // self.chunk_runs)):
+                lo = max(n0, r * self.chunk_runs)
+                hi = min(n1, (r + 1) * self.chunk_runs)
+                for w in range(n_band_chunks):
+                    start, stop = self._band_span(w)
+                    if lo == r * self.chunk_runs:
+                        chunk = np.full((self.chunk_runs, stop - start) + self._tail(q), np.nan, dtype=self.dtype)
+                    else:
+                        chunk = np.array(self._read_chunk(q, r, w, mmap=False))
+                    chunk[lo - r * self.chunk_runs:hi - r * self.chunk_runs] = cube[lo - n0:hi - n0, start:stop]
+                    self._write_chunk(q, r, w, chunk)
+
+        # 메타데이터 테이블
+        import pandas as pd
+        rows = []
+        for run in runs:
+            row = {'name': run.name, 'path': str(run.path or "")}
+            row.update({k: v for k, v in run.metadata.items() if np.ndim(v) == 0 and not isinstance(v, dict)})
+            row.update({SWEEP_PREFIX + k: v for k, v in run.metadata.get('sweep', {}).items()})
+            rows.append(row)
+        table = pd.concat([self.table, pd.DataFrame(rows)], ignore_index=True)
+        table.to_csv(self.path / "runs.csv", index=False)
+
+        self.info['n_runs'] = n1
+        _write_atomic(self.path / "store.json", json.dumps(self.info, indent=1).encode('utf-8'))
+        self._table = table
+        return self
+
+    def append_ensemble(self, ensemble):
+        """HydroLightEnsemble의 run 추가"""
+        return self.append(ensemble.runs)
+
+    # ------------------------------------------------------------------
+    # 읽기
+    # ------------------------------------------------------------------
+    def read(self, quantity, runs=None, bands=None):
+        """선택한 run/밴드의 배열 -> (n_run_sel, n_band_sel[, n_depth])
+
+        runs, bands는 int, slice, 인덱스 목록 또는 None(전체). int를 주면 그 축은 없어진다.
+        필요한 chunk만 읽으며, 비압축 store에서 선택이 chunk 하나 안의 연속 구간이면
+        memmap view를 그대로 반환한다.
+        """
+        n = len(self)
+        ir = _index(runs, n)
+        iw = _index(bands, len(self.wavelength))
+        tail = self._tail(quantity)
+
+        r_chunks = ir // self.chunk_runs
+        w_chunks = iw // self.chunk_bands
+        single = len(ir) and len(iw) and len(np.unique(r_chunks)) == 1 and len(np.unique(w_chunks)) == 1
+        if self.compression is None and single:
+            chunk = self._read_chunk(quantity, int(r_chunks[0]), int(w_chunks[0]))
+            rows = ir - r_chunks[0] * self.chunk_runs
+            cols = iw - w_chunks[0] * self.chunk_bands
+            if np.all(np.diff(rows) == 1) and np.all(np.diff(cols) == 1):
+                out = chunk[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+                return self._squeeze(out, runs, bands)
+
+        out = np.empty((len(ir), len(iw)) + tail, dtype=self.dtype)
+        for r in np.unique(r_chunks):
+            sel_r = np.flatnonzero(r_chunks == r)
+            for w in np.unique(w_chunks):
+                sel_w = np.flatnonzero(w_chunks == w)
+                chunk = self._read_chunk(quantity, int(r), int(w))
+                rows = ir[sel_r] - r * self.chunk_runs
+                cols = iw[sel_w] - w * self.chunk_bands
+                out[np.ix_(sel_r, sel_w)] = chunk[np.ix_(rows, cols)]
+        return self._squeeze(out, runs, bands)
+
+    @staticmethod
+    def _squeeze(out, runs, bands):
+        if np.isscalar(bands) or isinstance(bands, (int, np.integer)):
+            out = out[:, 0]
+        if np.isscalar(runs) or isinstance(runs, (int, np.integer)):
+            out = out[0]
+        return out
+
+    def at_wavelength(self, quantity, wavelength, runs=None):
+        """가장 가까운 밴드에서 run별 값 -> (n_run[, n_depth])"""
+        return self.read(quantity, runs=runs, bands=self.band(wavelength))
+
+    def run_spectra(self, quantity, run):
+        """run 하나(인덱스 또는 이름)의 모든 밴드 -> (n_wavelength[, n_depth])"""
+        if isinstance(run, str):
+            run = self.run_index(run)
+        return self.read(quantity, runs=int(run))
+
+    def cube(self, quantity):
+        """전체 배열 (HydroLightEnsemble.cube와 같은 shape)"""
+        return self.read(quantity)
+
+    def __repr__(self):
+        return (f"EnsembleStore({str(self.path)!r}, {len(self)} runs, {len(self.wavelength)} bands, "
+                f"{len(self.quantities)} quantities, compression={self.compression})")
@@ -0,0 +1,235 @@
+"""
+sweep.py
+HydroLight 파라미터 sweep 입력 파일 일괄 생성과 manifest
+
+파라미터 격자 또는 Latin hypercube 표본을 run마다 rootname으로 펼치고, run tree에
+농도 깊이 프로파일 (Chlzdata/Cdomz/Minez, HydroLight 'Chlorophyll-data standard format')과
+run 입력 파일 (template의 ${rootname}, ${title}, ${chl_file}, ${파라미터} 치환)을 쓴다.
+manifest.csv에는 run별 rootname, 출력 파일 이름 (P<rootname>), 파라미터, 입력 파일 경로가 남으므로
+출력을 읽는 쪽은 printout을 긁지 않고 apply_manifest로 파라미터를 붙인다.
+
+    samples = parameter_grid({'chl': [0.1, 1, 10], 'acdom440': [0.01, 0.1]})
+    samples = latin_hypercube({'chl': (0.05, 20, True), 'minerals': (0, 5, False)}, n=1000, seed=0)
+    manifest = write_sweep("sweep", samples, template="Iroot_template.txt", prefix="sw",
+                           path_prefix="C:/HE60/run/sweep")
+    runs = [apply_manifest(run, "sweep/manifest.csv") for run in runs]   # ensemble.params에 sweep 파라미터
+
+프로파일은 깊이 방향으로 상수 (두 점)이고, chl_peak_depth가 있으면 chl에 Gaussian 아극대
+(chl_peak_ratio 배, 폭 chl_peak_width m)를 더한다. 파일 하나의 내용은 메모리에서 만든 뒤 write 한 번으로 쓴다.
+"""
+
+import os
+import csv
+import itertools
+import numpy as np
+from string import Template
+from pathlib import Path
+
+
+# 파라미터 -> (파일 이름 앞부분, manifest 열, 값 설명)
+PROFILE_FILES = {
+    "chl": ("Chlzdata", "chl_file", "Chl (mg/m^3)"),
+    "acdom440": ("Cdomz", "cdom_file", "a_CDOM(440) (1/m)"),
+    "minerals": ("Minez", "mineral_file", "mineral concentration (g/m^3)"),
+}
+# 프로파일 깊이 범위 (m), bottom_depth가 있으면 바닥까지
+PROFILE_DEPTH = 200.0
+# HydroLight 기본 template의 제목 (run 이름으로 바꿈)
+TEMPLATE_TITLE = "Replace the rootname and title"
+MANIFEST_NAME = "manifest.csv"
+WRITE_BUFFER = 1 << 20
+
+# manifest 경로 -> (mtime, {출력 이름: 파라미터 dict})
+_MANIFEST_CACHE = {}
+
+
+# ----------------------------------------------------------------------
+# 표본
+# ----------------------------------------------------------------------
+def parameter_grid(values):
+    """{이름: 값 목록} -> 모든 조합의 dict 목록 (마지막 파라미터가 가장 빨리 바뀜)"""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(list(values[n]) for n in names))]
+
+
+def latin_hypercube(ranges, n, seed=None):
+    """{이름: (최소, 최대, log)} -> n개 Latin hypercube 표본 dict 목록
+
+    각 파라미터 구간을 n개 층으로 나누어 층마다 정확히 한 표본 (층 안 위치는 균등 난수),
+    파라미터마다 층 순서를 독립적으로 섞는다. log이면 log10 공간에서 층을 나눈다.
+    """
+    if n < 1:
+        raise ValueError(f"Latin hypercube needs at least one sample, got {n}")
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high, log) in ranges.items():
+        if log and (low <= 0 or high <= 0):
+            raise ValueError(f"Log range of {name} must be positive, got {low}:{high}")
+        unit = (rng.permutation(n) + rng.random(n)) / n
+        if log:
+            columns[name] = 10.0 ** (np.log10(low) + unit * (np.log10(high) - np.log10(low)))
+        else:
+            columns[name] = low + unit * (high - low)
+    return [{name: float(columns[name][i]) for name in columns} for i in range(n)]
+
+
+def combine(*sample_sets):
+    """여러 표본 목록의 곱 (예: 격자 x LHS), 빈 목록은 무시"""
+    sets = [s for s in sample_sets if s]
+    return [dict(kv for sample in combo for kv in sample.items()) for combo in itertools.product(*sets)]
+
+
+def parse_assignments(specs, kind="values"):
+    """명령행 값 지정 파싱
+
+    kind='values': ["chl=0.1,1,10"] -> {'chl': [0.1, 1.0, 10.0]}
+    kind='range':  ["chl=0.05:20:log", "minerals=0:5"] -> {'chl': (0.05, 20.0, True), 'minerals': (0.0, 5.0, False)}
+    """
+    out = {}
+    for spec in specs or []:
+        name, _, text = spec.partition("=")
+        name = name.strip()
+        try:
+            if kind == "range":
+                parts = text.split(":")
+                if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] not in ("log", "lin")):
+                    raise ValueError
+                out[name] = (float(parts[0]), float(parts[1]), len(parts) == 3 and parts[2] == "log")
+            else:
+                out[name] = [float(v) for v in text.split(",")]
+        except ValueError:
+            example = "NAME=LOW:HIGH[:log]" if kind == "range" else "NAME=V1,V2,..."
+            raise ValueError(f"Expected {example}, got {spec!r}") from None
+        if not name:
+            raise ValueError(f"Missing parameter name in {spec!r}")
+    return out
+
+
+# ----------------------------------------------------------------------
+# 파일 쓰기
+# ----------------------------------------------------------------------
+def profile(parameter, params):
+    """파라미터의 깊이 프로파일 (depth, value) 배열"""
+    zmax = params.get("bottom_depth", PROFILE_DEPTH)
+    value = float(params[parameter])
+    if parameter == "chl" and "chl_peak_depth" in params:
+        z = np.linspace(0.0, zmax, 201)
+        peak, width = params["chl_peak_depth"], params.get("chl_peak_width", 5.0)
+        ratio = params.get("chl_peak_ratio", 1.0)
+        return z, value * (1.0 + ratio * np.exp(-0.5 * ((z - peak) / width) ** 2))
+    return np.array([0.0, zmax]), np.array([value, value])
+
+
+def format_profile(depth, values, rootname, label):
+    """HydroLight 'Chlorophyll-data standard format' 텍스트 (header, 깊이/값 쌍, -1 -1 종료)"""
+    lines = ["\\begin_header",
+             f"{label} profile for run {rootname} (hydrolight sweep)",
+             f"depth (m)   {label}",
+             "\\end_header"]
+    lines += [f"{z:10.4f} {v:14.7g}" for z, v in zip(depth, values)]
+    lines.append("  -1.0  -1.0")
+    return "\n".join(lines) + "\n"
+
+
+def _write_text(path, text):
+    with open(path, "w", buffering=WRITE_BUFFER, newline="\n") as f:
+        f.write(text)
+
+
+def render_template(template_text, fields):
+    """run 입력 template 치환: ${이름} 자리표시자와 HydroLight 기본 제목 줄"""
+    text = Template(template_text).safe_substitute({k: _format_value(v) for k, v in fields.items()})
+    return text.replace(TEMPLATE_TITLE, fields.get("title", TEMPLATE_TITLE))
+
+
+def _format_value(value):
+    return f"{value:.7g}" if isinstance(value, float) else str(value)
+
+
+def write_sweep(root, samples, template=None, prefix="sw", path_prefix=None, title=None):
+    """run tree 작성 -> manifest 행 목록 (manifest.csv도 저장)
+
+    root/<rootname>/ 아래에 샘플의 chl/acdom440/minerals 프로파일 파일과 (template이 있으면) I<rootname>.txt.
+    path_prefix: run 입력 파일에 적을 경로 앞부분 (예: C:/HE60/run/sweep, 기본: 로컬 경로)
+    title: 제목 형식 (기본: "<rootname> chl=... acdom440=...")
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    template_text = Path(template).read_text() if template else None
+    width = max(4, len(str(len(samples))))
+    rows = []
+    for i, params in enumerate(samples):
+        rootname = f"{prefix}{i + 1:0{width}d}"
+        run_dir = root / rootname
+        run_dir.mkdir(exist_ok=True)
+        shown = " ".join(f"{k}={_format_value(float(v))}" for k, v in params.items())
+        fields = {"rootname": rootname, "title": (title or "{rootname} {params}").format(rootname=rootname,
+                                                                                       params=shown)}
+        fields.update(params)
+        row = {"rootname": rootname, "output": f"P{rootname}", "title": fields["title"]}
+        row.update(params)
+        for parameter, (stem, column, label) in PROFILE_FILES.items():
+            if parameter not in params:
+                continue
+            filename = f"{stem}_{rootname}.txt"
+            _write_text(run_dir / filename, format_profile(*profile(parameter, params), rootname, label))
+            local = run_dir / filename
+            fields[column] = (f"{path_prefix.rstrip('/')}/{rootname}/{filename}" if path_prefix
+                              else local.as_posix())
+            row[column] = local.as_posix()
+        if template_text is not None:
+            input_file = run_dir / f"I{rootname}.txt"
+            _write_text(input_file, render_template(template_text, fields))
+            row["input_file"] = input_file.as_posix()
+        rows.append(row)
+    write_manifest(root / MANIFEST_NAME, rows)
+    return rows
+
+
+def write_manifest(filepath, rows):
+    """manifest 행 목록 -> CSV (모든 행의 열 합집합, 처음 나온 순서)"""
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    with open(filepath, "w", newline="", buffering=WRITE_BUFFER) as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return filepath
+
+
+# ----------------------------------------------------------------------
+# 출력 쪽
+# ----------------------------------------------------------------------
+def _number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def load_manifest(filepath):
+    """manifest.csv -> {출력 이름 (P<rootname>)과 rootname: 수치형 파라미터 dict} (mtime으로 캐시)"""
+    filepath = os.path.abspath(filepath)
+    mtime = os.path.getmtime(filepath)
+    cached = _MANIFEST_CACHE.get(filepath)
+    if cached is None or cached[0] != mtime:
+        table = {}
+        with open(filepath, newline="") as f:
+            for row in csv.DictReader(f):
+                params = {k: _number(v) for k, v in row.items()
+                          if k not in ("rootname", "output", "title") and v not in (None, "") and _number(v) is not None}
+                table[row["output"]] = params
+                table[row["rootname"]] = params
+        _MANIFEST_CACHE[filepath] = (mtime, table)
+    return _MANIFEST_CACHE[filepath][1]
+
+
+def apply_manifest(run, manifest):
+    """run 이름으로 manifest를 찾아 metadata['sweep']에 파라미터를 붙임 (ensemble.params 열이 됨)
+
+    manifest: 파일 경로 또는 load_manifest 결과. 없는 run은 그대로 반환한다.
+    """
+    table = load_manifest(manifest) if isinstance(manifest, (str, Path)) else manifest
+    params = table.get(run.name)
+    if params is not None:
+        run.metadata['sweep'] = dict(params)
+    return run
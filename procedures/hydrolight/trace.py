@@ -0,0 +1,229 @@
+"""
+trace.py
+파싱 -> 파생량 -> 플롯 파이프라인의 단계별 시간/counter 기록 (표준 라이브러리만 사용)
+
+    from hydrolight import trace
+    with trace.tracing("results/trace.json", profile_file="results/profile.pstats", quiet=True):
+        ...                                  # parse/derive/plot 코드
+
+    with trace.stage("parse.scan"):          # 단계 timer (꺼져 있으면 아무 일도 하지 않음)
+        ...
+    trace.count("rows_decoded", n)           # counter 누적
+    trace.echo("Saved: ...")                 # quiet가 아니면 print
+    with trace.quieted():                    # 이 thread의 echo만 생략 (다른 thread 출력은 그대로)
+        ...
+
+기록은 기본적으로 꺼져 있으며, 꺼져 있을 때 stage()는 미리 만든 빈 context manager를 반환하고
+count()는 바로 반환하므로 일반 실행 비용은 거의 없다.
+저장 파일은 Chrome trace 형식(chrome://tracing, https://ui.perfetto.dev)이며, 단계별 합계와
+counter는 "otherData"에 함께 들어간다. profile_file을 주면 같은 구간을 cProfile로도 기록한다.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+from pathlib import Path
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """stage 하나의 시간 측정 (끝날 때 Chrome trace의 complete event로 기록)"""
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """단계별 timer와 counter 모음
+
+    events: Chrome trace event dict 목록 (ts, dur 단위는 us)
+    stages: {단계 이름: [호출 수, 합계(s), 최대(s)]}
+    counters: {이름: 값}
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.quiet = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.events = []
+        self.stages = {}
+        self.counters = {}
+        # ts는 Unix 시각 기준 (여러 프로세스의 기록을 합쳐도 시간축이 맞도록)
+        self._origin = time.perf_counter_ns()
+        self._epoch_ns = time.time_ns()
+
+    def stage(self, name, **args):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, args)
+
+    def _record(self, name, start, end, args):
+        event = {'name': name, 'cat': name.split(".")[0], 'ph': "X", 'pid': os.getpid(),
+                 'tid': threading.get_ident(), 'ts': (self._epoch_ns + start - self._origin) / 1e3, 'dur': (end - start) / 1e3}
+        if args:
+            event['args'] = {k: str(v) for k, v in args.items()}
+        seconds = (end - start) / 1e9
+        with self._lock:
+            self.events.append(event)
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def drain(self):
+        """기록을 꺼내고 비움 (작업 프로세스가 결과와 함께 돌려줄 때)"""
+        with self._lock:
+            data = {'events': self.events, 'stages': self.stages, 'counters': self.counters}
+            self.reset()
+        return data
+
+    def merge(self, data):
+        """drain()으로 꺼낸 다른 프로세스의 기록 합치기"""
+        with self._lock:
+            self.events.extend(data['events'])
+            for name, (calls, total, longest) in data['stages'].items():
+                entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            for name, value in data['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """{'stages': {이름: {calls, total_s, max_s}}, 'counters': {...}} (합계가 큰 단계부터)"""
+        stages = sorted(self.stages.items(), key=lambda item: -item[1][1])
+        return {'stages': {name: {'calls': calls, 'total_s': total, 'max_s': longest}
+                           for name, (calls, total, longest) in stages},
+                'counters': dict(sorted(self.counters.items()))}
+
+    def save(self, output_file):
+        """Chrome trace JSON 저장 (counter는 마지막 시점의 "C" event로도 기록)"""
+        output_file = Path(output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        end = max((e['ts'] + e['dur'] for e in self.events), default=0.0)
+        counters = [{'name': name, 'ph': "C", 'pid': os.getpid(), 'ts': end, 'args': {'value': value}}
+                    for name, value in sorted(self.counters.items())]
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events + counters, 'displayTimeUnit': "ms",
+                       'otherData': self.summary()}, f)
+        return output_file
+
+    def format_summary(self, limit=15):
+        """단계별 합계와 counter를 표로 만든 문자열"""
+        summary = self.summary()
+        lines = [f"{'stage':<36} {'calls':>7} {'total (s)':>10} {'max (ms)':>10}"]
+        for name, s in list(summary['stages'].items())[:limit]:
+            lines.append(f"{name:<36} {s['calls']:>7} {s['total_s']:>10.3f} {s['max_s'] * 1e3:>10.2f}")
+        for name, value in summary['counters'].items():
+            lines.append(f"{name:<36} {value:>7}")
+        return "\n".join(lines)
+
+
+# 프로세스마다 하나
+TRACER = Tracer()
+
+
+def stage(name, **args):
+    """단계 timer context manager"""
+    return TRACER.stage(name, **args)
+
+
+def count(name, n=1):
+    """counter 누적"""
+    TRACER.count(name, n)
+
+
+# quieted()로 켜는 thread별 quiet
+_LOCAL = threading.local()
+
+
+def echo(message):
+    """진행 상황 출력 (quiet 모드이거나 이 thread가 quieted() 안이면 생략)"""
+    if not TRACER.quiet and not getattr(_LOCAL, 'quiet', False):
+        print(message)
+
+
+@contextlib.contextmanager
+def quieted():
+    """이 thread의 echo 출력만 생략 (stdout을 바꾸지 않으므로 다른 thread에는 영향 없음)"""
+    previous = getattr(_LOCAL, 'quiet', False)
+    _LOCAL.quiet = True
+    try:
+        yield
+    finally:
+        _LOCAL.quiet = previous
+
+
+def enable(quiet=False):
+    TRACER.enabled = True
+    TRACER.quiet = quiet
+
+
+def disable():
+    TRACER.enabled = False
+    TRACER.quiet = False
+
+
+def set_quiet(quiet=True):
+    TRACER.quiet = quiet
+
+
+@contextlib.contextmanager
+def profile(output_file):
+    """구간을 cProfile로 기록하여 output_file에 저장 (pstats/snakeviz로 확인)"""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(output_file))
+
+
+@contextlib.contextmanager
+def tracing(trace_file=None, profile_file=None, quiet=False):
+    """구간 동안 기록을 켜고, 끝나면 trace_file(Chrome trace JSON)에 저장"""
+    previous = (TRACER.enabled, TRACER.quiet)
+    TRACER.reset()
+    enable(quiet)
+    try:
+        with profile(profile_file) if profile_file else contextlib.nullcontext():
+            yield TRACER
+    finally:
+        TRACER.enabled, TRACER.quiet = previous
+        if trace_file:
+            TRACER.save(trace_file)
@@ -0,0 +1,200 @@
+"""
+validate.py
+HydroLight 출력의 복사량 일관성 검사와 run별 품질 mask
+
+파서는 형식이 맞지 않는 행을 건너뛰므로, 잘리거나 깨진 출력 파일도 경고 없이 일부 배열만
+채워진 run이 된다. 여기서는 파싱된 배열 전체(모든 밴드 x 깊이)를 한 번에 검사한다.
+
+셀(파장 x 깊이) 검사 -> uint16 bit mask (CELL_FLAGS):
+    missing     Ed 또는 Lu 행이 없음
+    Eo_sum      Eo = Eou + Eod
+    R_ratio     R = Eu/Ed
+    Lu_Ed       Lu/Ed 컬럼 = Lu/Ed
+    Q_ratio     Q = Eu/Lu
+    a/b/bb_sum  성분별 계수의 합 = Total (IOP 요약의 total a, b, bb)
+
+run 검사 -> int bit mask (RUN_FLAGS):
+    no_normal_exit  "Normal exit from HydroLight" 없음
+    band_count      밴드 수가 "Waveband n of N"의 N과 다르거나 테이블마다 다름
+    depth_order     밴드 안에서 깊이가 단조 증가하지 않음
+    cell_checks     셀 검사에 실패한 셀이 있음
+
+배열은 앞에 run 축이 있어도 되므로 ensemble/store 전체를 한 번에 검사할 수 있다.
+"""
+
+import numpy as np
+
+from .parse import COLUMNS, COMPONENT_TABLES, DEPTH_COLUMNS
+
+
+CELL_FLAGS = {"missing": 1, "Eo_sum": 2, "R_ratio": 4, "Lu_Ed": 8, "Q_ratio": 16,
+              "a_sum": 32, "b_sum": 64, "bb_sum": 128}
+RUN_FLAGS = {"no_normal_exit": 1, "band_count": 2, "depth_order": 4, "cell_checks": 8}
+
+# 허용 오차: 출력 자릿수에서 오는 반올림 오차보다 조금 크게
+RTOL_IRRADIANCE = 5e-4      # irradiance는 유효숫자 5자리 (E 형식)
+RTOL_RADIANCE = 2e-3        # radiance와 그 비는 유효숫자 4자리
+COMPONENT_ATOL = {"a_comp": 5e-4, "b_comp": 5e-4, "bb_comp": 5e-5}   # 소수점 4, 4, 5자리
+
+# 다른 성분의 일부로 Total에 이미 포함된 성분 (예: "the part of total CDOM that covaries with Chlorophyll")
+SUBCOMPONENT_MARK = "the part of"
+
+
+def _ratio(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return a / b
+
+
+def _mismatch(printed, computed, rtol, atol=0.0):
+    """출력값과 다시 계산한 값이 다른 셀 (한쪽만 NaN/Inf인 셀 포함)"""
+    printed = np.asarray(printed, dtype=float)
+    computed = np.asarray(computed, dtype=float)
+    finite = np.isfinite(printed)
+    bad = finite != np.isfinite(computed)
+    both = finite & ~bad
+    bad[both] = np.abs(printed[both] - computed[both]) > atol + rtol * np.abs(computed[both])
+    return bad
+
+
+# (flag 이름, 필요한 양, 검사 함수) - 함수는 불일치 셀에서 True
+CELL_CHECKS = [
+    ("Eo_sum", ("Eo", "Eou", "Eod"), lambda Eo, Eou, Eod: _mismatch(Eo, Eou + Eod, RTOL_IRRADIANCE)),
+    ("R_ratio", ("R", "Eu", "Ed"), lambda R, Eu, Ed: _mismatch(R, _ratio(Eu, Ed), RTOL_IRRADIANCE)),
+    ("Lu_Ed", ("Lu_over_Ed", "Lu", "Ed"), lambda LuEd, Lu, Ed: _mismatch(LuEd, _ratio(Lu, Ed), RTOL_RADIANCE)),
+    ("Q_ratio", ("Q", "Eu", "Lu"), lambda Q, Eu, Lu: _mismatch(Q, _ratio(Eu, Lu), RTOL_RADIANCE)),
+]
+
+# 셀 검사에 쓰는 양 (store/ensemble에서 읽을 목록)
+CELL_QUANTITIES = sorted({q for _, deps, _ in CELL_CHECKS for q in deps})
+
+
+def summed_components(components, n_components):
+    """Total에 더해야 하는 성분 mask (다른 성분의 일부인 성분은 제외)"""
+    use = np.ones(n_components, dtype=bool)
+    for i, name in enumerate((components or [])[:n_components]):
+        if SUBCOMPONENT_MARK in name:
+            use[i] = False
+    return use
+
+
+def cell_flags(arrays, components=None):
+    """셀별 검사 -> uint16 bit mask (Ed와 같은 shape)
+
+    arrays는 양 이름으로 배열을 꺼낼 수 있는 mapping (dict, HydroLightRun).
+    필요한 양이 없는 검사는 건너뛴다. components는 성분 설명 목록 (metadata['components']).
+    """
+    Ed = np.asarray(arrays["Ed"], dtype=float)
+    flags = np.zeros(Ed.shape, dtype=np.uint16)
+    missing = ~np.isfinite(Ed)
+    if "Lu" in arrays:
+        missing |= ~np.isfinite(np.asarray(arrays["Lu"], dtype=float))
+    flags[missing] |= CELL_FLAGS["missing"]
+
+    for name, deps, check in CELL_CHECKS:
+        if all(d in arrays for d in deps):
+            flags[check(*[np.asarray(arrays[d], dtype=float) for d in deps])] |= CELL_FLAGS[name]
+
+    for table, total in COMPONENT_TABLES.items():
+        if table not in arrays or total not in arrays:
+            continue
+        comp = np.asarray(arrays[table], dtype=float)
+        use = summed_components(components, comp.shape[-1])
+        bad = _mismatch(arrays[total], comp[..., use].sum(axis=-1), 0.0, COMPONENT_ATOL[table])
+        flags[bad] |= CELL_FLAGS[table.replace("_comp", "_sum")]
+    return flags
+
+
+def table_flags(wavelength, tables):
+    """파싱한 원래 테이블(parse_lines()['tables'])의 밴드 수/깊이 순서 검사 -> run bit mask"""
+    flags = 0
+    for name, (waves, table) in tables.items():
+        if not len(table):
+            continue
+        if len(np.unique(waves)) != len(wavelength):
+            flags |= RUN_FLAGS["band_count"]
+        if name not in DEPTH_COLUMNS and name not in COMPONENT_TABLES:
+            continue
+        column = COLUMNS[name].index(DEPTH_COLUMNS[name]) if name in COLUMNS else 1
+        same_band = waves[1:] == waves[:-1]
+        if np.any(np.diff(table[:, column])[same_band] <= 0):
+            flags |= RUN_FLAGS["depth_order"]
+    return flags
+
+
+def run_flags(wavelength, metadata, tables=None, cells=None):
+    """run 단위 검사 -> int bit mask"""
+    flags = 0
+    if not metadata.get('normal_exit'):
+        flags |= RUN_FLAGS["no_normal_exit"]
+    expected = metadata.get('n_bands_expected') or 0
+    if expected and expected != len(wavelength):
+        flags |= RUN_FLAGS["band_count"]
+    if tables is not None:
+        flags |= table_flags(wavelength, tables)
+    if cells is not None and np.any(cells):
+        flags |= RUN_FLAGS["cell_checks"]
+    return flags
+
+
+def describe(flags, names=RUN_FLAGS):
+    """bit mask -> flag 이름 목록"""
+    return [name for name, bit in names.items() if int(flags) & bit]
+
+
+def count_flags(cells):
+    """(n_run, ...) 셀 mask -> {flag 이름: run별 실패 셀 수}"""
+    cells = np.asarray(cells).reshape(len(cells), -1)
+    return {name: np.count_nonzero(cells & bit, axis=1) for name, bit in CELL_FLAGS.items()}
+
+
+def validate_run(run, tables=None):
+    """run 검사 결과를 run.arrays['quality'] (셀 mask)와 metadata['quality_flags']에 저장
+
+    tables(파싱한 원래 테이블)가 주어지면 테이블별 밴드 수와 깊이 순서도 검사한다.
+    반환: run bit mask
+    """
+    cells = cell_flags(run, run.metadata.get('components'))
+    flags = run_flags(run.wavelength, run.metadata, tables, cells)
+    run.set("quality", cells)
+    run.metadata['quality_flags'] = flags
+    return flags
+
+
+def validate_ensemble(ensemble):
+    """ensemble 전체를 한 번에 검사 -> (run bit mask 배열, (n_run, n_wavelength, n_depth) 셀 mask)
+
+    셀 검사는 (run, 파장, 깊이) 배열 전체에 대해 한 번에 계산하고, run 검사는
+    각 run을 파싱할 때 저장한 quality_flags를 함께 사용한다.
+    """
+    cubes = {q: ensemble.cube(q) for q in CELL_QUANTITIES}
+    cells = cell_flags(cubes)
+    flags = np.array([run_flags(run.wavelength, run.metadata) | run.metadata.get('quality_flags', 0)
+                      for run in ensemble.runs], dtype=np.int64)
+    flags[cells.reshape(len(cells), -1).any(axis=1)] |= RUN_FLAGS["cell_checks"]
+    return flags, cells
+
+
+def validate_store(store, batch_runs=1024):
+    """EnsembleStore를 run batch 단위로 읽으며 검사 -> (run bit mask 배열, run별 실패 셀 수 dict)
+
+    셀 mask 전체를 메모리에 두지 않고 batch마다 flag별 셀 수만 남긴다.
+    runs.csv의 normal_exit, quality_flags 컬럼(파싱할 때 기록)도 run 검사에 사용한다.
+    """
+    n = len(store)
+    flags = np.zeros(n, dtype=np.int64)
+    counts = {name: np.zeros(n, dtype=np.int64) for name in CELL_FLAGS}
+    quantities = [q for q in CELL_QUANTITIES if q in store.quantities]
+    for start in range(0, n, batch_runs):
+        runs = slice(start, min(n, start + batch_runs))
+        cells = cell_flags({q: store.read(q, runs=runs) for q in quantities})
+        for name, values in count_flags(cells).items():
+            counts[name][runs] = values
+        flags[runs][cells.reshape(len(cells), -1).any(axis=1)] |= RUN_FLAGS["cell_checks"]
+
+    table = store.table
+    if 'normal_exit' in table.columns:
+        normal = table['normal_exit'].astype(str).str.lower().isin(['true', '1', '1.0']).to_numpy()
+        flags[~normal] |= RUN_FLAGS["no_normal_exit"]
+    if 'quality_flags' in table.columns:
+        flags |= table['quality_flags'].fillna(0).to_numpy().astype(np.int64)
+    return flags, counts
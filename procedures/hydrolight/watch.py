@@ -0,0 +1,269 @@
+"""
+watch.py
+run 폴더를 감시하다가 끝난 HydroLight 출력 파일을 자동으로 파싱/캐시/플롯하는 asyncio 기반 ingest 서비스
+
+- 폴더를 주기적으로 검사(polling)하여 새 파일 또는 바뀐 파일을 찾는다 (추가 의존성 없음).
+- 파일 끝부분에 "Normal exit from HydroLight"가 있고 크기가 두 번 연속 같으면 완료된 출력으로 본다.
+- 완료된 파일은 크기가 제한된 asyncio.Queue에 넣는다. queue가 가득 차면 검사를 멈추고
+  기다리므로(backpressure) 처리 속도보다 빨리 파일이 쌓여도 메모리가 늘지 않는다.
+- worker 수만큼의 작업만 프로세스 풀에서 동시에 실행된다.
+- 상태는 JSON 파일(status file)에 기록되며, 재시작하면 이미 처리한 파일은 건너뛴다.
+"""
+
+import os
+import json
+import time
+import signal
+import asyncio
+import contextlib
+import fnmatch
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+NORMAL_EXIT = "Normal exit from HydroLight"
+TAIL_BYTES = 4096
+
+
+def has_normal_exit(filepath, tail_bytes=TAIL_BYTES):
+    """파일 끝부분에 HydroLight 정상 종료 문구가 있는지 확인"""
+    with open(filepath, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - tail_bytes))
+        return NORMAL_EXIT.encode('ascii') in f.read()
+
+
+def ingest_file(filepath, output_root, cache_dir=None, render=True):
+    """작업 프로세스에서 실행: 파싱(캐시) 후 선택적으로 P03 플롯 생성 -> 결과 요약 dict"""
+    from .ensemble import load_run
+    from .validate import describe
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        run = load_run(filepath, cache_dir)
+        output = None
+        if render:
+            from .plots import process_file
+            output = str(process_file(filepath, Path(output_root) / "P03_parse_HL_results", run=run))
+    return {'name': run.name, 'n_bands': len(run.wavelength), 'n_depths': len(run.depth),
+            'quality': describe(run.metadata.get('quality_flags', 0)),
+            'output': output, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+class IngestService:
+    """폴더 감시 + 제한된 동시 처리 ingest 서비스
+
+    사용 예:
+        service = IngestService(["runs/"], "results", max_workers=2)
+        asyncio.run(service.run())          # Ctrl+C 또는 SIGTERM으로 종료
+        asyncio.run(service.run(once=True)) # 현재 있는 파일만 처리하고 종료
+    """
+
+    def __init__(self, directories, output_root, pattern="*.txt", cache_dir=None, render=True,
+                 poll_interval=2.0, max_workers=2, queue_size=8, status_file=None,
+                 stale_after=3600.0, status_interval=1.0, executor=None):
+        self.directories = [Path(d) for d in directories]
+        self.output_root = Path(output_root)
+        self.pattern = pattern
+        self.cache_dir = str(cache_dir) if cache_dir else None
+        self.render = render
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.status_file = Path(status_file or self.output_root / "ingest_status.json")
+        self.stale_after = stale_after
+        self.status_interval = status_interval
+        self._executor = executor
+        self._last_write = 0.0
+        self._dirty = False
+        self._stop = None
+        self._queue = None
+        self.started = time.time()
+        # 경로 -> 상태 dict (state: waiting/queued/processing/done/failed/incomplete)
+        self.files = {}
+        self._observed = {}
+        self._load_status()
+
+    # ------------------------------------------------------------------
+    # 상태 파일
+    # ------------------------------------------------------------------
+    def _load_status(self):
+        if not self.status_file.exists():
+            return
+        try:
+            with open(self.status_file, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            return
+        for path, entry in previous.get('files', {}).items():
+            # 처리 중이던 파일은 다시 처리
+            if entry.get('state') in ('done', 'failed'):
+                self.files[path] = entry
+
+    def counts(self):
+        counts = {}
+        for entry in self.files.values():
+            counts[entry['state']] = counts.get(entry['state'], 0) + 1
+        return counts
+
+    def write_status(self):
+        status = {'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                  'directories': [str(d) for d in self.directories],
+                  'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                  'queue_size': self.queue_size,
+                  'max_workers': self.max_workers,
+                  'counts': self.counts(),
+                  'files': self.files}
+        self.status_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.status_file.with_name(f".{self.status_file.name}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(status, f, indent=1)
+        tmp.replace(self.status_file)
+        self._last_write = time.monotonic()
+        self._dirty = False
+
+    def _set(self, path, state, **fields):
+        entry = self.files.setdefault(path, {})
+        entry.update(fields, state=state, changed=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        # 파일이 많을 때 매번 전체 JSON을 쓰지 않도록 status_interval마다 한 번만 기록
+        self._dirty = True
+        if time.monotonic() - self._last_write >= self.status_interval:
+            self.write_status()
+
+    # ------------------------------------------------------------------
+    # 폴더 검사
+    # ------------------------------------------------------------------
+    def _candidates(self):
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if fnmatch.fnmatch(name, self.pattern) and not name.startswith('.'):
+                        yield Path(root) / name
+
+    def scan(self, final=False):
+        """완료되었고 아직 처리하지 않은 파일 목록 (크기가 두 번 연속 같아야 완료로 인정)
+
+        final=True면 크기가 그대로인데 정상 종료 문구가 없는 파일을 바로 incomplete로 표시한다.
+        """
+        ready = []
+        now = time.time()
+        for filepath in self._candidates():
+            path = str(filepath.resolve())
+            try:
+                stat = filepath.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            entry = self.files.get(path)
+            if entry and (entry.get('size'), entry.get('mtime_ns')) == signature \
+                    and entry['state'] in ('queued', 'processing', 'done', 'failed', 'incomplete'):
+                continue
+
+            previous = self._observed.get(path)
+            self._observed[path] = signature
+            if previous != signature:
+                # 아직 쓰는 중일 수 있으므로 다음 검사에서 다시 확인
+                if entry is None or entry['state'] != 'waiting':
+                    self._set(path, 'waiting', size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                continue
+            try:
+                complete = has_normal_exit(filepath)
+            except OSError:
+                continue
+            if complete:
+                ready.append(path)
+            elif final or now - stat.st_mtime > self.stale_after:
+                self._set(path, 'incomplete', size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                          error=f"No '{NORMAL_EXIT}' and file is not growing")
+        return ready
+
+    # ------------------------------------------------------------------
+    # asyncio 작업
+    # ------------------------------------------------------------------
+    async def _scanner(self, once):
+        while not self._stop.is_set():
+            waiting_before = any(e['state'] == 'waiting' for e in self.files.values())
+            for path in self.scan(final=once and waiting_before):
+                stat = os.stat(path)
+                self._set(path, 'queued', size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                          queued_at=time.time())
+                # queue가 가득 차면 여기서 기다림 (backpressure)
+                await self._queue.put(path)
+            if once and not any(e['state'] == 'waiting' for e in self.files.values()):
+                break
+            if self._dirty:
+                self.write_status()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+
+    async def _worker(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            path = await self._queue.get()
+            try:
+                self._set(path, 'processing', started_at=time.time())
+                result = await loop.run_in_executor(executor, ingest_file, path, str(self.output_root),
+                                                    self.cache_dir, self.render)
+                self._set(path, 'done', done_at=time.time(), error=None, **result)
+                print(f"[done] {path} ({result['seconds']:.2f} s)", flush=True)
+            except Exception as e:
+                self._set(path, 'failed', done_at=time.time(), error=f"{type(e).__name__}: {e}")
+                print(f"[fail] {path}: {type(e).__name__}: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    def stop(self):
+        """서비스 종료 요청 (대기 중인 작업은 끝낸 뒤 종료)"""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self, once=False):
+        """감시 시작. once=True면 현재 있는 파일이 모두 완료/처리되면 종료"""
+        self._stop = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+                loop.add_signal_handler(sig, self.stop)
+
+        executor = self._executor or ProcessPoolExecutor(max_workers=self.max_workers)
+        workers = [asyncio.create_task(self._worker(executor)) for _ in range(self.max_workers)]
+        self.write_status()
+        print(f"Watching {', '.join(str(d) for d in self.directories)} "
+              f"(pattern {self.pattern}, {self.max_workers} worker(s))", flush=True)
+        try:
+            await self._scanner(once)
+            await self._queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._executor is None:
+                executor.shutdown(wait=True)
+            self.write_status()
+        return self.counts()
+
+
+# ----------------------------------------------------------------------
+# 시험용 HydroLight 출력 writer
+# ----------------------------------------------------------------------
+async def write_like_hydrolight(source, target, lines_per_chunk=400, delay=0.05, stop_at=None):
+    """source 출력 파일을 target에 조금씩 이어 써서 HydroLight가 실행 중인 상황을 흉내냄
+
+    stop_at(0-1)을 주면 그 비율까지만 쓰고 멈춘다 (비정상 종료한 run 흉내).
+    """
+    with open(source, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.readlines()
+    if stop_at is not None:
+        lines = lines[:int(len(lines) * stop_at)]
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        for start in range(0, len(lines), lines_per_chunk):
+            f.writelines(lines[start:start + lines_per_chunk])
+            f.flush()
+            await asyncio.sleep(delay)
+    return target
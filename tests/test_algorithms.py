@@ -0,0 +1,54 @@
+"""
+test_algorithms.py
+algorithms 검사: NASA OCx 계수, OCx/CI/OCI 값, 그리드 밖 밴드, 명령행 계수 파싱
+"""
+
+import numpy as np
+import pytest
+
+from hydrolight.algorithms import (CI_COEFFICIENTS, OCX_ALGORITHMS, evaluate, ocx, oci_chl,
+                                   parse_coefficients)
+
+
+WAVELENGTH = np.arange(400.0, 701.0, 1.0)
+
+
+def test_ocx_coefficients_are_nasa_v6():
+    # O'Reilly et al. / NASA OBPG OCx v6 (SeaWiFS OC4, OC2, MODIS OC3M), Hu et al. (2012) CI
+    assert OCX_ALGORITHMS["OC4"] == ((443.0, 490.0, 510.0), 555.0, [0.3272, -2.9940, 2.7218, -1.2259, -0.5683])
+    assert OCX_ALGORITHMS["OC3M"] == ((443.0, 488.0), 547.0, [0.2424, -2.7423, 1.8017, 0.0015, -1.2280])
+    assert OCX_ALGORITHMS["OC2"] == ((490.0,), 555.0, [0.2511, -2.0853, 1.5035, -3.1747, 0.3383])
+    assert CI_COEFFICIENTS == [-0.4909, 191.6590]
+
+
+def test_ocx_uses_max_blue_ratio():
+    rrs = np.full(len(WAVELENGTH), 0.002)
+    rrs[WAVELENGTH == 490.0] = 0.008            # 490 nm가 최대 blue 밴드, 비 4
+    blue, green, coefficients = OCX_ALGORITHMS["OC4"]
+    r = np.log10(4.0)
+    expected = 10.0 ** sum(a * r ** k for k, a in enumerate(coefficients))
+    assert ocx(rrs, WAVELENGTH, blue, green, coefficients)[0] == pytest.approx(expected)
+
+
+def test_ci_on_linear_baseline_and_oci_blend():
+    # 443-670 nm 직선 스펙트럼은 CI = 0 -> Chl = 10^a0
+    rrs = np.linspace(0.004, 0.001, len(WAVELENGTH))
+    products = evaluate(rrs, WAVELENGTH, algorithms=["CI"])
+    assert products["CI"][0] == pytest.approx(10.0 ** CI_COEFFICIENTS[0])
+    chl_ci, chl_oc = np.array([0.2, 0.275, 0.4, np.nan]), np.full(4, 1.0)
+    np.testing.assert_allclose(oci_chl(chl_ci, chl_oc), [0.2, 0.6375, 1.0, np.nan])
+
+
+def test_bands_outside_grid_are_nan():
+    products = evaluate(np.full((2, len(WAVELENGTH)), 0.002), WAVELENGTH, algorithms=["NDCI", "OC4"])
+    assert np.isnan(products["NDCI"]).all()        # 708 nm는 그리드 밖
+    assert np.isfinite(products["OC4"]).all()
+
+
+def test_parse_coefficients():
+    assert parse_coefficients(["OC4=0.3,-2.9,2.7,-1.2,-0.6", "CI=-0.49,191.7"]) == {
+        'OC4': [0.3, -2.9, 2.7, -1.2, -0.6], 'CI': [-0.49, 191.7]}
+    with pytest.raises(ValueError):
+        parse_coefficients(["CI=-0.49"])
+    with pytest.raises(ValueError):
+        parse_coefficients(["OC4=a,b"])
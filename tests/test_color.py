@@ -0,0 +1,51 @@
+"""
+test_color.py
+color.verify_run 검사: PExe/Ptest 출력의 CIE xyY와 Forel-Ule 번호를 재현하는지
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from hydrolight.color import forel_ule, verify_run
+from hydrolight.ensemble import load_run
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+RUNS = sorted(DATA_DIR.glob("P*.txt"))
+
+
+@pytest.fixture(scope="module", params=RUNS, ids=lambda path: path.stem)
+def checked(request):
+    run = load_run(request.param)
+    return run, verify_run(run)
+
+
+@pytest.fixture
+def rows(checked):
+    return checked[1]
+
+
+def test_xyY_matches_printout(checked):
+    run, rows = checked
+    run_rows = [row for row in rows if row['printed_Y'] > 0]
+    assert run_rows
+    # 출력은 소수 3자리: 20 nm 밴드 run은 반올림 오차 (0.0005), 5 nm 밴드 run (PExe04/05)은 0.0008까지
+    tolerance = 0.0005 + 1e-9 if np.diff(run.wavelength).min() > 10 else 0.0008
+    for row in run_rows:
+        assert abs(row['x'] - row['printed_x']) <= tolerance, row
+        assert abs(row['y'] - row['printed_y']) <= tolerance, row
+        assert row['Y'] == pytest.approx(row['printed_Y'], rel=2e-3), row
+
+
+def test_forel_ule_matches_printout(rows):
+    printed = [row for row in rows if row['printed_fu'] is not None]
+    assert len(printed) == 3
+    assert [row['fu'] for row in printed] == [row['printed_fu'] for row in printed]
+    assert all(row['status'] == "ok" for row in rows)
+
+
+def test_forel_ule_limits():
+    hue = np.array([300.0, 228.0, 196.0, 192.5, 88.0, 10.0, np.nan])
+    np.testing.assert_array_equal(forel_ule(hue), [1, 1, 4, 5, 9, 21, 0])
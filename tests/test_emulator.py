@@ -0,0 +1,41 @@
+"""
+test_emulator.py
+emulator.cross_validate 검사: 매끄러운 합성 ensemble에서 작은 오차, HydroLightEnsemble과 EnsembleStore가 같은 결과
+"""
+
+import numpy as np
+import pytest
+
+from hydrolight.ensemble import HydroLightEnsemble, HydroLightRun
+from hydrolight.emulator import cross_validate
+from hydrolight.store import EnsembleStore
+
+
+WAVELENGTH = np.arange(405.0, 700.0, 10.0)
+
+
+def synthetic_ensemble(n=12):
+    """Rrs가 chl의 매끄러운 함수인 run n개"""
+    runs = []
+    for i, chl in enumerate(np.geomspace(0.1, 10.0, n)):
+        rrs = 0.01 * np.exp(-0.3 * np.log10(chl) * (WAVELENGTH - 405.0) / 300.0) + 0.001 * np.log10(chl) ** 2
+        runs.append(HydroLightRun(f"run{i:02d}", WAVELENGTH, [0.0, 1.0], {'Rrs': rrs},
+                                  {'chl': chl, 'sun_zenith': 30.0}))
+    return HydroLightEnsemble(runs)
+
+
+def test_cross_validate_small_error():
+    rows, errors = cross_validate(synthetic_ensemble(), folds=4, quantities=["Rrs"])
+    assert rows[0]['n_runs'] == 12 and rows[0]['folds'] == 4
+    assert errors['Rrs'].shape == (12, len(WAVELENGTH))
+    assert np.isfinite(errors['Rrs']).all()
+    assert rows[0]['rms'] < 0.05
+
+
+def test_cross_validate_store_matches_ensemble(tmp_path):
+    ensemble = synthetic_ensemble()
+    store = EnsembleStore.from_ensemble(tmp_path / "store", ensemble, quantities=("Rrs",), dtype='float64')
+    rows, errors = cross_validate(ensemble, folds=3, quantities=["Rrs"])
+    store_rows, store_errors = cross_validate(store, folds=3, quantities=["Rrs"])
+    np.testing.assert_allclose(store_errors['Rrs'], errors['Rrs'], rtol=1e-6, atol=1e-9)
+    assert store_rows[0]['rms'] == pytest.approx(rows[0]['rms'])
@@ -0,0 +1,64 @@
+"""
+test_interpolate.py
+GridInterpolator 검사: 노드 값 재현, 선형/지수 감쇠 필드의 정확한 보간, 그리드 밖 질의, 바닥 NaN 범위
+"""
+
+import numpy as np
+import pytest
+
+from hydrolight.interpolate import GridInterpolator
+
+
+WAVELENGTH = np.array([400.0, 420.0, 450.0, 500.0, 560.0, 600.0])
+DEPTH = np.array([0.0, 1.0, 2.5, 5.0, 10.0])
+
+
+def field(kind):
+    """(2, n_wavelength, n_depth) 시험 값: 'linear' 또는 'exponential' (log가 파장, 깊이에 선형)"""
+    w, z = np.meshgrid(WAVELENGTH, DEPTH, indexing='ij')
+    if kind == "linear":
+        one = 2.0 + 0.01 * w - 0.15 * z
+    else:
+        one = 1.5 * np.exp(0.002 * w - 0.2 * z)
+    return np.stack([one, 3.0 * one])
+
+
+@pytest.mark.parametrize("method", ["pchip", "loglinear"])
+def test_nodes_are_reproduced(method):
+    values = np.random.default_rng(1).random((2, len(WAVELENGTH), len(DEPTH))) + 0.1
+    interp = GridInterpolator(values, WAVELENGTH, DEPTH, method=method)
+    out = interp(DEPTH[None, :], WAVELENGTH[:, None])
+    np.testing.assert_allclose(out, values)
+
+
+@pytest.mark.parametrize("method, kind", [("pchip", "linear"), ("loglinear", "exponential")])
+def test_exact_between_nodes(method, kind):
+    interp = GridInterpolator(field(kind), WAVELENGTH, DEPTH, method=method)
+    z, wl = np.array([0.3, 2.0, 7.7]), np.array([403.0, 437.5, 590.0])
+    out = interp(z, wl)
+    expected = 2.0 + 0.01 * wl - 0.15 * z if kind == "linear" else 1.5 * np.exp(0.002 * wl - 0.2 * z)
+    np.testing.assert_allclose(out, [expected, 3.0 * expected], rtol=1e-12)
+    # 질의점별 run
+    np.testing.assert_allclose(interp(z, wl, runs=[1, 0, 1]), [3.0, 1.0, 3.0] * expected, rtol=1e-12)
+
+
+def test_outside_grid_fill_and_clip():
+    values = field("linear")
+    assert np.isnan(GridInterpolator(values, WAVELENGTH, DEPTH)([-0.5, 11.0], 450.0)).all()
+    assert np.isnan(GridInterpolator(values, WAVELENGTH, DEPTH)(1.0, 650.0)).all()
+    clipped = GridInterpolator(values, WAVELENGTH, DEPTH, clip=True)([-0.5, 11.0], 450.0)
+    np.testing.assert_allclose(clipped, values[:, 2, [0, -1]])
+
+
+def test_bottom_nan_stays_in_bottom_cells():
+    values = field("linear")
+    values[:, :, -1] = np.nan
+    interp = GridInterpolator(values, WAVELENGTH, DEPTH)
+    assert np.isnan(interp(7.5, 450.0)).all()
+    np.testing.assert_allclose(interp(np.array([0.5, 3.0]), 450.0)[0], 2.0 + 4.5 - 0.15 * np.array([0.5, 3.0]))
+
+
+def test_single_run_without_depth():
+    rrs = 0.001 + 1e-5 * WAVELENGTH
+    interp = GridInterpolator(rrs[None], WAVELENGTH, single=True)
+    np.testing.assert_allclose(interp(None, [410.0, 555.0]), 0.001 + 1e-5 * np.array([410.0, 555.0]))
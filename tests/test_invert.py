@@ -0,0 +1,57 @@
+"""
+test_invert.py
+ShallowWaterInversion 검사: forward 모델로 만든 스펙트럼의 미지수/바닥 비율 복원, NaN 스펙트럼, 관측 파일 읽기
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from hydrolight.ensemble import load_run
+from hydrolight.invert import ShallowWaterInversion, read_spectra
+from hydrolight.library import DEFAULT_LIBRARY_DIR, SpectralLibrary
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+# [P, G, X, H, q]와 바닥 쌍 인덱스 (3종이면 쌍 (0, 1), (0, 2), (1, 2))
+TRUTH = np.array([[0.05, 0.03, 0.01, 3.0, 0.7],
+                  [0.2, 0.1, 0.02, 6.0, 0.3],
+                  [0.02, 0.01, 0.005, 1.5, 1.0]])
+PAIRS = [0, 1, 2]
+
+
+@pytest.fixture(scope="module")
+def inversion():
+    library = SpectralLibrary.from_directory(DEFAULT_LIBRARY_DIR)
+    return ShallowWaterInversion.from_run(load_run(DATA_DIR / "PExe01.txt"), library, bottoms=library.names[:3])
+
+
+def test_recovers_forward_model_spectra(inversion):
+    spectra = inversion.model(TRUTH, inversion.pairs[PAIRS])
+    result = inversion.invert(np.vstack([spectra, np.full(len(inversion.wavelength), np.nan)]))
+    np.testing.assert_allclose(result["values"][:3], TRUTH, rtol=1e-3, atol=1e-6)
+    np.testing.assert_array_equal(result["pairs"][:3], inversion.pairs[PAIRS])
+    np.testing.assert_allclose(result["fractions"][:3], [[0.7, 0.3, 0.0], [0.3, 0.0, 0.7], [0.0, 1.0, 0.0]],
+                               atol=1e-3)
+    assert result["converged"][:3].all() and (result["rmse"][:3] < 1e-8).all()
+    # NaN 밴드가 있는 스펙트럼은 결과도 NaN, 쌍은 -1
+    assert np.isnan(result["values"][3]).all() and (result["pairs"][3] == -1).all()
+    rows = inversion.result_rows(result, ["a", "b", "c", "missing"])
+    assert rows[3]['bottom_1'] == "" and rows[0]['bottom_1'] == inversion.bottom_names[0]
+
+
+def test_parallel_chunks_match_serial(inversion):
+    spectra = inversion.model(TRUTH, inversion.pairs[PAIRS])
+    serial = inversion.invert(spectra)
+    parallel = inversion.invert(spectra, jobs=2, chunk_size=2)
+    np.testing.assert_allclose(parallel["values"], serial["values"])
+
+
+def test_read_spectra_csv(tmp_path):
+    path = tmp_path / "rrs.csv"
+    path.write_text("station,443,555\nA,0.004,0.002\nB,0.003,\n")
+    names, wavelength, rrs = read_spectra(path)
+    assert names == ["A", "B"]
+    np.testing.assert_array_equal(wavelength, [443.0, 555.0])
+    np.testing.assert_array_equal(rrs, [[0.004, 0.002], [0.003, np.nan]])
@@ -0,0 +1,60 @@
+"""
+test_sensor.py
+sensor.convolve / band_matrix 검사: 박스형 응답의 평균, NaN 전파 범위, 캐시 행렬 보호
+"""
+
+import numpy as np
+import pytest
+
+from hydrolight.sensor import SensorResponse, band_matrix, convolve
+
+
+# HydroLight 기본 그리드와 같은 10 nm 밴드 (350-700 nm 경계, 중심 355-695 nm)
+WAVELENGTH = np.arange(355.0, 700.0, 10.0)
+
+
+def box_sensor():
+    """440-450 nm, 550-570 nm 박스형 응답 두 밴드"""
+    # 경계에서 1e-6 nm 안에 0 -> 1로 바뀌는 선형 보간 응답 (사실상 박스)
+    edges = {0: (440.0, 450.0), 1: (550.0, 570.0)}
+    wavelength = np.unique(np.concatenate([[400.0, 600.0]] + [[lo - 1e-6, lo, hi, hi + 1e-6]
+                                                             for lo, hi in edges.values()]))
+    response = np.stack([((wavelength >= lo) & (wavelength <= hi)).astype(float) for lo, hi in edges.values()])
+    return SensorResponse("box", wavelength, response, ["B443", "B560"])
+
+
+def test_box_band_is_band_mean():
+    spectrum = np.random.default_rng(0).random(len(WAVELENGTH))
+    out = convolve(spectrum, box_sensor(), WAVELENGTH)
+    # 440-450 nm는 445 nm 밴드 하나, 550-570 nm는 555, 565 nm 밴드 절반씩
+    assert out[0] == pytest.approx(spectrum[9])
+    assert out[1] == pytest.approx(0.5 * (spectrum[20] + spectrum[21]))
+
+
+def test_nan_only_reaches_bands_that_weight_it():
+    cube = np.tile(np.linspace(0.0, 1.0, len(WAVELENGTH)), (3, 1))
+    cube[0, -1] = np.nan          # 695 nm: 두 센서 밴드 모두 가중치 0
+    cube[1, 9] = np.nan           # 445 nm: 첫 밴드만
+    out = convolve(cube, box_sensor(), WAVELENGTH)
+    clean = convolve(cube[2], box_sensor(), WAVELENGTH)
+    np.testing.assert_allclose(out[0], clean)
+    assert np.isnan(out[1, 0]) and out[1, 1] == pytest.approx(clean[1])
+
+
+def test_nan_with_depth_axis():
+    cube = np.ones((2, len(WAVELENGTH), 4))
+    cube[0, -1, 2] = np.nan
+    cube[1, 20, 1] = np.nan
+    out = convolve(cube, box_sensor(), WAVELENGTH, axis=1)
+    assert out.shape == (2, 2, 4)
+    assert not np.isnan(out[0]).any()
+    assert np.isnan(out[1, 1, 1]) and np.isnan(out).sum() == 1
+
+
+def test_band_matrix_is_read_only():
+    matrix, coverage = band_matrix(box_sensor(), WAVELENGTH)
+    with pytest.raises(ValueError):
+        matrix[0, 0] = 1.0
+    with pytest.raises(ValueError):
+        coverage[0] = 0.0
+    assert band_matrix(box_sensor(), WAVELENGTH)[0][0, 9] == pytest.approx(1.0)
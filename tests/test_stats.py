@@ -0,0 +1,69 @@
+"""
+test_stats.py
+stats 검사: streaming 평균/분산과 merge, 분위수 sketch의 상대 오차, 파일 reducer의 병렬 결과
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from hydrolight.stats import QuantileSketch, StreamingMoments, reduce_files
+
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def sample(seed=0, shape=(200, 4, 3)):
+    values = np.random.default_rng(seed).lognormal(mean=-3.0, sigma=1.5, size=shape)
+    values[::7, 0, 0] = np.nan
+    return values
+
+
+def test_moments_match_numpy_after_batches_and_merge():
+    values = sample()
+    left, right = StreamingMoments(values.shape[1:]), StreamingMoments(values.shape[1:])
+    for run in values[:50]:
+        left.update(run)
+    left.update_batch(values[50:120])
+    right.update_batch(values[120:])
+    summary = left.merge(right).summary()
+    np.testing.assert_array_equal(summary['count'], np.isfinite(values).sum(axis=0))
+    np.testing.assert_allclose(summary['mean'], np.nanmean(values, axis=0), rtol=1e-12)
+    np.testing.assert_allclose(summary['std'], np.nanstd(values, axis=0, ddof=1), rtol=1e-10)
+    np.testing.assert_array_equal(summary['min'], np.nanmin(values, axis=0))
+    np.testing.assert_array_equal(summary['max'], np.nanmax(values, axis=0))
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_sketch_quantiles_within_relative_accuracy(accuracy):
+    values = sample(1)
+    sketch = QuantileSketch(values.shape[1:], relative_accuracy=accuracy)
+    sketch.update_batch(values[:100])
+    other = QuantileSketch(values.shape[1:], relative_accuracy=accuracy)
+    other.update_batch(values[100:])
+    sketch.merge(other)
+    for q in (0.0, 0.05, 0.5, 0.95, 1.0):
+        exact = np.nanquantile(values, q, axis=0, method='lower')
+        np.testing.assert_array_less(np.abs(sketch.quantile(q) / exact - 1), accuracy + 1e-12)
+
+
+def test_sketch_signed_values_and_empty_cells():
+    sketch = QuantileSketch((2,))
+    sketch.update_batch(np.array([[-2.0, np.nan], [0.0, np.nan], [3.0, np.nan]]))
+    assert sketch.quantile(0.0)[0] == pytest.approx(-2.0, rel=0.01)
+    assert sketch.quantile(0.5)[0] == 0.0
+    assert sketch.quantile(1.0)[0] == pytest.approx(3.0, rel=0.01)
+    assert np.isnan(sketch.quantile(0.5)[1])
+    with pytest.raises(ValueError):
+        sketch.quantile(1.5)
+
+
+def test_parallel_file_reduction_matches_serial():
+    files = sorted(DATA_DIR.glob("PExe0[1-3].txt"))
+    serial, failures = reduce_files(files, quantities=("Ed", "Rrs"))
+    parallel, _ = reduce_files(files, quantities=("Ed", "Rrs"), jobs=2)
+    assert not failures and serial.n_runs == parallel.n_runs == 3
+    for q in ("Ed", "Rrs"):
+        for key, values in serial.summary(q).items():
+            np.testing.assert_allclose(parallel.summary(q)[key], values, rtol=1e-12, err_msg=f"{q} {key}")